@@ -1964,7 +1964,7 @@ class GLTriMeshNode(GLSceneGraphNode):
             '  <li><b># of vertices:</b>' + str(len(tmesh.vertex_list)) + '\n' +\
             '  <li><b># of faces:</b>'    + str(len(tmesh.face_idx_list)) + '\n'
 
-        if (tmesh.texcoord_list == []):
+        if (len(tmesh.texcoord_list) == 0):
             tmesh_desc += '  <li>no texture coordinates\n'
         else:
             tmesh_desc += \
@@ -1973,7 +1973,7 @@ class GLTriMeshNode(GLSceneGraphNode):
                 '  <li><b># of texcoord idx:</b>' +\
                 str(len(tmesh.texcoord_idx_list)) + '\n'
 
-        if (tmesh.normal_list == []):
+        if (len(tmesh.normal_list) == 0):
             tmesh_desc += '  <li>no normals\n'
         else:
             tmesh_desc += \
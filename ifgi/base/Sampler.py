@@ -10,21 +10,70 @@ import numpy, random, math, ifgimath
 
 class StratifiedRegularSampler(object):
     """a simple stratified regular sampler.
+
+    Each pixel has sample_count samples. The pixel is divided into
+    strata_x x strata_y (= sample_count) strata, and each sample is in
+    its own stratum. Without jitter, a sample is at the center of its
+    stratum (one sample: the pixel center). With jitter, a sample is
+    uniformly random in its stratum.
+
+    The random numbers of a frame only depend on (seed, frame
+    number), then rendering a frame again gives the same samples.
+
+    The samples are numpy arrays, see get_sample_x_array(),
+    get_sample_y_array(), and get_jitter_array() for the batched
+    camera (Camera.generate_tile_rays()).
     """
 
-    def __init__(self):
-        """default constructor"""
+    def __init__(self, _is_jitter=False, _seed=0):
+        """default constructor
+
+        \param[in] _is_jitter when True, jitter the samples in the strata
+        \param[in] _seed      random seed of the jitter
+        """
         self._xstart = 0
         self._xend   = 0
         self._ystart = -1
         self._yend   = -1
         self._xsize  = 0
         self._ysize  = 0
-        self._sample_loc_x = numpy.zeros( (0, 0) )
-        self._sample_loc_y = numpy.zeros( (0, 0) )
+        self._is_jitter = _is_jitter
+        self._seed      = _seed
+        self._strata_size = (1, 1)
+        # (sample_count, xsize, ysize)
+        self._sample_loc_x = numpy.zeros( (1, 0, 0) )
+        self._sample_loc_y = numpy.zeros( (1, 0, 0) )
+
+
+    def set_jitter(self, _is_jitter):
+        """set jitter mode.
+        \param[in] _is_jitter when True, jitter the samples in the strata
+        """
+        self._is_jitter = _is_jitter
+
+
+    def is_jitter(self):
+        """get jitter mode.
+        \return True when jittered
+        """
+        return self._is_jitter
 
 
-    def compute_sample(self, _xstart, _xend, _ystart, _yend):
+    def set_seed(self, _seed):
+        """set random seed of the jitter.
+        \param[in] _seed random seed
+        """
+        self._seed = _seed
+
+
+    def get_seed(self):
+        """get random seed of the jitter.
+        \return random seed
+        """
+        return self._seed
+
+
+    def compute_sample(self, _xstart, _xend, _ystart, _yend, _nframe=0, _sample_count=1):
         """compute samples. Allocate memory.
 
         we can access pixel index [_xstart, _xend], [_ystart, _yend]
@@ -33,9 +82,13 @@ class StratifiedRegularSampler(object):
         \param[in] _xend   end   of pixel x (inclusive)
         \param[in] _ystart start of pixel y
         \param[in] _yend   end   of pixel y (inclusive)
+        \param[in] _nframe frame number. The jitter of a frame is
+        deterministic.
+        \param[in] _sample_count number of samples per pixel
         """
         assert(_xstart <= _xend)
         assert(_ystart <= _yend)
+        assert(_sample_count > 0)
 
         self._xstart = _xstart
         self._xend   = _xend
@@ -43,27 +96,100 @@ class StratifiedRegularSampler(object):
         self._yend   = _yend
         self._xsize  = self._xend - self._xstart + 1
         self._ysize  = self._yend - self._ystart + 1
-        if(self._sample_loc_x.shape != ( (self._xsize, self._ysize) )):
-            # resize
-            print 'resize the sample location from ' + str(self._sample_loc_x.shape) +\
-                ' to ' + str((self._xsize, self._ysize) )
-            self._sample_loc_x = numpy.zeros( (self._xsize, self._ysize) )
-            self._sample_loc_y = numpy.zeros( (self._xsize, self._ysize) )
-
-        for x in xrange(0, self._xsize, 1):
-            for y in xrange(0, self._ysize, 1):
-                self._sample_loc_x[x,y] = x + 0.5
-                self._sample_loc_y[x,y] = y + 0.5
+        self._strata_size = get_strata_size(_sample_count)
+        (strata_x, strata_y) = self._strata_size
+
+        shape = (_sample_count, self._xsize, self._ysize)
+        if self._is_jitter:
+            rng = numpy.random.RandomState([self._seed & 0xffffffff, _nframe & 0xffffffff])
+            jitter_x = rng.random_sample(shape)
+            jitter_y = rng.random_sample(shape)
+        else:
+            jitter_x = 0.5
+            jitter_y = 0.5
+
+        # stratum of each sample
+        sidx = numpy.arange(_sample_count)
+        stratum_x = (sidx / strata_y).astype(numpy.float64)[:, numpy.newaxis, numpy.newaxis]
+        stratum_y = (sidx % strata_y).astype(numpy.float64)[:, numpy.newaxis, numpy.newaxis]
+        px = numpy.arange(self._xstart, self._xend + 1,
+                          dtype=numpy.float64)[numpy.newaxis, :, numpy.newaxis]
+        py = numpy.arange(self._ystart, self._yend + 1,
+                          dtype=numpy.float64)[numpy.newaxis, numpy.newaxis, :]
+
+        self._sample_loc_x = px + (stratum_x + jitter_x) / strata_x + numpy.zeros(shape)
+        self._sample_loc_y = py + (stratum_y + jitter_y) / strata_y + numpy.zeros(shape)
+
+
+    def get_sample_count(self):
+        """get number of samples per pixel.
+        \return number of samples per pixel
+        """
+        return self._sample_loc_x.shape[0]
+
+
+    def get_strata_size(self):
+        """get the strata size of a pixel.
+        \return (strata_x, strata_y)
+        """
+        return self._strata_size
+
 
     # get sample location x
-    def get_sample_x(self, _xidx, _yidx):
+    def get_sample_x(self, _xidx, _yidx, _sample_idx=0):
         """get the sample location x from the pixel index."""
-        return self._sample_loc_x[_xidx,_yidx]
+        return self._sample_loc_x[_sample_idx, _xidx - self._xstart, _yidx - self._ystart]
 
     # get sample location y
-    def get_sample_y(self, _xidx, _yidx):
+    def get_sample_y(self, _xidx, _yidx, _sample_idx=0):
         """get the sample location y from the pixel index."""
-        return self._sample_loc_y[_xidx,_yidx]
+        return self._sample_loc_y[_sample_idx, _xidx - self._xstart, _yidx - self._ystart]
+
+
+    def get_sample_x_array(self):
+        """get all the sample locations x.
+        \return numpy.array (sample_count, xsize, ysize)
+        """
+        return self._sample_loc_x
+
+
+    def get_sample_y_array(self):
+        """get all the sample locations y.
+        \return numpy.array (sample_count, xsize, ysize)
+        """
+        return self._sample_loc_y
+
+
+    def get_jitter_array(self, _sample_idx=0):
+        """get the sample positions in the pixels of a sample index.
+
+        The order is the framebuffer order (x major), the same as
+        Camera.generate_tile_rays().
+
+        \param[in] _sample_idx sample index
+        \return sample positions in the pixels [0,1)^2 numpy.array
+        (xsize * ysize, 2)
+        """
+        jx = self._sample_loc_x[_sample_idx] - \
+            numpy.arange(self._xstart, self._xend + 1)[:, numpy.newaxis]
+        jy = self._sample_loc_y[_sample_idx] - \
+            numpy.arange(self._ystart, self._yend + 1)[numpy.newaxis, :]
+        return numpy.column_stack((jx.ravel(), jy.ravel()))
+
+
+def get_strata_size(_sample_count):
+    """get the strata size of a number of samples.
+
+    The strata are as square as possible, strata_x <= strata_y and
+    strata_x * strata_y = _sample_count.
+
+    \param[in] _sample_count number of samples
+    \return (strata_x, strata_y)
+    """
+    strata_x = int(math.sqrt(_sample_count))
+    while (_sample_count % strata_x) != 0:
+        strata_x -= 1
+    return (strata_x, _sample_count / strata_x)
 
 
 class UnitDiskUniformSampler(object):
@@ -88,10 +214,82 @@ class UnitDiskUniformSampler(object):
         return (x, y)
 
 
+    def get_sample_array(self, _sample_count, _rng):
+        """get many sample points on an unit disk
+        \param[in] _sample_count number of samples
+        \param[in] _rng random number generator (numpy.random.RandomState)
+        \return numpy.array (_sample_count, 2)"""
+        return self.warp_sample_array(_rng.random_sample((_sample_count, 2)))
+
+
+    def warp_sample_array(self, _u):
+        """map uniform samples to an unit disk
+        \param[in] _u uniform samples in [0,1)^2 numpy.array (N,2)
+        \return numpy.array (N, 2)"""
+        r = numpy.sqrt(_u[:, 0])
+        t = (2.0 * math.pi) * _u[:, 1]
+        return numpy.column_stack((r * numpy.cos(t), r * numpy.sin(t)))
+
+
 
 class UnitHemisphereUniformSampler(object):
     """Generate uniform sampling on a hemisphere.
-    Using UnitDiskUniformSampler.
+    Uniform respect to solid angle, pdf = 1/(2 pi).
+    """
+
+    def __init__(self):
+        """default constructor"""
+        pass
+
+    def get_sample(self):
+        """get sample point on a unit hemisphere
+        \return numpy.array([x,y,z])"""
+        z = random.random()
+        t = 2.0 * math.pi * random.random()
+        r = math.sqrt(max(0.0, 1.0 - z * z))
+        return numpy.array([r * math.cos(t), r * math.sin(t), z])
+
+
+    def get_sample_array(self, _sample_count, _rng):
+        """get many sample points on a unit hemisphere
+        \param[in] _sample_count number of samples
+        \param[in] _rng random number generator (numpy.random.RandomState)
+        \return numpy.array (_sample_count, 3)"""
+        return self.warp_sample_array(_rng.random_sample((_sample_count, 2)))
+
+
+    def warp_sample_array(self, _u):
+        """map uniform samples to a unit hemisphere
+        \param[in] _u uniform samples in [0,1)^2 numpy.array (N,2)
+        \return numpy.array (N, 3)"""
+        z = _u[:, 0]
+        t = (2.0 * math.pi) * _u[:, 1]
+        r = numpy.sqrt(numpy.maximum(0.0, 1.0 - z * z))
+        return numpy.column_stack((r * numpy.cos(t), r * numpy.sin(t), z))
+
+
+    def get_pdf(self, _v):
+        """get the probability density of a sample
+        \param[in] _v sample point on the unit hemisphere
+        \return pdf respect to solid angle"""
+        return 1.0 / (2.0 * math.pi)
+
+
+    def get_pdf_array(self, _v):
+        """get the probability density of many samples
+        \param[in] _v sample points numpy.array (N,3)
+        \return pdf respect to solid angle numpy.array (N,)"""
+        pdf = numpy.empty(_v.shape[0])
+        pdf.fill(1.0 / (2.0 * math.pi))
+        return pdf
+
+
+
+class UnitHemisphereCosineSampler(object):
+    """Generate cosine weighted sampling on a hemisphere.
+    pdf = cos(theta) / pi = z / pi. Using UnitDiskUniformSampler
+    (Malley's method: project the uniform disk samples up to the
+    hemisphere).
     """
 
     def __init__(self):
@@ -107,14 +305,510 @@ class UnitHemisphereUniformSampler(object):
 
         x = p[0]
         y = p[1]
-        z = math.sqrt(numpy.max([0, 1 - x * x - y * y]))
+        z = math.sqrt(max(0.0, 1.0 - x * x - y * y))
         v = numpy.array([x, y, z])
         # v should be a normalized vector. see in the test.
-        # r = ifgimath.normalize_vec(v)
-
         return v
 
 
+    def get_sample_array(self, _sample_count, _rng):
+        """get many sample points on a unit hemisphere
+        \param[in] _sample_count number of samples
+        \param[in] _rng random number generator (numpy.random.RandomState)
+        \return numpy.array (_sample_count, 3)"""
+        return self.warp_sample_array(_rng.random_sample((_sample_count, 2)))
+
+
+    def warp_sample_array(self, _u):
+        """map uniform samples to a unit hemisphere
+        \param[in] _u uniform samples in [0,1)^2 numpy.array (N,2)
+        \return numpy.array (N, 3)"""
+        p = self.__udus.warp_sample_array(_u)
+        z = numpy.sqrt(numpy.maximum(0.0, 1.0 - (p * p).sum(axis=1)))
+        return numpy.column_stack((p, z))
+
+
+    def get_pdf(self, _v):
+        """get the probability density of a sample
+        \param[in] _v sample point on the unit hemisphere
+        \return pdf respect to solid angle"""
+        return max(0.0, _v[2]) / math.pi
+
+
+    def get_pdf_array(self, _v):
+        """get the probability density of many samples
+        \param[in] _v sample points numpy.array (N,3)
+        \return pdf respect to solid angle numpy.array (N,)"""
+        return numpy.maximum(0.0, _v[:, 2]) * (1.0 / math.pi)
+
+
+
+# ----------------------------------------------------------------------
+# pixel samplers: a sample point of (pixel, sample index, dimension)
+# ----------------------------------------------------------------------
+
+def hash_uint32(_x):
+    """integer hash (vectorized). Good avalanche, from the
+    'hash prospector' of C. Wellons.
+    \param[in] _x numpy.array of uint32
+    \return hashed numpy.array of uint32
+    """
+    x = numpy.array(_x, dtype=numpy.uint32, ndmin=1)
+    with numpy.errstate(over='ignore'):
+        x ^= x >> 16
+        x *= numpy.uint32(0x7feb352d)
+        x ^= x >> 15
+        x *= numpy.uint32(0x846ca68b)
+        x ^= x >> 16
+    return x
+
+
+def hash_combine_uint32(_seed, _v):
+    """combine a value to a hash seed (vectorized).
+    \param[in] _seed seed numpy.array of uint32 (or int)
+    \param[in] _v    value numpy.array of uint32 (or int)
+    \return hashed numpy.array of uint32
+    """
+    v = numpy.array(_v, dtype=numpy.uint32, ndmin=1)
+    with numpy.errstate(over='ignore'):
+        return hash_uint32(hash_uint32(_seed) ^ (v + numpy.uint32(0x9e3779b9)))
+
+
+def reverse_bits_uint32(_x):
+    """reverse the bits of 32 bit integers (vectorized).
+    \param[in] _x numpy.array of uint32
+    \return bit reversed numpy.array of uint32
+    """
+    x = numpy.array(_x, dtype=numpy.uint32, ndmin=1)
+    x = ((x >> 1) & numpy.uint32(0x55555555)) | ((x & numpy.uint32(0x55555555)) << 1)
+    x = ((x >> 2) & numpy.uint32(0x33333333)) | ((x & numpy.uint32(0x33333333)) << 2)
+    x = ((x >> 4) & numpy.uint32(0x0f0f0f0f)) | ((x & numpy.uint32(0x0f0f0f0f)) << 4)
+    x = ((x >> 8) & numpy.uint32(0x00ff00ff)) | ((x & numpy.uint32(0x00ff00ff)) << 8)
+    x = (x >> 16) | (x << 16)
+    return x
+
+
+def owen_scramble_uint32(_x, _seed):
+    """nested uniform (Owen) scrambling in base 2 (vectorized).
+
+    Hash based scrambling by Burley 2020, "Practical Hash-based Owen
+    Scrambling" (Laine-Karras permutation on the reversed bits).
+
+    \param[in] _x    numpy.array of uint32 (fixed point [0,1))
+    \param[in] _seed scramble seed numpy.array of uint32
+    \return scrambled numpy.array of uint32
+    """
+    x = reverse_bits_uint32(_x)
+    with numpy.errstate(over='ignore'):
+        x += numpy.array(_seed, dtype=numpy.uint32)
+        x ^= x * numpy.uint32(0x6c50b47c)
+        x ^= x * numpy.uint32(0xb82f1e52)
+        x ^= x * numpy.uint32(0xc7afe638)
+        x ^= x * numpy.uint32(0x8d22f6e6)
+    return reverse_bits_uint32(x)
+
+
+def uint32_to_unit_float(_x):
+    """32 bit fixed point to a float in [0,1).
+    \param[in] _x numpy.array of uint32
+    \return numpy.array of float64 in [0,1)
+    """
+    return _x.astype(numpy.float64) * (1.0 / 4294967296.0)
+
+
+def get_prime_list(_count):
+    """get the first primes.
+    \param[in] _count number of primes
+    \return list of the first _count primes
+    """
+    prime_list = []
+    n = 2
+    while len(prime_list) < _count:
+        if all([(n % p) != 0 for p in prime_list if p * p <= n]):
+            prime_list.append(n)
+        n += 1
+    return prime_list
+
+
+
+class PixelSamplerIF(object):
+    """pixel sampler interface.
+
+    A pixel sampler gives the sample point of (pixel index, sample
+    index, dimension) in [0,1). A renderer allocates the dimensions
+    (e.g., 0,1: pixel jitter, 2,3: lens, then some dimensions per
+    bounce), then each dimension of a pixel is a well distributed
+    sequence over the sample index (frame number). The pixels are
+    decorrelated by hashing the pixel index with the seed.
+
+    The same (seed, pixel index, sample index, dimension) always
+    gives the same point, independent of the tile or the process.
+    """
+
+    def __init__(self, _seed=0):
+        """constructor
+        \param[in] _seed scramble seed (int)
+        """
+        self.set_seed(_seed)
+
+
+    def get_classname(self):
+        """get class name. interface method.
+        \return class name
+        """
+        assert(False)           # you need to implement this in the inherited class
+
+
+    def set_seed(self, _seed):
+        """set the scramble seed.
+        \param[in] _seed scramble seed (int)
+        """
+        self._seed = numpy.uint32(_seed & 0xffffffff)
+
+
+    def get_seed(self):
+        """get the scramble seed.
+        \return scramble seed
+        """
+        return int(self._seed)
+
+
+    def get_sample_array(self, _pixel_idx, _sample_idx, _dim, _dim_count):
+        """get sample points. interface method.
+
+        \param[in] _pixel_idx  pixel indices numpy.array (N,)
+        \param[in] _sample_idx sample index (int or numpy.array (N,))
+        \param[in] _dim        the first dimension
+        \param[in] _dim_count  number of dimensions
+        \return sample points in [0,1) numpy.array (N, _dim_count)
+        """
+        assert(False)           # you need to implement this in the inherited class
+
+
+
+class RandomPixelSampler(PixelSamplerIF):
+    """independent uniform random samples (the reference).
+
+    The random numbers are hashed from (seed, pixel, sample,
+    dimension), no random number generator state.
+    """
+
+    def get_classname(self):
+        """get class name.
+        \return 'RandomPixelSampler'
+        """
+        return 'RandomPixelSampler'
+
+
+    def get_sample_array(self, _pixel_idx, _sample_idx, _dim, _dim_count):
+        """get sample points. See PixelSamplerIF.
+        """
+        key = hash_combine_uint32(hash_combine_uint32(self._seed, _pixel_idx), _sample_idx)
+        col_list = []
+        for dim in xrange(_dim, _dim + _dim_count):
+            col_list.append(uint32_to_unit_float(hash_combine_uint32(key, dim)))
+        return numpy.column_stack(col_list)
+
+
+
+class HaltonPixelSampler(PixelSamplerIF):
+    """scrambled Halton sequence.
+
+    Dimension d is the radical inverse in the d-th prime base with a
+    random digit permutation of the dimension (Faure-Tezuka style
+    scrambling, the permutation keeps 0). Each pixel has a random
+    toroidal shift (Cranley-Patterson rotation) per dimension.
+    """
+
+    # max number of dimensions
+    MAX_DIMENSION = 128
+
+    def __init__(self, _seed=0):
+        """constructor
+        \param[in] _seed scramble seed (int)
+        """
+        self.__prime_list = get_prime_list(HaltonPixelSampler.MAX_DIMENSION)
+        super(HaltonPixelSampler, self).__init__(_seed)
+
+
+    def get_classname(self):
+        """get class name.
+        \return 'HaltonPixelSampler'
+        """
+        return 'HaltonPixelSampler'
+
+
+    def set_seed(self, _seed):
+        """set the scramble seed. The digit permutations are rebuilt.
+        \param[in] _seed scramble seed (int)
+        """
+        super(HaltonPixelSampler, self).set_seed(_seed)
+        rng = numpy.random.RandomState(int(self._seed))
+        self.__perm_list = []
+        for base in self.__prime_list:
+            perm = numpy.arange(base)
+            perm[1:] = rng.permutation(perm[1:])
+            self.__perm_list.append(perm)
+
+
+    def get_sample_array(self, _pixel_idx, _sample_idx, _dim, _dim_count):
+        """get sample points. See PixelSamplerIF.
+        """
+        if _dim + _dim_count > HaltonPixelSampler.MAX_DIMENSION:
+            raise StandardError, ('HaltonPixelSampler supports ' +
+                                  str(HaltonPixelSampler.MAX_DIMENSION) + ' dimensions.')
+        pixel_key = hash_combine_uint32(self._seed, _pixel_idx)
+        sample_idx = numpy.zeros(len(pixel_key), dtype=numpy.int64) + _sample_idx
+        col_list = []
+        for dim in xrange(_dim, _dim + _dim_count):
+            base = self.__prime_list[dim]
+            perm = self.__perm_list[dim]
+            val  = numpy.zeros(len(sample_idx))
+            idx  = sample_idx.copy()
+            inv_base = 1.0 / base
+            scale = inv_base
+            while (idx > 0).any():
+                val += perm[idx % base] * scale
+                idx //= base
+                scale *= inv_base
+            shift = uint32_to_unit_float(hash_combine_uint32(pixel_key, dim))
+            val += shift
+            val -= numpy.floor(val)
+            col_list.append(val)
+        return numpy.column_stack(col_list)
+
+
+
+class SobolPixelSampler(PixelSamplerIF):
+    """Owen scrambled, shuffled Sobol (0,2) sequence.
+
+    The dimensions are padded by pairs: dimensions (2k, 2k+1) are the
+    first two Sobol dimensions. Each pair of each pixel has its own
+    Owen scrambling and its own index shuffle (Burley 2020), this
+    decorrelates the pairs and the pixels. Each pair is a (0,2)
+    sequence: the first 2^m samples are stratified in every 2^m
+    elementary interval.
+    """
+
+    def __init__(self, _seed=0):
+        """constructor
+        \param[in] _seed scramble seed (int)
+        """
+        super(SobolPixelSampler, self).__init__(_seed)
+        # direction numbers of the second Sobol dimension
+        self.__dir1 = []
+        v = 1 << 31
+        for bit in xrange(32):
+            self.__dir1.append(numpy.uint32(v))
+            v ^= (v >> 1)
+
+
+    def get_classname(self):
+        """get class name.
+        \return 'SobolPixelSampler'
+        """
+        return 'SobolPixelSampler'
+
+
+    def get_sample_array(self, _pixel_idx, _sample_idx, _dim, _dim_count):
+        """get sample points. See PixelSamplerIF.
+        """
+        pixel_key = hash_combine_uint32(self._seed, _pixel_idx)
+        sample_idx = numpy.zeros(len(pixel_key), dtype=numpy.uint32) + \
+            numpy.array(_sample_idx, dtype=numpy.uint32)
+        col_list = []
+        pair_cache = {}
+        for dim in xrange(_dim, _dim + _dim_count):
+            pair = dim // 2
+            if not (pair in pair_cache):
+                pair_cache[pair] = self.__get_pair(pixel_key, sample_idx, pair)
+            col_list.append(pair_cache[pair][dim % 2])
+        return numpy.column_stack(col_list)
+
+
+    def __get_pair(self, _pixel_key, _sample_idx, _pair):
+        """get a 2d point of a dimension pair.
+        \param[in] _pixel_key  hashed pixel keys
+        \param[in] _sample_idx sample indices numpy.array of uint32
+        \param[in] _pair       dimension pair index
+        \return (x, y) numpy.arrays in [0,1)
+        """
+        pair_key = hash_combine_uint32(_pixel_key, _pair)
+        idx = owen_scramble_uint32(_sample_idx, hash_combine_uint32(pair_key, 0))
+        x = reverse_bits_uint32(idx)
+        y = numpy.zeros(len(idx), dtype=numpy.uint32)
+        for bit in xrange(32):
+            y ^= numpy.where((idx >> bit) & 1, self.__dir1[bit], numpy.uint32(0))
+        x = owen_scramble_uint32(x, hash_combine_uint32(pair_key, 1))
+        y = owen_scramble_uint32(y, hash_combine_uint32(pair_key, 2))
+        return (uint32_to_unit_float(x), uint32_to_unit_float(y))
+
+
+
+class CMJPixelSampler(PixelSamplerIF):
+    """correlated multi-jittered sampling, Kensler 2013,
+    "Correlated Multi-Jittered Sampling".
+
+    A pattern of m x n samples per pixel and dimension pair. The
+    sample index s uses the pattern s / (m n) of the pixel, each
+    m n samples are stratified both as a n x m jitter and as m n
+    1D strata. Works best when the number of samples per pixel is a
+    multiple of m n.
+    """
+
+    def __init__(self, _seed=0, _pattern_size=(4, 4)):
+        """constructor
+        \param[in] _seed         scramble seed (int)
+        \param[in] _pattern_size (m, n) pattern has m x n samples
+        """
+        super(CMJPixelSampler, self).__init__(_seed)
+        (self.__m, self.__n) = _pattern_size
+        assert((self.__m > 0) and (self.__n > 0))
+
+
+    def get_classname(self):
+        """get class name.
+        \return 'CMJPixelSampler'
+        """
+        return 'CMJPixelSampler'
+
+
+    def get_pattern_size(self):
+        """get the pattern size.
+        \return (m, n), m x n samples per pattern
+        """
+        return (self.__m, self.__n)
+
+
+    def get_sample_array(self, _pixel_idx, _sample_idx, _dim, _dim_count):
+        """get sample points. See PixelSamplerIF.
+        """
+        pixel_key = hash_combine_uint32(self._seed, _pixel_idx)
+        sample_idx = numpy.zeros(len(pixel_key), dtype=numpy.uint32) + \
+            numpy.array(_sample_idx, dtype=numpy.uint32)
+        pattern_count = numpy.uint32(self.__m * self.__n)
+        col_list = []
+        pair_cache = {}
+        for dim in xrange(_dim, _dim + _dim_count):
+            pair = dim // 2
+            if not (pair in pair_cache):
+                pattern = hash_combine_uint32(hash_combine_uint32(pixel_key, pair),
+                                              sample_idx // pattern_count)
+                pair_cache[pair] = self.__cmj(sample_idx % pattern_count, pattern)
+            col_list.append(pair_cache[pair][dim % 2])
+        return numpy.column_stack(col_list)
+
+
+    def __cmj(self, _s, _p):
+        """Kensler's cmj() (vectorized).
+        \param[in] _s sample index in the pattern numpy.array of uint32
+        \param[in] _p pattern numpy.array of uint32
+        \return (x, y) numpy.arrays in [0,1)
+        """
+        (m, n) = (self.__m, self.__n)
+        with numpy.errstate(over='ignore'):
+            s  = permute_uint32(_s, m * n, _p * numpy.uint32(0x51633e2d))
+            sm = s % numpy.uint32(m)
+            sn = s // numpy.uint32(m)
+            sx = permute_uint32(sm, m, _p * numpy.uint32(0x68bc21eb))
+            sy = permute_uint32(sn, n, _p * numpy.uint32(0x02e5be93))
+            jx = kensler_randfloat(s, _p * numpy.uint32(0x967a889b))
+            jy = kensler_randfloat(s, _p * numpy.uint32(0x368cc8b7))
+        x = (sx + (sy + jx) / n) / m
+        y = (s.astype(numpy.float64) + jy) / (m * n)
+        return (x, y)
+
+
+
+def permute_uint32(_i, _l, _p):
+    """Kensler's hash based permutation of [0, _l) (vectorized).
+    \param[in] _i values in [0, _l) numpy.array of uint32
+    \param[in] _l permutation length
+    \param[in] _p permutation seeds numpy.array of uint32
+    \return permuted values numpy.array of uint32
+    """
+    w = _l - 1
+    w |= w >> 1
+    w |= w >> 2
+    w |= w >> 4
+    w |= w >> 8
+    w |= w >> 16
+    w = numpy.uint32(w)
+    l = numpy.uint32(_l)
+
+    def permute_once(_x, _q):
+        x = _x.copy()
+        with numpy.errstate(over='ignore'):
+            x ^= _q
+            x *= numpy.uint32(0xe170893d)
+            x ^= _q >> 16
+            x ^= (x & w) >> 4
+            x ^= _q >> 8
+            x *= numpy.uint32(0x0929eb3f)
+            x ^= _q >> 23
+            x ^= (x & w) >> 1
+            x *= numpy.uint32(1) | (_q >> 27)
+            x *= numpy.uint32(0x6935fa69)
+            x ^= (x & w) >> 11
+            x *= numpy.uint32(0x74dcb303)
+            x ^= (x & w) >> 2
+            x *= numpy.uint32(0x9e501cc3)
+            x ^= (x & w) >> 2
+            x *= numpy.uint32(0xc860a3df)
+            x &= w
+            x ^= x >> 5
+        return x
+
+    p = numpy.array(_p, dtype=numpy.uint32)
+    i = permute_once(numpy.array(_i, dtype=numpy.uint32), p)
+    # cycle walking: repeat until in [0, l)
+    out = (i >= l)
+    while out.any():
+        i[out] = permute_once(i[out], p[out])
+        out = (i >= l)
+    with numpy.errstate(over='ignore'):
+        return (i + p) % l
+
+
+def kensler_randfloat(_i, _p):
+    """Kensler's hash based random float (vectorized).
+    \param[in] _i values numpy.array of uint32
+    \param[in] _p seeds numpy.array of uint32
+    \return numpy.array of float64 in [0,1)
+    """
+    i = numpy.array(_i, dtype=numpy.uint32)
+    with numpy.errstate(over='ignore'):
+        i ^= _p
+        i ^= i >> 17
+        i ^= i >> 10
+        i *= numpy.uint32(0xb36534e5)
+        i ^= i >> 12
+        i ^= i >> 21
+        i *= numpy.uint32(0x93fc4795)
+        i ^= numpy.uint32(0xdf6e307f)
+        i ^= i >> 17
+        i *= numpy.uint32(1) | (_p >> 18)
+    return uint32_to_unit_float(i)
+
+
+
+def create_pixel_sampler(_sampler_name, _seed=0):
+    """pixel sampler factory.
+    \param[in] _sampler_name one of 'random', 'halton', 'sobol', 'cmj'
+    \param[in] _seed scramble seed
+    \return a PixelSamplerIF
+    """
+    if _sampler_name == 'random':
+        return RandomPixelSampler(_seed)
+    elif _sampler_name == 'halton':
+        return HaltonPixelSampler(_seed)
+    elif _sampler_name == 'sobol':
+        return SobolPixelSampler(_seed)
+    elif _sampler_name == 'cmj':
+        return CMJPixelSampler(_seed)
+    raise StandardError, ('unknown pixel sampler [' + _sampler_name + ']')
+
+
 
 #
 # main test
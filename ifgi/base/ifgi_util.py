@@ -7,7 +7,7 @@
 \file
 \brief ifgi base utility"""
 
-import time
+import os, time
 
 def has_dict_all_key(_dict, _key_list):
     """check a dict has all key list
@@ -39,3 +39,22 @@ def get_current_localtime_str():
     """
     return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
 
+def atomic_write(_fname, _writer, _mode='wb'):
+    """write a file atomically: write a temporary file in the same
+    directory, then rename it to the file name. A reader never sees a
+    partial file. On an error, the temporary file is removed and the
+    error is raised again.
+
+    \param[in] _fname  file name
+    \param[in] _writer write function, _writer(file object)
+    \param[in] _mode   file open mode ('wb' or 'w')
+    """
+    tmp_fname = _fname + '.tmp.' + str(os.getpid())
+    try:
+        with open(tmp_fname, _mode) as outfile:
+            _writer(outfile)
+        os.rename(tmp_fname, _fname)
+    except:
+        if os.path.exists(tmp_fname):
+            os.remove(tmp_fname)
+        raise
@@ -32,6 +32,48 @@ class TestStratifiedRegularSampler(unittest.TestCase):
                 assert(srs.get_sample_y(x,y) == y + 0.5)
 
 
+    def test_stratified_jitter_sample(self):
+        """test jittered stratified samples of a tile."""
+
+        srs = Sampler.StratifiedRegularSampler(True, 5)
+        assert(srs.is_jitter())
+        (xstart, xend, ystart, yend) = (4, 11, 2, 6)
+        sample_count = 6
+        srs.compute_sample(xstart, xend, ystart, yend, 3, sample_count)
+        self.assertEquals(srs.get_sample_count(), sample_count)
+        self.assertEquals(srs.get_strata_size(), (2, 3))
+
+        sx = srs.get_sample_x_array()
+        sy = srs.get_sample_y_array()
+        assert(sx.shape == (sample_count, 8, 5))
+        assert(sy.shape == (sample_count, 8, 5))
+
+        # each sample is in its pixel, and the samples of a pixel
+        # are in the different strata.
+        for x in xrange(xstart, xend + 1):
+            for y in xrange(ystart, yend + 1):
+                strata = set()
+                for si in xrange(sample_count):
+                    fx = srs.get_sample_x(x, y, si) - x
+                    fy = srs.get_sample_y(x, y, si) - y
+                    assert((0.0 <= fx < 1.0) and (0.0 <= fy < 1.0))
+                    strata.add((int(fx * 2), int(fy * 3)))
+                self.assertEquals(len(strata), sample_count)
+
+        # jitter array: framebuffer order
+        jitter = srs.get_jitter_array(1)
+        assert(jitter.shape == (40, 2))
+        assert(abs(jitter[1 * 5 + 2, 0] - (srs.get_sample_x(5, 4, 1) - 5)) < 1e-12)
+        assert(abs(jitter[1 * 5 + 2, 1] - (srs.get_sample_y(5, 4, 1) - 4)) < 1e-12)
+
+        # a frame is deterministic, different frames differ
+        sx = sx.copy()
+        srs.compute_sample(xstart, xend, ystart, yend, 3, sample_count)
+        assert((srs.get_sample_x_array() == sx).all())
+        srs.compute_sample(xstart, xend, ystart, yend, 4, sample_count)
+        assert((srs.get_sample_x_array() != sx).any())
+
+
 class TestUnitDiskUniformSampler(unittest.TestCase):
     """test: UnitDiskUniformSampler"""
 
@@ -79,6 +121,122 @@ class TestUnitHemisphereUniformSampler(unittest.TestCase):
             assert(abs(v_len - 1.0) < 0.00001)
 
 
+    def test_unit_hemisphere_uniform_sampler_array(self):
+        """test unit hemisphere uniform sampler array version."""
+
+        uhus = Sampler.UnitHemisphereUniformSampler()
+        rng  = numpy.random.RandomState(0)
+
+        sample_count = 1000
+        v = uhus.get_sample_array(sample_count, rng)
+        assert(v.shape == (sample_count, 3))
+        v_len = numpy.sqrt((v * v).sum(axis=1))
+        assert(numpy.all(abs(v_len - 1.0) < 0.00001))
+        assert(numpy.all(v[:, 2] >= 0.0))
+        # uniform respect to solid angle: E[z] = 1/2
+        assert(abs(v[:, 2].mean() - 0.5) < 0.05)
+        assert(numpy.allclose(uhus.get_pdf_array(v), 1.0 / (2.0 * numpy.pi)))
+
+
+class TestUnitHemisphereCosineSampler(unittest.TestCase):
+    """test: UnitHemisphereCosineSampler"""
+
+    def test_unit_hemisphere_cosine_sampler(self):
+        """test unit hemisphere cosine sampler."""
+
+        uhcs = Sampler.UnitHemisphereCosineSampler()
+        for i in xrange(100):
+            v = uhcs.get_sample()
+            assert(abs(numpy.linalg.norm(v) - 1.0) < 0.00001)
+            assert(abs(uhcs.get_pdf(v) - v[2] / numpy.pi) < 0.00001)
+
+
+    def test_unit_hemisphere_cosine_sampler_array(self):
+        """test unit hemisphere cosine sampler array version."""
+
+        uhcs = Sampler.UnitHemisphereCosineSampler()
+        rng  = numpy.random.RandomState(0)
+
+        sample_count = 10000
+        v = uhcs.get_sample_array(sample_count, rng)
+        assert(v.shape == (sample_count, 3))
+        v_len = numpy.sqrt((v * v).sum(axis=1))
+        assert(numpy.all(abs(v_len - 1.0) < 0.00001))
+        assert(numpy.all(v[:, 2] >= 0.0))
+        # cosine weighted: E[z] = 2/3
+        assert(abs(v[:, 2].mean() - 2.0 / 3.0) < 0.02)
+
+        # both samplers estimate the integral of z^2 over the
+        # hemisphere (2 pi / 3). cosine sampler has less variance.
+        uhus = Sampler.UnitHemisphereUniformSampler()
+        u = uhus.get_sample_array(sample_count, rng)
+        est_cos = v[:, 2] ** 2 / uhcs.get_pdf_array(v)
+        est_uni = u[:, 2] ** 2 / uhus.get_pdf_array(u)
+        for est in [est_cos, est_uni]:
+            assert(abs(est.mean() - 2.0 * numpy.pi / 3.0) < 0.05)
+        assert(est_cos.std() < est_uni.std())
+
+
+class TestPixelSampler(unittest.TestCase):
+    """test for the pixel samplers (random, halton, sobol, cmj)"""
+
+    SAMPLER_NAME_LIST = ['random', 'halton', 'sobol', 'cmj']
+
+    def test_pixel_sampler_range(self):
+        """test pixel sampler shape, range, and determinism."""
+        pixel_idx = numpy.arange(64)
+        for name in TestPixelSampler.SAMPLER_NAME_LIST:
+            ps = Sampler.create_pixel_sampler(name, 7)
+            u = ps.get_sample_array(pixel_idx, 3, 4, 6)
+            assert(u.shape == (64, 6))
+            assert(numpy.all(u >= 0.0) and numpy.all(u < 1.0))
+            # deterministic
+            ps2 = Sampler.create_pixel_sampler(name, 7)
+            assert((u == ps2.get_sample_array(pixel_idx, 3, 4, 6)).all())
+            # pixels are decorrelated
+            assert(len(numpy.unique(u[:, 0])) > 32)
+            # a different seed gives different samples
+            ps2.set_seed(8)
+            assert(ps2.get_seed() == 8)
+            assert((u != ps2.get_sample_array(pixel_idx, 3, 4, 6)).any())
+
+
+    def test_pixel_sampler_stratification(self):
+        """test sobol and cmj: 16 samples of a pixel are stratified."""
+        sample_count = 16
+        for name in ['sobol', 'cmj']:
+            ps = Sampler.create_pixel_sampler(name, 3)
+            for dim in [0, 4]:
+                u = numpy.vstack([ps.get_sample_array(numpy.array([5]), si, dim, 2)
+                                  for si in xrange(sample_count)])
+                # 1D strata of each dimension
+                for d in xrange(2):
+                    strata = numpy.floor(u[:, d] * sample_count).astype(numpy.int32)
+                    assert(len(numpy.unique(strata)) == sample_count)
+                # 2D 4x4 strata
+                strata = numpy.floor(u[:, 0] * 4).astype(numpy.int32) * 4 + \
+                    numpy.floor(u[:, 1] * 4).astype(numpy.int32)
+                assert(len(numpy.unique(strata)) == sample_count)
+
+
+    def test_pixel_sampler_integration(self):
+        """test low-discrepancy samplers have less error than random."""
+        # integral of x y over [0,1)^2 is 1/4
+        sample_count = 64
+        pixel_idx = numpy.arange(256)
+        err_dict = {}
+        for name in TestPixelSampler.SAMPLER_NAME_LIST:
+            ps = Sampler.create_pixel_sampler(name, 11)
+            est = numpy.zeros(len(pixel_idx))
+            for si in xrange(sample_count):
+                u = ps.get_sample_array(pixel_idx, si, 2, 2)
+                est += u[:, 0] * u[:, 1]
+            est /= sample_count
+            err_dict[name] = numpy.sqrt(((est - 0.25) ** 2).mean())
+        for name in ['halton', 'sobol', 'cmj']:
+            assert(err_dict[name] < 0.5 * err_dict['random'])
+
+
 #
 # main test
 #
@@ -86,5 +244,7 @@ if __name__ == '__main__':
     suit0   = unittest.TestLoader().loadTestsFromTestCase(TestStratifiedRegularSampler)
     suit1   = unittest.TestLoader().loadTestsFromTestCase(TestUnitDiskUniformSampler)
     suit2   = unittest.TestLoader().loadTestsFromTestCase(TestUnitHemisphereUniformSampler)
-    alltest = unittest.TestSuite([suit0, suit1, suit2])
+    suit3   = unittest.TestLoader().loadTestsFromTestCase(TestUnitHemisphereCosineSampler)
+    suit4   = unittest.TestLoader().loadTestsFromTestCase(TestPixelSampler)
+    alltest = unittest.TestSuite([suit0, suit1, suit2, suit3, suit4])
     unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -26,6 +26,9 @@ if __name__ == '__main__':
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Listener.TestListener))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_OrthonomalBasis.TestIFGIONB))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Sampler.TestStratifiedRegularSampler))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Sampler.TestUnitHemisphereUniformSampler))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Sampler.TestUnitHemisphereCosineSampler))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Sampler.TestPixelSampler))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_const.TestConst))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_enum.TestEnum))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ifgimath.TestIFGImathModule))
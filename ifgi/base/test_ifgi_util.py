@@ -6,6 +6,7 @@
 """test ifgi utility"""
 
 import unittest
+import os, tempfile, shutil
 import ifgi_util
 
 class TestIfgiUtil(unittest.TestCase):
@@ -25,6 +26,32 @@ class TestIfgiUtil(unittest.TestCase):
         assert(ifgi_util.get_dict_missing_key(dict0, klist1) == ['hoge', 'moge', ])
 
 
+    def test_atomic_write(self):
+        """test ifgi_util.atomic_write: written or unchanged, no
+        temporary file is left."""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            fname = os.path.join(tmpdir, 'out.txt')
+            ifgi_util.atomic_write(fname, lambda _outfile: _outfile.write('first'), 'w')
+            ifgi_util.atomic_write(fname, lambda _outfile: _outfile.write('second'))
+            self.assertEquals(open(fname, 'r').read(), 'second')
+
+            # a failed writer keeps the previous file
+            def broken_writer(_outfile):
+                _outfile.write('partial')
+                raise IOError, ('disk full')
+            self.assertRaises(IOError, ifgi_util.atomic_write, fname, broken_writer)
+            self.assertEquals(open(fname, 'r').read(), 'second')
+            self.assertEquals(os.listdir(tmpdir), ['out.txt'])
+
+            # no such directory
+            self.assertRaises(IOError, ifgi_util.atomic_write,
+                              os.path.join(tmpdir, 'no_dir', 'out.txt'),
+                              lambda _outfile: _outfile.write('x'))
+        finally:
+            shutil.rmtree(tmpdir)
+
+
 #
 # main test
 #
@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI benchmark
+\file
+\brief benchmark timing, JSON result files, and comparison of two
+runs.
+
+A benchmark is a function that does some work and returns the amount
+of the work (e.g., number of rays). The rate is work / time of the
+fastest of the repeats, higher is better.
+
+Result file (JSON):
+- 'version': result format version
+- 'machine': get_machine_info()
+- 'result_list': list of BenchmarkResult.to_dict()
+"""
+
+import os, sys, time, json, platform, subprocess, multiprocessing
+import numpy
+
+
+# result format version
+VERSION = 1
+# a rate lower than the base by this ratio is a regression
+DEFAULT_REGRESSION_THRESHOLD = 0.1
+
+
+class BenchmarkResult(object):
+    """a benchmark result. members are public.
+    """
+
+    def __init__(self, _name, _unit, _work_count, _time_sec_list):
+        """constructor.
+
+        \param[in] _name          benchmark name
+        \param[in] _unit          rate unit (e.g., 'rays/s')
+        \param[in] _work_count    amount of work of a run
+        \param[in] _time_sec_list time of each run
+        """
+        super(BenchmarkResult, self).__init__()
+        self.name          = _name
+        self.unit          = _unit
+        self.work_count    = _work_count
+        self.time_sec_list = list(_time_sec_list)
+
+
+    def get_rate(self):
+        """get the rate of the fastest run.
+        \return work per second
+        """
+        return self.work_count / max(min(self.time_sec_list), 1e-9)
+
+
+    def to_dict(self):
+        """get a JSON serializable dict.
+        \return dict
+        """
+        return {'name':          self.name,
+                'unit':          self.unit,
+                'work_count':    self.work_count,
+                'time_sec_list': self.time_sec_list,
+                'rate':          self.get_rate()}
+
+
+    def __str__(self):
+        """human readable string."""
+        return '%-28s %14.6g %-10s (best %.4g [s] of %d)' % \
+            (self.name, self.get_rate(), self.unit, min(self.time_sec_list),
+             len(self.time_sec_list))
+
+
+def run_benchmark(_name, _func, _unit, _repeat=3):
+    """run a benchmark.
+
+    The function runs _repeat times after a warm up run.
+
+    \param[in] _name   benchmark name
+    \param[in] _func   benchmark function. No argument, returns the
+    amount of work.
+    \param[in] _unit   rate unit
+    \param[in] _repeat number of timed runs
+    \return BenchmarkResult
+    """
+    if _repeat <= 0:
+        raise StandardError, ('repeat must be positive, but ' + str(_repeat))
+
+    _func()
+    time_sec_list = []
+    work_count = 0
+    for i in xrange(_repeat):
+        start_time = time.time()
+        work_count = _func()
+        time_sec_list.append(time.time() - start_time)
+
+    return BenchmarkResult(_name, _unit, work_count, time_sec_list)
+
+
+def get_machine_info():
+    """get the machine metadata of a run.
+    \return dict
+    """
+    info = {'date':       time.strftime('%Y-%m-%d %H:%M:%S', time.localtime()),
+            'hostname':   platform.node(),
+            'platform':   platform.platform(),
+            'machine':    platform.machine(),
+            'processor':  platform.processor(),
+            'cpu_count':  multiprocessing.cpu_count(),
+            'python':     platform.python_version(),
+            'numpy':      numpy.__version__,
+            'revision':   get_source_revision()}
+    return info
+
+
+def get_source_revision():
+    """get the source revision (git commit) of this tree.
+    \return revision string, '' when unknown
+    """
+    try:
+        proc = subprocess.Popen(['git', 'rev-parse', 'HEAD'],
+                                cwd=os.path.dirname(os.path.abspath(__file__)),
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        (out, err) = proc.communicate()
+    except OSError:
+        return ''
+    if proc.returncode != 0:
+        return ''
+    return out.strip()
+
+
+def write_result_json(_fname, _result_list, _machine_info=None):
+    """write the results to a JSON file.
+
+    \param[in] _fname        output file name
+    \param[in] _result_list  list of BenchmarkResult
+    \param[in] _machine_info machine metadata. None: get_machine_info()
+    """
+    if _machine_info == None:
+        _machine_info = get_machine_info()
+    with open(_fname, 'w') as outfile:
+        json.dump({'version':     VERSION,
+                   'machine':     _machine_info,
+                   'result_list': [r.to_dict() for r in _result_list]},
+                  outfile, indent=1, sort_keys=True)
+
+
+def read_result_json(_fname):
+    """read a result JSON file.
+
+    \param[in] _fname result file name
+    \return (machine info dict, name -> result dict)
+    """
+    with open(_fname, 'r') as infile:
+        run = json.load(infile)
+    if run.get('version') != VERSION:
+        raise StandardError, ('unsupported benchmark result version [' +
+                              str(run.get('version')) + '] of ' + _fname)
+    return (run['machine'], dict([(r['name'], r) for r in run['result_list']]))
+
+
+def compare_result(_base_dict, _new_dict, _threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """compare two runs.
+
+    \param[in] _base_dict base run, name -> result dict
+    \param[in] _new_dict  new run,  name -> result dict
+    \param[in] _threshold relative rate change to flag
+    \return list of (name, unit, base rate, new rate, new / base,
+    status), status is 'regression', 'improvement', 'same', 'new'
+    (not in the base), or 'missing' (not in the new run). Sorted by
+    name.
+    """
+    compare_list = []
+    for name in sorted(set(_base_dict.keys()) | set(_new_dict.keys())):
+        base = _base_dict.get(name)
+        new  = _new_dict.get(name)
+        if base == None:
+            compare_list.append((name, new['unit'], None, new['rate'], None, 'new'))
+            continue
+        if new == None:
+            compare_list.append((name, base['unit'], base['rate'], None, None, 'missing'))
+            continue
+
+        ratio = new['rate'] / max(base['rate'], 1e-300)
+        status = 'same'
+        if ratio < 1.0 - _threshold:
+            status = 'regression'
+        elif ratio > 1.0 + _threshold:
+            status = 'improvement'
+        compare_list.append((name, new['unit'], base['rate'], new['rate'], ratio, status))
+
+    return compare_list
+
+
+def has_regression(_compare_list):
+    """does a comparison have a regression?
+    \param[in] _compare_list compare_result() result
+    \return True when some benchmark is a regression.
+    """
+    return any([c[5] == 'regression' for c in _compare_list])
+
+
+def format_compare(_compare_list):
+    """format a comparison as a table.
+    \param[in] _compare_list compare_result() result
+    \return string
+    """
+    def rate_str(_rate):
+        if _rate == None:
+            return '-'
+        return '%.6g' % _rate
+
+    line_list = ['%-28s %14s %14s %8s  %s' % ('name', 'base', 'new', 'new/base', 'status')]
+    for (name, unit, base_rate, new_rate, ratio, status) in _compare_list:
+        ratio_str = '-'
+        if ratio != None:
+            ratio_str = '%.3f' % ratio
+        flag = ''
+        if status == 'regression':
+            flag = '  <<<'
+        line_list.append('%-28s %14s %14s %8s  %s%s' %
+                         (name, rate_str(base_rate), rate_str(new_rate), ratio_str,
+                          status, flag))
+    return '\n'.join(line_list)
@@ -0,0 +1,478 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI renderer benchmark
+\file
+\brief benchmarks of the renderer hot paths.
+
+- triangle_intersect:      Triangle.ray_intersect [rays/s]
+- trimesh_intersect:       TriMesh (bunny, BVH) ray_intersect [rays/s]
+- trimesh_intersect_batch: TriMesh (bunny, BVH) ray_intersect_batch, the
+  batched BVH traversal [rays/s]
+- trimesh_intersect_batch_brute: TriMesh (bunny, no BVH)
+  ray_intersect_batch, all the rays against all the faces [rays/s]
+- camera_ray:              Camera.get_ray [rays/s]
+- camera_tile_rays:        Camera.generate_tile_rays [rays/s]
+- stratified_sampler:      StratifiedRegularSampler.compute_sample [samples/s]
+- pixel_sampler_sobol:     SobolPixelSampler.get_sample_array [samples/s]
+- hemisphere_sampler:      UnitHemisphereCosineSampler [samples/s]
+- obj_load:                ObjReader.read_bulk of the bunny [MB/s]
+- film_save:               ImageFilm.save_file png [pixels/s]
+- render_cornel_box:       WavefrontPathTracer, cornel_box.ifgi [samples/s]
+- render_bunny:            WavefrontPathTracer, bunny1_8K.obj [samples/s]
+
+The render benchmarks build the scene accelerator, the path tracer's
+batch ray casts traverse it.
+
+Usage:
+  python RendererBenchmark.py -o result.json
+  python RendererBenchmark.py -o new.json --baseline base.json
+  python RendererBenchmark.py --compare base.json new.json
+
+The exit status is 1 when a comparison has a regression.
+"""
+
+import os, sys, tempfile, shutil, optparse
+import numpy
+
+from ifgi.base      import Sampler
+from ifgi.scene     import Primitive, Ray, Camera, ObjReader, ConvReader2Primitive, Film
+from ifgi.scene     import IfgiSceneReader, SceneUtil
+from ifgi.render    import WavefrontPathTracer
+from ifgi.benchmarks import Benchmark
+
+
+# sample data directory
+SAMPLEDATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                               '..', '..', 'sampledata'))
+CORNEL_BOX_IFGI = os.path.join(SAMPLEDATA_DIR, 'cornel_box.ifgi')
+BUNNY_OBJ       = os.path.join(SAMPLEDATA_DIR, 'bunny1_8K.obj')
+
+# benchmark names in the run order
+BENCHMARK_NAME_LIST = [
+    'triangle_intersect',
+    'trimesh_intersect',
+    'trimesh_intersect_batch',
+    'trimesh_intersect_batch_brute',
+    'camera_ray',
+    'camera_tile_rays',
+    'stratified_sampler',
+    'pixel_sampler_sobol',
+    'hemisphere_sampler',
+    'obj_load',
+    'film_save',
+    'render_cornel_box',
+    'render_bunny',
+    ]
+
+# bunny scene of render_bunny. %(...)s are filled in.
+BUNNY_IFGI_TEMPLATE = """# ifgi_scene 0
+def camera {
+    cam_name = default
+    eye_pos = %(eye_pos)s
+    view_dir = 0.0 0.0 -1.0
+    up_dir = 0.0 1.0 0.0
+    z_near = 0.001
+    z_far = 1000
+    resolution_x = 64
+    resolution_y = 64
+}
+def material {
+    mat_name = default_env
+    mat_type = environment_constant_color
+    emit_color = 1.0 1.0 1.0 1.0
+}
+def material {
+    mat_name = bunny_mat
+    mat_type = lambert
+    diffuse_color = 0.8 0.8 0.8 1.0
+}
+def geometry {
+    geo_name = bunny
+    material = bunny_mat
+    geo_file_type = obj
+    geo_file_name = %(geo_file_name)s
+}
+"""
+
+
+class RendererBenchmark(object):
+    """the renderer benchmarks.
+
+    The quick mode has smaller work sizes for a smoke test. The rates
+    of a quick run are not comparable with a full run.
+    """
+
+    def __init__(self, _is_quick=False, _repeat=3):
+        """constructor.
+
+        \param[in] _is_quick quick mode (small work sizes)
+        \param[in] _repeat   number of timed runs of each benchmark
+        """
+        super(RendererBenchmark, self).__init__()
+        self.__is_quick = _is_quick
+        self.__repeat   = _repeat
+        self.__tmpdir   = None
+
+
+    def run(self, _name_list=None):
+        """run benchmarks.
+
+        \param[in] _name_list benchmark names. None: all
+        (BENCHMARK_NAME_LIST)
+        \return list of BenchmarkResult
+        """
+        if _name_list == None:
+            _name_list = BENCHMARK_NAME_LIST
+        for name in _name_list:
+            if not (name in BENCHMARK_NAME_LIST):
+                raise StandardError, ('unknown benchmark [' + name + ']')
+
+        self.__tmpdir = tempfile.mkdtemp(prefix='ifgi_benchmark_')
+        result_list = []
+        try:
+            for name in _name_list:
+                (func, unit) = getattr(self, '_RendererBenchmark__setup_' + name)()
+                result = Benchmark.run_benchmark(name, func, unit, self.__repeat)
+                print str(result)
+                sys.stdout.flush()
+                result_list.append(result)
+        finally:
+            shutil.rmtree(self.__tmpdir)
+            self.__tmpdir = None
+
+        return result_list
+
+    # private: ------------------------------------------------------------
+
+    def __size(self, _full, _quick):
+        """work size of the mode.
+        \param[in] _full  work size of a full run
+        \param[in] _quick work size of a quick run
+        \return work size
+        """
+        if self.__is_quick:
+            return _quick
+        return _full
+
+
+    def __get_bunny_trimesh(self, _is_build_bvh=True):
+        """load the bunny and build its BVH.
+        \param[in] _is_build_bvh build the BVH when True
+        \return TriMesh
+        """
+        objreader = ObjReader.ObjReader()
+        objreader.read_bulk(BUNNY_OBJ)
+        tmesh = ConvReader2Primitive.conv_objreader_trimesh(objreader, 'bunny', 'bunny_mat')
+        if _is_build_bvh:
+            tmesh.build_bvh()
+        return tmesh
+
+
+    def __get_ray_array(self, _tmesh, _ray_count):
+        """rays from a sphere around a mesh to the points in its
+        bounding box. About half of the rays hit the mesh.
+
+        \param[in] _tmesh     TriMesh
+        \param[in] _ray_count number of rays
+        \return (orig, dir, min_t, max_t) numpy.array
+        """
+        rng = numpy.random.RandomState(0)
+        bbox = _tmesh.get_bbox()
+        center = 0.5 * (bbox.get_min() + bbox.get_max())
+        radius = numpy.linalg.norm(bbox.get_max() - bbox.get_min())
+
+        orig = rng.normal(size=(_ray_count, 3))
+        orig = center + radius * orig / numpy.sqrt((orig * orig).sum(axis=1))[:, numpy.newaxis]
+        target = bbox.get_min() + \
+            rng.random_sample((_ray_count, 3)) * (bbox.get_max() - bbox.get_min())
+        vdir = target - orig
+        vdir /= numpy.sqrt((vdir * vdir).sum(axis=1))[:, numpy.newaxis]
+        return (orig, vdir,
+                numpy.zeros(_ray_count), numpy.ones(_ray_count) * (2.0 * radius))
+
+
+    def __get_cornel_box_camera(self, _image_size):
+        """get the cornel box camera.
+        \param[in] _image_size image x and y size
+        \return IFGICamera
+        """
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        if not ifgireader.read(CORNEL_BOX_IFGI):
+            raise StandardError, ('load file [' + CORNEL_BOX_IFGI + '] failed.')
+        cam = Camera.IFGICamera()
+        cam.set_config_dict(ifgireader.camera_dict_dict['default'])
+        cam.set_resolution_x(_image_size)
+        cam.set_resolution_y(_image_size)
+        return cam
+
+
+    def __setup_render(self, _ifgi_fname, _image_size):
+        """set up a render benchmark of a scene.
+
+        \param[in] _ifgi_fname ifgi scene file name
+        \param[in] _image_size image x and y size
+        \return (benchmark function, unit)
+        """
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        if not ifgireader.read(_ifgi_fname):
+            raise StandardError, ('load file [' + _ifgi_fname + '] failed.')
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.set_bvh_cache(None)
+        scene_geo_mat.append_ifgi_data(ifgireader)
+        scene_geo_mat.build_accelerator()
+        env_mat = scene_geo_mat.material_list[scene_geo_mat.material_name_idx_dict['default_env']]
+
+        cam = Camera.IFGICamera()
+        cam.set_config_dict(ifgireader.camera_dict_dict['default'])
+        cam.set_resolution_x(_image_size)
+        cam.set_resolution_y(_image_size)
+        film = Film.ImageFilm((_image_size, _image_size, 4), 'RGBA')
+        wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4)
+        frame_count = self.__size(4, 1)
+
+        def func():
+            for nframe in xrange(frame_count):
+                wpt.render_frame(cam, film, nframe)
+            return frame_count * _image_size * _image_size
+
+        return (func, 'samples/s')
+
+
+    def __setup_triangle_intersect(self):
+        """Triangle.ray_intersect"""
+        tri = Primitive.Triangle()
+        tri.set_vertex(numpy.array([-1.0, -1.0, 0.0]),
+                       numpy.array([ 1.0, -1.0, 0.0]),
+                       numpy.array([ 0.0,  1.0, 0.0]))
+        rng = numpy.random.RandomState(0)
+        ray_list = []
+        for i in xrange(self.__size(5000, 200)):
+            orig = numpy.array([rng.uniform(-1.5, 1.5), rng.uniform(-1.5, 1.5), 1.0])
+            ray_list.append(Ray.Ray(orig, numpy.array([0.0, 0.0, -1.0]), 0.0, 10.0))
+
+        def func():
+            for ray in ray_list:
+                tri.ray_intersect(ray)
+            return len(ray_list)
+
+        return (func, 'rays/s')
+
+
+    def __setup_trimesh_intersect(self):
+        """TriMesh.ray_intersect (one ray at a time)"""
+        tmesh = self.__get_bunny_trimesh()
+        (orig, vdir, min_t, max_t) = self.__get_ray_array(tmesh, self.__size(1000, 50))
+        ray_list = [Ray.Ray(orig[i], vdir[i], min_t[i], max_t[i]) for i in xrange(len(orig))]
+
+        def func():
+            for ray in ray_list:
+                tmesh.ray_intersect(ray)
+            return len(ray_list)
+
+        return (func, 'rays/s')
+
+
+    def __setup_trimesh_intersect_batch(self):
+        """TriMesh.ray_intersect_batch, the batched BVH traversal"""
+        return self.__setup_trimesh_batch(True, self.__size(20000, 500))
+
+
+    def __setup_trimesh_intersect_batch_brute(self):
+        """TriMesh.ray_intersect_batch without the BVH"""
+        return self.__setup_trimesh_batch(False, self.__size(4000, 100))
+
+
+    def __setup_trimesh_batch(self, _is_build_bvh, _ray_count):
+        """set up a TriMesh.ray_intersect_batch benchmark.
+
+        \param[in] _is_build_bvh with the BVH when True
+        \param[in] _ray_count    number of rays
+        \return (benchmark function, unit)
+        """
+        tmesh = self.__get_bunny_trimesh(_is_build_bvh)
+        (orig, vdir, min_t, max_t) = self.__get_ray_array(tmesh, _ray_count)
+
+        def func():
+            tmesh.ray_intersect_batch(orig, vdir, min_t, max_t)
+            return len(orig)
+
+        return (func, 'rays/s')
+
+
+    def __setup_camera_ray(self):
+        """Camera.get_ray (one ray at a time, a reused ray)"""
+        image_size = self.__size(64, 8)
+        cam = self.__get_cornel_box_camera(image_size)
+        ray = Ray.Ray(numpy.zeros(3), numpy.array([0.0, 0.0, 1.0]), 0.0, 1.0)
+
+        def func():
+            for x in xrange(image_size):
+                nx = (x + 0.5) / image_size
+                for y in xrange(image_size):
+                    cam.get_ray(nx, (y + 0.5) / image_size, ray)
+            return image_size * image_size
+
+        return (func, 'rays/s')
+
+
+    def __setup_camera_tile_rays(self):
+        """Camera.generate_tile_rays"""
+        image_size = self.__size(256, 16)
+        cam = self.__get_cornel_box_camera(image_size)
+
+        def func():
+            cam.generate_tile_rays(0, image_size - 1, 0, image_size - 1)
+            return image_size * image_size
+
+        return (func, 'rays/s')
+
+
+    def __setup_stratified_sampler(self):
+        """StratifiedRegularSampler.compute_sample (jittered)"""
+        image_size = self.__size(256, 16)
+        sample_count = 4
+        sampler = Sampler.StratifiedRegularSampler(True, 0)
+
+        def func():
+            sampler.compute_sample(0, image_size - 1, 0, image_size - 1, 0, sample_count)
+            return image_size * image_size * sample_count
+
+        return (func, 'samples/s')
+
+
+    def __setup_pixel_sampler_sobol(self):
+        """SobolPixelSampler.get_sample_array"""
+        pixel_count = self.__size(65536, 256)
+        dim_count = 2
+        sampler = Sampler.create_pixel_sampler('sobol', 0)
+        pixel_idx = numpy.arange(pixel_count)
+
+        def func():
+            sampler.get_sample_array(pixel_idx, 0, 0, dim_count)
+            return pixel_count * dim_count
+
+        return (func, 'samples/s')
+
+
+    def __setup_hemisphere_sampler(self):
+        """UnitHemisphereCosineSampler.get_sample_array"""
+        sample_count = self.__size(1000000, 1000)
+        sampler = Sampler.UnitHemisphereCosineSampler()
+        rng = numpy.random.RandomState(0)
+
+        def func():
+            sampler.get_sample_array(sample_count, rng)
+            return sample_count
+
+        return (func, 'samples/s')
+
+
+    def __setup_obj_load(self):
+        """ObjReader.read_bulk of the bunny"""
+        mbyte = os.path.getsize(BUNNY_OBJ) / (1024.0 * 1024.0)
+
+        def func():
+            objreader = ObjReader.ObjReader()
+            objreader.read_bulk(BUNNY_OBJ)
+            return mbyte
+
+        return (func, 'MB/s')
+
+
+    def __setup_film_save(self):
+        """ImageFilm.save_file png"""
+        image_size = self.__size(256, 16)
+        film = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+        film.get_framebuffer()[:] = \
+            numpy.random.RandomState(0).random_sample((image_size, image_size, 4))
+        out_fname = os.path.join(self.__tmpdir, 'film_save.png')
+
+        def func():
+            film.save_file(out_fname)
+            return image_size * image_size
+
+        return (func, 'pixels/s')
+
+
+    def __setup_render_cornel_box(self):
+        """WavefrontPathTracer, cornel_box.ifgi"""
+        return self.__setup_render(CORNEL_BOX_IFGI, self.__size(32, 4))
+
+
+    def __setup_render_bunny(self):
+        """WavefrontPathTracer, bunny1_8K.obj in front of a white
+        environment"""
+        tmesh = self.__get_bunny_trimesh()
+        bbox = tmesh.get_bbox()
+        center = 0.5 * (bbox.get_min() + bbox.get_max())
+        eye_pos = center + numpy.array([0.0, 0.0, 2.5 * (bbox.get_max() - bbox.get_min()).max()])
+
+        ifgi_fname = os.path.join(self.__tmpdir, 'bunny.ifgi')
+        with open(ifgi_fname, 'w') as outfile:
+            outfile.write(BUNNY_IFGI_TEMPLATE %
+                          {'eye_pos':       ' '.join([repr(v) for v in eye_pos]),
+                           'geo_file_name': BUNNY_OBJ})
+        return self.__setup_render(ifgi_fname, self.__size(32, 4))
+
+# ----------------------------------------------------------------------
+
+def main(_argv):
+    """benchmark command.
+    \param[in] _argv command line arguments (without the command name)
+    \return exit status. 1 when a comparison has a regression.
+    """
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('-o', '--output', dest='output', default=None,
+                      help='write the result JSON to this file')
+    parser.add_option('--quick', dest='is_quick', action='store_true', default=False,
+                      help='small work sizes (a smoke test)')
+    parser.add_option('--repeat', dest='repeat', type='int', default=3,
+                      help='number of timed runs of each benchmark [default: %default]')
+    parser.add_option('--filter', dest='name_filter', default=None,
+                      help='run the benchmarks whose name contains this string')
+    parser.add_option('--baseline', dest='baseline', default=None,
+                      help='compare the result with this result JSON')
+    parser.add_option('--compare', dest='compare', nargs=2, default=None,
+                      metavar='BASE NEW', help='compare two result JSON files, no run')
+    parser.add_option('--threshold', dest='threshold', type='float',
+                      default=Benchmark.DEFAULT_REGRESSION_THRESHOLD,
+                      help='relative slow down to flag as a regression [default: %default]')
+    (opt, args) = parser.parse_args(_argv)
+
+    if opt.compare != None:
+        (base_machine, base_dict) = Benchmark.read_result_json(opt.compare[0])
+        (new_machine,  new_dict)  = Benchmark.read_result_json(opt.compare[1])
+    else:
+        name_list = BENCHMARK_NAME_LIST
+        if opt.name_filter != None:
+            name_list = [name for name in name_list if opt.name_filter in name]
+        result_list = RendererBenchmark(opt.is_quick, opt.repeat).run(name_list)
+        new_machine = Benchmark.get_machine_info()
+        new_machine['quick'] = opt.is_quick
+        if opt.output != None:
+            Benchmark.write_result_json(opt.output, result_list, new_machine)
+            print 'wrote ' + opt.output
+        if opt.baseline == None:
+            return 0
+        (base_machine, base_dict) = Benchmark.read_result_json(opt.baseline)
+        new_dict = dict([(r.name, r.to_dict()) for r in result_list])
+
+    for (label, machine) in [('base', base_machine), ('new', new_machine)]:
+        print '%-4s: %s %s %s python %s numpy %s %s' % \
+            (label, machine.get('date'), machine.get('hostname'), machine.get('platform'),
+             machine.get('python'), machine.get('numpy'), machine.get('revision'))
+    if base_machine.get('quick') != new_machine.get('quick'):
+        print 'warning: a quick run is compared with a full run.'
+
+    compare_list = Benchmark.compare_result(base_dict, new_dict, opt.threshold)
+    print Benchmark.format_compare(compare_list)
+    if Benchmark.has_regression(compare_list):
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,7 @@
+#
+# ifgi benchmarks module code
+#
+# Copyright (C) 2010-2011 Yamauchi, Hitoshi
+#
+# This is the benchmark package of the ifgi path tracer.
+#
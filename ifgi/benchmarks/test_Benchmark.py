@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for Benchmark
+#
+
+"""test IFGI Benchmark"""
+
+import unittest
+import os, tempfile, shutil
+
+import Benchmark
+import RendererBenchmark
+
+
+class TestBenchmark(unittest.TestCase):
+    """test for Benchmark"""
+
+    def setUp(self):
+        """create a result directory"""
+        self.tmpdir = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        """remove the result directory"""
+        shutil.rmtree(self.tmpdir)
+
+
+    def test_run_benchmark(self):
+        """run_benchmark: a warm up run and the timed runs"""
+        call_list = []
+        def func():
+            call_list.append(0)
+            return 10
+
+        result = Benchmark.run_benchmark('count', func, 'calls/s', 3)
+        self.assertEquals(len(call_list), 4)
+        self.assertEquals(result.work_count, 10)
+        self.assertEquals(len(result.time_sec_list), 3)
+        assert(result.get_rate() > 0.0)
+        self.assertRaises(StandardError, Benchmark.run_benchmark, 'count', func, 'calls/s', 0)
+
+
+    def test_result_json(self):
+        """write_result_json/read_result_json: round trip with the
+        machine metadata"""
+        result_list = [Benchmark.BenchmarkResult('a', 'rays/s', 100, [0.5, 0.25]),
+                       Benchmark.BenchmarkResult('b', 'MB/s',   2.0, [1.0])]
+        fname = os.path.join(self.tmpdir, 'result.json')
+        Benchmark.write_result_json(fname, result_list)
+
+        (machine, result_dict) = Benchmark.read_result_json(fname)
+        for key in ['date', 'platform', 'python', 'numpy', 'cpu_count', 'revision']:
+            assert(key in machine)
+        self.assertEquals(sorted(result_dict.keys()), ['a', 'b'])
+        self.assertEquals(result_dict['a']['rate'], 400.0)
+        self.assertEquals(result_dict['a']['time_sec_list'], [0.5, 0.25])
+        self.assertEquals(result_dict['b']['unit'], 'MB/s')
+
+
+    def test_compare_result(self):
+        """compare_result: flag the regressions"""
+        def rate_dict(_rate):
+            return {'unit': 'rays/s', 'rate': _rate}
+
+        base_dict = {'same': rate_dict(100.0), 'slow': rate_dict(100.0),
+                     'fast': rate_dict(100.0), 'gone': rate_dict(100.0)}
+        new_dict  = {'same': rate_dict(95.0),  'slow': rate_dict(80.0),
+                     'fast': rate_dict(150.0), 'added': rate_dict(1.0)}
+        compare_list = Benchmark.compare_result(base_dict, new_dict, 0.1)
+        self.assertEquals([(c[0], c[5]) for c in compare_list],
+                          [('added', 'new'), ('fast', 'improvement'), ('gone', 'missing'),
+                           ('same', 'same'), ('slow', 'regression')])
+        assert(Benchmark.has_regression(compare_list))
+        assert('<<<' in Benchmark.format_compare(compare_list))
+
+        # a larger threshold accepts the slow down
+        compare_list = Benchmark.compare_result(base_dict, new_dict, 0.25)
+        assert(not Benchmark.has_regression(compare_list))
+
+
+    def test_renderer_benchmark(self):
+        """RendererBenchmark: quick run and compare mode"""
+        name_list = ['triangle_intersect', 'trimesh_intersect_batch',
+                     'trimesh_intersect_batch_brute', 'camera_tile_rays', 'obj_load',
+                     'film_save', 'render_cornel_box']
+        bench = RendererBenchmark.RendererBenchmark(True, 1)
+        result_list = bench.run(name_list)
+        self.assertEquals([r.name for r in result_list], name_list)
+        for r in result_list:
+            assert(r.get_rate() > 0.0)
+        self.assertRaises(StandardError, bench.run, ['no_such_benchmark'])
+
+        # command: run, write, then compare with itself
+        fname = os.path.join(self.tmpdir, 'result.json')
+        self.assertEquals(RendererBenchmark.main(['--quick', '--repeat', '1',
+                                                  '--filter', 'sampler', '-o', fname]), 0)
+        (machine, result_dict) = Benchmark.read_result_json(fname)
+        self.assertEquals(sorted(result_dict.keys()),
+                          ['hemisphere_sampler', 'pixel_sampler_sobol', 'stratified_sampler'])
+        assert(machine['quick'])
+        self.assertEquals(RendererBenchmark.main(['--compare', fname, fname]), 0)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestBenchmark)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2010-2011 Yamauchi, Hitoshi
+#
+#
+"""test all in ifgi benchmarks"""
+
+import unittest
+
+import test_Benchmark
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suits = []
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Benchmark.TestBenchmark))
+
+    alltest = unittest.TestSuite(suits)
+    unittest.TextTestRunner(verbosity=2).run(alltest)
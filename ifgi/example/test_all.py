@@ -11,6 +11,8 @@ import test_ifgi_init_shutdown
 import test_ifgi_render_0
 import test_ifgi_render_1
 import test_ifgi_render_2
+import test_ifgi_render_4
+import test_ifgi_render_service
 
 #
 # main test
@@ -21,5 +23,7 @@ if __name__ == '__main__':
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ifgi_render_0.TestIfgiRender0))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ifgi_render_1.TestIfgiRender1))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ifgi_render_2.TestIfgiRender2))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ifgi_render_4.TestIfgiRender4))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ifgi_render_service.TestIfgiRenderService))
     alltest = unittest.TestSuite(suits)
     unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -13,13 +13,14 @@
 
 import cProfile
 import unittest
-import numpy, random, copy, math
+import numpy, random, math
 
 # package import: specify a directory and file.
 from ifgi.base    import Sampler, ifgi_util
 from ifgi.ptracer import IfgiSys
 from ifgi.scene   import SceneGraph, Primitive, Film, test_scene_util, IfgiSceneReader
-from ifgi.scene   import SceneUtil
+from ifgi.scene   import SceneUtil, Light, Ray
+from ifgi.render  import RussianRoulette, Checkpoint, AdaptiveSampling
 
 
 class TestIfgiRender2(unittest.TestCase):
@@ -37,8 +38,8 @@ class TestIfgiRender2(unittest.TestCase):
         assert(ifgi_stat == True)
 
         random.seed(0)
-        # unit hemisphere uniform sampler
-        self.__hemisphere_sampler = Sampler.UnitHemisphereUniformSampler()
+        # unit hemisphere cosine weighted sampler
+        self.__hemisphere_sampler = Sampler.UnitHemisphereCosineSampler()
 
         # FIXME random.uniform(0,1)
 
@@ -57,10 +58,25 @@ class TestIfgiRender2(unittest.TestCase):
         # get environment material from the scene
         self.__environment_mat = self.__retrieve_environment_material_from_scene()
 
-        # reder frames
-        # max_frame      = 2000
-        max_frame      = 1000
+        # emitting triangles for the explicit light sampling
+        self.__light_registry = Light.LightRegistry(self.__scene_geo_mat)
+        self.__light_rng      = numpy.random.RandomState(0)
+
+        # Russian roulette path termination. The max path length is
+        # a hard limit.
+        self.__russian_roulette = RussianRoulette.RussianRoulette()
+
+        # reder frames. With the light sampling, 100 frames are as
+        # good as 1000 frames of the BRDF sampling only.
+        max_frame      = 100
         save_per_frame = 50
+        # the noisy tiles get more frames, the render stops when all
+        # the tiles are under the error threshold.
+        self.__adaptive = AdaptiveSampling.AdaptiveSampling(0.05, 8, max_frame)
+        # checkpoint each _save_per_frame. A killed run resumes from
+        # the last checkpoint, a completed run removes it.
+        self.__checkpoint = Checkpoint.RenderCheckpoint('test_ifgi_render_2.ckpt',
+                                                        self.__scene_hash, save_per_frame)
         self.__render_all_frame(max_frame, save_per_frame)
 
         ifgi_stat = ifgi_inst.shutdown()
@@ -88,6 +104,9 @@ class TestIfgiRender2(unittest.TestCase):
         # create the global material_name -> material lookup map
         self.__scene_geo_mat.append_ifgi_data(ifgireader)
         self.__scene_geo_mat.print_summary()
+        with open(_infilepath, 'r') as infile:
+            self.__scene_hash = Checkpoint.compute_scene_hash(self.__scene_geo_mat, None,
+                                                              infile.read())
 
         # -- now all primitive (TriMesh) can look up the material
 
@@ -106,9 +125,10 @@ class TestIfgiRender2(unittest.TestCase):
         cur_cam.set_resolution_x(self.__image_xsize)
         cur_cam.set_resolution_y(self.__image_ysize)
 
-        # added RGBA buffer and Hit buffer to the current camera.
+        # added RGBA buffer (accumulation mode, with the second moment
+        # for the adaptive sampling) to the current camera.
         imgsz = (cur_cam.get_resolution_x(), cur_cam.get_resolution_y(), 4)
-        cur_cam.set_film('RGBA',    Film.ImageFilm(imgsz, 'RGBA'))
+        cur_cam.set_film('RGBA',    Film.ImageFilm(imgsz, 'RGBA', False, True, True))
         # cur_cam.print_obj()
 
 
@@ -129,44 +149,60 @@ class TestIfgiRender2(unittest.TestCase):
         return env_mat
 
 
-    def __compute_color(self, _pixel_x, _pixel_y, _ray, _nframe):
-        """compute framebuffer color"""
+    def __compute_color(self, _ray):
+        """compute the color of a eye ray path.
+        \param[in] _ray eye ray
+        \return color. When the path is longer than the max path
+        length, the initial ray intensity.
+        """
         # FIXME: super slow
-        cur_cam = self.__scenegraph.get_current_camera()
-        col_buf = cur_cam.get_film('RGBA')
-
-        is_update_intensity = False
+        # solid angle pdf of the ray direction. None: eye ray
+        dir_pdf = None
         for _ray.path_length in xrange(0, self.__max_path_length):
             hr = self.__scene_geo_mat.ray_intersect(_ray)
             if hr != None:
                 # hit somthing, lookup material
                 assert(hr.hit_material_index >= 0)
                 mat = self.__scene_geo_mat.material_list[hr.hit_material_index]
-                # only Lambert
-                # mat.explicit_brdf(hr.hit_basis, _out_v0, _out_v1, _tex_point, _tex_uv)
-                # print 'DEBUG: mat ref ', mat.explicit_brdf(None, None, None, None, None)
-
-                # probability is 1/pi, here, constant importance,
-                # therefore, divided by (1/pi) = multiplied by pi
-                brdf = math.pi * mat.explicit_brdf(None, None, None, None, None)
-                _ray.reflectance = (_ray.reflectance * brdf)
                 if mat.is_emit():
-                    # only Lambert emittance
+                    # only Lambert emittance. The light sampling
+                    # also found this light, MIS weighted.
                     # mat.emit_radiance(_hit_onb, _light_out_dir, _tex_point, _tex_uv))
+                    weight = self.__emitter_mis_weight(hr, _ray, dir_pdf)
                     _ray.intensity = _ray.intensity + \
-                        (_ray.reflectance * mat.emit_radiance(None, None, None, None))
-                    # hit the light source
-                    print 'DEBUG: Hit a light source at path length = ', _ray.path_length
-                    is_update_intensity = True
+                        (weight * _ray.reflectance * mat.emit_radiance(None, None, None, None))
                     break
 
-                # Do not stop by reflectance criterion. (if stop, it's wrong.)
+                # only Lambert
+                # mat.explicit_brdf(hr.hit_basis, _out_v0, _out_v1, _tex_point, _tex_uv)
+                brdf = mat.explicit_brdf(None, None, None, None, None)
 
-                # update ray information
-                out_v = mat.diffuse_direction(hr.hit_basis, _ray.get_dir(), \
-                                                  self.__hemisphere_sampler)
-                _ray.set_origin(copy.deepcopy(hr.intersect_pos))
-                _ray.set_dir(copy.deepcopy(out_v))
+                # explicit light sampling: the path of length path_length + 2
+                if _ray.path_length + 1 < self.__max_path_length:
+                    _ray.intensity = _ray.intensity + \
+                        (_ray.reflectance * self.__sample_light(hr, _ray, brdf))
+
+                # next direction. importance sampled by the cosine
+                # weighted sampler: brdf * cos / pdf
+                (out_v, dir_pdf, brdf) = mat.sample_brdf(hr.hit_basis, _ray.get_dir(),
+                                                         None, None,
+                                                         self.__hemisphere_sampler)
+                if dir_pdf <= 0.0:
+                    break
+                cos_out = numpy.dot(out_v, hr.hit_basis.w())
+                _ray.reflectance = (_ray.reflectance * brdf * (cos_out / dir_pdf))
+
+                # Do not stop by reflectance criterion. (if stop, it's
+                # wrong.) The Russian roulette is unbiased.
+                rr_weight = self.__russian_roulette.apply(_ray.path_length + 1,
+                                                          _ray.reflectance,
+                                                          random.random())
+                if rr_weight == 0.0:
+                    break
+                _ray.reflectance = _ray.reflectance * rr_weight
+
+                # update ray information. Both are new arrays, no copy.
+                _ray.reset(hr.intersect_pos, out_v)
 
             else:
                 # done. hit to the environmnt.
@@ -179,28 +215,70 @@ class TestIfgiRender2(unittest.TestCase):
                 amb_col = self.__environment_mat.ambient_response(hit_onb, light_out_dir,\
                                                                       tex_point, tex_uv)
                 _ray.intensity = _ray.intensity + (_ray.reflectance * amb_col)
-                is_update_intensity = True
                 # print 'DEBUG: hit env, amb_col = ', amb_col
                 break
 
+        return _ray.intensity
+
 
-        # now we know the color
-        if (is_update_intensity == True): # and (_ray.path_length == 2)
-            col = float(_nframe) * col_buf.get_color((_pixel_x, _pixel_y)) +\
-                _ray.intensity
-            col_buf.put_color((_pixel_x, _pixel_y), col/(float(_nframe) + 1.0))
+    def __sample_light(self, _hr, _ray, _brdf):
+        """explicit light sampling at a hit point (next event estimation).
 
+        A point on a light is sampled, then a shadow ray is traced.
+        MIS weighted (power heuristic) with the BRDF sampling.
 
-    # no more refrection, too less reflectance
-    def __enough_reflectance(self, _ray):
-        if _ray.reflectance.max() < 0.01:
-            print 'DEBUG: max reflectance is less than 0.01 ', _ray.reflectance
-            return False
-        return True
+        \param[in] _hr   hit record
+        \param[in] _ray  ray that hit
+        \param[in] _brdf BRDF of the hit point
+        \return radiance from the sampled light point
+        """
+        if not self.__light_registry.can_sample():
+            return 0.0
+
+        (light_pos, light_normal, light_emit, pdf_area, light_idx) = \
+            self.__light_registry.sample(self.__light_rng)
+        to_light = light_pos - _hr.intersect_pos
+        dist     = numpy.linalg.norm(to_light)
+        if dist <= _ray.get_min_t():
+            return 0.0
+        ldir      = to_light / dist
+        cos_hit   = numpy.dot(_hr.hit_basis.w(), ldir)
+        cos_light = abs(numpy.dot(light_normal, ldir))
+        if (cos_hit <= 0.0) or (cos_light <= 0.0) or (pdf_area <= 0.0):
+            return 0.0
+
+        shadow_ray = Ray.Ray(_hr.intersect_pos, ldir, _ray.get_min_t(), dist * (1.0 - 1e-4))
+        if self.__scene_geo_mat.occluded(shadow_ray):
+            return 0.0
+
+        light_pdf = pdf_area * dist * dist / cos_light
+        brdf_pdf  = cos_hit / math.pi
+        weight    = (light_pdf * light_pdf) / (light_pdf * light_pdf + brdf_pdf * brdf_pdf)
+        return (weight * cos_hit * cos_light / (dist * dist * pdf_area)) * _brdf * light_emit
+
+
+    def __emitter_mis_weight(self, _hr, _ray, _dir_pdf):
+        """MIS weight of a light hit by the BRDF sampling.
+        \param[in] _hr      hit record of the light
+        \param[in] _ray     ray that hit
+        \param[in] _dir_pdf solid angle pdf of the ray direction. None: eye ray
+        \return weight
+        """
+        if _dir_pdf == None:
+            return 1.0
+        geo_idx   = self.__scene_geo_mat.geometry_name_idx_dict[_hr.hit_primitive.get_name()]
+        light_idx = self.__light_registry.get_light_index(numpy.array([geo_idx]),
+                                                          numpy.array([_hr.hit_face_index]))
+        pdf_area  = self.__light_registry.get_pdf_area(light_idx)[0]
+        cos_light = abs(numpy.dot(_hr.hit_basis.w(), _ray.get_dir()))
+        if (cos_light <= 0.0) or (pdf_area <= 0.0):
+            return 1.0
+        light_pdf = pdf_area * _hr.dist * _hr.dist / cos_light
+        return (_dir_pdf * _dir_pdf) / (_dir_pdf * _dir_pdf + light_pdf * light_pdf)
 
 
     # render a frame
-    def __render_frame(self, _nframe):
+    def __render_frame(self, _nframe, _tile_list):
         cur_cam = self.__scenegraph.get_current_camera()
         image_xsize = cur_cam.get_resolution_x()
         image_ysize = cur_cam.get_resolution_y()
@@ -213,29 +291,55 @@ class TestIfgiRender2(unittest.TestCase):
         inv_xsz = 1.0/image_xsize
         inv_ysz = 1.0/image_ysize
         cur_cam = self.__scenegraph.get_current_camera()
-
-        for x in xrange(0, image_xsize, 1):
-            # print 'DEBUG x = ', x
-            for y in xrange(0, image_ysize, 1):
-                # get normalized coordinate
-                nx = srs.get_sample_x(x,y) * inv_xsz
-                ny = srs.get_sample_y(x,y) * inv_ysz
-                eye_ray = cur_cam.get_ray(nx, ny)
-                # print eye_ray
-                # print nx, ny
-                self.__compute_color(x, y, eye_ray, _nframe)
+        col_buf = cur_cam.get_film('RGBA')
+        # one eye ray object is reused for all the pixels
+        eye_ray = None
+        # per frame intersection counters
+        self.__scene_geo_mat.reset_intersect_stat()
+
+        # render only the tiles that need more samples
+        for (xstart, xend, ystart, yend) in _tile_list:
+            tile = numpy.zeros((xend - xstart + 1, yend - ystart + 1,
+                                col_buf.get_resolution()[2]))
+            for x in xrange(xstart, xend + 1, 1):
+                # print 'DEBUG x = ', x
+                for y in xrange(ystart, yend + 1, 1):
+                    # get normalized coordinate
+                    nx = srs.get_sample_x(x,y) * inv_xsz
+                    ny = srs.get_sample_y(x,y) * inv_ysz
+                    eye_ray = cur_cam.get_ray(nx, ny, eye_ray)
+                    # print eye_ray
+                    # print nx, ny
+                    tile[x - xstart, y - ystart] = self.__compute_color(eye_ray)
+
+            # accumulate the whole tile at once
+            col_buf.accumulate(tile, (xstart, ystart))
 
     def __render_all_frame(self, _max_frame, _save_per_frame):
         """render all frames
         \param[in] _max_frame      max number of frames.
         \param[in] _save_per_frame each _save_per_frame, save the frame to a file.
         """
-        for nf in xrange(0, _max_frame):
-            self.__render_frame(nf)
-            print 'render frame ', nf
+        col_buf  = self.__scenegraph.get_current_camera().get_film('RGBA')
+        (xsize, ysize, zsize) = col_buf.get_resolution()
+        tile_list = AdaptiveSampling.create_tile_list(xsize, ysize, 8)
+        rng_dict = {'random': random, 'light': self.__light_rng}
+        start_frame = self.__checkpoint.restore(col_buf, rng_dict)
+        for nf in xrange(start_frame, _max_frame):
+            active_list = self.__adaptive.get_active_tile_list(col_buf, tile_list)
+            if len(active_list) == 0:
+                print 'converged at frame ', nf, self.__adaptive.stat
+                break
+            self.__render_frame(nf, [tile_list[i] for i in active_list])
+            self.__adaptive.add_pass(tile_list, active_list)
+            print 'render frame ', nf, self.__scene_geo_mat.intersect_stat
+            print '  adaptive: ', self.__adaptive.stat
+            self.__checkpoint.update(col_buf, nf + 1, rng_dict)
             if ((nf != 0) and (nf % _save_per_frame == 0)):
                 self.__save_frame(nf)
         self.__save_frame(0)
+        # completed: the next run renders from the first frame
+        self.__checkpoint.remove()
 
 
     # save the result
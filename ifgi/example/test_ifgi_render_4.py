@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2010-2011 Yamauchi, Hitoshi
+#
+# Example 4: wavefront rendering test/example
+#
+# For set up the environment to run, see test_all.sh
+#
+"""
+\file
+\brief wavefront path tracer example. The same scene as example 2,
+but whole frames are traced as numpy batches.
+"""
+
+import unittest
+
+# package import: specify a directory and file.
+from ifgi.base    import ifgi_util
+from ifgi.ptracer import IfgiSys
+from ifgi.scene   import SceneGraph, Film, IfgiSceneReader
+from ifgi.scene   import SceneUtil
+from ifgi.render  import WavefrontPathTracer, TileRenderer
+
+
+class TestIfgiRender4(unittest.TestCase):
+    """test: ifgi wavefront render test."""
+
+    def test_render(self):
+        """test rendering"""
+
+        print
+        print 'StartTime: ' + ifgi_util.get_current_localtime_str()
+
+        # get ifgi system
+        ifgi_inst = IfgiSys.IfgiSys()
+        ifgi_stat = ifgi_inst.start()
+        assert(ifgi_stat == True)
+
+        self.__image_xsize = 32
+        self.__image_ysize = 32
+        self.__max_path_length = 10 # 2...for direct light only
+
+        # members
+        self.__scenegraph = None
+
+        # global geometry/material list
+        self.__scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+
+        self.__create_scene()
+
+        # get environment material from the scene
+        env_mat = self.__retrieve_environment_material_from_scene()
+
+        self.__path_tracer = WavefrontPathTracer.WavefrontPathTracer(
+            self.__scene_geo_mat, env_mat, self.__max_path_length, 0)
+
+        # tile renderer: worker processes (0: number of CPUs), tile size
+        cur_cam = self.__scenegraph.get_current_camera()
+        self.__tile_renderer = TileRenderer.TileRenderer(
+            self.__path_tracer, cur_cam, cur_cam.get_film('RGBA'), 0, 16)
+
+        # reder frames
+        max_frame      = 100
+        save_per_frame = 50
+        self.__tile_renderer.start()
+        self.__render_all_frame(max_frame, save_per_frame)
+        self.__tile_renderer.stop()
+        self.__path_tracer.print_stat()
+
+        ifgi_stat = ifgi_inst.shutdown()
+
+        print 'EndTime: ', ifgi_util.get_current_localtime_str()
+
+
+    def __create_scene(self):
+        """create scene.
+        geometry, material, and camera.
+        """
+
+        print 'creating a scene'
+
+        # create scenegraph by the ifgi scene parser
+
+        _infilepath = '../../sampledata/cornel_box.ifgi'
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        if(not ifgireader.read(_infilepath)):
+            raise StandardError, ('load file [' + _infilepath + '] failed.')
+
+        self.__scenegraph = SceneGraph.create_ifgi_scenegraph(ifgireader)
+        self.__scenegraph.update_all_bbox()
+
+        # create the global material_name -> material lookup map
+        self.__scene_geo_mat.append_ifgi_data(ifgireader)
+        self.__scene_geo_mat.print_summary()
+
+        # set the camera
+        # default camera should exist
+        assert('default' in ifgireader.camera_dict_dict)
+
+        cur_cam = self.__scenegraph.get_current_camera()
+        cur_cam.set_config_dict(ifgireader.camera_dict_dict['default'])
+        cur_cam.set_resolution_x(self.__image_xsize)
+        cur_cam.set_resolution_y(self.__image_ysize)
+
+        # added RGBA buffer (accumulation mode, shared with the render
+        # workers) to the current camera.
+        imgsz = (cur_cam.get_resolution_x(), cur_cam.get_resolution_y(), 4)
+        cur_cam.set_film('RGBA', Film.ImageFilm(imgsz, 'RGBA', True, True))
+
+
+    def __retrieve_environment_material_from_scene(self):
+        """retrieve environment material from the scene.
+        The scene should be constructed.
+
+        \return found environment material in the scene"""
+
+        env_mat_name = 'default_env'
+        if not(self.__scene_geo_mat.material_name_idx_dict.has_key(env_mat_name)):
+            raise StandardError, ('Not found environment material [' + env_mat_name + '].')
+
+        env_mat_idx = self.__scene_geo_mat.material_name_idx_dict[env_mat_name]
+        env_mat = self.__scene_geo_mat.material_list[env_mat_idx]
+        assert(env_mat.get_classname() == 'EnvironmentMaterial')
+
+        return env_mat
+
+
+    def __render_all_frame(self, _max_frame, _save_per_frame):
+        """render all frames
+        \param[in] _max_frame      max number of frames.
+        \param[in] _save_per_frame each _save_per_frame, save the frame to a file.
+        """
+        for nf in xrange(0, _max_frame):
+            self.__tile_renderer.render_frame(nf)
+            if ((nf != 0) and (nf % _save_per_frame == 0)):
+                self.__save_frame(nf)
+        self.__save_frame(0)
+
+
+    # save the result
+    def __save_frame(self, _nframe):
+        cur_cam = self.__scenegraph.get_current_camera()
+        assert(cur_cam != None)
+        film = cur_cam.get_film('RGBA')
+        assert(film != None)
+        if (_nframe == 0):
+            fname = 'test_ifgi_render_4.RGBA.png'
+        else:
+            fname = 'test_ifgi_render_4.RGBA.' + str(_nframe) + '.png'
+        film.save_file(fname)
+        print 'Saved ... ', fname
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestIfgiRender4)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2010-2011 Yamauchi, Hitoshi
+#
+# Example: render service
+#
+# For set up the environment to run, see test_all.sh
+#
+"""
+\file
+\brief ifgi render service: render jobs from a spool directory. The
+second job of the same scene uses the loaded scene.
+"""
+
+import unittest
+import os, tempfile, shutil
+
+from ifgi.ptracer import IfgiSys, JobSpool
+
+
+class TestIfgiRenderService(unittest.TestCase):
+    """test: ifgi render service."""
+
+    def setUp(self):
+        """create a spool directory"""
+        self.tmpdir = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        """remove the spool directory"""
+        shutil.rmtree(self.tmpdir)
+
+
+    def test_render_spool(self):
+        """render jobs from a spool directory"""
+        spool_dir = os.path.join(self.tmpdir, 'spool')
+        scene = '../../sampledata/cornel_box.ifgi'
+        job_name_list = []
+        # the same scene from two cameras, then a broken job
+        for (i, eye_pos) in enumerate([None, [278.0, 273.0, -600.0]]):
+            job = {'scene':        scene,
+                   'output':       os.path.join(self.tmpdir, 'out' + str(i) + '.png'),
+                   'resolution':   [8, 8],
+                   'sample_count': 2,
+                   'max_path_length': 4}
+            if eye_pos != None:
+                job['camera_param'] = {'eye_pos': eye_pos}
+            job_name_list.append(JobSpool.submit_job(spool_dir, job, 'job' + str(i)))
+        job_name_list.append(JobSpool.submit_job(
+                spool_dir, {'scene': 'no_such_scene.ifgi', 'output': 'none.png'}, 'job2'))
+        self.assertEquals(JobSpool.get_job_state(spool_dir, 'job0'), 'job')
+        self.assertRaises(StandardError, JobSpool.submit_job, spool_dir, {'scene': scene})
+        self.assertRaises(StandardError, JobSpool.submit_job, spool_dir,
+                          {'scene': scene, 'output': 'a.png', 'no_such_key': 0})
+
+        ifgi_inst = IfgiSys.IfgiSys()
+        # not up: no job
+        self.assertEquals(ifgi_inst.process_spool(spool_dir), 0)
+        assert(ifgi_inst.start() == True)
+        self.assertEquals(ifgi_inst.serve_spool(spool_dir, 0.01, 0.0), 3)
+
+        result_list = [JobSpool.get_job_result(spool_dir, name) for name in job_name_list]
+        self.assertEquals([r['status'] for r in result_list], ['done', 'done', 'failed'])
+        self.assertEquals([JobSpool.get_job_state(spool_dir, name) for name in job_name_list],
+                          ['done', 'done', 'failed'])
+        for r in result_list[0:2]:
+            assert(os.path.isfile(r['output']))
+            self.assertEquals(r['sample_count'], 2)
+        # the second job uses the loaded scene
+        self.assertEquals([r['scene_cache_hit'] for r in result_list[0:2]], [False, True])
+        assert(result_list[0]['load_time_sec'] > 0.0)
+        self.assertEquals(result_list[1]['load_time_sec'], 0.0)
+
+        cache = ifgi_inst.get_scene_cache()
+        self.assertEquals(cache.get_scene_count(), 1)
+        self.assertEquals(cache.stat.hit_count,  1)
+        self.assertEquals(cache.stat.miss_count, 1)
+
+        # adaptive job from render_job
+        result = ifgi_inst.render_job({'scene': scene,
+                                       'output': os.path.join(self.tmpdir, 'out3.png'),
+                                       'resolution': [8, 8], 'tile_size': 4,
+                                       'sample_count': 4, 'error_threshold': 0.0,
+                                       'max_path_length': 4})
+        self.assertEquals(result['status'], 'done')
+        self.assertEquals(result['sample_count'], 4)
+        assert(result['scene_cache_hit'])
+
+        assert(ifgi_inst.shutdown() == True)
+        self.assertEquals(cache.get_scene_count(), 0)
+        self.assertEquals(ifgi_inst.render_job({'scene': scene, 'output': 'a.png'})['status'],
+                          'failed')
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestIfgiRenderService)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -6,7 +6,12 @@
 \file
 \brief ifgi path tracer system class
 """
+import os, time, traceback
+
 from ifgi.base.ILog import ILog
+from ifgi.scene     import Film
+from ifgi.render    import TileRenderer, AdaptiveSampling
+import SceneCache, JobSpool
 
 # ifgi system class
 class IfgiSys(object):
@@ -14,14 +19,25 @@ class IfgiSys(object):
     - initialize the system
     - configure the system
     - get the component
+    - render jobs (render service)
     - shutdown the system
+
+    As a render service, the system keeps the loaded scenes (parsed
+    scene, loaded meshes, built accelerator) while it is not
+    shutdown. The jobs of a loaded scene (e.g., new cameras) skip the
+    load and the build. The jobs come from render_job() or a spool
+    directory (see JobSpool).
     """
 
     # default constructor
-    def __init__(self):
-        """default constructor"""
+    def __init__(self, _max_scene_count=4):
+        """default constructor
+        \param[in] _max_scene_count max number of loaded scenes
+        """
         # system status: "up", "stop", "down"
         self.__sys_status = "stop"
+        # loaded scenes
+        self.__scene_cache = SceneCache.SceneCache(_max_scene_count)
 
 
     # start the system
@@ -63,11 +79,11 @@ class IfgiSys(object):
         \return true success.
         """
         if self.__sys_status == "up":
-            # some shutdown process here
+            self.__scene_cache.clear()
             self.__sys_status = "down"
             return True
         elif self.__sys_status == "stop":
-            # some shutdown process here
+            self.__scene_cache.clear()
             self.__sys_status = "down"
             return True
         elif self.__sys_status == "down":
@@ -81,3 +97,125 @@ class IfgiSys(object):
         \return state string {"up", "stop", "down"}
         """
         return self.__sys_status
+
+
+    # get scene cache
+    def get_scene_cache(self):
+        """get the loaded scenes.
+        \return SceneCache
+        """
+        return self.__scene_cache
+
+
+    # render a job
+    def render_job(self, _job):
+        """render a job. The system must be up.
+
+        \param[in] _job job dict, see JobSpool.JOB_DEFAULT_DICT
+        \return result dict: 'status' ('done' or 'failed'), 'error',
+        'output', 'sample_count' (max samples per pixel),
+        'scene_cache_hit', 'load_time_sec', 'render_time_sec'
+        """
+        if self.__sys_status != "up":
+            return {'status': 'failed', 'error': 'IfgiSys is not up.'}
+
+        try:
+            return self.__render_job(JobSpool.get_job_dict(_job))
+        except Exception, extrainfo:
+            ILog.error('render job failed: ' + str(extrainfo))
+            return {'status': 'failed', 'error': str(extrainfo),
+                    'traceback': traceback.format_exc()}
+
+
+    # process the jobs of a spool
+    def process_spool(self, _spool_dir, _max_job_count=None):
+        """render the submitted jobs of a spool directory.
+
+        \param[in] _spool_dir     spool directory
+        \param[in] _max_job_count max number of jobs. None: all the
+        submitted jobs
+        \return number of processed jobs
+        """
+        job_count = 0
+        while (self.__sys_status == "up") and \
+                ((_max_job_count == None) or (job_count < _max_job_count)):
+            claimed = JobSpool.claim_next_job(_spool_dir)
+            if claimed == None:
+                break
+            (job_name, job) = claimed
+            ILog.info('render job [' + job_name + ']')
+            JobSpool.finish_job(_spool_dir, job_name, self.render_job(job))
+            job_count += 1
+        return job_count
+
+
+    # serve a spool
+    def serve_spool(self, _spool_dir, _poll_interval_sec=1.0, _max_idle_sec=None):
+        """render the jobs of a spool directory until the system is
+        not up or the spool is idle.
+
+        \param[in] _spool_dir         spool directory
+        \param[in] _poll_interval_sec interval to look for new jobs
+        \param[in] _max_idle_sec      return after this seconds without
+        a job. None: never
+        \return number of processed jobs
+        """
+        job_count = 0
+        idle_start = time.time()
+        while self.__sys_status == "up":
+            count = self.process_spool(_spool_dir)
+            job_count += count
+            if count > 0:
+                idle_start = time.time()
+            elif (_max_idle_sec != None) and (time.time() - idle_start >= _max_idle_sec):
+                break
+            else:
+                time.sleep(_poll_interval_sec)
+        return job_count
+
+    # private: ------------------------------------------------------------
+
+    # render a complete job dict
+    def __render_job(self, _job):
+        """render a job.
+        \param[in] _job job dict of all the keys
+        \return result dict
+        """
+        (scene, is_hit) = self.__scene_cache.get_scene(str(_job['scene']))
+        load_time_sec = 0.0
+        if not is_hit:
+            load_time_sec = scene.load_time_sec
+
+        start_time = time.time()
+        cam = scene.create_camera(str(_job['camera']), _job['camera_param'],
+                                  _job['resolution'])
+        worker_count = _job['worker_count']
+        is_adaptive  = (_job['error_threshold'] != None)
+        imgsz = (cam.get_resolution_x(), cam.get_resolution_y(), 4)
+        film = Film.ImageFilm(imgsz, 'RGBA', worker_count != 1, True, is_adaptive)
+
+        path_tracer = scene.get_path_tracer(_job['max_path_length'], _job['seed'])
+        tile_renderer = TileRenderer.TileRenderer(path_tracer, cam, film, worker_count,
+                                                  _job['tile_size'], _job['seed'])
+        tile_renderer.start()
+        try:
+            if is_adaptive:
+                adaptive = AdaptiveSampling.AdaptiveSampling(
+                    _job['error_threshold'], min(8, _job['sample_count']),
+                    _job['sample_count'])
+                tile_renderer.render_adaptive(adaptive)
+            else:
+                for nframe in xrange(_job['sample_count']):
+                    tile_renderer.render_frame(nframe)
+        finally:
+            tile_renderer.stop()
+
+        output = str(_job['output'])
+        film.save_file(output, _job['exposure'], _job['gamma'])
+
+        return {'status':          'done',
+                'output':          output,
+                'sample_count':    int(film.get_sample_count_buffer().max()),
+                'scene_cache_hit': is_hit,
+                'load_time_sec':   load_time_sec,
+                'render_time_sec': time.time() - start_time}
@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI render job spool
+\file
+\brief a directory spool of render jobs.
+
+A job is a JSON file in the spool directory. Its state is the file
+extension:
+- <name>.job:     submitted
+- <name>.running: claimed by a render service
+- <name>.done:    finished
+- <name>.failed:  failed
+and <name>.result is the JSON result of a finished or failed job.
+
+All the files are written by ifgi_util.atomic_write(). A claim is a
+rename, only one service gets a job even when several services
+share a spool directory. The jobs are processed in the name order,
+the default name is the submit time.
+"""
+
+import os, time, json
+
+from ifgi.base import ifgi_util
+from ifgi.base.ILog import ILog
+
+
+JOB_EXT     = '.job'
+RUNNING_EXT = '.running'
+DONE_EXT    = '.done'
+FAILED_EXT  = '.failed'
+RESULT_EXT  = '.result'
+
+# job keys: a scene and an output file name are necessary
+# - scene:        ifgi scene file name
+# - output:       output image file name
+# - camera:       camera name of the scene
+# - camera_param: camera parameters to override, see Camera.set_config_dict()
+# - resolution:   [x, y]. None: the scene camera resolution
+# - sample_count: samples per pixel (max samples with error_threshold)
+# - error_threshold: adaptive sampling relative error. None: uniform
+# - max_path_length, seed, worker_count, tile_size, exposure, gamma
+JOB_DEFAULT_DICT = {
+    'camera':          'default',
+    'camera_param':    None,
+    'resolution':      None,
+    'sample_count':    16,
+    'error_threshold': None,
+    'max_path_length': 10,
+    'seed':            0,
+    'worker_count':    1,
+    'tile_size':       32,
+    'exposure':        1.0,
+    'gamma':           1.0,
+    }
+
+
+def get_job_dict(_job):
+    """get a complete job dict: check the keys and the sample count,
+    and fill the defaults.
+
+    \param[in] _job job dict
+    \return job dict of all the keys
+    """
+    for key in ['scene', 'output']:
+        if not (key in _job):
+            raise StandardError, ('job has no [' + key + ']')
+    for key in _job.keys():
+        if not ((key in JOB_DEFAULT_DICT) or (key in ['scene', 'output'])):
+            raise StandardError, ('unknown job key [' + key + ']')
+
+    job_dict = dict(JOB_DEFAULT_DICT)
+    job_dict.update(_job)
+
+    # adaptive sampling needs 2 samples to estimate the error
+    min_sample_count = 1
+    if job_dict['error_threshold'] != None:
+        min_sample_count = 2
+    if job_dict['sample_count'] < min_sample_count:
+        raise StandardError, ('job sample_count must be at least ' + str(min_sample_count) +
+                              ' (error_threshold ' + str(job_dict['error_threshold']) +
+                              '), but ' + str(job_dict['sample_count']))
+    return job_dict
+
+
+def submit_job(_spool_dir, _job, _job_name=None):
+    """submit a job to a spool directory.
+
+    The scene and the output file names are made absolute here, a
+    service may run in another directory.
+
+    \param[in] _spool_dir spool directory
+    \param[in] _job       job dict, see JOB_DEFAULT_DICT
+    \param[in] _job_name  job name. None: the submit time
+    \return job name
+    """
+    job_dict = get_job_dict(_job)
+    job_dict['scene']  = os.path.abspath(job_dict['scene'])
+    job_dict['output'] = os.path.abspath(job_dict['output'])
+
+    if _job_name == None:
+        _job_name = '%.6f_%d' % (time.time(), os.getpid())
+    if not os.path.isdir(_spool_dir):
+        os.makedirs(_spool_dir)
+    write_json(os.path.join(_spool_dir, _job_name + JOB_EXT), job_dict)
+    return _job_name
+
+
+def claim_next_job(_spool_dir):
+    """claim the next submitted job.
+
+    \param[in] _spool_dir spool directory
+    \return (job name, job dict), None when no job. A job file that
+    is not JSON is failed here and skipped.
+    """
+    if not os.path.isdir(_spool_dir):
+        return None
+
+    for fname in sorted(os.listdir(_spool_dir)):
+        if not fname.endswith(JOB_EXT):
+            continue
+        job_name = fname[:-len(JOB_EXT)]
+        running_fname = os.path.join(_spool_dir, job_name + RUNNING_EXT)
+        try:
+            os.rename(os.path.join(_spool_dir, fname), running_fname)
+        except OSError:
+            # another service claimed it
+            continue
+        try:
+            with open(running_fname, 'r') as infile:
+                job = json.load(infile)
+        except ValueError, extrainfo:
+            ILog.warn('broken job [' + running_fname + '] ' + str(extrainfo))
+            finish_job(_spool_dir, job_name, {'status': 'failed',
+                                              'error':  'broken job: ' + str(extrainfo)})
+            continue
+        return (job_name, job)
+
+    return None
+
+
+def finish_job(_spool_dir, _job_name, _result):
+    """finish a claimed job: write the result and change the state.
+
+    \param[in] _spool_dir spool directory
+    \param[in] _job_name  job name
+    \param[in] _result    result dict. 'status' is 'done' or 'failed'.
+    """
+    write_json(os.path.join(_spool_dir, _job_name + RESULT_EXT), _result)
+    ext = DONE_EXT
+    if _result['status'] != 'done':
+        ext = FAILED_EXT
+    os.rename(os.path.join(_spool_dir, _job_name + RUNNING_EXT),
+              os.path.join(_spool_dir, _job_name + ext))
+
+
+def get_job_state(_spool_dir, _job_name):
+    """get the state of a job.
+
+    \param[in] _spool_dir spool directory
+    \param[in] _job_name  job name
+    \return 'job', 'running', 'done', 'failed', or None (no such job)
+    """
+    for ext in [DONE_EXT, FAILED_EXT, RUNNING_EXT, JOB_EXT]:
+        if os.path.isfile(os.path.join(_spool_dir, _job_name + ext)):
+            return ext[1:]
+    return None
+
+
+def get_job_result(_spool_dir, _job_name):
+    """get the result of a finished or failed job.
+
+    \param[in] _spool_dir spool directory
+    \param[in] _job_name  job name
+    \return result dict, None when not finished.
+    """
+    result_fname = os.path.join(_spool_dir, _job_name + RESULT_EXT)
+    if not os.path.isfile(result_fname):
+        return None
+    with open(result_fname, 'r') as infile:
+        return json.load(infile)
+
+
+def write_json(_fname, _obj):
+    """write a JSON file atomically, see ifgi_util.atomic_write().
+
+    \param[in] _fname file name
+    \param[in] _obj   JSON serializable object
+    """
+    ifgi_util.atomic_write(_fname,
+                           lambda _outfile: json.dump(_obj, _outfile, indent=1,
+                                                      sort_keys=True),
+                           'w')
@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI scene cache
+\file
+\brief loaded scenes of a render service. A scene is parsed, its
+meshes are loaded, its acceleration structure and its path tracer
+(light registry, shading tables) are built once, then the render jobs
+of the scene share them.
+"""
+
+import os, time
+import collections
+
+from ifgi.base.ILog import ILog
+from ifgi.scene     import IfgiSceneReader, SceneUtil, Camera
+from ifgi.render    import WavefrontPathTracer
+
+
+# environment material name of a scene
+ENVIRONMENT_MATERIAL_NAME = 'default_env'
+
+
+class SceneCacheEntry(object):
+    """a loaded scene.
+
+    Public members:
+    - ifgi_fname:    absolute scene file name
+    - file_stat:     (mtime, size) of the scene file when loaded
+    - ifgireader:    IfgiSceneReader
+    - scene_geo_mat: SceneGeometryMaterialContainer, the accelerator
+      is built (the path tracer's batch ray casts traverse it)
+    - environment_mat: environment material
+    - path_tracer:   WavefrontPathTracer of the scene (the light
+      registry and the shading tables are built), see
+      get_path_tracer()
+    - load_time_sec: load and build time
+    """
+
+    def __init__(self, _ifgi_fname):
+        """load a scene.
+        \param[in] _ifgi_fname ifgi scene file name
+        """
+        super(SceneCacheEntry, self).__init__()
+
+        start_time = time.time()
+        self.ifgi_fname = os.path.abspath(_ifgi_fname)
+        self.file_stat  = get_file_stat(self.ifgi_fname)
+
+        self.ifgireader = IfgiSceneReader.IfgiSceneReader()
+        if not self.ifgireader.read(self.ifgi_fname):
+            raise StandardError, ('load file [' + self.ifgi_fname + '] failed.')
+
+        self.scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        self.scene_geo_mat.append_ifgi_data(self.ifgireader)
+        self.scene_geo_mat.build_accelerator()
+
+        mat_idx_dict = self.scene_geo_mat.material_name_idx_dict
+        if not (ENVIRONMENT_MATERIAL_NAME in mat_idx_dict):
+            raise StandardError, ('Not found environment material [' +
+                                  ENVIRONMENT_MATERIAL_NAME + '] in [' +
+                                  self.ifgi_fname + '].')
+        self.environment_mat = \
+            self.scene_geo_mat.material_list[mat_idx_dict[ENVIRONMENT_MATERIAL_NAME]]
+        self.path_tracer = WavefrontPathTracer.WavefrontPathTracer(self.scene_geo_mat,
+                                                                   self.environment_mat)
+
+        self.load_time_sec = time.time() - start_time
+
+
+    def is_valid(self):
+        """is the entry the same as the scene file?
+        \return False when the scene file is changed or removed.
+        """
+        return get_file_stat(self.ifgi_fname) == self.file_stat
+
+
+    def get_path_tracer(self, _max_path_length, _seed):
+        """get the path tracer of the scene for a job. The per job
+        state (max path length, seed, statistics) is reset, the
+        light registry and the shading tables are reused.
+
+        \param[in] _max_path_length max path length
+        \param[in] _seed            random seed
+        \return WavefrontPathTracer
+        """
+        self.path_tracer.set_max_path_length(_max_path_length)
+        self.path_tracer.set_seed(_seed)
+        self.path_tracer.stat.reset()
+        self.path_tracer.get_frame_intersect_stat().reset()
+        return self.path_tracer
+
+
+    def create_camera(self, _camera_name='default', _camera_param=None, _resolution=None):
+        """create a camera of the scene.
+
+        \param[in] _camera_name  camera name of the scene (def camera)
+        \param[in] _camera_param camera parameter dict to override the
+        scene camera, e.g., {'eye_pos': [0, 0, 10]}. See
+        Camera.set_config_dict(). None: no override
+        \param[in] _resolution   (x, y) resolution. None: the scene
+        camera resolution
+        \return IFGICamera
+        """
+        if not (_camera_name in self.ifgireader.camera_dict_dict):
+            raise StandardError, ('no camera [' + _camera_name + '] in [' +
+                                  self.ifgi_fname + '].')
+        cam = Camera.IFGICamera()
+        cam.set_config_dict(self.ifgireader.camera_dict_dict[_camera_name])
+        if _camera_param != None:
+            config = {}
+            for (key, val) in _camera_param.items():
+                if isinstance(val, (list, tuple)):
+                    val = ' '.join([str(v) for v in val])
+                config[str(key)] = str(val)
+            cam.set_config_dict(config)
+        if _resolution != None:
+            cam.set_resolution_x(int(_resolution[0]))
+            cam.set_resolution_y(int(_resolution[1]))
+        return cam
+
+
+def get_file_stat(_fname):
+    """get the file state to detect a change.
+    \param[in] _fname file name
+    \return (mtime, size). None when the file does not exist.
+    """
+    try:
+        st = os.stat(_fname)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size)
+
+# ----------------------------------------------------------------------
+
+class SceneCacheStat(object):
+    """scene cache statistics"""
+
+    def __init__(self):
+        """constructor."""
+        super(SceneCacheStat, self).__init__()
+        self.reset()
+
+
+    def reset(self):
+        """reset all the counters."""
+        # number of requests served by a loaded scene
+        self.hit_count = 0
+        # number of scene loads
+        self.miss_count = 0
+        # number of scenes removed by the scene count limit
+        self.evict_count = 0
+        # number of scenes reloaded since the file was changed
+        self.reload_count = 0
+        # total scene load time
+        self.load_time_sec = 0.0
+
+
+    def add(self, _stat):
+        """add the counters of another stat.
+        \param[in] _stat SceneCacheStat
+        """
+        self.hit_count     += _stat.hit_count
+        self.miss_count    += _stat.miss_count
+        self.evict_count   += _stat.evict_count
+        self.reload_count  += _stat.reload_count
+        self.load_time_sec += _stat.load_time_sec
+
+
+    def __str__(self):
+        """human readable string."""
+        return '%d hits, %d misses (%d reloads), %d evictions, %g [s] load time' % \
+            (self.hit_count, self.miss_count, self.reload_count, self.evict_count,
+             self.load_time_sec)
+
+
+class SceneCache(object):
+    """loaded scenes, least recently used first out.
+
+    A scene is reloaded when its scene file is changed. The mesh
+    files the scene refers are not checked, clear() after changing
+    them.
+    """
+
+    def __init__(self, _max_scene_count=4):
+        """constructor.
+        \param[in] _max_scene_count max number of loaded scenes
+        """
+        super(SceneCache, self).__init__()
+
+        if _max_scene_count <= 0:
+            raise StandardError, ('max scene count must be positive, but ' +
+                                  str(_max_scene_count))
+        self.__max_scene_count = _max_scene_count
+        # absolute file name -> SceneCacheEntry, least recently used first
+        self.__entry_dict = collections.OrderedDict()
+        self.stat = SceneCacheStat()
+
+
+    def get_scene(self, _ifgi_fname):
+        """get a loaded scene. Load it when not loaded or changed.
+
+        \param[in] _ifgi_fname ifgi scene file name
+        \return (SceneCacheEntry, is_hit)
+        """
+        key = os.path.abspath(_ifgi_fname)
+        if key in self.__entry_dict:
+            entry = self.__entry_dict.pop(key)
+            if entry.is_valid():
+                self.__entry_dict[key] = entry
+                self.stat.hit_count += 1
+                return (entry, True)
+            ILog.info('scene [' + key + '] has been changed, reload.')
+            self.stat.reload_count += 1
+
+        entry = SceneCacheEntry(key)
+        self.stat.miss_count    += 1
+        self.stat.load_time_sec += entry.load_time_sec
+        ILog.info('loaded scene [' + key + '] in ' + str(entry.load_time_sec) + ' [s]')
+
+        self.__entry_dict[key] = entry
+        while len(self.__entry_dict) > self.__max_scene_count:
+            (evict_key, evict_entry) = self.__entry_dict.popitem(False)
+            self.stat.evict_count += 1
+            ILog.info('evict scene [' + evict_key + ']')
+
+        return (entry, False)
+
+
+    def get_scene_count(self):
+        """get number of loaded scenes.
+        \return number of loaded scenes
+        """
+        return len(self.__entry_dict)
+
+
+    def get_scene_name_list(self):
+        """get the loaded scene file names, least recently used first.
+        \return list of absolute file names
+        """
+        return self.__entry_dict.keys()
+
+
+    def clear(self):
+        """unload all the scenes.
+        """
+        self.__entry_dict.clear()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for JobSpool
+#
+
+"""test IFGI JobSpool"""
+
+import unittest
+import os, tempfile, shutil
+
+import JobSpool
+
+
+class TestJobSpool(unittest.TestCase):
+    """test for JobSpool"""
+
+    def setUp(self):
+        """create a spool directory"""
+        self.tmpdir    = tempfile.mkdtemp()
+        self.spool_dir = os.path.join(self.tmpdir, 'spool')
+
+
+    def tearDown(self):
+        """remove the spool directory"""
+        shutil.rmtree(self.tmpdir)
+
+
+    def test_get_job_dict(self):
+        """get_job_dict: the defaults and the bad jobs"""
+        job_dict = JobSpool.get_job_dict({'scene': 'a.ifgi', 'output': 'a.png',
+                                          'sample_count': 4})
+        self.assertEquals(job_dict['sample_count'], 4)
+        for key in JobSpool.JOB_DEFAULT_DICT.keys():
+            if key != 'sample_count':
+                self.assertEquals(job_dict[key], JobSpool.JOB_DEFAULT_DICT[key])
+
+        self.assertRaises(StandardError, JobSpool.get_job_dict, {'scene': 'a.ifgi'})
+        self.assertRaises(StandardError, JobSpool.get_job_dict, {'output': 'a.png'})
+        self.assertRaises(StandardError, JobSpool.get_job_dict,
+                          {'scene': 'a.ifgi', 'output': 'a.png', 'no_such_key': 0})
+
+        # adaptive sampling needs at least 2 samples
+        self.assertRaises(StandardError, JobSpool.get_job_dict,
+                          {'scene': 'a.ifgi', 'output': 'a.png', 'sample_count': 0})
+        self.assertRaises(StandardError, JobSpool.get_job_dict,
+                          {'scene': 'a.ifgi', 'output': 'a.png', 'sample_count': 1,
+                           'error_threshold': 0.05})
+        job_dict = JobSpool.get_job_dict({'scene': 'a.ifgi', 'output': 'a.png',
+                                          'sample_count': 2, 'error_threshold': 0.05})
+        self.assertEquals(job_dict['sample_count'], 2)
+        self.assertRaises(StandardError, JobSpool.submit_job, self.spool_dir,
+                          {'scene': 'a.ifgi', 'output': 'a.png', 'sample_count': 1,
+                           'error_threshold': 0.05})
+
+
+    def test_claim(self):
+        """claim_next_job: the name order, a job is claimed once"""
+        for name in ['job1', 'job0']:
+            JobSpool.submit_job(self.spool_dir, {'scene': 'a.ifgi', 'output': 'a.png'}, name)
+        self.assertEquals(JobSpool.get_job_state(self.spool_dir, 'job0'), 'job')
+
+        (job_name, job) = JobSpool.claim_next_job(self.spool_dir)
+        self.assertEquals(job_name, 'job0')
+        self.assertEquals(job['scene'], os.path.abspath('a.ifgi'))
+        self.assertEquals(JobSpool.get_job_state(self.spool_dir, 'job0'), 'running')
+
+        (job_name, job) = JobSpool.claim_next_job(self.spool_dir)
+        self.assertEquals(job_name, 'job1')
+        self.assertEquals(JobSpool.claim_next_job(self.spool_dir), None)
+        self.assertEquals(JobSpool.claim_next_job(os.path.join(self.tmpdir, 'no_dir')), None)
+        self.assertEquals(JobSpool.get_job_state(self.spool_dir, 'no_such_job'), None)
+
+
+    def test_finish(self):
+        """finish_job: the result files and the states"""
+        for name in ['job0', 'job1']:
+            JobSpool.submit_job(self.spool_dir, {'scene': 'a.ifgi', 'output': 'a.png'}, name)
+        JobSpool.claim_next_job(self.spool_dir)
+        self.assertEquals(JobSpool.get_job_result(self.spool_dir, 'job0'), None)
+        JobSpool.finish_job(self.spool_dir, 'job0', {'status': 'done', 'sample_count': 4})
+        JobSpool.claim_next_job(self.spool_dir)
+        JobSpool.finish_job(self.spool_dir, 'job1', {'status': 'failed', 'error': 'test'})
+
+        self.assertEquals(JobSpool.get_job_state(self.spool_dir, 'job0'), 'done')
+        self.assertEquals(JobSpool.get_job_state(self.spool_dir, 'job1'), 'failed')
+        self.assertEquals(JobSpool.get_job_result(self.spool_dir, 'job0'),
+                          {'status': 'done', 'sample_count': 4})
+        self.assertEquals(JobSpool.get_job_result(self.spool_dir, 'job1')['error'], 'test')
+        self.assertEquals(sorted(os.listdir(self.spool_dir)),
+                          ['job0.done', 'job0.result', 'job1.failed', 'job1.result'])
+
+
+    def test_broken_job(self):
+        """claim_next_job: a job file that is not JSON fails"""
+        os.makedirs(self.spool_dir)
+        with open(os.path.join(self.spool_dir, 'job0.job'), 'w') as outfile:
+            outfile.write('not json')
+        JobSpool.submit_job(self.spool_dir, {'scene': 'a.ifgi', 'output': 'a.png'}, 'job1')
+
+        (job_name, job) = JobSpool.claim_next_job(self.spool_dir)
+        self.assertEquals(job_name, 'job1')
+        self.assertEquals(JobSpool.get_job_state(self.spool_dir, 'job0'), 'failed')
+        assert('broken job' in JobSpool.get_job_result(self.spool_dir, 'job0')['error'])
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestJobSpool)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
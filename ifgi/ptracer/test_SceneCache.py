@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for SceneCache
+#
+
+"""test IFGI SceneCache"""
+
+import unittest
+import os, tempfile, shutil
+import numpy
+
+import SceneCache
+
+
+# a one triangle scene. %(...)s are filled in.
+SCENE_TEMPLATE = """# ifgi_scene 0
+def camera {
+    cam_name = default
+    eye_pos = 0.0 0.0 %(eye_z)s
+    view_dir = 0.0 0.0 -1.0
+    up_dir = 0.0 1.0 0.0
+    resolution_x = 4
+    resolution_y = 4
+}
+def material {
+    mat_name = default_env
+    mat_type = environment_constant_color
+    emit_color = 0.1 0.1 0.1 1.0
+}
+def material {
+    mat_name = one_tri_mat
+    mat_type = lambert
+    diffuse_color = 1.0 0.0 0.0 1.0
+}
+def geometry {
+    geo_name = one_tri
+    material = one_tri_mat
+    geo_file_type = obj
+    geo_file_name = %(obj_fname)s
+}
+"""
+
+
+class TestSceneCache(unittest.TestCase):
+    """test for SceneCache"""
+
+    def setUp(self):
+        """create a scene directory"""
+        self.tmpdir = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        """remove the scene directory"""
+        shutil.rmtree(self.tmpdir)
+
+
+    def write_scene(self, _name, _eye_z):
+        """write a one triangle scene.
+        \param[in] _name  scene file name (in the scene directory)
+        \param[in] _eye_z camera eye z
+        \return scene file name
+        """
+        fname = os.path.join(self.tmpdir, _name)
+        with open(fname, 'w') as outfile:
+            outfile.write(SCENE_TEMPLATE %
+                          {'eye_z':     _eye_z,
+                           'obj_fname': os.path.abspath('../../sampledata/one_tri.obj')})
+        return fname
+
+
+    def test_hit(self):
+        """get_scene: a hit does not reload the scene"""
+        fname = self.write_scene('scene0.ifgi', '10.0')
+        cache = SceneCache.SceneCache(2)
+        (entry0, is_hit0) = cache.get_scene(fname)
+        (entry1, is_hit1) = cache.get_scene(os.path.relpath(fname))
+        self.assertEquals((is_hit0, is_hit1), (False, True))
+        assert(entry1 is entry0)
+        assert(entry0.is_valid())
+        # the batch ray casts of the path tracer use the accelerator
+        accel = entry0.scene_geo_mat.get_accelerator()
+        assert(accel != None)
+        (t, gi, fi) = entry0.scene_geo_mat.ray_intersect_batch(
+            numpy.array([[0.0, 0.5, 10.0], [0.0, 0.5, -10.0]]),
+            numpy.array([[0.0, 0.0, -1.0], [0.0, 0.0, -1.0]]),
+            numpy.zeros(2), numpy.array([100.0, 100.0]))
+        self.assertEquals(list(gi), [0, -1])
+        self.assertEquals(accel.stat.ray_count, 2)
+        self.assertEquals(cache.stat.hit_count,  1)
+        self.assertEquals(cache.stat.miss_count, 1)
+        self.assertEquals(cache.stat.reload_count, 0)
+
+        cam = entry0.create_camera('default', {'eye_pos': [0.0, 0.0, 20.0]}, (8, 6))
+        self.assertEquals(list(cam.get_eye_pos()), [0.0, 0.0, 20.0])
+        self.assertEquals((cam.get_resolution_x(), cam.get_resolution_y()), (8, 6))
+        self.assertRaises(StandardError, entry0.create_camera, 'no_such_camera')
+
+        # the jobs share the path tracer, the per job state is reset
+        wpt = entry0.get_path_tracer(3, 0)
+        assert(wpt is entry1.path_tracer)
+        self.assertEquals(wpt.get_max_path_length(), 3)
+        wpt.stat.frame_count = 5
+        wpt = entry1.get_path_tracer(6, 1)
+        assert(wpt is entry0.path_tracer)
+        self.assertEquals(wpt.get_max_path_length(), 6)
+        self.assertEquals(wpt.stat.frame_count, 0)
+
+
+    def test_reload(self):
+        """get_scene: a changed scene file (size or mtime) is reloaded"""
+        fname = self.write_scene('scene0.ifgi', '10.0')
+        cache = SceneCache.SceneCache(2)
+        (entry0, is_hit) = cache.get_scene(fname)
+
+        # size changed
+        self.write_scene('scene0.ifgi', '100.0')
+        assert(not entry0.is_valid())
+        (entry1, is_hit) = cache.get_scene(fname)
+        assert(not is_hit)
+        assert(entry1 is not entry0)
+        self.assertEquals(list(entry1.create_camera().get_eye_pos()), [0.0, 0.0, 100.0])
+
+        # mtime changed, the same size
+        st = os.stat(fname)
+        os.utime(fname, (st.st_atime, st.st_mtime - 10.0))
+        (entry2, is_hit) = cache.get_scene(fname)
+        assert(not is_hit)
+        assert(entry2 is not entry1)
+
+        self.assertEquals(cache.stat.miss_count,   3)
+        self.assertEquals(cache.stat.reload_count, 2)
+        self.assertEquals(cache.get_scene_count(), 1)
+
+
+    def test_evict(self):
+        """get_scene: the least recently used scene is evicted at the
+        max scene count"""
+        fname_list = [self.write_scene('scene' + str(i) + '.ifgi', '10.0') for i in xrange(3)]
+        cache = SceneCache.SceneCache(2)
+        cache.get_scene(fname_list[0])
+        cache.get_scene(fname_list[1])
+        # scene0 is used, scene1 is the least recently used
+        (entry, is_hit) = cache.get_scene(fname_list[0])
+        assert(is_hit)
+        cache.get_scene(fname_list[2])
+
+        self.assertEquals(cache.get_scene_count(), 2)
+        self.assertEquals(cache.get_scene_name_list(), [fname_list[0], fname_list[2]])
+        self.assertEquals(cache.stat.evict_count, 1)
+        (entry, is_hit) = cache.get_scene(fname_list[1])
+        assert(not is_hit)
+
+        cache.clear()
+        self.assertEquals(cache.get_scene_count(), 0)
+        self.assertRaises(StandardError, SceneCache.SceneCache, 0)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestSceneCache)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
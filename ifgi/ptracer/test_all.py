@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2010-2011 Yamauchi, Hitoshi
+#
+#
+"""test all in ifgi ptracer"""
+
+import unittest
+
+import test_JobSpool
+import test_SceneCache
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suits = []
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_JobSpool.TestJobSpool))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_SceneCache.TestSceneCache))
+
+    alltest = unittest.TestSuite(suits)
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI adaptive sampling
+\file
+\brief tile adaptive sampling driven by the per pixel variance
+estimates of the film.
+"""
+
+import numpy
+
+
+def create_tile_list(_xsize, _ysize, _tile_size):
+    """split an image to square tiles.
+
+    \param[in] _xsize     image x size
+    \param[in] _ysize     image y size
+    \param[in] _tile_size tile size in pixel
+    \return list of (xstart, xend, ystart, yend), end is inclusive.
+    """
+    if _tile_size <= 0:
+        raise StandardError, ('tile size must be positive, but ' + str(_tile_size))
+    tile_list = []
+    for xstart in xrange(0, _xsize, _tile_size):
+        for ystart in xrange(0, _ysize, _tile_size):
+            tile_list.append((xstart, min(xstart + _tile_size, _xsize) - 1,
+                              ystart, min(ystart + _tile_size, _ysize) - 1))
+    return tile_list
+
+# ----------------------------------------------------------------------
+
+class AdaptiveStat(object):
+    """adaptive sampling statistics"""
+
+    def __init__(self):
+        """constructor."""
+        super(AdaptiveStat, self).__init__()
+        self.reset()
+
+
+    def reset(self):
+        """reset all the counters."""
+        # number of passes that rendered some tiles
+        self.pass_count = 0
+        # number of rendered tiles (tile samples)
+        self.tile_sample_count = 0
+        # number of rendered pixel samples
+        self.pixel_sample_count = 0
+        # number of active tiles of the last pass
+        self.active_tile_count = 0
+        # max tile error of the last pass
+        self.max_error = numpy.inf
+
+
+    def add(self, _stat):
+        """add the counters of another stat.
+        \param[in] _stat AdaptiveStat
+        """
+        self.pass_count         += _stat.pass_count
+        self.tile_sample_count  += _stat.tile_sample_count
+        self.pixel_sample_count += _stat.pixel_sample_count
+
+
+    def __str__(self):
+        """human readable string."""
+        return ('%d passes, %d tile samples, %d pixel samples, ' +
+                '%d active tiles, max error %g') % \
+            (self.pass_count, self.tile_sample_count, self.pixel_sample_count,
+             self.active_tile_count, self.max_error)
+
+# ----------------------------------------------------------------------
+
+class AdaptiveSampling(object):
+    """tile adaptive sampling.
+
+    The error of a pixel is the relative standard error of its color,
+    sqrt(variance of the mean) / (color + min_radiance), the max of
+    the color channels. min_radiance keeps the black pixels from
+    sampling forever. The error of a tile is the max error of its
+    pixels, a firefly keeps its tile sampling.
+
+    A tile is active (needs one more sample per pixel) while it has
+    less than min_sample_count samples, or while its error is above
+    error_threshold and it has less than max_sample_count samples.
+    The render has converged when no tile is active. The noise budget
+    is the error_threshold, not a frame count.
+
+    The film must be in the second moment mode (ImageFilm(..., True,
+    True)).
+    """
+
+    def __init__(self, _error_threshold=0.05, _min_sample_count=8, _max_sample_count=1024,
+                 _min_radiance=0.01, _color_channel_count=3):
+        """constructor.
+
+        \param[in] _error_threshold     relative standard error threshold
+        \param[in] _min_sample_count    number of samples before the error
+        is trusted (at least 2)
+        \param[in] _max_sample_count    max number of samples per pixel
+        \param[in] _min_radiance        added to the color of the error
+        denominator
+        \param[in] _color_channel_count number of color channels (e.g.,
+        3 for RGBA, alpha is not a color)
+        """
+        super(AdaptiveSampling, self).__init__()
+
+        if not (2 <= _min_sample_count <= _max_sample_count):
+            raise StandardError, ('illegal sample count range [' + str(_min_sample_count) +
+                                  ', ' + str(_max_sample_count) + ']')
+        if _error_threshold < 0.0:
+            raise StandardError, ('negative error threshold ' + str(_error_threshold))
+
+        self.__error_threshold  = _error_threshold
+        self.__min_sample_count = _min_sample_count
+        self.__max_sample_count = _max_sample_count
+        self.__min_radiance     = _min_radiance
+        self.__color_channel_count = _color_channel_count
+
+        self.stat = AdaptiveStat()
+
+
+    def get_error_threshold(self):
+        """get the relative standard error threshold.
+        \return error threshold
+        """
+        return self.__error_threshold
+
+
+    def get_sample_count_range(self):
+        """get the sample count range.
+        \return (min sample count, max sample count)
+        """
+        return (self.__min_sample_count, self.__max_sample_count)
+
+
+    def get_error_image(self, _film):
+        """get the per pixel relative standard error.
+
+        \param[in] _film film (ImageFilm) in the second moment mode
+        \return error numpy.array (x, y). inf for the pixels of less
+        than two samples.
+        """
+        ccount = self.__color_channel_count
+        var   = _film.get_variance()[:, :, 0:ccount]
+        color = numpy.abs(_film.get_image()[:, :, 0:ccount])
+        return (numpy.sqrt(var) / (color + self.__min_radiance)).max(axis=2)
+
+
+    def get_active_tile_list(self, _film, _tile_list):
+        """get the tiles that need more samples.
+
+        \param[in] _film      film (ImageFilm) in the second moment mode
+        \param[in] _tile_list list of (xstart, xend, ystart, yend)
+        \return list of indices of _tile_list
+        """
+        error = self.get_error_image(_film)
+        count = _film.get_sample_count_buffer()
+
+        active_list = []
+        max_error = 0.0
+        for (tile_idx, (xstart, xend, ystart, yend)) in enumerate(_tile_list):
+            tile_count = count[xstart:(xend + 1), ystart:(yend + 1)].min()
+            if tile_count >= self.__max_sample_count:
+                continue
+            if tile_count < self.__min_sample_count:
+                active_list.append(tile_idx)
+                max_error = numpy.inf
+                continue
+            tile_error = error[xstart:(xend + 1), ystart:(yend + 1)].max()
+            if tile_error > self.__error_threshold:
+                active_list.append(tile_idx)
+                max_error = max(max_error, tile_error)
+
+        self.stat.active_tile_count = len(active_list)
+        self.stat.max_error = max_error
+        return active_list
+
+
+    def is_converged(self, _film, _tile_list):
+        """has the render converged? (no tile needs more samples.)
+
+        \param[in] _film      film (ImageFilm) in the second moment mode
+        \param[in] _tile_list list of (xstart, xend, ystart, yend)
+        \return True when converged.
+        """
+        return len(self.get_active_tile_list(_film, _tile_list)) == 0
+
+
+    def add_pass(self, _tile_list, _active_list):
+        """count a rendered pass.
+
+        \param[in] _tile_list   list of (xstart, xend, ystart, yend)
+        \param[in] _active_list indices of the rendered tiles
+        """
+        if len(_active_list) == 0:
+            return
+        self.stat.pass_count += 1
+        self.stat.tile_sample_count += len(_active_list)
+        for tile_idx in _active_list:
+            (xstart, xend, ystart, yend) = _tile_list[tile_idx]
+            self.stat.pixel_sample_count += (xend - xstart + 1) * (yend - ystart + 1)
+
+
+    def __str__(self):
+        """human readable string.
+        """
+        return 'AdaptiveSampling: error threshold %g, samples [%d, %d]' % \
+            (self.__error_threshold, self.__min_sample_count, self.__max_sample_count)
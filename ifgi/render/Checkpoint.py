@@ -0,0 +1,363 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI render checkpoint
+\file
+\brief checkpoint and resume of a progressive rendering.
+
+A checkpoint is a compressed numpy .npz file:
+- 'version':      checkpoint format version
+- 'scene_hash':   compute_scene_hash() of the rendered scene
+- 'frame_count':  number of rendered (blended) frames
+- 'elapsed_sec':  rendering time of the frames
+- 'framebuffer':  the film framebuffer
+- 'sample_count': the film sample count buffer (accumulation film),
+  empty array otherwise
+- 'second_moment': the film sum of squares buffer (second moment
+  film), empty array otherwise
+- 'rng.<name>.*': state of the random number generators
+
+The file is written by ifgi_util.atomic_write(), a job killed while
+writing keeps the previous checkpoint.
+
+A checkpoint is restored only when its scene hash and film shape are
+the same. The pixel samplers are deterministic from (seed, sample
+index), the frame count is their state.
+"""
+
+import os, time, hashlib, zipfile, zlib
+import numpy
+
+from ifgi.base import ifgi_util
+from ifgi.base.ILog import ILog
+
+
+# format version
+VERSION = 1
+
+
+def compute_scene_hash(_scene_geo_mat, _camera=None, _extra=None):
+    """compute the scene hash of a checkpoint.
+
+    The hash covers the geometry (vertices, faces, instance
+    matrices), the geometry material names, the material names and
+    classes, and the camera parameters. Material parameters are not
+    covered, pass the scene file contents as _extra to cover them.
+
+    \param[in] _scene_geo_mat SceneGeometryMaterialContainer
+    \param[in] _camera        camera. None: not covered
+    \param[in] _extra         additional string (e.g., scene file
+    contents, render settings). None: not covered
+    \return hex digest string
+    """
+    sha = hashlib.sha1()
+    for mat in _scene_geo_mat.material_list:
+        sha.update(mat.get_classname() + ':' + mat.get_material_name() + ';')
+
+    for geo_dict in _scene_geo_mat.geometry_dict_list:
+        tmesh = geo_dict['TriMesh']
+        sha.update(geo_dict['geo_name'] + ':' + geo_dict['material'] + ';')
+        if tmesh.get_classname() == 'TriMeshInstance':
+            sha.update(numpy.ascontiguousarray(tmesh.get_matrix()).tostring())
+            tmesh = tmesh.get_trimesh()
+        sha.update(numpy.ascontiguousarray(tmesh.vertex_list,   dtype=numpy.float64).tostring())
+        sha.update(numpy.ascontiguousarray(tmesh.face_idx_list, dtype=numpy.int32).tostring())
+
+    if _camera != None:
+        cam_param = [_camera.get_eye_pos(), _camera.get_view_dir(), _camera.get_up_dir(),
+                     _camera.get_fovy_rad(), _camera.get_aspect_ratio(),
+                     _camera.get_z_near(), _camera.get_z_far(), _camera.get_projection(),
+                     _camera.get_focal_length(), _camera.get_lens_to_film_distance(),
+                     _camera.get_resolution_x(), _camera.get_resolution_y()]
+        sha.update(repr([repr(numpy.asarray(p).tolist()) for p in cam_param]))
+
+    if _extra != None:
+        sha.update(_extra)
+
+    return sha.hexdigest()
+
+
+def write_checkpoint(_fname, _scene_hash, _frame_count, _film, _rng_dict=None,
+                     _elapsed_sec=0.0):
+    """write a checkpoint file.
+
+    \param[in] _fname       checkpoint file name
+    \param[in] _scene_hash  compute_scene_hash() of the scene
+    \param[in] _frame_count number of rendered frames
+    \param[in] _film        film (ImageFilm)
+    \param[in] _rng_dict    name -> random number generator
+    (numpy.random.RandomState, or random module / random.Random).
+    None: no generator
+    \param[in] _elapsed_sec rendering time of the frames
+    \return True when written.
+    """
+    array_dict = {'version':     numpy.array(VERSION),
+                  'scene_hash':  numpy.array(_scene_hash),
+                  'frame_count': numpy.array(_frame_count),
+                  'elapsed_sec': numpy.array(_elapsed_sec),
+                  'framebuffer': numpy.asarray(_film.get_framebuffer())}
+    for (name, buf, dtype) in [('sample_count',  _film.get_sample_count_buffer(),  numpy.int32),
+                               ('second_moment', _film.get_second_moment_buffer(), numpy.float64)]:
+        if buf is None:
+            array_dict[name] = numpy.zeros(0, dtype=dtype)
+        else:
+            array_dict[name] = numpy.asarray(buf)
+    if _rng_dict != None:
+        for (name, rng) in _rng_dict.items():
+            array_dict.update(get_rng_state_array_dict(name, rng))
+
+    try:
+        ifgi_util.atomic_write(_fname,
+                               lambda _outfile: numpy.savez_compressed(_outfile, **array_dict))
+    except (IOError, OSError), extrainfo:
+        ILog.warn('cannot write checkpoint [' + _fname + '] ' + str(extrainfo))
+        return False
+
+    return True
+
+
+def read_checkpoint(_fname, _scene_hash):
+    """read a checkpoint file.
+
+    \param[in] _fname      checkpoint file name
+    \param[in] _scene_hash compute_scene_hash() of the scene
+    \return name -> numpy.array dict (see the file format). None when
+    there is no valid checkpoint of the scene.
+    """
+    if not os.path.isfile(_fname):
+        return None
+
+    if not zipfile.is_zipfile(_fname):
+        ILog.warn('ignore broken checkpoint [' + _fname + '] not a npz file.')
+        return None
+
+    try:
+        with open(_fname, 'rb') as infile:
+            npz = numpy.load(infile)
+            array_dict = dict([(name, npz[name]) for name in npz.files])
+        if int(array_dict['version']) != VERSION:
+            ILog.warn('ignore checkpoint [' + _fname + '] of version ' +
+                      str(array_dict['version']))
+            return None
+    except (StandardError, IOError, zipfile.BadZipfile, zlib.error), extrainfo:
+        ILog.warn('ignore broken checkpoint [' + _fname + '] ' + str(extrainfo))
+        return None
+
+    if str(array_dict['scene_hash']) != _scene_hash:
+        ILog.warn('ignore checkpoint [' + _fname + '] of another scene.')
+        return None
+
+    return array_dict
+
+
+def restore_checkpoint(_fname, _scene_hash, _film, _rng_dict=None):
+    """restore the film and the random number generators from a
+    checkpoint file.
+
+    \param[in]     _fname      checkpoint file name
+    \param[in]     _scene_hash compute_scene_hash() of the scene
+    \param[in,out] _film       film (ImageFilm), the buffers are
+    overwritten in place
+    \param[in,out] _rng_dict   name -> random number generator, see
+    write_checkpoint(). The states are restored.
+    \return (frame count, elapsed sec) of the checkpoint. (0, 0.0)
+    when not restored.
+    """
+    array_dict = read_checkpoint(_fname, _scene_hash)
+    if array_dict == None:
+        return (0, 0.0)
+
+    buf_dict = {'framebuffer':   _film.get_framebuffer(),
+                'sample_count':  _film.get_sample_count_buffer(),
+                'second_moment': _film.get_second_moment_buffer()}
+    for (name, buf) in buf_dict.items():
+        if name not in array_dict:
+            # no second moment in a checkpoint of an older tree
+            array_dict[name] = numpy.zeros(0)
+        if (((buf is None) and (array_dict[name].size != 0)) or
+            ((buf is not None) and (array_dict[name].shape != buf.shape))):
+            ILog.warn('ignore checkpoint [' + _fname + '] of another film.')
+            return (0, 0.0)
+
+    if _rng_dict != None:
+        for name in _rng_dict.keys():
+            if not (('rng.' + name + '.kind') in array_dict):
+                ILog.warn('ignore checkpoint [' + _fname + '] without rng [' + name + ']')
+                return (0, 0.0)
+
+    for (name, buf) in buf_dict.items():
+        if buf is not None:
+            buf[...] = array_dict[name]
+    if _rng_dict != None:
+        for (name, rng) in _rng_dict.items():
+            set_rng_state_array_dict(name, rng, array_dict)
+
+    return (int(array_dict['frame_count']), float(array_dict['elapsed_sec']))
+
+
+def get_rng_state_array_dict(_name, _rng):
+    """get the state of a random number generator as arrays.
+
+    \param[in] _name name of the generator in the checkpoint
+    \param[in] _rng  numpy.random.RandomState, or an object that has
+    getstate() (random module, random.Random)
+    \return 'rng.<name>.*' -> numpy.array dict
+    """
+    prefix = 'rng.' + _name + '.'
+    if isinstance(_rng, numpy.random.RandomState):
+        (kind, keys, pos, has_gauss, cached_gauss) = _rng.get_state()
+        return {prefix + 'kind':  numpy.array('numpy'),
+                prefix + 'state': numpy.asarray(keys, dtype=numpy.uint32),
+                prefix + 'param': numpy.array([pos, has_gauss], dtype=numpy.int64),
+                prefix + 'gauss': numpy.array(cached_gauss)}
+
+    (version, internal, gauss_next) = _rng.getstate()
+    if gauss_next == None:
+        gauss_next = numpy.nan
+    return {prefix + 'kind':  numpy.array('python'),
+            prefix + 'state': numpy.array(internal, dtype=numpy.int64),
+            prefix + 'param': numpy.array([version], dtype=numpy.int64),
+            prefix + 'gauss': numpy.array(gauss_next)}
+
+
+def set_rng_state_array_dict(_name, _rng, _array_dict):
+    """set the state of a random number generator from arrays.
+    See get_rng_state_array_dict().
+
+    \param[in]     _name       name of the generator in the checkpoint
+    \param[in,out] _rng        random number generator
+    \param[in]     _array_dict checkpoint arrays
+    """
+    prefix = 'rng.' + _name + '.'
+    kind   = str(_array_dict[prefix + 'kind'])
+    state  = _array_dict[prefix + 'state']
+    param  = _array_dict[prefix + 'param']
+    gauss  = float(_array_dict[prefix + 'gauss'])
+    if isinstance(_rng, numpy.random.RandomState) != (kind == 'numpy'):
+        raise StandardError, ('rng [' + _name + '] kind differs: ' + kind)
+
+    if kind == 'numpy':
+        _rng.set_state(('MT19937', state, int(param[0]), int(param[1]), gauss))
+    else:
+        gauss_next = gauss
+        if numpy.isnan(gauss):
+            gauss_next = None
+        _rng.setstate((int(param[0]), tuple([long(x) for x in state]), gauss_next))
+
+# ----------------------------------------------------------------------
+
+class RenderCheckpoint(object):
+    """periodic checkpoint of a progressive rendering.
+
+    Usage:
+    \code
+    ckpt = RenderCheckpoint(fname, scene_hash, 100)
+    start_frame = ckpt.restore(film, rng_dict)
+    for nframe in xrange(start_frame, max_frame):
+        render_frame(nframe)
+        ckpt.update(film, nframe + 1, rng_dict)
+    ckpt.remove()
+    \endcode
+
+    A checkpoint is written every frame_interval frames, or when
+    time_interval_sec has passed since the last one.
+    """
+
+    def __init__(self, _fname, _scene_hash, _frame_interval=100, _time_interval_sec=None):
+        """constructor.
+
+        \param[in] _fname             checkpoint file name
+        \param[in] _scene_hash        compute_scene_hash() of the scene
+        \param[in] _frame_interval    write every this frames. None: no
+        frame interval
+        \param[in] _time_interval_sec write when this seconds passed.
+        None: no time interval
+        """
+        super(RenderCheckpoint, self).__init__()
+
+        self.__fname      = _fname
+        self.__scene_hash = _scene_hash
+        self.__frame_interval    = _frame_interval
+        self.__time_interval_sec = _time_interval_sec
+
+        self.__last_frame_count = 0
+        self.__last_write_time  = time.time()
+        # rendering time before this process (restored)
+        self.__restored_elapsed_sec = 0.0
+        self.__start_time = time.time()
+
+
+    def get_filename(self):
+        """get the checkpoint file name.
+        \return file name
+        """
+        return self.__fname
+
+
+    def restore(self, _film, _rng_dict=None):
+        """restore the film and the random number generators, if a
+        valid checkpoint exists.
+
+        \param[in,out] _film     film (ImageFilm)
+        \param[in,out] _rng_dict name -> random number generator
+        \return frame count to resume from, 0 when not restored.
+        """
+        (frame_count, elapsed_sec) = restore_checkpoint(self.__fname, self.__scene_hash,
+                                                        _film, _rng_dict)
+        if frame_count > 0:
+            ILog.info('resume from checkpoint [' + self.__fname + '] at frame ' +
+                      str(frame_count) + ', ' + str(elapsed_sec) + ' [s] rendered.')
+        self.__last_frame_count     = frame_count
+        self.__restored_elapsed_sec = elapsed_sec
+        self.__start_time      = time.time()
+        self.__last_write_time = time.time()
+        return frame_count
+
+
+    def is_due(self, _frame_count):
+        """is a checkpoint due?
+        \param[in] _frame_count number of rendered frames
+        \return True when the frame or the time interval has passed.
+        """
+        if _frame_count <= self.__last_frame_count:
+            return False
+        if ((self.__frame_interval != None) and
+            (_frame_count - self.__last_frame_count >= self.__frame_interval)):
+            return True
+        if ((self.__time_interval_sec != None) and
+            (time.time() - self.__last_write_time >= self.__time_interval_sec)):
+            return True
+        return False
+
+
+    def update(self, _film, _frame_count, _rng_dict=None, _is_force=False):
+        """write a checkpoint when it is due.
+
+        \param[in] _film        film (ImageFilm)
+        \param[in] _frame_count number of rendered frames
+        \param[in] _rng_dict    name -> random number generator
+        \param[in] _is_force    write even if not due (e.g., the last frame)
+        \return True when written.
+        """
+        if not (_is_force or self.is_due(_frame_count)):
+            return False
+
+        elapsed_sec = self.__restored_elapsed_sec + time.time() - self.__start_time
+        if not write_checkpoint(self.__fname, self.__scene_hash, _frame_count, _film,
+                                _rng_dict, elapsed_sec):
+            return False
+        self.__last_frame_count = _frame_count
+        self.__last_write_time  = time.time()
+        return True
+
+
+    def remove(self):
+        """remove the checkpoint file, e.g., after a completed render.
+        A completed render leaves no checkpoint, the next run starts
+        from frame 0.
+        """
+        if os.path.exists(self.__fname):
+            os.remove(self.__fname)
+        self.__last_frame_count = 0
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI Russian roulette
+\file
+\brief Russian roulette path termination driven by the path throughput.
+"""
+
+import numpy
+
+
+class RussianRoulette(object):
+    """Russian roulette path termination.
+
+    After min_depth bounces, a path survives with the probability of
+    its throughput (the max of the color channels), clamped to
+    [min_survival_prob, max_survival_prob]. A surviving path's
+    throughput is divided by the survival probability, then the
+    estimate is unbiased. Cutting a path by a fixed threshold (e.g.,
+    reflectance < 0.01) is biased.
+
+    The lower bound keeps the variance of the dark paths finite. The
+    upper bound makes the paths in a closed scene (e.g., the Cornell
+    box) terminate.
+    """
+
+    def __init__(self, _min_depth=3, _min_survival_prob=0.05, _max_survival_prob=0.95,
+                 _color_channel_count=3):
+        """constructor.
+
+        \param[in] _min_depth number of bounces before the roulette
+        starts. The paths shorter than this are never terminated.
+        \param[in] _min_survival_prob lower bound of the survival probability
+        \param[in] _max_survival_prob upper bound of the survival probability
+        \param[in] _color_channel_count number of color channels of a
+        throughput (e.g., 3 for RGBA, alpha is not a color)
+        """
+        super(RussianRoulette, self).__init__()
+
+        self.__min_depth = _min_depth
+        self.__color_channel_count = _color_channel_count
+        self.set_survival_prob_bound(_min_survival_prob, _max_survival_prob)
+
+
+    def set_min_depth(self, _min_depth):
+        """set number of bounces before the roulette starts.
+        \param[in] _min_depth minimal depth
+        """
+        self.__min_depth = _min_depth
+
+
+    def get_min_depth(self):
+        """get number of bounces before the roulette starts.
+        \return minimal depth
+        """
+        return self.__min_depth
+
+
+    def set_survival_prob_bound(self, _min_survival_prob, _max_survival_prob):
+        """set the survival probability bounds.
+        \param[in] _min_survival_prob lower bound, (0, 1]
+        \param[in] _max_survival_prob upper bound, [_min_survival_prob, 1]
+        """
+        if not ((0.0 < _min_survival_prob <= _max_survival_prob) and
+                (_max_survival_prob <= 1.0)):
+            raise StandardError, ('illegal survival probability bound [' +
+                                  str(_min_survival_prob) + ', ' +
+                                  str(_max_survival_prob) + ']')
+        self.__min_survival_prob = _min_survival_prob
+        self.__max_survival_prob = _max_survival_prob
+
+
+    def get_survival_prob_bound(self):
+        """get the survival probability bounds.
+        \return (min survival probability, max survival probability)
+        """
+        return (self.__min_survival_prob, self.__max_survival_prob)
+
+
+    def get_survival_prob_array(self, _depth, _throughput):
+        """get the survival probabilities of paths (vectorized).
+
+        \param[in] _depth      number of bounces of the paths
+        \param[in] _throughput path throughput numpy.array (N, channels)
+        \return survival probability numpy.array (N,)
+        """
+        if _depth < self.__min_depth:
+            return numpy.ones(_throughput.shape[0])
+        color = _throughput[:, 0:self.__color_channel_count]
+        return numpy.clip(color.max(axis=1), self.__min_survival_prob,
+                          self.__max_survival_prob)
+
+
+    def apply_array(self, _depth, _throughput, _u):
+        """play the roulette (vectorized).
+
+        \param[in] _depth      number of bounces of the paths
+        \param[in] _throughput path throughput numpy.array (N, channels)
+        \param[in] _u          uniform random numbers numpy.array (N,)
+        \return (is_survive bool numpy.array (N,), weight numpy.array
+        (N,)). Multiply the weight (1/survival probability) to the
+        surviving throughput.
+        """
+        prob = self.get_survival_prob_array(_depth, _throughput)
+        return (_u < prob, 1.0 / prob)
+
+
+    def apply(self, _depth, _throughput, _u):
+        """play the roulette of a path.
+
+        \param[in] _depth      number of bounces of the path
+        \param[in] _throughput path throughput numpy.array (channels,)
+        \param[in] _u          a uniform random number
+        \return weight (1/survival probability) of the surviving
+        path, 0.0 when terminated.
+        """
+        (is_survive, weight) = \
+            self.apply_array(_depth, numpy.asarray(_throughput)[numpy.newaxis, :],
+                             numpy.array([_u]))
+        if is_survive[0]:
+            return weight[0]
+        return 0.0
+
+
+    def __str__(self):
+        """human readable string.
+        """
+        return 'RussianRoulette: min depth %d, survival probability [%g, %g]' % \
+            (self.__min_depth, self.__min_survival_prob, self.__max_survival_prob)
@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI tile renderer
+\file
+\brief multi-process tile renderer.
+
+The camera film is split into tiles and the tiles are dispatched to a
+multiprocessing pool. The worker processes are forked when the pool
+starts, they inherit the scene, the path tracer, and the camera
+without pickling. The film is in shared memory, the workers write
+the pixels directly to it. Only the tile descriptions and the
+statistics go through the pool.
+"""
+
+import multiprocessing
+import numpy
+
+import WavefrontPathTracer, AdaptiveSampling
+from ifgi.base.ILog import ILog
+
+
+# worker context (path tracer, camera, film). This is set before the
+# pool is created and the workers inherit it by fork.
+_worker_context = None
+
+
+def _render_tile_task(_task):
+    """render a tile (runs in a worker process).
+
+    \param[in] _task (nframe, seed, xstart, xend, ystart, yend)
+    \return WavefrontStat of this tile
+    """
+    (path_tracer, camera, film) = _worker_context
+    (nframe, seed, xstart, xend, ystart, yend) = _task
+
+    frame_stat = path_tracer.stat
+    path_tracer.stat = WavefrontPathTracer.WavefrontStat()
+    try:
+        path_tracer.set_seed(seed)
+        path_tracer.render_tile(camera, film, nframe, xstart, xend, ystart, yend)
+        tile_stat = path_tracer.stat
+    finally:
+        path_tracer.stat = frame_stat
+
+    return tile_stat
+
+# ----------------------------------------------------------------------
+
+class TileRenderer(object):
+    """multi-process tile renderer.
+
+    Each tile of each frame has its own random seed, the result does
+    not depend on the worker count or on the tile order.
+
+    Usage: start(), render_frame() for each frame, then stop(). The
+    workers see the scene as it was at start().
+    """
+
+    def __init__(self, _path_tracer, _camera, _film, _worker_count=0,
+                 _tile_size=32, _seed=0):
+        """constructor.
+
+        \param[in] _path_tracer  path tracer (WavefrontPathTracer)
+        \param[in] _camera       camera
+        \param[in] _film         film. Must be shared (ImageFilm(...,
+        True)) when _worker_count > 1.
+        \param[in] _worker_count number of worker processes. 0: number
+        of CPUs. 1: render in this process.
+        \param[in] _tile_size    tile size in pixel (square tile)
+        \param[in] _seed         random seed
+        """
+        super(TileRenderer, self).__init__()
+
+        if _worker_count <= 0:
+            _worker_count = multiprocessing.cpu_count()
+        if _tile_size <= 0:
+            raise StandardError, ('tile size must be positive, but ' + str(_tile_size))
+        if (_worker_count > 1) and (not _film.is_shared()):
+            raise StandardError, ('multi process rendering needs a shared memory film.')
+
+        self.__path_tracer  = _path_tracer
+        self.__camera       = _camera
+        self.__film         = _film
+        self.__worker_count = _worker_count
+        self.__tile_size    = _tile_size
+        self.__seed         = _seed
+        self.__pool         = None
+
+
+    def get_worker_count(self):
+        """get number of worker processes.
+        \return number of worker processes
+        """
+        return self.__worker_count
+
+
+    def get_tile_list(self):
+        """get the tiles of the film.
+        \return list of (xstart, xend, ystart, yend), end is inclusive.
+        """
+        return AdaptiveSampling.create_tile_list(self.__camera.get_resolution_x(),
+                                                 self.__camera.get_resolution_y(),
+                                                 self.__tile_size)
+
+
+    def start(self):
+        """start the worker processes.
+        """
+        global _worker_context
+        if self.__pool != None:
+            ILog.warn('TileRenderer has already been started.')
+            return
+
+        _worker_context = (self.__path_tracer, self.__camera, self.__film)
+        if self.__worker_count > 1:
+            self.__pool = multiprocessing.Pool(self.__worker_count)
+            ILog.info('started ' + str(self.__worker_count) + ' render workers.')
+
+
+    def stop(self):
+        """stop the worker processes.
+        """
+        global _worker_context
+        if self.__pool != None:
+            self.__pool.close()
+            self.__pool.join()
+            self.__pool = None
+        _worker_context = None
+
+
+    def render_frame(self, _nframe):
+        """render one sample per pixel frame and blend it to the film.
+
+        \param[in] _nframe frame number (0 is the first frame)
+        """
+        task_list = []
+        for (tile_idx, tile) in enumerate(self.get_tile_list()):
+            seed = [self.__seed, _nframe, tile_idx]
+            task_list.append((_nframe, seed) + tile)
+
+        self.__render_task_list(task_list)
+        self.__path_tracer.stat.frame_count += 1
+
+
+    def render_adaptive_pass(self, _adaptive):
+        """render one sample per pixel of the tiles that need more
+        samples.
+
+        The frame number of a tile is its sample count, the same tile
+        sample has the same seed as render_frame().
+
+        \param[in] _adaptive AdaptiveSampling. The film must be in the
+        second moment mode.
+        \return number of rendered tiles. 0: converged
+        """
+        tile_list   = self.get_tile_list()
+        active_list = _adaptive.get_active_tile_list(self.__film, tile_list)
+        count = self.__film.get_sample_count_buffer()
+
+        task_list = []
+        for tile_idx in active_list:
+            (xstart, xend, ystart, yend) = tile_list[tile_idx]
+            nframe = int(count[xstart:(xend + 1), ystart:(yend + 1)].min())
+            seed = [self.__seed, nframe, tile_idx]
+            task_list.append((nframe, seed) + tile_list[tile_idx])
+
+        self.__render_task_list(task_list)
+        _adaptive.add_pass(tile_list, active_list)
+        if len(task_list) > 0:
+            self.__path_tracer.stat.frame_count += 1
+        return len(task_list)
+
+
+    def render_adaptive(self, _adaptive, _max_pass=None):
+        """render adaptive passes until the film converges.
+
+        \param[in] _adaptive AdaptiveSampling
+        \param[in] _max_pass max number of passes. None: until converged
+        (AdaptiveSampling max sample count bounds the passes)
+        \return number of rendered passes
+        """
+        pass_count = 0
+        while (_max_pass == None) or (pass_count < _max_pass):
+            if self.render_adaptive_pass(_adaptive) == 0:
+                ILog.info('adaptive sampling converged after ' + str(pass_count) +
+                          ' passes: ' + str(_adaptive.stat))
+                break
+            pass_count += 1
+        return pass_count
+
+    # private: ------------------------------------------------------------
+
+    def __render_task_list(self, _task_list):
+        """render the tile tasks by the workers.
+        \param[in] _task_list list of (nframe, seed, xstart, xend, ystart, yend)
+        """
+        if _worker_context == None:
+            raise StandardError, ('TileRenderer has not been started.')
+
+        # the per frame intersection counters of this frame (or pass)
+        frame_intersect_stat = self.__path_tracer.get_frame_intersect_stat()
+        frame_intersect_stat.reset()
+
+        if self.__pool != None:
+            tile_stat_list = self.__pool.imap_unordered(_render_tile_task, _task_list)
+        else:
+            tile_stat_list = map(_render_tile_task, _task_list)
+
+        for tile_stat in tile_stat_list:
+            self.__path_tracer.stat.add(tile_stat)
+            # in this process, trace_path() has already counted the tile
+            if self.__pool != None:
+                frame_intersect_stat.add(tile_stat.intersect)
@@ -0,0 +1,721 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI wavefront path tracer
+\file
+\brief wavefront (ray stream) path tracer. Whole frame in numpy arrays.
+
+All the live paths of a frame are kept in structure of arrays
+(origin, direction, throughput, and radiance). Each bounce runs as
+batched stages:
+- intersect: all the rays against the scene at once
+- shade:     environment, emitter, and BRDF weighting
+- light:     next event estimation. A point on a light is sampled and
+             a shadow ray is traced. Combined with the BRDF sampled
+             emitter hit by multiple importance sampling (power
+             heuristic).
+- sample:    next direction on the hemisphere of each hit point
+- roulette:  Russian roulette termination by the path throughput
+- compact:   remove the terminated paths from the arrays
+"""
+
+import time, math
+import numpy
+
+from ifgi.base    import Sampler
+from ifgi.base.ILog import ILog
+from ifgi.scene   import Light, Primitive
+import RussianRoulette
+
+
+# ----------------------------------------------------------------------
+
+def build_onb_array(_w):
+    """build orthonormal bases from unit vectors (vectorized).
+
+    Branchless construction by Duff et al. 2017, "Building an
+    Orthonormal Basis, Revisited".
+
+    \param[in] _w unit vectors numpy.array (N,3)
+    \return (u, v) numpy.array (N,3) each. (u, v, _w) is right handed.
+    """
+    (wx, wy, wz) = (_w[:, 0], _w[:, 1], _w[:, 2])
+    sign = numpy.where(wz >= 0.0, 1.0, -1.0)
+    a = -1.0 / (sign + wz)
+    b = wx * wy * a
+    u = numpy.column_stack((1.0 + sign * wx * wx * a, sign * b, -sign * wx))
+    v = numpy.column_stack((b, sign + wy * wy * a, -wy))
+    return (u, v)
+
+# ----------------------------------------------------------------------
+
+class WavefrontStat(object):
+    """wavefront path tracer statistics. members are public.
+    """
+
+    def __init__(self):
+        """default constructor.
+        """
+        self.reset()
+
+
+    def reset(self):
+        """reset statistics.
+        """
+        self.frame_count      = 0
+        self.path_count       = 0
+        self.ray_count        = 0
+        self.shadow_ray_count = 0
+        self.trace_time_sec   = 0.0
+        # number of rays at each bounce
+        self.bounce_ray_count = []
+        # number of paths terminated by the Russian roulette at each bounce
+        self.bounce_rr_kill_count = []
+        # ray - mesh intersection counters
+        self.intersect = Primitive.IntersectStat()
+
+
+    def add_bounce(self, _bounce, _ray_count):
+        """add number of rays at a bounce.
+        \param[in] _bounce    bounce index (0: eye ray)
+        \param[in] _ray_count number of rays
+        """
+        while len(self.bounce_ray_count) <= _bounce:
+            self.bounce_ray_count.append(0)
+        self.bounce_ray_count[_bounce] += _ray_count
+        self.ray_count += _ray_count
+
+
+    def add_rr_kill(self, _bounce, _path_count):
+        """add number of paths terminated by the Russian roulette.
+        \param[in] _bounce     bounce index
+        \param[in] _path_count number of terminated paths
+        """
+        while len(self.bounce_rr_kill_count) <= _bounce:
+            self.bounce_rr_kill_count.append(0)
+        self.bounce_rr_kill_count[_bounce] += _path_count
+
+
+    def add_shadow_ray(self, _ray_count):
+        """add number of shadow rays.
+        \param[in] _ray_count number of rays
+        """
+        self.shadow_ray_count += _ray_count
+        self.ray_count        += _ray_count
+
+
+    def add(self, _other):
+        """add other statistics to this.
+        \param[in] _other other WavefrontStat
+        """
+        self.frame_count    += _other.frame_count
+        self.path_count     += _other.path_count
+        self.trace_time_sec += _other.trace_time_sec
+        for (bounce, ray_count) in enumerate(_other.bounce_ray_count):
+            self.add_bounce(bounce, ray_count)
+        for (bounce, path_count) in enumerate(_other.bounce_rr_kill_count):
+            self.add_rr_kill(bounce, path_count)
+        self.add_shadow_ray(_other.shadow_ray_count)
+        self.intersect.add(_other.intersect)
+
+
+    def __str__(self):
+        """human readable string.
+        """
+        ray_per_sec = 0.0
+        if self.trace_time_sec > 0.0:
+            ray_per_sec = self.ray_count / self.trace_time_sec
+
+        return '%d frames, %d paths, %d rays (%d shadow), %g [s], %g rays/s, ' \
+            'rays/bounce %s, roulette kills/bounce %s, intersect: %s' % \
+            (self.frame_count, self.path_count, self.ray_count, self.shadow_ray_count,
+             self.trace_time_sec, ray_per_sec, str(self.bounce_ray_count),
+             str(self.bounce_rr_kill_count), str(self.intersect))
+
+# ----------------------------------------------------------------------
+
+class WavefrontPathTracer(object):
+    """wavefront path tracer.
+
+    Only Lambert (DiffuseMaterial) surfaces and a constant
+    environment. The scene geometry and materials are looked up when
+    this is constructed, construct a new one when the scene changed.
+
+    The emitting geometries are the lights of the next event
+    estimation (see Light.LightRegistry). It is on when the scene has
+    a light, see set_light_sampling().
+
+    After a few bounces, the paths are terminated by the Russian
+    roulette (see set_russian_roulette()). The max path length is a
+    hard limit on top of it.
+
+    The random numbers are from the random number generator, or from
+    a pixel sampler (Sampler.PixelSamplerIF, e.g., Sobol), see
+    set_pixel_sampler(). The pixel sampler dimensions are
+    - SAMPLE_DIM_PIXEL:  pixel jitter (2)
+    - SAMPLE_DIM_LENS:   lens (2)
+    - SAMPLE_DIM_BOUNCE + SAMPLE_DIM_PER_BOUNCE * bounce: BRDF
+      direction (2), light point (2), light choice (1), Russian
+      roulette (1)
+    The sample index is the frame number.
+    """
+
+    # shadow ray stops this ratio before the light sample point
+    SHADOW_RAY_EPSILON = 1e-4
+
+    # pixel sampler dimension allocation
+    SAMPLE_DIM_PIXEL      = 0
+    SAMPLE_DIM_LENS       = 2
+    SAMPLE_DIM_BOUNCE     = 4
+    SAMPLE_DIM_PER_BOUNCE = 6
+
+    def __init__(self, _scene_geo_mat, _environment_mat, _max_path_length=10, _seed=0):
+        """constructor.
+
+        \param[in] _scene_geo_mat   SceneGeometryMaterialContainer
+        \param[in] _environment_mat environment material
+        \param[in] _max_path_length max path length
+        \param[in] _seed            random seed
+        """
+        super(WavefrontPathTracer, self).__init__()
+
+        self.__scene_geo_mat   = _scene_geo_mat
+        self.__max_path_length = _max_path_length
+        self.__rng = numpy.random.RandomState(_seed)
+        self.__hemisphere_sampler = Sampler.UnitHemisphereCosineSampler()
+        self.__disk_sampler  = Sampler.UnitDiskUniformSampler()
+        # None: the random number generator
+        self.__pixel_sampler = None
+        self.__lens_radius   = 0.0
+        self.__russian_roulette = RussianRoulette.RussianRoulette()
+        self.stat = WavefrontStat()
+        # intersection counters of the last render_frame()
+        self.__frame_intersect_stat = Primitive.IntersectStat()
+
+        self.__env_color = numpy.asarray(
+            _environment_mat.ambient_response(None, None, None, None), dtype=numpy.float64)
+        self.__channel_count = len(self.__env_color)
+        self.__setup_material_table()
+        self.__setup_face_frame()
+
+        self.__light_registry = Light.LightRegistry(_scene_geo_mat)
+        self.__is_light_sampling = self.__light_registry.can_sample()
+
+
+    def set_max_path_length(self, _max_path_length):
+        """set max path length.
+        \param[in] _max_path_length max path length
+        """
+        self.__max_path_length = _max_path_length
+
+
+    def get_max_path_length(self):
+        """get max path length.
+        \return max path length
+        """
+        return self.__max_path_length
+
+
+    def set_light_sampling(self, _is_light_sampling):
+        """set the next event estimation (explicit light sampling) on/off.
+
+        Without it, only the paths that hit an emitter by BRDF
+        sampling get the light. Both converge to the same image.
+
+        \param[in] _is_light_sampling light sampling on when True.
+        Ignored when the scene has no light.
+        """
+        self.__is_light_sampling = (_is_light_sampling and
+                                    self.__light_registry.can_sample())
+
+
+    def is_light_sampling(self):
+        """is the next event estimation on?
+        \return True when light sampling is on
+        """
+        return self.__is_light_sampling
+
+
+    def get_light_registry(self):
+        """get the light registry of the scene.
+        \return Light.LightRegistry
+        """
+        return self.__light_registry
+
+
+    def set_russian_roulette(self, _russian_roulette):
+        """set the Russian roulette path termination.
+
+        \param[in] _russian_roulette RussianRoulette.RussianRoulette.
+        None: no Russian roulette, only the max path length
+        terminates a path.
+        """
+        self.__russian_roulette = _russian_roulette
+
+
+    def get_russian_roulette(self):
+        """get the Russian roulette path termination.
+        \return RussianRoulette.RussianRoulette, None when off
+        """
+        return self.__russian_roulette
+
+
+    def set_pixel_sampler(self, _pixel_sampler):
+        """set the pixel sampler.
+
+        With a pixel sampler, the pixel positions are jittered and all
+        the sample dimensions come from it (see the class
+        document). Without (None), the eye rays go through the pixel
+        centers and the random number generator is used.
+
+        \param[in] _pixel_sampler Sampler.PixelSamplerIF or None
+        """
+        self.__pixel_sampler = _pixel_sampler
+
+
+    def get_pixel_sampler(self):
+        """get the pixel sampler.
+        \return Sampler.PixelSamplerIF, None when not set
+        """
+        return self.__pixel_sampler
+
+
+    def set_lens_radius(self, _lens_radius):
+        """set the lens (aperture) radius of the eye rays.
+        0 is a pinhole camera. See Camera.generate_rays().
+        \param[in] _lens_radius lens radius
+        """
+        self.__lens_radius = _lens_radius
+
+
+    def get_lens_radius(self):
+        """get the lens radius.
+        \return lens radius
+        """
+        return self.__lens_radius
+
+
+    def set_seed(self, _seed):
+        """set the random seed.
+        \param[in] _seed random seed (int or a sequence of int)
+        """
+        self.__rng.seed(_seed)
+
+
+    def get_rng(self):
+        """get the random number generator, e.g., to checkpoint its
+        state.
+        \return numpy.random.RandomState
+        """
+        return self.__rng
+
+
+    def render_frame(self, _camera, _film, _nframe):
+        """render one sample per pixel frame and blend it to the film.
+
+        An accumulation mode film accumulates the frame. Otherwise,
+        the film holds the mean of the frames, _nframe frames have
+        been blended before this one.
+
+        \param[in] _camera camera
+        \param[in] _film   film (ImageFilm) of the camera resolution
+        \param[in] _nframe frame number (0 is the first frame)
+        """
+        self.__frame_intersect_stat.reset()
+        self.render_tile(_camera, _film, _nframe,
+                         0, _camera.get_resolution_x() - 1,
+                         0, _camera.get_resolution_y() - 1)
+        self.stat.frame_count += 1
+
+
+    def get_frame_intersect_stat(self):
+        """get the intersection counters of the last frame, of
+        render_frame() or of a TileRenderer frame or adaptive pass.
+        stat.intersect accumulates all the frames.
+        \return Primitive.IntersectStat
+        """
+        return self.__frame_intersect_stat
+
+
+    def render_tile(self, _camera, _film, _nframe, _xstart, _xend, _ystart, _yend):
+        """render one sample per pixel of a tile and blend it to the film.
+
+        We render pixel index [_xstart, _xend], [_ystart, _yend].
+
+        \param[in] _camera camera
+        \param[in] _film   film (ImageFilm) of the camera resolution
+        \param[in] _nframe frame number (0 is the first frame)
+        \param[in] _xstart start of pixel x
+        \param[in] _xend   end   of pixel x (inclusive)
+        \param[in] _ystart start of pixel y
+        \param[in] _yend   end   of pixel y (inclusive)
+        """
+        fb = _film.get_framebuffer()
+        if (fb.shape[0] != _camera.get_resolution_x()) or \
+                (fb.shape[1] != _camera.get_resolution_y()):
+            raise StandardError, ('film resolution ' + str(fb.shape) +
+                                  ' does not match the camera resolution.')
+        if fb.shape[2] != self.__channel_count:
+            raise StandardError, ('film has ' + str(fb.shape[2]) + ' channels, but ' +
+                                  str(self.__channel_count) + ' expected.')
+
+        # pixel index of the framebuffer, x major
+        xsize = _xend - _xstart + 1
+        ysize = _yend - _ystart + 1
+        pixel_idx = \
+            numpy.repeat(numpy.arange(_xstart, _xend + 1), ysize) * fb.shape[1] + \
+            numpy.tile(numpy.arange(_ystart, _yend + 1), xsize)
+
+        (orig, vdir, min_t, max_t) = \
+            self.__generate_eye_ray(_camera, _xstart, _xend, _ystart, _yend,
+                                    pixel_idx, _nframe)
+        radiance = self.trace_path(orig, vdir, min_t, max_t, pixel_idx, _nframe)
+
+        tile = fb[_xstart:(_xend + 1), _ystart:(_yend + 1)]
+        if _film.is_accumulation():
+            _film.accumulate(radiance.reshape(tile.shape), (_xstart, _ystart))
+        else:
+            # running mean
+            tile *= float(_nframe)
+            tile += radiance.reshape(tile.shape)
+            tile /= float(_nframe) + 1.0
+
+
+    def trace_path(self, _orig, _dir, _min_t, _max_t, _pixel_idx=None, _sample_idx=0):
+        """trace paths of rays.
+
+        \param[in] _orig  ray origins numpy.array (R,3)
+        \param[in] _dir   ray directions numpy.array (R,3), normalized
+        \param[in] _min_t ray minimal distances numpy.array (R,)
+        \param[in] _max_t ray maximal distances numpy.array (R,)
+        \param[in] _pixel_idx  pixel index of the rays numpy.array
+        (R,) for the pixel sampler. None: use the random number
+        generator.
+        \param[in] _sample_idx sample index for the pixel sampler
+        \return radiance numpy.array (R, channels)
+        """
+        start_time = time.time()
+        intersect_stat = Primitive.IntersectStat()
+
+        ray_count  = _orig.shape[0]
+        radiance   = numpy.zeros((ray_count, self.__channel_count))
+        throughput = numpy.ones((ray_count, self.__channel_count))
+        path_idx   = numpy.arange(ray_count)
+        orig  = _orig
+        vdir  = _dir
+        min_t = _min_t
+        max_t = _max_t
+        # solid angle pdf of the ray direction. inf: eye ray, no MIS
+        dir_pdf = numpy.empty(ray_count)
+        dir_pdf.fill(numpy.inf)
+
+        for bounce in xrange(0, self.__max_path_length):
+            if len(path_idx) == 0:
+                break
+            self.stat.add_bounce(bounce, len(path_idx))
+
+            # intersect
+            (t, gi, fi) = self.__scene_geo_mat.ray_intersect_batch(orig, vdir, min_t, max_t,
+                                                                   intersect_stat)
+
+            # shade: missed paths get the environment and terminate
+            is_hit = (gi >= 0)
+            is_miss = ~is_hit
+            radiance[path_idx[is_miss]] += throughput[is_miss] * self.__env_color
+
+            # compact
+            path_idx   = path_idx[is_hit]
+            throughput = throughput[is_hit]
+            orig  = orig[is_hit]
+            vdir  = vdir[is_hit]
+            min_t = min_t[is_hit]
+            max_t = max_t[is_hit]
+            dir_pdf = dir_pdf[is_hit]
+            t  = t[is_hit]
+            gi = gi[is_hit]
+            fi = fi[is_hit]
+
+            # shade: emitter terminates the path
+            mat_idx = self.__geo_mat_idx[gi]
+            is_emit = self.__mat_is_emit[mat_idx]
+            if is_emit.any():
+                emit = throughput[is_emit] * self.__mat_emit[mat_idx[is_emit]]
+                if self.__is_light_sampling:
+                    emit *= self.__get_emitter_mis_weight(
+                        vdir[is_emit], t[is_emit], gi[is_emit], fi[is_emit],
+                        dir_pdf[is_emit])[:, numpy.newaxis]
+                radiance[path_idx[is_emit]] += emit
+
+            # compact
+            is_alive   = ~is_emit
+            path_idx   = path_idx[is_alive]
+            throughput = throughput[is_alive]
+            orig  = orig[is_alive]
+            vdir  = vdir[is_alive]
+            min_t = min_t[is_alive]
+            max_t = max_t[is_alive]
+            t  = t[is_alive]
+            albedo = self.__mat_albedo[mat_idx[is_alive]]
+            fi = fi[is_alive] + self.__geo_face_offset[gi[is_alive]]
+
+            # hit point and the face frame (u, v, normal) facing to
+            # the incoming side
+            orig   = orig + t[:, numpy.newaxis] * vdir
+            normal = self.__face_normal[fi]
+            frame_v = self.__face_frame_v[fi]
+            is_back = (numpy.einsum('ij,ij->i', normal, vdir) > 0.0)
+            normal[is_back]  *= -1.0
+            frame_v[is_back] *= -1.0
+
+            # light: the light path of length bounce + 2
+            dim = WavefrontPathTracer.SAMPLE_DIM_BOUNCE + \
+                WavefrontPathTracer.SAMPLE_DIM_PER_BOUNCE * bounce
+            if self.__is_light_sampling and (bounce + 1 < self.__max_path_length):
+                u_light = self.__get_uniform_sample(len(path_idx), _pixel_idx, path_idx,
+                                                    _sample_idx, dim + 2, 3)
+                # (light choice, light point)
+                u_light = u_light[:, [2, 0, 1]]
+                self.__add_light_sample(radiance, path_idx, throughput * albedo,
+                                        orig, normal, min_t, u_light, intersect_stat)
+
+            # sample: next direction on the hemisphere facing to the
+            # incoming side
+            u_dir = self.__get_uniform_sample(len(path_idx), _pixel_idx, path_idx,
+                                              _sample_idx, dim, 2)
+            local = self.__hemisphere_sampler.warp_sample_array(u_dir)
+            vdir  = local[:, 0:1] * self.__face_frame_u[fi] + local[:, 1:2] * frame_v + \
+                local[:, 2:3] * normal
+            dir_pdf = self.__hemisphere_sampler.get_pdf_array(local)
+
+            # shade: Lambert brdf * cos / pdf. The sampler is cosine
+            # weighted (pdf = cos/pi), this is the albedo.
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                cos_pdf = local[:, 2] / (math.pi * dir_pdf)
+            cos_pdf[dir_pdf <= 0.0] = 0.0
+            throughput *= albedo * cos_pdf[:, numpy.newaxis]
+
+            # roulette: terminate the low throughput paths. The
+            # survivors are weighted by 1/(survival probability).
+            if (self.__russian_roulette != None) and \
+                    (bounce + 1 >= self.__russian_roulette.get_min_depth()) and \
+                    (bounce + 1 < self.__max_path_length):
+                u_rr = self.__get_uniform_sample(len(path_idx), _pixel_idx, path_idx,
+                                                 _sample_idx, dim + 5, 1)[:, 0]
+                (is_alive, weight) = \
+                    self.__russian_roulette.apply_array(bounce + 1, throughput, u_rr)
+                self.stat.add_rr_kill(bounce + 1, len(path_idx) - is_alive.sum())
+                path_idx   = path_idx[is_alive]
+                throughput = throughput[is_alive] * weight[is_alive, numpy.newaxis]
+                orig  = orig[is_alive]
+                vdir  = vdir[is_alive]
+                min_t = min_t[is_alive]
+                max_t = max_t[is_alive]
+                dir_pdf = dir_pdf[is_alive]
+
+        # the remaining paths reached the max path length, no contribution.
+        self.stat.path_count     += ray_count
+        self.stat.trace_time_sec += time.time() - start_time
+        self.stat.intersect.add(intersect_stat)
+        self.__frame_intersect_stat.add(intersect_stat)
+
+        return radiance
+
+
+    def print_stat(self):
+        """print statistics.
+        """
+        ILog.info('wavefront path tracer: ' + str(self.stat))
+
+
+    # private: ------------------------------------------------------------
+
+    def __get_uniform_sample(self, _count, _pixel_idx, _path_idx, _sample_idx,
+                             _dim, _dim_count):
+        """get uniform samples from the pixel sampler or the random
+        number generator.
+
+        \param[in] _count      number of samples
+        \param[in] _pixel_idx  pixel index of all the paths (None: random
+        number generator)
+        \param[in] _path_idx   path index of each sample
+        \param[in] _sample_idx sample index
+        \param[in] _dim        the first dimension
+        \param[in] _dim_count  number of dimensions
+        \return samples in [0,1) numpy.array (_count, _dim_count)
+        """
+        if (self.__pixel_sampler == None) or (_pixel_idx is None):
+            return self.__rng.random_sample((_count, _dim_count))
+        return self.__pixel_sampler.get_sample_array(_pixel_idx[_path_idx], _sample_idx,
+                                                     _dim, _dim_count)
+
+
+    def __add_light_sample(self, _radiance, _path_idx, _albedo_throughput,
+                           _pos, _normal, _min_t, _u, _stat):
+        """next event estimation: add the light through a sampled light
+        point to the radiance.
+
+        \param[in,out] _radiance       radiance of all the paths
+        \param[in] _path_idx           path index of each hit point
+        \param[in] _albedo_throughput  throughput x albedo of each hit point
+        \param[in] _pos                hit points numpy.array (N,3)
+        \param[in] _normal             unit normals facing to the
+        incoming side numpy.array (N,3)
+        \param[in] _min_t              ray minimal distances numpy.array (N,)
+        \param[in] _u                  uniform samples (light choice,
+        light point) numpy.array (N,3)
+        \param[in] _stat               Primitive.IntersectStat of the
+        shadow rays
+        """
+        hit_count = len(_path_idx)
+        if hit_count == 0:
+            return
+        (light_pos, light_normal, light_emit, pdf_area, light_idx) = \
+            self.__light_registry.warp_sample_array(_u)
+
+        to_light = light_pos - _pos
+        dist2 = numpy.einsum('ij,ij->i', to_light, to_light)
+        dist  = numpy.sqrt(dist2)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            ldir = to_light / dist[:, numpy.newaxis]
+            cos_hit   = numpy.einsum('ij,ij->i', _normal, ldir)
+            cos_light = numpy.abs(numpy.einsum('ij,ij->i', light_normal, ldir))
+        is_valid = (cos_hit > 0.0) & (cos_light > 0.0) & (pdf_area > 0.0) & \
+            (dist > _min_t)
+        valid_idx = numpy.nonzero(is_valid)[0]
+        if len(valid_idx) == 0:
+            return
+
+        # shadow ray
+        shadow_max_t = dist[valid_idx] * (1.0 - WavefrontPathTracer.SHADOW_RAY_EPSILON)
+        is_occluded = self.__scene_geo_mat.occluded_batch(
+            _pos[valid_idx], ldir[valid_idx], _min_t[valid_idx], shadow_max_t,
+            _stat)
+        self.stat.add_shadow_ray(len(valid_idx))
+        valid_idx = valid_idx[~is_occluded]
+        if len(valid_idx) == 0:
+            return
+
+        # Lambert brdf = albedo/pi. G = cos_hit cos_light / dist^2
+        cos_hit   = cos_hit[valid_idx]
+        cos_light = cos_light[valid_idx]
+        dist2     = dist2[valid_idx]
+        pdf_area  = pdf_area[valid_idx]
+        light_pdf = pdf_area * dist2 / cos_light
+        brdf_pdf  = cos_hit * (1.0 / math.pi)
+        weight = (light_pdf * light_pdf) / (light_pdf * light_pdf + brdf_pdf * brdf_pdf)
+        scale  = weight * cos_hit * cos_light / (math.pi * dist2 * pdf_area)
+        _radiance[_path_idx[valid_idx]] += \
+            _albedo_throughput[valid_idx] * light_emit[valid_idx] * scale[:, numpy.newaxis]
+
+
+    def __get_emitter_mis_weight(self, _dir, _t, _geo_idx, _face_idx, _dir_pdf):
+        """MIS weight (power heuristic) of BRDF sampled emitter hits.
+
+        \param[in] _dir      ray directions numpy.array (N,3)
+        \param[in] _t        hit distances numpy.array (N,)
+        \param[in] _geo_idx  hit geometry indices numpy.array (N,)
+        \param[in] _face_idx hit face indices numpy.array (N,)
+        \param[in] _dir_pdf  solid angle pdf of the ray directions. inf:
+        the ray is not BRDF sampled (eye ray).
+        \return weight numpy.array (N,)
+        """
+        light_idx = self.__light_registry.get_light_index(_geo_idx, _face_idx)
+        normal = self.__face_normal[_face_idx + self.__geo_face_offset[_geo_idx]]
+        cos_light = numpy.abs(numpy.einsum('ij,ij->i', normal, _dir))
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            light_pdf = self.__light_registry.get_pdf_area(light_idx) * _t * _t / cos_light
+            weight = (_dir_pdf * _dir_pdf) / (_dir_pdf * _dir_pdf + light_pdf * light_pdf)
+        weight[numpy.isinf(_dir_pdf)] = 1.0
+        weight[~numpy.isfinite(weight)] = 1.0
+        return weight
+
+
+    def __generate_eye_ray(self, _camera, _xstart, _xend, _ystart, _yend,
+                           _pixel_idx, _sample_idx):
+        """generate the eye rays of a tile.
+
+        The ray order is the framebuffer order (x major). Without a
+        pixel sampler, the rays go through the pixel centers.
+
+        \param[in] _camera camera
+        \param[in] _xstart start of pixel x
+        \param[in] _xend   end   of pixel x (inclusive)
+        \param[in] _ystart start of pixel y
+        \param[in] _yend   end   of pixel y (inclusive)
+        \param[in] _pixel_idx  pixel index of the rays
+        \param[in] _sample_idx sample index
+        \return (origin, direction, min_t, max_t) arrays
+        """
+        jitter_xy = None
+        lens_uv   = None
+        if self.__pixel_sampler != None:
+            jitter_xy = self.__pixel_sampler.get_sample_array(
+                _pixel_idx, _sample_idx, WavefrontPathTracer.SAMPLE_DIM_PIXEL, 2)
+        if self.__lens_radius > 0.0:
+            u_lens = self.__get_uniform_sample(len(_pixel_idx), _pixel_idx,
+                                               numpy.arange(len(_pixel_idx)), _sample_idx,
+                                               WavefrontPathTracer.SAMPLE_DIM_LENS, 2)
+            lens_uv = self.__disk_sampler.warp_sample_array(u_lens)
+        (orig, vdir) = _camera.generate_tile_rays(_xstart, _xend, _ystart, _yend,
+                                                  jitter_xy, lens_uv, self.__lens_radius)
+        ray_count = orig.shape[0]
+        min_t = numpy.empty(ray_count)
+        min_t.fill(_camera.get_z_near())
+        max_t = numpy.empty(ray_count)
+        max_t.fill(_camera.get_z_far())
+
+        return (orig, vdir, min_t, max_t)
+
+
+    def __setup_material_table(self):
+        """set up the per material and per geometry tables.
+        """
+        mat_list = self.__scene_geo_mat.material_list
+        mat_count = len(mat_list)
+        self.__mat_albedo  = numpy.zeros((mat_count, self.__channel_count))
+        self.__mat_emit    = numpy.zeros((mat_count, self.__channel_count))
+        self.__mat_is_emit = numpy.zeros(mat_count, dtype=bool)
+        for (mi, mat) in enumerate(mat_list):
+            if mat.get_classname() != 'DiffuseMaterial':
+                continue
+            self.__mat_albedo[mi] = mat.get_texture().value(None, None)
+            if mat.is_emit():
+                self.__mat_is_emit[mi] = True
+                self.__mat_emit[mi] = mat.emit_radiance(None, None, None, None)
+
+        geo_dict_list = self.__scene_geo_mat.geometry_dict_list
+        self.__geo_mat_idx = numpy.zeros(len(geo_dict_list), dtype=numpy.int32)
+        for (gi, geo_dict) in enumerate(geo_dict_list):
+            mi = geo_dict['TriMesh'].material_index
+            if mat_list[mi].get_classname() != 'DiffuseMaterial':
+                raise StandardError, ('geometry [' + geo_dict['geo_name'] +
+                                      '] material is not supported: ' +
+                                      mat_list[mi].get_classname())
+            self.__geo_mat_idx[gi] = mi
+
+
+    def __setup_face_frame(self):
+        """set up the face frames (TriMesh.face_frame_*) of all the
+        geometries.
+
+        The unit normals of geometry gi are
+        __face_normal[__geo_face_offset[gi]:__geo_face_offset[gi+1]],
+        the same for __face_frame_u and __face_frame_v.
+        """
+        u_list = [numpy.zeros((0, 3))]
+        v_list = [numpy.zeros((0, 3))]
+        w_list = [numpy.zeros((0, 3))]
+        face_offset = [0]
+        for geo_dict in self.__scene_geo_mat.geometry_dict_list:
+            tmesh = geo_dict['TriMesh']
+            u_list.append(tmesh.face_frame_u)
+            v_list.append(tmesh.face_frame_v)
+            w_list.append(tmesh.face_frame_w)
+            face_offset.append(face_offset[-1] + len(tmesh.face_frame_w))
+
+        self.__face_frame_u = numpy.vstack(u_list)
+        self.__face_frame_v = numpy.vstack(v_list)
+        self.__face_normal  = numpy.vstack(w_list)
+        self.__geo_face_offset = numpy.array(face_offset, dtype=numpy.int32)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for AdaptiveSampling
+#
+
+"""test IFGI AdaptiveSampling"""
+
+import unittest
+import numpy
+
+from ifgi.scene import Film
+import AdaptiveSampling, WavefrontPathTracer, TileRenderer
+from test_WavefrontPathTracer import create_cornel_box_scene
+
+
+class TestAdaptiveSampling(unittest.TestCase):
+    """test for AdaptiveSampling"""
+
+    def test_create_tile_list(self):
+        """create_tile_list: the tiles cover the image"""
+        tile_list = AdaptiveSampling.create_tile_list(7, 5, 3)
+        self.assertEquals(len(tile_list), 3 * 2)
+        cover = numpy.zeros((7, 5), dtype=numpy.int32)
+        for (xstart, xend, ystart, yend) in tile_list:
+            cover[xstart:(xend + 1), ystart:(yend + 1)] += 1
+        assert((cover == 1).all())
+        self.assertRaises(StandardError, AdaptiveSampling.create_tile_list, 7, 5, 0)
+
+
+    def test_active_tile(self):
+        """active tiles: a noisy tile samples until the max count, a
+        flat tile stops after the min count"""
+        adaptive = AdaptiveSampling.AdaptiveSampling(0.05, 4, 16)
+        film = Film.ImageFilm((4, 2, 4), 'RGBA', False, True, True)
+        # tile 0: x in [0,1] noisy, tile 1: x in [2,3] flat
+        tile_list = AdaptiveSampling.create_tile_list(4, 2, 2)
+        rng = numpy.random.RandomState(0)
+
+        pass_count = 0
+        while True:
+            active_list = adaptive.get_active_tile_list(film, tile_list)
+            if len(active_list) == 0:
+                break
+            adaptive.add_pass(tile_list, active_list)
+            for tile_idx in active_list:
+                (xstart, xend, ystart, yend) = tile_list[tile_idx]
+                tile = numpy.ones((xend - xstart + 1, yend - ystart + 1, 4))
+                if xstart == 0:
+                    tile *= 10.0 * rng.random_sample(tile.shape)
+                film.accumulate(tile, (xstart, ystart))
+            pass_count += 1
+
+        count = film.get_sample_count_buffer()
+        assert((count[0:2] == 16).all())
+        assert((count[2:4] == 4).all())
+        assert(adaptive.is_converged(film, tile_list))
+        self.assertEquals(pass_count, 16)
+        self.assertEquals(adaptive.stat.pass_count, 16)
+        self.assertEquals(adaptive.stat.tile_sample_count, 16 + 4)
+        self.assertEquals(adaptive.stat.pixel_sample_count, count.sum())
+
+        self.assertRaises(StandardError, AdaptiveSampling.AdaptiveSampling, 0.05, 1, 16)
+        self.assertRaises(StandardError, AdaptiveSampling.AdaptiveSampling, -1.0)
+
+
+    def test_tile_renderer_adaptive(self):
+        """tile renderer: zero threshold is the same as the uniform
+        frames, a threshold stops the converged tiles early"""
+        image_size = 8
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(image_size)
+        fb_list = []
+        for is_adaptive in [False, True]:
+            film = Film.ImageFilm((image_size, image_size, 4), 'RGBA', False, True, True)
+            wpt  = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4)
+            tile_renderer = TileRenderer.TileRenderer(wpt, cam, film, 1, 4)
+            tile_renderer.start()
+            try:
+                if is_adaptive:
+                    adaptive = AdaptiveSampling.AdaptiveSampling(0.0, 3, 3)
+                    self.assertEquals(tile_renderer.render_adaptive(adaptive), 3)
+                else:
+                    for nframe in xrange(3):
+                        tile_renderer.render_frame(nframe)
+            finally:
+                tile_renderer.stop()
+            fb_list.append(film.get_framebuffer().copy())
+        assert(fb_list[0].max() > 0.0)
+        assert((fb_list[0] == fb_list[1]).all())
+
+        # a loose threshold: some tiles stop before the max sample count
+        film = Film.ImageFilm((image_size, image_size, 4), 'RGBA', False, True, True)
+        wpt  = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4)
+        tile_renderer = TileRenderer.TileRenderer(wpt, cam, film, 1, 2)
+        adaptive = AdaptiveSampling.AdaptiveSampling(0.3, 2, 32, 0.1)
+        tile_renderer.start()
+        try:
+            pass_count = tile_renderer.render_adaptive(adaptive)
+        finally:
+            tile_renderer.stop()
+        count = film.get_sample_count_buffer()
+        self.assertEquals(pass_count, count.max())
+        self.assertEquals(adaptive.stat.pixel_sample_count, count.sum())
+        assert(count.min() < count.max())
+        assert(count.sum() < 32 * image_size * image_size)
+        assert(adaptive.is_converged(film, tile_renderer.get_tile_list()))
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestAdaptiveSampling)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for Checkpoint
+#
+
+"""test IFGI Checkpoint"""
+
+import unittest
+import os, random, tempfile, shutil
+import numpy
+
+from ifgi.scene import Film
+import Checkpoint, WavefrontPathTracer
+import test_WavefrontPathTracer
+
+
+class TestCheckpoint(unittest.TestCase):
+    """test for Checkpoint"""
+
+    def setUp(self):
+        """create a temporary directory"""
+        self.tmpdir = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        """remove the temporary directory"""
+        shutil.rmtree(self.tmpdir)
+
+
+    def test_rng_state(self):
+        """rng state: numpy and python generators are restored"""
+        np_rng = numpy.random.RandomState(3)
+        np_rng.normal()         # has a cached gauss
+        py_rng = random.Random(4)
+        py_rng.gauss(0.0, 1.0)
+        array_dict = {}
+        array_dict.update(Checkpoint.get_rng_state_array_dict('np', np_rng))
+        array_dict.update(Checkpoint.get_rng_state_array_dict('py', py_rng))
+        np_ref = np_rng.normal(size=5)
+        py_ref = [py_rng.gauss(0.0, 1.0) for i in xrange(5)]
+
+        Checkpoint.set_rng_state_array_dict('np', np_rng, array_dict)
+        Checkpoint.set_rng_state_array_dict('py', py_rng, array_dict)
+        assert((np_rng.normal(size=5) == np_ref).all())
+        self.assertEquals([py_rng.gauss(0.0, 1.0) for i in xrange(5)], py_ref)
+
+
+    def test_checkpoint_resume(self):
+        """checkpoint: a resumed render is the same as an uninterrupted one"""
+        image_size = 8
+        (scene_geo_mat, cam, env_mat) = \
+            test_WavefrontPathTracer.create_cornel_box_scene(image_size)
+        scene_hash = Checkpoint.compute_scene_hash(scene_geo_mat, cam)
+        fname = os.path.join(self.tmpdir, 'render.ckpt')
+
+        # uninterrupted
+        ref_film = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+        wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4, 0)
+        for nframe in xrange(4):
+            wpt.render_frame(cam, ref_film, nframe)
+
+        # interrupted after frame 2
+        film = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+        wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4, 0)
+        ckpt = Checkpoint.RenderCheckpoint(fname, scene_hash, 2)
+        self.assertEquals(ckpt.restore(film, {'wpt': wpt.get_rng()}), 0)
+        for nframe in xrange(3):
+            wpt.render_frame(cam, film, nframe)
+            is_written = ckpt.update(film, nframe + 1, {'wpt': wpt.get_rng()})
+            self.assertEquals(is_written, nframe == 1)
+        self.assertEquals(os.listdir(self.tmpdir), ['render.ckpt'])
+
+        # resume
+        film = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+        wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4, 1)
+        ckpt = Checkpoint.RenderCheckpoint(fname, scene_hash, 2)
+        start_frame = ckpt.restore(film, {'wpt': wpt.get_rng()})
+        self.assertEquals(start_frame, 2)
+        for nframe in xrange(start_frame, 4):
+            wpt.render_frame(cam, film, nframe)
+        assert((film.get_framebuffer() == ref_film.get_framebuffer()).all())
+
+        # a completed render removes the checkpoint
+        ckpt.remove()
+        self.assertEquals(os.listdir(self.tmpdir), [])
+        ckpt.remove()
+
+
+    def test_checkpoint_second_moment(self):
+        """checkpoint: the sample count and the second moment buffers
+        are restored"""
+        fname = os.path.join(self.tmpdir, 'render.ckpt')
+        film = Film.ImageFilm((3, 2, 4), 'RGBA', False, True, True)
+        film.accumulate(numpy.random.RandomState(0).random_sample((3, 2, 4)))
+        film.accumulate(numpy.ones((1, 2, 4)), (1, 0))
+        assert(Checkpoint.write_checkpoint(fname, 'scene', 2, film))
+
+        restored = Film.ImageFilm((3, 2, 4), 'RGBA', False, True, True)
+        self.assertEquals(Checkpoint.restore_checkpoint(fname, 'scene', restored)[0], 2)
+        for name in ['get_framebuffer', 'get_sample_count_buffer', 'get_second_moment_buffer']:
+            assert((getattr(restored, name)() == getattr(film, name)()).all())
+
+        # a film without the second moment is another film
+        other_film = Film.ImageFilm((3, 2, 4), 'RGBA', False, True)
+        self.assertEquals(Checkpoint.restore_checkpoint(fname, 'scene', other_film), (0, 0.0))
+
+
+    def test_checkpoint_reject(self):
+        """checkpoint: another scene, another film, and a broken file
+        are not restored"""
+        image_size = 4
+        (scene_geo_mat, cam, env_mat) = \
+            test_WavefrontPathTracer.create_cornel_box_scene(image_size)
+        scene_hash = Checkpoint.compute_scene_hash(scene_geo_mat, cam)
+        fname = os.path.join(self.tmpdir, 'render.ckpt')
+        film = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+        film.get_framebuffer().fill(0.5)
+        assert(Checkpoint.write_checkpoint(fname, scene_hash, 3, film))
+        self.assertEquals(Checkpoint.restore_checkpoint(fname, scene_hash, film)[0], 3)
+
+        # another camera
+        cam.set_resolution_x(2 * image_size)
+        assert(Checkpoint.compute_scene_hash(scene_geo_mat, cam) != scene_hash)
+        self.assertEquals(Checkpoint.read_checkpoint(fname, 'other'), None)
+
+        # another film
+        other_film = Film.ImageFilm((image_size, 2 * image_size, 4), 'RGBA')
+        self.assertEquals(Checkpoint.restore_checkpoint(fname, scene_hash, other_film), (0, 0.0))
+        assert((other_film.get_framebuffer() == 0.0).all())
+
+        # missing rng
+        self.assertEquals(Checkpoint.restore_checkpoint(fname, scene_hash, film,
+                                                        {'wpt': numpy.random.RandomState()}),
+                          (0, 0.0))
+
+        # broken file
+        with open(fname, 'r+b') as f:
+            f.truncate(os.path.getsize(fname) / 2)
+        self.assertEquals(Checkpoint.read_checkpoint(fname, scene_hash), None)
+        self.assertEquals(Checkpoint.read_checkpoint(fname + '.none', scene_hash), None)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestCheckpoint)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2011 Yamauchi, Hitoshi
+#
+# test for RussianRoulette
+#
+
+"""test IFGI RussianRoulette"""
+
+import unittest
+import numpy
+
+import RussianRoulette
+
+
+class TestRussianRoulette(unittest.TestCase):
+    """test for RussianRoulette"""
+
+    def test_survival_prob(self):
+        """survival probability: min depth, color channels, and bounds"""
+        rr = RussianRoulette.RussianRoulette(2, 0.1, 0.9)
+        self.assertEquals(rr.get_min_depth(), 2)
+        self.assertEquals(rr.get_survival_prob_bound(), (0.1, 0.9))
+
+        # alpha is not a color
+        throughput = numpy.array([[0.5, 0.2, 0.3, 1.0],
+                                  [0.0, 0.0, 0.01, 1.0],
+                                  [2.0, 0.0, 0.0, 1.0]])
+        assert((rr.get_survival_prob_array(1, throughput) == 1.0).all())
+        prob = rr.get_survival_prob_array(2, throughput)
+        assert(numpy.allclose(prob, [0.5, 0.1, 0.9]))
+
+        self.assertRaises(StandardError, rr.set_survival_prob_bound, 0.0, 0.5)
+        self.assertRaises(StandardError, rr.set_survival_prob_bound, 0.6, 0.5)
+        self.assertRaises(StandardError, rr.set_survival_prob_bound, 0.5, 1.5)
+
+
+    def test_unbiased(self):
+        """roulette: the weighted survivors have the same expectation"""
+        rr = RussianRoulette.RussianRoulette(0)
+        rng = numpy.random.RandomState(0)
+        sample_count = 100000
+        throughput = numpy.tile([0.2, 0.1, 0.05, 1.0], (sample_count, 1))
+        (is_survive, weight) = rr.apply_array(0, throughput, rng.random_sample(sample_count))
+        assert(abs(is_survive.mean() - 0.2) < 0.01)
+        est = numpy.where(is_survive, weight, 0.0)[:, numpy.newaxis] * throughput
+        assert(numpy.allclose(est.mean(axis=0)[0:3], [0.2, 0.1, 0.05], rtol=0.05))
+
+        # one path version
+        self.assertEquals(rr.apply(0, throughput[0], 0.1), 5.0)
+        self.assertEquals(rr.apply(0, throughput[0], 0.3), 0.0)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestRussianRoulette)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
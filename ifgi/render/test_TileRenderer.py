@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for TileRenderer
+#
+
+"""test IFGI TileRenderer"""
+
+import unittest
+import numpy
+
+from ifgi.scene import Film
+import WavefrontPathTracer, TileRenderer
+from test_WavefrontPathTracer import create_cornel_box_scene
+
+
+def render_cornel_box(_image_size, _worker_count, _tile_size, _frame_count):
+    """render the cornel box by the tile renderer
+    \return (framebuffer, WavefrontStat, list of the per frame
+    intersection ray counts)
+    """
+    (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(_image_size)
+    film = Film.ImageFilm((_image_size, _image_size, 4), 'RGBA', True)
+    wpt  = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4)
+
+    tile_renderer = TileRenderer.TileRenderer(wpt, cam, film, _worker_count, _tile_size)
+    frame_ray_count_list = []
+    tile_renderer.start()
+    try:
+        for nframe in xrange(_frame_count):
+            tile_renderer.render_frame(nframe)
+            frame_ray_count_list.append(wpt.get_frame_intersect_stat().ray_count)
+    finally:
+        tile_renderer.stop()
+
+    return (film.get_framebuffer().copy(), wpt.stat, frame_ray_count_list)
+
+
+class TestTileRenderer(unittest.TestCase):
+    """test for TileRenderer"""
+
+    def test_tile_list(self):
+        """tile list covers the film once"""
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(10)
+        film = Film.ImageFilm((10, 10, 4), 'RGBA')
+        wpt  = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat)
+        tile_renderer = TileRenderer.TileRenderer(wpt, cam, film, 1, 4)
+
+        count = numpy.zeros((10, 10), dtype=numpy.int32)
+        for (xs, xe, ys, ye) in tile_renderer.get_tile_list():
+            count[xs:(xe + 1), ys:(ye + 1)] += 1
+        assert((count == 1).all())
+        self.assertEquals(len(tile_renderer.get_tile_list()), 9)
+
+
+    def test_non_shared_film(self):
+        """multi process needs a shared film"""
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(4)
+        film = Film.ImageFilm((4, 4, 4), 'RGBA')
+        wpt  = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat)
+        self.assertRaises(StandardError, TileRenderer.TileRenderer, wpt, cam, film, 2)
+
+
+    def test_worker_count_independent(self):
+        """the result does not depend on the worker count"""
+        (fb1, stat1, frame_ray_count1) = render_cornel_box(12, 1, 5, 2)
+        (fb2, stat2, frame_ray_count2) = render_cornel_box(12, 2, 5, 2)
+
+        assert(fb1.max() > 0.0)
+        assert(numpy.allclose(fb1, fb2))
+        self.assertEquals(stat1.frame_count, 2)
+        self.assertEquals(stat2.frame_count, 2)
+        self.assertEquals(stat2.path_count, 2 * 12 * 12)
+        self.assertEquals(stat1.bounce_ray_count, stat2.bounce_ray_count)
+
+        # per frame intersection counters: each frame, not accumulated
+        self.assertEquals(frame_ray_count1, frame_ray_count2)
+        assert(0 < frame_ray_count1[1] < stat1.intersect.ray_count)
+        self.assertEquals(sum(frame_ray_count1), stat1.intersect.ray_count)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestTileRenderer)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
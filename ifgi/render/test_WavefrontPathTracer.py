@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for WavefrontPathTracer
+#
+
+"""test IFGI WavefrontPathTracer"""
+
+import unittest
+import numpy
+
+from ifgi.base  import Sampler
+from ifgi.scene import SceneGraph, SceneUtil, IfgiSceneReader, Film
+import WavefrontPathTracer
+
+
+def create_cornel_box_scene(_image_size):
+    """create the cornel box scene for the test
+    \param[in] _image_size image x and y size
+    \return (scene geometry material container, camera, environment material)
+    """
+    ifgireader = IfgiSceneReader.IfgiSceneReader()
+    if(not ifgireader.read('../../sampledata/cornel_box.ifgi')):
+        raise StandardError, ('load cornel_box.ifgi failed.')
+
+    scenegraph = SceneGraph.create_ifgi_scenegraph(ifgireader)
+    scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+    scene_geo_mat.append_ifgi_data(ifgireader)
+
+    cur_cam = scenegraph.get_current_camera()
+    cur_cam.set_config_dict(ifgireader.camera_dict_dict['default'])
+    cur_cam.set_resolution_x(_image_size)
+    cur_cam.set_resolution_y(_image_size)
+
+    env_idx = scene_geo_mat.material_name_idx_dict['default_env']
+    env_mat = scene_geo_mat.material_list[env_idx]
+
+    return (scene_geo_mat, cur_cam, env_mat)
+
+
+class TestWavefrontPathTracer(unittest.TestCase):
+    """test for WavefrontPathTracer"""
+
+    def test_build_onb_array(self):
+        """build_onb_array: orthonormal right handed bases"""
+        rng = numpy.random.RandomState(0)
+        w = rng.normal(size=(100, 3))
+        w[0] = [0.0, 0.0,  1.0]
+        w[1] = [0.0, 0.0, -1.0]
+        w /= numpy.sqrt((w * w).sum(axis=1))[:, numpy.newaxis]
+
+        (u, v) = WavefrontPathTracer.build_onb_array(w)
+        for (a, b) in [(u, u), (v, v)]:
+            assert(numpy.allclose((a * b).sum(axis=1), 1.0))
+        for (a, b) in [(u, v), (u, w), (v, w)]:
+            assert(numpy.allclose((a * b).sum(axis=1), 0.0))
+        assert(numpy.allclose(numpy.cross(u, v), w))
+
+
+    def test_trace_path_environment(self):
+        """trace_path: a ray out of the scene gets the environment color"""
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(4)
+        wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat)
+
+        orig  = numpy.array([[278.0, 273.0, -800.0]])
+        vdir  = numpy.array([[0.0, 0.0, -1.0]])
+        radiance = wpt.trace_path(orig, vdir, numpy.array([0.1]), numpy.array([10000.0]))
+        env_col = env_mat.ambient_response(None, None, None, None)
+        assert(numpy.allclose(radiance[0], env_col))
+        self.assertEquals(wpt.stat.bounce_ray_count, [1])
+
+
+    def test_trace_path_light_sampling(self):
+        """trace_path: light sampling has the same mean and less variance"""
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(4)
+        ray_count = 20000
+        # direct light of a floor point
+        orig  = numpy.tile([278.0, 273.0, -800.0], (ray_count, 1))
+        vdir  = numpy.tile([172.0, -273.0, 900.0], (ray_count, 1))
+        vdir /= numpy.linalg.norm(vdir[0])
+        min_t = numpy.empty(ray_count)
+        min_t.fill(0.1)
+        max_t = numpy.empty(ray_count)
+        max_t.fill(10000.0)
+
+        result = []
+        for is_light_sampling in [False, True]:
+            wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 2, 0)
+            wpt.set_light_sampling(is_light_sampling)
+            self.assertEquals(wpt.is_light_sampling(), is_light_sampling)
+            radiance = wpt.trace_path(orig, vdir, min_t, max_t)[:, 0]
+            result.append((radiance.mean(), radiance.std()))
+            self.assertEquals(wpt.stat.shadow_ray_count > 0, is_light_sampling)
+
+        (bsdf_mean, bsdf_std) = result[0]
+        (nee_mean,  nee_std)  = result[1]
+        assert(abs(nee_mean - bsdf_mean) < 0.15 * bsdf_mean)
+        assert(nee_std < 0.5 * bsdf_std)
+
+
+    def test_trace_path_russian_roulette(self):
+        """trace_path: Russian roulette has the same mean and less rays"""
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(4)
+        ray_count = 20000
+        orig  = numpy.tile([278.0, 273.0, -800.0], (ray_count, 1))
+        vdir  = numpy.tile([172.0, -273.0, 900.0], (ray_count, 1))
+        vdir /= numpy.linalg.norm(vdir[0])
+        min_t = numpy.empty(ray_count)
+        min_t.fill(0.1)
+        max_t = numpy.empty(ray_count)
+        max_t.fill(10000.0)
+
+        result = []
+        for is_rr in [False, True]:
+            wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 12, 0)
+            if not is_rr:
+                wpt.set_russian_roulette(None)
+            radiance = wpt.trace_path(orig, vdir, min_t, max_t)[:, 0]
+            result.append((radiance.mean(), wpt.stat.ray_count))
+            self.assertEquals(sum(wpt.stat.bounce_rr_kill_count) > 0, is_rr)
+
+        ((ref_mean, ref_ray_count), (rr_mean, rr_ray_count)) = result
+        assert(abs(rr_mean - ref_mean) < 0.05 * ref_mean)
+        assert(rr_ray_count < 0.8 * ref_ray_count)
+
+
+    def test_render_frame(self):
+        """render_frame: render the cornel box"""
+        image_size = 8
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(image_size)
+        film = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+        wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4, 0)
+
+        for nframe in xrange(2):
+            wpt.render_frame(cam, film, nframe)
+
+        fb = film.get_framebuffer()
+        assert(numpy.all(numpy.isfinite(fb)))
+        assert(numpy.all(fb >= 0.0))
+        assert(fb.max() > 0.0)
+        self.assertEquals(wpt.stat.frame_count, 2)
+        self.assertEquals(wpt.stat.path_count, 2 * image_size * image_size)
+        self.assertEquals(wpt.stat.bounce_ray_count[0], 2 * image_size * image_size)
+        # paths are terminated and compacted
+        assert(wpt.stat.bounce_ray_count[-1] < wpt.stat.bounce_ray_count[0])
+        # per frame and all the frames intersection counters
+        frame_stat = wpt.get_frame_intersect_stat()
+        self.assertEquals(wpt.stat.intersect.ray_count,
+                          wpt.stat.ray_count - wpt.stat.shadow_ray_count)
+        self.assertEquals(wpt.stat.intersect.occlusion_ray_count, wpt.stat.shadow_ray_count)
+        assert(0 < frame_stat.ray_count < wpt.stat.intersect.ray_count)
+        assert(frame_stat.occluded_count <= frame_stat.occlusion_ray_count)
+
+
+    def test_render_frame_pixel_sampler(self):
+        """render_frame: render with a pixel sampler and a lens"""
+        image_size = 8
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(image_size)
+        fb_list = []
+        for i in xrange(2):
+            film = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+            wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4, 0)
+            wpt.set_pixel_sampler(Sampler.create_pixel_sampler('sobol', 1))
+            wpt.set_lens_radius(1.0)
+            self.assertEquals(wpt.get_pixel_sampler().get_classname(), 'SobolPixelSampler')
+            self.assertEquals(wpt.get_lens_radius(), 1.0)
+            for nframe in xrange(2):
+                wpt.render_frame(cam, film, nframe)
+            fb_list.append(film.get_framebuffer().copy())
+
+        assert(numpy.all(numpy.isfinite(fb_list[0])))
+        assert(numpy.all(fb_list[0] >= 0.0))
+        assert(fb_list[0][:, :, 0].max() > 0.0)
+        # the pixel sampler is deterministic
+        assert((fb_list[0] == fb_list[1]).all())
+
+
+    def test_render_frame_accumulation(self):
+        """render_frame: accumulation film is the same as the running mean"""
+        image_size = 6
+        (scene_geo_mat, cam, env_mat) = create_cornel_box_scene(image_size)
+        film     = Film.ImageFilm((image_size, image_size, 4), 'RGBA')
+        acc_film = Film.ImageFilm((image_size, image_size, 4), 'RGBA', False, True)
+        wpt     = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4, 0)
+        acc_wpt = WavefrontPathTracer.WavefrontPathTracer(scene_geo_mat, env_mat, 4, 0)
+
+        for nframe in xrange(3):
+            wpt.render_frame(cam, film, nframe)
+            acc_wpt.render_frame(cam, acc_film, nframe)
+
+        assert((acc_film.get_sample_count_buffer() == 3).all())
+        assert(numpy.allclose(acc_film.get_image(), film.get_framebuffer()))
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestWavefrontPathTracer)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2010-2011 Yamauchi, Hitoshi
+#
+#
+"""test all in ifgi render"""
+
+import unittest
+
+import test_AdaptiveSampling
+import test_Checkpoint
+import test_RussianRoulette
+import test_TileRenderer
+import test_WavefrontPathTracer
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suits = []
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_AdaptiveSampling.TestAdaptiveSampling))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Checkpoint.TestCheckpoint))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_RussianRoulette.TestRussianRoulette))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_TileRenderer.TestTileRenderer))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_WavefrontPathTracer.TestWavefrontPathTracer))
+
+    alltest = unittest.TestSuite(suits)
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,900 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI bounding volume hierarchy
+\file
+\brief bounding volume hierarchy (BVH) for ray intersection acceleration.
+
+Two level BVH.
+- TriMeshBVH: bottom level (BLAS), a BVH over the faces of a TriMesh.
+- SceneBVH:   top level (TLAS), a BVH over the geometry bounding boxes.
+
+Both are built by the binned surface area heuristic (SAH). A
+TriMeshBVH can be read from a BVHCache instead of built.
+"""
+
+import sys, time
+import numpy
+
+import Primitive, BVHCache
+from ifgi.base.ILog import ILog
+
+
+# ----------------------------------------------------------------------
+
+class BVHStat(object):
+    """BVH build and traversal statistics. members are public.
+    """
+
+    def __init__(self):
+        """default constructor.
+        """
+        # build statistics
+        self.build_time_sec  = 0.0
+        self.primitive_count = 0
+        self.node_count      = 0
+        self.leaf_count      = 0
+        self.max_depth       = 0
+        # traversal statistics
+        self.reset_traversal()
+
+
+    def reset_traversal(self):
+        """reset traversal statistics (e.g., per frame).
+        """
+        self.ray_count            = 0
+        self.node_visit_count     = 0
+        self.primitive_test_count = 0
+
+
+    def add(self, _other):
+        """add other statistics to this.
+        \param[in] _other other BVHStat
+        """
+        self.build_time_sec       += _other.build_time_sec
+        self.primitive_count      += _other.primitive_count
+        self.node_count           += _other.node_count
+        self.leaf_count           += _other.leaf_count
+        self.max_depth             = max(self.max_depth, _other.max_depth)
+        self.ray_count            += _other.ray_count
+        self.node_visit_count     += _other.node_visit_count
+        self.primitive_test_count += _other.primitive_test_count
+
+
+    def __str__(self):
+        """human readable string.
+        """
+        avg_node = 0.0
+        avg_prim = 0.0
+        if self.ray_count > 0:
+            avg_node = float(self.node_visit_count)     / self.ray_count
+            avg_prim = float(self.primitive_test_count) / self.ray_count
+
+        return 'build: %g [s], %d prims, %d nodes, %d leaves, depth %d; ' \
+            'traversal: %d rays, %g nodes/ray, %g prims/ray' % \
+            (self.build_time_sec, self.primitive_count, self.node_count,
+             self.leaf_count, self.max_depth,
+             self.ray_count, avg_node, avg_prim)
+
+
+# ----------------------------------------------------------------------
+
+class BVH(object):
+    """binned SAH bounding volume hierarchy over axis aligned boxes.
+
+    The tree is stored in flat arrays.
+    - node_min[i], node_max[i]: bounding box of node i
+    - node_child[i]: first child index of an inner node (the second
+      child is node_child[i] + 1), -1 for a leaf node.
+    - node_start[i], node_count[i]: primitive range of a leaf node,
+      prim_order[node_start[i]:node_start[i] + node_count[i]] are the
+      primitive indices.
+    """
+
+    # cost of one traversal step relative to one primitive test
+    TRAVERSAL_COST = 1.0
+
+
+    def __init__(self, _max_leaf_size, _bin_count):
+        """constructor.
+        \param[in] _max_leaf_size max number of primitives in a leaf
+        \param[in] _bin_count     number of SAH bins per axis
+        """
+        assert(_max_leaf_size > 0)
+        assert(_bin_count > 1)
+        self.__max_leaf_size = _max_leaf_size
+        self.__bin_count     = _bin_count
+
+        self.node_min   = numpy.zeros((0, 3))
+        self.node_max   = numpy.zeros((0, 3))
+        self.node_child = numpy.zeros(0, dtype=numpy.int32)
+        self.node_start = numpy.zeros(0, dtype=numpy.int32)
+        self.node_count = numpy.zeros(0, dtype=numpy.int32)
+        self.prim_order = numpy.zeros(0, dtype=numpy.int32)
+
+        self.stat = BVHStat()
+
+
+    def get_classname(self):
+        """get class name.
+        \return class name
+        """
+        return 'BVH'
+
+
+    def get_max_leaf_size(self):
+        """get max number of primitives in a leaf.
+        \return max leaf size
+        """
+        return self.__max_leaf_size
+
+
+    def get_bin_count(self):
+        """get number of SAH bins.
+        \return bin count
+        """
+        return self.__bin_count
+
+
+    def is_valid(self):
+        """has this BVH been built?
+        \return True when this has at least one node.
+        """
+        return len(self.node_child) > 0
+
+
+    def build(self, _prim_min, _prim_max):
+        """build the BVH.
+        \param[in] _prim_min primitive bbox min, numpy.array shape (N,3)
+        \param[in] _prim_max primitive bbox max, numpy.array shape (N,3)
+        """
+        start_time = time.time()
+
+        prim_min = numpy.asarray(_prim_min, dtype=numpy.float64)
+        prim_max = numpy.asarray(_prim_max, dtype=numpy.float64)
+        assert(prim_min.shape == prim_max.shape)
+        nprim = prim_min.shape[0]
+        assert(nprim > 0)
+
+        centroid   = 0.5 * (prim_min + prim_max)
+        prim_order = numpy.arange(nprim, dtype=numpy.int32)
+
+        # node lists (converted to arrays at the end)
+        node_min   = []
+        node_max   = []
+        node_child = []
+        node_start = []
+        node_count = []
+
+        def new_node():
+            node_min.append(None)
+            node_max.append(None)
+            node_child.append(-1)
+            node_start.append(0)
+            node_count.append(0)
+            return len(node_child) - 1
+
+        self.stat = BVHStat()
+        self.stat.primitive_count = nprim
+
+        # build stack: (node index, start, end, depth)
+        root = new_node()
+        stack = [(root, 0, nprim, 0)]
+        while len(stack) > 0:
+            (ni, start, end, depth) = stack.pop()
+            idx = prim_order[start:end]
+            node_min[ni] = prim_min[idx].min(axis=0)
+            node_max[ni] = prim_max[idx].max(axis=0)
+            self.stat.max_depth = max(self.stat.max_depth, depth)
+
+            split = None
+            if (end - start) > self.__max_leaf_size:
+                split = self.__find_split(prim_min[idx], prim_max[idx],
+                                          centroid[idx],
+                                          node_min[ni], node_max[ni])
+            if split is None:
+                # leaf
+                node_start[ni] = start
+                node_count[ni] = end - start
+                self.stat.leaf_count += 1
+                continue
+
+            # partition the primitives
+            is_left = split
+            prim_order[start:end] = numpy.concatenate((idx[is_left], idx[~is_left]))
+            mid = start + int(is_left.sum())
+
+            child = new_node()
+            new_node()
+            node_child[ni] = child
+            stack.append((child,     start, mid, depth + 1))
+            stack.append((child + 1, mid,   end, depth + 1))
+
+        self.node_min   = numpy.array(node_min)
+        self.node_max   = numpy.array(node_max)
+        self.node_child = numpy.array(node_child, dtype=numpy.int32)
+        self.node_start = numpy.array(node_start, dtype=numpy.int32)
+        self.node_count = numpy.array(node_count, dtype=numpy.int32)
+        self.prim_order = prim_order
+
+        self.__prepare_traversal()
+
+        self.stat.node_count     = len(node_child)
+        self.stat.build_time_sec = time.time() - start_time
+
+
+    def get_array_dict(self):
+        """get the built BVH as arrays (e.g., for a cache).
+        \return dict of BVHCache.ARRAY_NAME_LIST arrays and 'stat_' +
+        BVHCache.STAT_NAME_LIST build statistics
+        """
+        bvh_dict = {}
+        for name in BVHCache.ARRAY_NAME_LIST:
+            bvh_dict[name] = getattr(self, name)
+        for name in BVHCache.STAT_NAME_LIST:
+            bvh_dict['stat_' + name] = getattr(self.stat, name)
+        return bvh_dict
+
+
+    def set_array_dict(self, _bvh_dict):
+        """set a built BVH from arrays, instead of build().
+        \param[in] _bvh_dict get_array_dict() result
+        """
+        self.stat = BVHStat()
+        for name in BVHCache.ARRAY_NAME_LIST:
+            setattr(self, name, _bvh_dict[name])
+        for name in BVHCache.STAT_NAME_LIST:
+            setattr(self.stat, name, _bvh_dict['stat_' + name])
+        self.__prepare_traversal()
+
+
+    def intersect_closest(self, _ray, _leaf_intersect, _max_t=None):
+        """find the closest intersection along the ray.
+
+        The closest hit so far is the max t of the rest of the
+        traversal, the farther nodes are skipped.
+
+        \param[in] _ray a ray
+        \param[in] _leaf_intersect leaf intersection function.
+        _leaf_intersect(_start, _end, _max_t) tests the primitives
+        prim_order[_start:_end] and returns (dist, payload) of the
+        closest hit closer than _max_t, or None.
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \return (dist, payload) of the closest hit, None if no hit.
+        """
+        return self.__traverse(_ray, _leaf_intersect, _max_t, False)
+
+
+    def intersect_any(self, _ray, _leaf_intersect, _max_t=None):
+        """find any intersection along the ray (occlusion). The
+        traversal stops at the first leaf that has a hit.
+
+        \param[in] _ray a ray
+        \param[in] _leaf_intersect leaf intersection function, see
+        intersect_closest(). It may return any hit in the leaf.
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \return (dist, payload) of a hit, None if no hit.
+        """
+        return self.__traverse(_ray, _leaf_intersect, _max_t, True)
+
+
+    def intersect_closest_batch(self, _orig, _inv_dir, _min_t, _max_t, _leaf_intersect):
+        """find the closest intersections of many rays.
+
+        The rays traverse the BVH together: a node is visited with the
+        set of the rays that hit its box, so a leaf tests its
+        primitives against all of its rays at once. A ray's closest
+        hit so far is its max t of the rest of the traversal.
+
+        \param[in] _orig    ray origins numpy.array (R,3)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3)
+        \param[in] _min_t   ray minimal distances numpy.array (R,)
+        \param[in] _max_t   ray maximal distances numpy.array (R,)
+        \param[in] _leaf_intersect leaf intersection function.
+        _leaf_intersect(_start, _end, _ray_idx, _max_t) tests the
+        primitives prim_order[_start:_end] against the rays _ray_idx
+        with their maximal distances _max_t, and returns (dist,
+        payload) numpy.array (len(_ray_idx),) each. payload is an
+        integer, -1 when the ray does not hit.
+        \return (dist, payload) numpy.array (R,) each. dist = inf and
+        payload = -1 when the ray does not hit.
+        """
+        return self.__traverse_batch(_orig, _inv_dir, _min_t, _max_t, _leaf_intersect, False)
+
+
+    def intersect_any_batch(self, _orig, _inv_dir, _min_t, _max_t, _leaf_intersect):
+        """find any intersection of many rays (occlusion). A ray
+        leaves the traversal at its first leaf hit.
+
+        \param[in] _orig    ray origins numpy.array (R,3)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3)
+        \param[in] _min_t   ray minimal distances numpy.array (R,)
+        \param[in] _max_t   ray maximal distances numpy.array (R,)
+        \param[in] _leaf_intersect leaf intersection function, see
+        intersect_closest_batch(). It may return any hit in the leaf.
+        \return (dist, payload) numpy.array (R,) each, see
+        intersect_closest_batch().
+        """
+        return self.__traverse_batch(_orig, _inv_dir, _min_t, _max_t, _leaf_intersect, True)
+
+
+    # private: ------------------------------------------------------------
+
+    def __traverse(self, _ray, _leaf_intersect, _max_t, _is_any_hit):
+        """traverse the BVH, nearer child first.
+        \return (dist, payload) of the closest (or any) hit, None if no hit.
+        """
+        if not self.is_valid():
+            return None
+
+        self.stat.ray_count += 1
+
+        # per node work is a few float operations, plain python
+        # floats are faster than small numpy arrays here.
+        orig    = [float(x) for x in _ray.get_origin()[0:3]]
+        inv_dir = _ray.get_inv_dir()
+        min_t   = _ray.get_min_t()
+        max_t   = _ray.get_max_t()
+        if (_max_t != None) and (_max_t < max_t):
+            max_t = _max_t
+
+        if self.__slab_test(orig, inv_dir, min_t, max_t, 0) == None:
+            return None
+
+        node_child = self.__node_child
+        closest = None
+        stack   = [0]
+        while len(stack) > 0:
+            ni = stack.pop()
+            self.stat.node_visit_count += 1
+            child = node_child[ni]
+            if child < 0:
+                # leaf
+                (start, end) = self.__node_range[ni]
+                self.stat.primitive_test_count += end - start
+                res = _leaf_intersect(start, end, max_t)
+                if (res != None) and (res[0] <= max_t):
+                    if _is_any_hit:
+                        return res
+                    max_t   = res[0]
+                    closest = res
+                continue
+
+            tnear0 = self.__slab_test(orig, inv_dir, min_t, max_t, child)
+            tnear1 = self.__slab_test(orig, inv_dir, min_t, max_t, child + 1)
+            if tnear0 != None:
+                if tnear1 != None:
+                    # visit the nearer child first (pushed last)
+                    if tnear0 <= tnear1:
+                        stack.append(child + 1)
+                        stack.append(child)
+                    else:
+                        stack.append(child)
+                        stack.append(child + 1)
+                else:
+                    stack.append(child)
+            elif tnear1 != None:
+                stack.append(child + 1)
+
+        return closest
+
+
+    def __traverse_batch(self, _orig, _inv_dir, _min_t, _max_t, _leaf_intersect,
+                         _is_any_hit):
+        """traverse the BVH with ray sets. Each stack entry is a node
+        and the rays that hit the node box (with their box entry
+        distances). The child that the most rays enter first is
+        visited first.
+        \return (dist, payload) numpy.array (R,) each.
+        """
+        ray_count = _orig.shape[0]
+        t_hit = numpy.empty(ray_count)
+        t_hit.fill(numpy.inf)
+        payload_hit = numpy.empty(ray_count, dtype=numpy.int32)
+        payload_hit.fill(-1)
+        if (ray_count == 0) or (not self.is_valid()):
+            return (t_hit, payload_hit)
+
+        self.stat.ray_count += ray_count
+
+        # max_t shrinks at a closest hit, and is -inf after any hit:
+        # a ray whose box entry is beyond its max_t leaves the node.
+        max_t = numpy.array(_max_t, dtype=numpy.float64)
+        (tnear, tfar, is_hit) = Primitive.ray_bbox_slab_test_batch(
+            _orig, _inv_dir, _min_t, max_t, self.node_min[0], self.node_max[0])
+        ray_idx = numpy.nonzero(is_hit)[0]
+
+        node_child = self.__node_child
+        stack = [(0, ray_idx, tnear[ray_idx])]
+        while len(stack) > 0:
+            (ni, ray_idx, tnear) = stack.pop()
+            ray_idx = ray_idx[tnear <= max_t[ray_idx]]
+            if len(ray_idx) == 0:
+                continue
+            self.stat.node_visit_count += len(ray_idx)
+            child = node_child[ni]
+            if child < 0:
+                # leaf
+                (start, end) = self.__node_range[ni]
+                self.stat.primitive_test_count += len(ray_idx) * (end - start)
+                (t, payload) = _leaf_intersect(start, end, ray_idx, max_t[ray_idx])
+                is_leaf_hit = (payload >= 0)
+                hit_idx = ray_idx[is_leaf_hit]
+                t_hit[hit_idx]       = t[is_leaf_hit]
+                payload_hit[hit_idx] = payload[is_leaf_hit]
+                if _is_any_hit:
+                    max_t[hit_idx] = -numpy.inf
+                else:
+                    max_t[hit_idx] = t[is_leaf_hit]
+                continue
+
+            child_list = []
+            for ci in [child, child + 1]:
+                (tnear, tfar, is_hit) = Primitive.ray_bbox_slab_test_batch(
+                    _orig[ray_idx], _inv_dir[ray_idx], _min_t[ray_idx], max_t[ray_idx],
+                    self.node_min[ci], self.node_max[ci])
+                child_list.append((ci, ray_idx[is_hit], tnear[is_hit], tnear))
+
+            # visit the child nearer for the most rays first (pushed last)
+            near0 = (child_list[0][3] <= child_list[1][3]).sum()
+            if 2 * near0 >= len(ray_idx):
+                child_list.reverse()
+            for (ci, child_ray_idx, child_tnear, all_tnear) in child_list:
+                if len(child_ray_idx) > 0:
+                    stack.append((ci, child_ray_idx, child_tnear))
+
+        return (t_hit, payload_hit)
+
+
+    def __prepare_traversal(self):
+        """prepare the traversal data (python lists of the node arrays).
+        """
+        self.__node_min   = self.node_min.tolist()
+        self.__node_max   = self.node_max.tolist()
+        self.__node_child = self.node_child.tolist()
+        self.__node_range = zip(self.node_start.tolist(),
+                                (self.node_start + self.node_count).tolist())
+
+
+    def __slab_test(self, _orig, _inv_dir, _min_t, _max_t, _ni):
+        """ray - node bbox slab test. See Primitive.ray_bbox_slab_test().
+        \return tnear when the node is hit, None when not hit.
+        """
+        trange = Primitive.ray_bbox_slab_test(_orig, _inv_dir, _min_t, _max_t,
+                                              self.__node_min[_ni], self.__node_max[_ni])
+        if trange == None:
+            return None
+        return trange[0]
+
+
+    def __find_split(self, _pmin, _pmax, _centroid, _node_min, _node_max):
+        """find the binned SAH split.
+        \return boolean array, True for the primitives go to the left
+        child. None when a leaf is better.
+        """
+        nprim = _centroid.shape[0]
+        cmin  = _centroid.min(axis=0)
+        cmax  = _centroid.max(axis=0)
+        extent = cmax - cmin
+
+        best_cost  = sys.float_info.max
+        best_axis  = -1
+        best_split = -1
+        best_bin   = None
+        nbin = self.__bin_count
+        for axis in xrange(3):
+            if extent[axis] <= 0.0:
+                continue
+            bin_idx = ((_centroid[:, axis] - cmin[axis]) *
+                       (nbin / extent[axis])).astype(numpy.int32)
+            bin_idx = numpy.clip(bin_idx, 0, nbin - 1)
+
+            bin_cnt = numpy.bincount(bin_idx, minlength=nbin)
+            bin_min = numpy.empty((nbin, 3))
+            bin_max = numpy.empty((nbin, 3))
+            bin_min.fill( sys.float_info.max)
+            bin_max.fill(-sys.float_info.max)
+            numpy.minimum.at(bin_min, bin_idx, _pmin)
+            numpy.maximum.at(bin_max, bin_idx, _pmax)
+
+            # sweep: left[i] covers bins [0, i], right[i] bins [i+1, nbin)
+            left_cnt  = numpy.cumsum(bin_cnt)[:-1]
+            right_cnt = nprim - left_cnt
+            left_area  = self.__sweep_area(bin_min,       bin_max)[:-1]
+            right_area = self.__sweep_area(bin_min[::-1], bin_max[::-1])[::-1][1:]
+
+            cost = left_area * left_cnt + right_area * right_cnt
+            cost[(left_cnt == 0) | (right_cnt == 0)] = sys.float_info.max
+            split = int(numpy.argmin(cost))
+            if cost[split] < best_cost:
+                best_cost  = cost[split]
+                best_axis  = axis
+                best_split = split
+                best_bin   = bin_idx
+
+        if best_axis < 0:
+            # all the centroids are the same point. object median split.
+            if nprim <= self.__max_leaf_size:
+                return None
+            is_left = numpy.zeros(nprim, dtype=bool)
+            is_left[0:nprim / 2] = True
+            return is_left
+
+        # SAH leaf cost versus split cost (relative to the node area)
+        node_area = self.__half_area(_node_min, _node_max)
+        if node_area > 0.0:
+            split_cost = BVH.TRAVERSAL_COST + best_cost / node_area
+            if split_cost >= nprim:
+                return None
+
+        return best_bin <= best_split
+
+
+    def __half_area(self, _bmin, _bmax):
+        """half surface area of a box.
+        """
+        d = numpy.maximum(_bmax - _bmin, 0.0)
+        return d[0] * d[1] + d[1] * d[2] + d[2] * d[0]
+
+
+    def __sweep_area(self, _bin_min, _bin_max):
+        """half surface area of accumulated bins (prefix sweep).
+        Empty bins keep the invalid (inverted) box, that gives area 0.
+        """
+        acc_min = numpy.minimum.accumulate(_bin_min, axis=0)
+        acc_max = numpy.maximum.accumulate(_bin_max, axis=0)
+        d = numpy.maximum(acc_max - acc_min, 0.0)
+        return d[:, 0] * d[:, 1] + d[:, 1] * d[:, 2] + d[:, 2] * d[:, 0]
+
+
+# ----------------------------------------------------------------------
+
+class TriMeshBVH(BVH):
+    """bottom level BVH over the faces of a TriMesh.
+
+    The TriMesh's face_v0, face_e1, face_e2, face_n arrays are copied in the
+    BVH primitive order, so a leaf is a contiguous range of the
+    arrays for the vectorized intersection.
+    """
+
+    def __init__(self, _trimesh, _max_leaf_size=8, _bin_count=16, _bvh_cache=None):
+        """constructor. build the BVH, or read it from the cache.
+        \param[in] _trimesh       a TriMesh
+        \param[in] _max_leaf_size max number of faces in a leaf
+        \param[in] _bin_count     number of SAH bins per axis
+        \param[in] _bvh_cache     BVHCache. None: always build
+        """
+        super(TriMeshBVH, self).__init__(_max_leaf_size, _bin_count)
+        self.__trimesh = _trimesh
+
+        start_time = time.time()
+        bvh_dict = None
+        if _bvh_cache != None:
+            key = BVHCache.compute_trimesh_key(_trimesh, _max_leaf_size, _bin_count)
+            bvh_dict = _bvh_cache.read(key)
+        if (bvh_dict != None) and (len(bvh_dict['prim_order']) == len(_trimesh.face_idx_list)):
+            self.set_array_dict(bvh_dict)
+            self.stat.build_time_sec = time.time() - start_time
+        else:
+            self.build(_trimesh.face_bbox_min, _trimesh.face_bbox_max)
+            if _bvh_cache != None:
+                _bvh_cache.write(key, self.get_array_dict())
+
+        self.__v0 = _trimesh.face_v0[self.prim_order]
+        self.__e1 = _trimesh.face_e1[self.prim_order]
+        self.__e2 = _trimesh.face_e2[self.prim_order]
+        self.__n  = _trimesh.face_n[self.prim_order]
+
+
+    def get_classname(self):
+        """get class name.
+        \return class name
+        """
+        return 'TriMeshBVH'
+
+
+    def ray_intersect(self, _ray, _max_t=None):
+        """compute ray intersection with the mesh.
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \return a HitRecord. None if no hit.
+        """
+        hit = self.intersect_closest_face(_ray, _max_t)
+        if hit == None:
+            return None
+        return self.__trimesh.get_hit_record(*hit)
+
+
+    def occluded(self, _ray, _max_t=None):
+        """any hit query with the mesh.
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \return True when the ray hits a face.
+        """
+        return self.intersect_any_face(_ray, _max_t) != None
+
+
+    def intersect_closest_face(self, _ray, _max_t=None):
+        """the closest face hit.
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \return (t, face index, b1, b2), None if no hit.
+        """
+        return self.__intersect_face(_ray, _max_t, False)
+
+
+    def intersect_any_face(self, _ray, _max_t=None):
+        """any face hit.
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \return (t, face index, b1, b2), None if no hit.
+        """
+        return self.__intersect_face(_ray, _max_t, True)
+
+
+    def intersect_face_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir, _is_any_hit):
+        """the closest (or any) face hits of many rays.
+        \param[in] _orig    ray origins numpy.array (R,3)
+        \param[in] _dir     ray directions numpy.array (R,3)
+        \param[in] _min_t   ray minimal distances numpy.array (R,)
+        \param[in] _max_t   ray maximal distances numpy.array (R,)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3)
+        \param[in] _is_any_hit when True, any hit instead of the closest
+        \return (t, face index) numpy.array (R,) each. t = inf and
+        face index = -1 when the ray does not hit.
+        """
+        def leaf_intersect(_start, _end, _ray_idx, _max_t):
+            (t, fi) = Primitive.ray_triangle_intersect_batch(_orig[_ray_idx], _dir[_ray_idx],
+                                                             _min_t[_ray_idx], _max_t,
+                                                             self.__v0[_start:_end],
+                                                             self.__e1[_start:_end],
+                                                             self.__e2[_start:_end],
+                                                             self.__n[_start:_end])
+            fi[fi >= 0] += _start
+            return (t, fi)
+
+        if _is_any_hit:
+            (t, order_idx) = self.intersect_any_batch(_orig, _inv_dir, _min_t, _max_t,
+                                                      leaf_intersect)
+        else:
+            (t, order_idx) = self.intersect_closest_batch(_orig, _inv_dir, _min_t, _max_t,
+                                                          leaf_intersect)
+        is_hit = (order_idx >= 0)
+        order_idx[is_hit] = self.prim_order[order_idx[is_hit]]
+        return (t, order_idx)
+
+
+    def __intersect_face(self, _ray, _max_t, _is_any_hit):
+        """the closest or any face hit.
+        \return (t, face index, b1, b2), None if no hit.
+        """
+        orig  = _ray.get_origin()
+        rdir  = _ray.get_dir()
+        min_t = _ray.get_min_t()
+
+        def leaf_intersect(_start, _end, _max_t):
+            hit = Primitive.ray_triangle_intersect_soa(orig, rdir, min_t, _max_t,
+                                                       self.__v0[_start:_end],
+                                                       self.__e1[_start:_end],
+                                                       self.__e2[_start:_end],
+                                                       self.__n[_start:_end],
+                                                       _is_any_hit)
+            if hit == None:
+                return None
+            return (hit[0], (_start + hit[1], hit[2], hit[3]))
+
+        if _is_any_hit:
+            res = self.intersect_any(_ray, leaf_intersect, _max_t)
+        else:
+            res = self.intersect_closest(_ray, leaf_intersect, _max_t)
+        if res == None:
+            return None
+        (t, (order_idx, b1, b2)) = res
+        return (t, self.prim_order[order_idx], b1, b2)
+
+
+# ----------------------------------------------------------------------
+
+class SceneBVH(BVH):
+    """top level BVH over the geometry (TriMesh) bounding boxes.
+
+    A TriMeshInstance is an entry of its own (its world space box),
+    the instances of a TriMesh share one bottom level BVH.
+    """
+
+    def __init__(self, _trimesh_list, _max_leaf_size=8, _bin_count=16, _bvh_cache=None):
+        """constructor. build the top level BVH and each TriMesh's
+        bottom level BVH.
+
+        \param[in] _trimesh_list TriMesh (or TriMeshInstance) list
+        \param[in] _max_leaf_size max number of primitives in a leaf
+        \param[in] _bin_count     number of SAH bins per axis
+        \param[in] _bvh_cache     BVHCache of the bottom level BVHs.
+        None: always build
+        """
+        super(SceneBVH, self).__init__(_max_leaf_size, _bin_count)
+        self.__trimesh_list = _trimesh_list
+
+        for tmesh in self.__trimesh_list:
+            tmesh.build_bvh(_max_leaf_size, _bin_count, _bvh_cache)
+
+        geo_min = []
+        geo_max = []
+        for tmesh in self.__trimesh_list:
+            geo_min.append(tmesh.get_bbox().get_min()[0:3])
+            geo_max.append(tmesh.get_bbox().get_max()[0:3])
+
+        if len(self.__trimesh_list) > 0:
+            self.build(numpy.array(geo_min), numpy.array(geo_max))
+
+
+    def get_classname(self):
+        """get class name.
+        \return class name
+        """
+        return 'SceneBVH'
+
+
+    def ray_intersect(self, _ray, _stat=None):
+        """compute ray intersection with the scene.
+        \param[in] _ray  a ray
+        \param[in] _stat Primitive.IntersectStat to count the tests.
+        None: no count
+        \return a HitRecord. None if no hit.
+        """
+        def leaf_intersect(_start, _end, _max_t):
+            closest = None
+            for gi in self.prim_order[_start:_end]:
+                # the mesh is skipped when its box is beyond _max_t
+                hr = self.__trimesh_list[gi].ray_intersect(_ray, _max_t, _stat)
+                if (hr != None) and (hr.dist < _max_t):
+                    _max_t  = hr.dist
+                    closest = (hr.dist, hr)
+            return closest
+
+        res = self.intersect_closest(_ray, leaf_intersect)
+        if res == None:
+            return None
+        return res[1]
+
+
+    def occluded(self, _ray, _stat=None):
+        """any hit query with the scene.
+        \param[in] _ray  a ray
+        \param[in] _stat Primitive.IntersectStat to count the tests.
+        None: no count
+        \return True when the ray hits a face.
+        """
+        def leaf_intersect(_start, _end, _max_t):
+            for gi in self.prim_order[_start:_end]:
+                if self.__trimesh_list[gi].occluded(_ray, _max_t, _stat):
+                    return (_max_t, gi)
+            return None
+
+        return self.intersect_any(_ray, leaf_intersect) != None
+
+
+    def ray_intersect_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir, _stat=None):
+        """compute many rays intersection with the scene.
+        \param[in] _orig    ray origins numpy.array (R,3)
+        \param[in] _dir     ray directions numpy.array (R,3)
+        \param[in] _min_t   ray minimal distances numpy.array (R,)
+        \param[in] _max_t   ray maximal distances numpy.array (R,)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3)
+        \param[in] _stat Primitive.IntersectStat to count the tests.
+        None: no count
+        \return (t, geometry index, face index) numpy.array (R,)
+        each. t = inf, geometry index = face index = -1 when the ray
+        does not hit.
+        """
+        fi_hit = numpy.empty(_orig.shape[0], dtype=numpy.int32)
+        fi_hit.fill(-1)
+
+        def leaf_intersect(_start, _end, _ray_idx, _max_t):
+            orig    = _orig[_ray_idx]
+            rdir    = _dir[_ray_idx]
+            min_t   = _min_t[_ray_idx]
+            inv_dir = _inv_dir[_ray_idx]
+            max_t   = _max_t.copy()
+            t_leaf  = numpy.empty(len(_ray_idx))
+            t_leaf.fill(numpy.inf)
+            gi_leaf = numpy.empty(len(_ray_idx), dtype=numpy.int32)
+            gi_leaf.fill(-1)
+            for gi in self.prim_order[_start:_end]:
+                # the rays whose hit so far is before the mesh box skip it
+                (t, fi) = self.__trimesh_list[gi].ray_intersect_batch(orig, rdir, min_t, max_t,
+                                                                      inv_dir, _stat)
+                is_closer = (t < t_leaf)
+                t_leaf[is_closer]  = t[is_closer]
+                gi_leaf[is_closer] = gi
+                # every leaf hit is within _max_t, it is the new closest hit
+                fi_hit[_ray_idx[is_closer]] = fi[is_closer]
+                max_t = numpy.minimum(max_t, t_leaf)
+            return (t_leaf, gi_leaf)
+
+        (t_hit, gi_hit) = self.intersect_closest_batch(_orig, _inv_dir, _min_t, _max_t,
+                                                       leaf_intersect)
+        return (t_hit, gi_hit, fi_hit)
+
+
+    def occluded_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir, _stat=None):
+        """many rays any hit query with the scene.
+        \param[in] _orig    ray origins numpy.array (R,3)
+        \param[in] _dir     ray directions numpy.array (R,3)
+        \param[in] _min_t   ray minimal distances numpy.array (R,)
+        \param[in] _max_t   ray maximal distances numpy.array (R,)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3)
+        \param[in] _stat Primitive.IntersectStat to count the tests.
+        None: no count
+        \return occluded bool numpy.array (R,)
+        """
+        def leaf_intersect(_start, _end, _ray_idx, _max_t):
+            gi_leaf = numpy.empty(len(_ray_idx), dtype=numpy.int32)
+            gi_leaf.fill(-1)
+            # rays not occluded yet, index of _ray_idx
+            idx = numpy.arange(len(_ray_idx))
+            for gi in self.prim_order[_start:_end]:
+                if len(idx) == 0:
+                    break
+                ray_idx = _ray_idx[idx]
+                is_hit = self.__trimesh_list[gi].occluded_batch(_orig[ray_idx], _dir[ray_idx],
+                                                                _min_t[ray_idx], _max_t[idx],
+                                                                _inv_dir[ray_idx], _stat)
+                gi_leaf[idx[is_hit]] = gi
+                idx = idx[~is_hit]
+            return (_max_t, gi_leaf)
+
+        (t_hit, gi_hit) = self.intersect_any_batch(_orig, _inv_dir, _min_t, _max_t,
+                                                   leaf_intersect)
+        return (gi_hit >= 0)
+
+
+    def get_blas_stat(self):
+        """get the sum of all the bottom level BVH statistics.
+        \return BVHStat
+        """
+        blas_stat = BVHStat()
+        for bvh in self.__get_blas_list():
+            blas_stat.add(bvh.stat)
+        return blas_stat
+
+
+    def reset_traversal_stat(self):
+        """reset the traversal statistics of all the levels.
+        """
+        self.stat.reset_traversal()
+        for bvh in self.__get_blas_list():
+            bvh.stat.reset_traversal()
+
+
+    def print_stat(self):
+        """print the BVH statistics.
+        """
+        ILog.info('TLAS: ' + str(self.stat))
+        ILog.info('BLAS: ' + str(self.get_blas_stat()))
+
+
+    def __get_blas_list(self):
+        """get the bottom level BVHs. A BVH shared by instances is
+        listed once.
+        \return TriMeshBVH list
+        """
+        blas_list = []
+        blas_id_set = set()
+        for tmesh in self.__trimesh_list:
+            bvh = tmesh.get_bvh()
+            if (bvh != None) and (not (id(bvh) in blas_id_set)):
+                blas_id_set.add(id(bvh))
+                blas_list.append(bvh)
+        return blas_list
+
+
+#
+# main test ... test_BVH
+#
+# see test_BVH.py
+#
+# if __name__ == '__main__':
+#     pass
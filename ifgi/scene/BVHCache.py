@@ -0,0 +1,289 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI BVH cache
+\file
+\brief content addressed disk cache of the built bottom level BVHs.
+
+A cache file is <cache dir>/<key>.ifgibvh, the key is the sha1 of
+the TriMesh vertex and face arrays, the BVH builder parameters, and
+the cache format version. The same mesh data has the same key
+whatever its file name is, a changed mesh has a new key.
+
+A cache file is a numpy .npz file of the BVH node arrays and the
+build statistics, written by ifgi_util.atomic_write().
+
+The least recently used files are removed when the total size of
+the cache files is over the max total size. A cache hit touches the
+file's mtime.
+
+The default cache (get_default_cache()) is in the directory of the
+environment variable IFGI_BVH_CACHE_DIR, no cache when it is not set.
+"""
+
+import os, time, hashlib, zipfile, zlib
+import numpy
+
+from ifgi.base import ifgi_util
+from ifgi.base.ILog import ILog
+
+
+# cache file extension
+CACHE_EXT = '.ifgibvh'
+# format version. Increment when the BVH builder changes its result.
+VERSION = 1
+# default max total size of the cache files [byte]
+DEFAULT_MAX_TOTAL_SIZE = 1024 * 1024 * 1024
+# environment variable of the default cache directory
+CACHE_DIR_ENV = 'IFGI_BVH_CACHE_DIR'
+
+# cached BVH arrays
+ARRAY_NAME_LIST = ['node_min', 'node_max', 'node_child', 'node_start', 'node_count',
+                   'prim_order']
+# cached BVHStat build statistics, 'stat_' + name in a cache
+STAT_NAME_LIST  = ['primitive_count', 'node_count', 'leaf_count', 'max_depth']
+
+
+def compute_trimesh_key(_trimesh, _max_leaf_size, _bin_count):
+    """compute the cache key of a TriMesh BVH.
+
+    \param[in] _trimesh       TriMesh
+    \param[in] _max_leaf_size BVH max number of faces in a leaf
+    \param[in] _bin_count     BVH number of SAH bins per axis
+    \return hex digest string
+    """
+    sha = hashlib.sha1()
+    sha.update(repr(('TriMeshBVH', VERSION, _max_leaf_size, _bin_count)))
+    vertex = numpy.ascontiguousarray(_trimesh.vertex_list, dtype=numpy.float64)
+    face   = numpy.ascontiguousarray(_trimesh.face_idx_list, dtype=numpy.int32)
+    sha.update(repr((vertex.shape, face.shape)))
+    sha.update(vertex.tostring())
+    sha.update(face.tostring())
+    return sha.hexdigest()
+
+# ----------------------------------------------------------------------
+
+class BVHCacheStat(object):
+    """BVH cache statistics"""
+
+    def __init__(self):
+        """constructor."""
+        super(BVHCacheStat, self).__init__()
+        self.reset()
+
+
+    def reset(self):
+        """reset all the counters."""
+        self.hit_count   = 0
+        self.miss_count  = 0
+        self.write_count = 0
+        # number of removed files
+        self.evict_count = 0
+        # total time to read the cache files
+        self.read_time_sec = 0.0
+
+
+    def add(self, _stat):
+        """add the counters of another stat.
+        \param[in] _stat BVHCacheStat
+        """
+        self.hit_count     += _stat.hit_count
+        self.miss_count    += _stat.miss_count
+        self.write_count   += _stat.write_count
+        self.evict_count   += _stat.evict_count
+        self.read_time_sec += _stat.read_time_sec
+
+
+    def __str__(self):
+        """human readable string."""
+        return '%d hits, %d misses, %d writes, %d evictions, %g [s] read time' % \
+            (self.hit_count, self.miss_count, self.write_count, self.evict_count,
+             self.read_time_sec)
+
+
+class BVHCache(object):
+    """content addressed disk cache of the built BVHs.
+    """
+
+    def __init__(self, _cache_dir, _max_total_size=DEFAULT_MAX_TOTAL_SIZE):
+        """constructor.
+
+        \param[in] _cache_dir      cache directory. Created when it does
+        not exist.
+        \param[in] _max_total_size max total size of the cache files [byte]
+        """
+        super(BVHCache, self).__init__()
+
+        if _max_total_size <= 0:
+            raise StandardError, ('max total size must be positive, but ' +
+                                  str(_max_total_size))
+        self.__cache_dir      = os.path.abspath(_cache_dir)
+        self.__max_total_size = _max_total_size
+        self.stat = BVHCacheStat()
+
+
+    def get_cache_dir(self):
+        """get the cache directory.
+        \return absolute cache directory name
+        """
+        return self.__cache_dir
+
+
+    def get_max_total_size(self):
+        """get the max total size of the cache files.
+        \return max total size [byte]
+        """
+        return self.__max_total_size
+
+
+    def get_cache_filename(self, _key):
+        """get the cache file name of a key.
+        \param[in] _key cache key
+        \return cache file name
+        """
+        return os.path.join(self.__cache_dir, _key + CACHE_EXT)
+
+
+    def read(self, _key):
+        """read a cached BVH.
+
+        \param[in] _key cache key
+        \return dict of ARRAY_NAME_LIST arrays and 'stat_' +
+        STAT_NAME_LIST ints. None when not cached (or broken).
+        """
+        start_time  = time.time()
+        cache_fname = self.get_cache_filename(_key)
+        if not os.path.isfile(cache_fname):
+            self.stat.miss_count += 1
+            return None
+
+        try:
+            if not zipfile.is_zipfile(cache_fname):
+                raise StandardError, ('not a npz file.')
+            with open(cache_fname, 'rb') as infile:
+                npz = numpy.load(infile)
+                if str(npz['key']) != _key:
+                    raise StandardError, ('key differs.')
+                bvh_dict = dict([(name, npz[name]) for name in ARRAY_NAME_LIST])
+                for name in STAT_NAME_LIST:
+                    bvh_dict['stat_' + name] = int(npz['stat_' + name])
+            # least recently used is the oldest mtime
+            os.utime(cache_fname, None)
+        except (StandardError, IOError, OSError, zipfile.BadZipfile, zlib.error), extrainfo:
+            ILog.warn('ignore broken BVH cache [' + cache_fname + '] ' + str(extrainfo))
+            self.stat.miss_count += 1
+            return None
+
+        self.stat.hit_count     += 1
+        self.stat.read_time_sec += time.time() - start_time
+        return bvh_dict
+
+
+    def write(self, _key, _bvh_dict):
+        """write a BVH to the cache, then evict the least recently
+        used files over the max total size.
+
+        \param[in] _key      cache key
+        \param[in] _bvh_dict dict of ARRAY_NAME_LIST arrays and 'stat_'
+        + STAT_NAME_LIST ints (BVH.get_array_dict())
+        \return True when written.
+        """
+        array_dict = {'key': numpy.array(_key)}
+        for name in ARRAY_NAME_LIST:
+            array_dict[name] = numpy.asarray(_bvh_dict[name])
+        for name in STAT_NAME_LIST:
+            array_dict['stat_' + name] = numpy.array(_bvh_dict['stat_' + name])
+
+        cache_fname = self.get_cache_filename(_key)
+        try:
+            if not os.path.isdir(self.__cache_dir):
+                os.makedirs(self.__cache_dir)
+            ifgi_util.atomic_write(cache_fname,
+                                   lambda _outfile: numpy.savez(_outfile, **array_dict))
+        except (IOError, OSError), extrainfo:
+            ILog.warn('cannot write BVH cache [' + cache_fname + '] ' + str(extrainfo))
+            return False
+
+        self.stat.write_count += 1
+        self.evict()
+        return True
+
+
+    def get_total_size(self):
+        """get the total size of the cache files.
+        \return total size [byte]
+        """
+        return sum([size for (mtime, size, fname) in self.__get_file_list()])
+
+
+    def evict(self):
+        """remove the least recently used files until the total size
+        is not over the max total size.
+        \return number of removed files
+        """
+        file_list  = sorted(self.__get_file_list())
+        total_size = sum([size for (mtime, size, fname) in file_list])
+        remove_count = 0
+        for (mtime, size, fname) in file_list:
+            if total_size <= self.__max_total_size:
+                break
+            try:
+                os.remove(fname)
+            except OSError:
+                # removed by another process
+                pass
+            total_size   -= size
+            remove_count += 1
+
+        self.stat.evict_count += remove_count
+        return remove_count
+
+
+    def clear(self):
+        """remove all the cache files.
+        """
+        for (mtime, size, fname) in self.__get_file_list():
+            try:
+                os.remove(fname)
+            except OSError:
+                pass
+
+    # private: ------------------------------------------------------------
+
+    def __get_file_list(self):
+        """get the cache files.
+        \return list of (mtime, size, file name)
+        """
+        if not os.path.isdir(self.__cache_dir):
+            return []
+        file_list = []
+        for fname in os.listdir(self.__cache_dir):
+            if not fname.endswith(CACHE_EXT):
+                continue
+            path = os.path.join(self.__cache_dir, fname)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            file_list.append((st.st_mtime, st.st_size, path))
+        return file_list
+
+# ----------------------------------------------------------------------
+
+# cache directory -> default BVHCache
+_default_cache_dict = {}
+
+
+def get_default_cache():
+    """get the default BVH cache.
+    \return BVHCache of the IFGI_BVH_CACHE_DIR directory. None when
+    the environment variable is not set.
+    """
+    cache_dir = os.environ.get(CACHE_DIR_ENV, '')
+    if cache_dir == '':
+        return None
+    if not (cache_dir in _default_cache_dict):
+        _default_cache_dict[cache_dir] = BVHCache(cache_dir)
+    return _default_cache_dict[cache_dir]
@@ -27,9 +27,9 @@ class Camera(object):
     # default constructor
     def __init__(self):
         """default constructor"""
-        self.__eye_pos      = numpy.array([0, 0,  5])
-        self.__view_dir     = numpy.array([0, 0, -1])
-        self.__up_dir       = numpy.array([0, 1,  0])
+        self.__eye_pos      = numpy.array([0.0, 0.0,  5.0])
+        self.__view_dir     = numpy.array([0.0, 0.0, -1.0])
+        self.__up_dir       = numpy.array([0.0, 1.0,  0.0])
         self.__fovy_rad     = 45.0 * math.pi / 180.0
         self.__aspect_ratio = 1.0
         self.__z_near       = 0.1
@@ -41,11 +41,11 @@ class Camera(object):
         self.__lens_screen_dist = 1.0
         self.__lens_film_dist = 1.0
         # lower bottom corner
-        self.__LB_corner    = numpy.array([-1, -1,  0])
+        self.__LB_corner    = numpy.array([-1.0, -1.0,  0.0])
         # x direction base vector
-        self.__ex    = numpy.array([1, 0,  0])
+        self.__ex    = numpy.array([1.0, 0.0,  0.0])
         # y direction base vector
-        self.__ey    = numpy.array([0, 1,  0])
+        self.__ey    = numpy.array([0.0, 1.0,  0.0])
         self.__resolution_x = 128
         self.__resolution_y = 64
         # films: framebuffer
@@ -156,6 +156,7 @@ class Camera(object):
         """set fovy as radian.
         \param[in] _fovy_rad field of view in radian."""
         self.__fovy_rad = _fovy_rad
+        self.__compute_screen_parameter()
 
 
     def get_fovy_rad(self):
@@ -168,6 +169,7 @@ class Camera(object):
         """set aspect ratio.
         \param[in] _aspect_ratio aspect ratio. """
         self.__aspect_ratio = _aspect_ratio
+        self.__compute_screen_parameter()
 
 
     def get_aspect_ratio(self):
@@ -310,6 +312,7 @@ class Camera(object):
         """set get lens to screen distance.
         \param[in] _l2s_dist lens to screen distance."""
         self.__lens_screen_dist = _l2s_dist
+        self.__compute_screen_parameter()
 
     # get lens to film distance
     def get_lens_to_film_distance(self):
@@ -324,19 +327,123 @@ class Camera(object):
         self.__lens_film_dist = _l2f_dist
 
     # get ray
-    def get_ray(self, _dx, _dy):
+    def get_ray(self, _dx, _dy, _ray=None):
         """get ray.
         \param[in] _dx delta x normalized screen coordinate [0,1]
         \param[in] _dy delta y normalized screen coordinate [0,1]
+        \param[in] _ray a ray to reuse (reset for a new path). None:
+        create a new ray.
         \return a ray
         """
         target =  self.__LB_corner + _dx * self.__ex + _dy * self.__ey
         vdir   =  target - self.__eye_pos
         vdir   /= numpy.linalg.norm(vdir)
 
+        if _ray != None:
+            _ray.reset(self.__eye_pos, vdir, self.__z_near, self.__z_far)
+            _ray.reset_path()
+            return _ray
+
         r = Ray.Ray(self.__eye_pos, vdir, self.__z_near, self.__z_far)
         return r
 
+    def generate_rays(self, _dx, _dy, _lens_uv=None, _lens_radius=0.0):
+        """generate many rays at once (vectorized get_ray).
+
+        Without lens samples, the rays are the same as get_ray(). With
+        lens samples, the ray origins are on a thin lens of radius
+        _lens_radius and the rays converge on the focal plane. The
+        focal plane distance is given by the thin lens equation from
+        the focal length and the lens to film distance,
+        1/f = 1/d_o + 1/d_i. When d_i <= f, the focal plane is at
+        infinity.
+
+        \param[in] _dx normalized screen coordinate x [0,1], numpy.array (N,)
+        \param[in] _dy normalized screen coordinate y [0,1], numpy.array (N,)
+        \param[in] _lens_uv samples on a unit disk numpy.array (N,2),
+        None for a pinhole camera.
+        \param[in] _lens_radius lens (aperture) radius
+        \return (origin, direction) numpy.array (N,3) each. direction
+        is normalized.
+        """
+        dx = numpy.asarray(_dx, dtype=numpy.float64)[:, numpy.newaxis]
+        dy = numpy.asarray(_dy, dtype=numpy.float64)[:, numpy.newaxis]
+        target = self.__LB_corner + dx * self.__ex + dy * self.__ey
+        vdir   = target - self.__eye_pos
+        vdir  /= numpy.sqrt((vdir * vdir).sum(axis=1))[:, numpy.newaxis]
+        orig   = numpy.tile(self.__eye_pos, (vdir.shape[0], 1))
+
+        if (_lens_uv is None) or (_lens_radius <= 0.0):
+            return (orig, vdir)
+
+        # lens basis
+        ex = self.__ex / numpy.linalg.norm(self.__ex)
+        ey = self.__ey / numpy.linalg.norm(self.__ey)
+        lens_pos = _lens_radius * (_lens_uv[:, 0:1] * ex + _lens_uv[:, 1:2] * ey)
+
+        focal_dist = self.get_focal_plane_distance()
+        if focal_dist == float('inf'):
+            # parallel to the pinhole ray
+            return (orig + lens_pos, vdir)
+
+        # the pinhole ray point on the focal plane
+        cos_view = numpy.dot(vdir, self.__view_dir)
+        focal_pos = self.__eye_pos + (focal_dist / cos_view)[:, numpy.newaxis] * vdir
+        orig = orig + lens_pos
+        vdir = focal_pos - orig
+        vdir /= numpy.sqrt((vdir * vdir).sum(axis=1))[:, numpy.newaxis]
+        return (orig, vdir)
+
+
+    def generate_tile_rays(self, _xstart, _xend, _ystart, _yend, _jitter_xy=None,
+                           _lens_uv=None, _lens_radius=0.0):
+        """generate the rays of a pixel tile.
+
+        we generate pixel index [_xstart, _xend], [_ystart, _yend].
+        The ray order is the framebuffer order (x major), index =
+        (x - _xstart) * ysize + (y - _ystart).
+
+        \param[in] _xstart start of pixel x
+        \param[in] _xend   end   of pixel x (inclusive)
+        \param[in] _ystart start of pixel y
+        \param[in] _yend   end   of pixel y (inclusive)
+        \param[in] _jitter_xy sample position in the pixel [0,1)^2,
+        numpy.array (N,2). None for the pixel centers.
+        \param[in] _lens_uv samples on a unit disk numpy.array (N,2)
+        \param[in] _lens_radius lens (aperture) radius
+        \return (origin, direction) numpy.array (N,3) each.
+        """
+        assert(_xstart <= _xend)
+        assert(_ystart <= _yend)
+        xsize = _xend - _xstart + 1
+        ysize = _yend - _ystart + 1
+        px = numpy.repeat(numpy.arange(_xstart, _xend + 1, dtype=numpy.float64), ysize)
+        py = numpy.tile(numpy.arange(_ystart, _yend + 1, dtype=numpy.float64), xsize)
+        if _jitter_xy is None:
+            px += 0.5
+            py += 0.5
+        else:
+            px += _jitter_xy[:, 0]
+            py += _jitter_xy[:, 1]
+
+        return self.generate_rays(px * (1.0 / self.__resolution_x),
+                                  py * (1.0 / self.__resolution_y),
+                                  _lens_uv, _lens_radius)
+
+
+    def get_focal_plane_distance(self):
+        """get the focal plane (in focus plane) distance by the thin
+        lens equation.
+        \return focal plane distance from the lens, inf when the lens
+        to film distance is not larger than the focal length.
+        """
+        f   = float(self.__focal_length)
+        d_i = float(self.__lens_film_dist)
+        if d_i <= f:
+            return float('inf')
+        return f * d_i / (d_i - f)
+
+
     # set a film
     def set_film(self, _film_name, _film):
         """set a film.
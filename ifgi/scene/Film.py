@@ -9,6 +9,7 @@
 """
 
 from PIL import Image
+from multiprocessing import sharedctypes
 import numpy
 
 # # Film class: interface
@@ -43,10 +44,19 @@ class ImageFilm(object):
     """image film (frame buffer)"""
 
     # constructor
-    def __init__(self, _res, _buffername):
+    def __init__(self, _res, _buffername, _is_shared=False, _is_accumulation=False,
+                 _is_second_moment=False):
         """constructor.
         \param[in] _res  resolution tuple, (x, y, z) resolution.
         \param[in] _buffername buffer name (RGBA, Z, ...)
+        \param[in] _is_shared when True, the framebuffer is in shared
+        memory. Processes forked after this see the same framebuffer.
+        \param[in] _is_accumulation when True, the framebuffer is the
+        sum of accumulated frames and each pixel has a sample count.
+        The color is sum / sample count.
+        \param[in] _is_second_moment when True, the film also
+        accumulates the sum of squares of the frames for the per pixel
+        variance estimate. Accumulation mode only.
         """
         super(ImageFilm, self).__init__()
 
@@ -59,9 +69,21 @@ class ImageFilm(object):
         self.__buffername = _buffername
 
         # allocate buffer: zeros((shepe_touple), type, ...)
-        self.__framebuffer = numpy.zeros((self.__resolution[0],
-                                          self.__resolution[1],
-                                          self.__resolution[2]))
+        self.__is_shared = _is_shared
+        self.__framebuffer = self.__allocate((self.__resolution[0],
+                                              self.__resolution[1],
+                                              self.__resolution[2]), 'd')
+        # per pixel sample count (accumulation mode only)
+        self.__sample_count = None
+        if _is_accumulation:
+            self.__sample_count = self.__allocate((self.__resolution[0],
+                                                   self.__resolution[1]), 'i')
+        # per pixel sum of squares (second moment mode only)
+        self.__second_moment = None
+        if _is_second_moment:
+            if not _is_accumulation:
+                raise StandardError, ('second moment needs the accumulation mode film.')
+            self.__second_moment = self.__allocate(self.__resolution, 'd')
 
     # class name
     def get_classname(self):
@@ -85,6 +107,104 @@ class ImageFilm(object):
         """
         return self.__resolution
 
+    # is shared memory framebuffer
+    def is_shared(self):
+        """is the framebuffer in shared memory?
+        \return True when shared.
+        """
+        return self.__is_shared
+
+    # is accumulation mode
+    def is_accumulation(self):
+        """is the film in accumulation mode?
+        \return True when accumulation mode.
+        """
+        return self.__sample_count is not None
+
+    # get framebuffer
+    def get_framebuffer(self):
+        """get the framebuffer.
+        In accumulation mode, this is the sum of the accumulated
+        frames. Use get_image() for the color.
+        \return framebuffer numpy.array (x, y, z) (reference, not a copy)
+        """
+        return self.__framebuffer
+
+    # get sample count buffer
+    def get_sample_count_buffer(self):
+        """get the per pixel sample count buffer.
+        \return sample count numpy.array (x, y) (reference, not a
+        copy). None when not in accumulation mode.
+        """
+        return self.__sample_count
+
+    # get second moment buffer
+    def get_second_moment_buffer(self):
+        """get the per pixel sum of squares buffer.
+        \return sum of squares numpy.array (x, y, z) (reference, not a
+        copy). None when not in second moment mode.
+        """
+        return self.__second_moment
+
+    # get variance
+    def get_variance(self):
+        """get the variance of the pixel colors (the variance of the
+        mean of the samples, i.e., the squared standard error).
+        Second moment mode only.
+
+        \return variance numpy.array (x, y, z). inf for the pixels of
+        less than two samples.
+        """
+        if self.__second_moment is None:
+            raise StandardError, ('variance needs the second moment mode film.')
+
+        count = self.__sample_count[:, :, numpy.newaxis].astype(numpy.float64)
+        n  = numpy.maximum(count, 2.0)
+        sq = self.__second_moment - self.__framebuffer * self.__framebuffer / n
+        var = numpy.maximum(sq, 0.0) / ((n - 1.0) * n)
+        var[numpy.repeat(count < 2.0, self.__resolution[2], axis=2)] = numpy.inf
+        return var
+
+    # get image
+    def get_image(self):
+        """get the image (color of all pixels).
+        In accumulation mode, the image is normalized here.
+        \return image numpy.array (x, y, z). Do not modify it (it is
+        the framebuffer when not in accumulation mode).
+        """
+        if self.__sample_count is None:
+            return self.__framebuffer
+
+        count = numpy.maximum(self.__sample_count, 1)
+        return self.__framebuffer / count[:, :, numpy.newaxis]
+
+    # accumulate a frame
+    def accumulate(self, _frame, _offset=(0, 0)):
+        """accumulate a frame (or a tile) to the framebuffer.
+        Accumulation mode only.
+
+        \param[in] _frame  a frame numpy.array (xsize, ysize, z)
+        \param[in] _offset pixel position of _frame[0, 0]
+        """
+        if self.__sample_count is None:
+            raise StandardError, ('accumulate needs the accumulation mode film.')
+        xend = _offset[0] + _frame.shape[0]
+        yend = _offset[1] + _frame.shape[1]
+        self.__framebuffer[_offset[0]:xend, _offset[1]:yend] += _frame
+        self.__sample_count[_offset[0]:xend, _offset[1]:yend] += 1
+        if self.__second_moment is not None:
+            self.__second_moment[_offset[0]:xend, _offset[1]:yend] += _frame * _frame
+
+    # clear
+    def clear(self):
+        """clear the framebuffer (and the sample count) to zero.
+        """
+        self.__framebuffer.fill(0.0)
+        if self.__sample_count is not None:
+            self.__sample_count.fill(0)
+        if self.__second_moment is not None:
+            self.__second_moment.fill(0.0)
+
     # get color
     def get_color(self, _pos):
         """get color at pixel _pos in numpy array.
@@ -95,11 +215,16 @@ class ImageFilm(object):
         \param[in] _pos position of the pixel (x,y) or (x,y,z)
         \return color (numpy.array for (x,y), scalar for (x,y,z))
         """
-        return self.__framebuffer[_pos]
+        if self.__sample_count is None:
+            return self.__framebuffer[_pos]
+
+        count = max(self.__sample_count[_pos[0], _pos[1]], 1)
+        return self.__framebuffer[_pos] / float(count)
 
     # put color at a pixel
     def put_color(self, _pos, _color):
         """put a color at pixel _pos.
+        In accumulation mode, the pixel is reset to one sample of _color.
 
         \param[in] _pos   position as pixel (tuple), e.g., (80, 120)
         \param[in] _color pixel color as numpy.array. e.g., [1.0, 0.0, 0.0, 1.0]
@@ -107,6 +232,10 @@ class ImageFilm(object):
         assert(((len(_pos) == 2) and (len(_color) == self.__resolution[2])) or
                ((len(_pos) == 3) and (len(_color) == 1)))
         self.__framebuffer[_pos] = _color
+        if self.__sample_count is not None:
+            self.__sample_count[_pos[0], _pos[1]] = 1
+        if self.__second_moment is not None:
+            self.__second_moment[_pos] = numpy.asarray(_color) ** 2
 
 
     # fill color
@@ -117,58 +246,80 @@ class ImageFilm(object):
 
         \param[in] _col color to fill.
         """
-        for x in xrange(0, self.__resolution[0], 1):
-            for y in xrange(0, self.__resolution[1], 1):
-                self.__framebuffer[(x, y)] = _col
+        self.__framebuffer[:, :] = _col
+        if self.__sample_count is not None:
+            self.__sample_count.fill(1)
+        if self.__second_moment is not None:
+            self.__second_moment[:, :] = numpy.asarray(_col) ** 2
+
+
+    # get 8 bit image
+    def get_uint8_image(self, _exposure=1.0, _gamma=1.0):
+        """get the image as 8 bit per channel image array.
+
+        The color channels are scaled by _exposure, clamped to [0,1],
+        gamma corrected by 1/_gamma, and quantized. The alpha channel
+        is only clamped and quantized. Y is flipped (row 0 is the top
+        of the image).
+
+        \param[in] _exposure exposure scale of the color channels
+        \param[in] _gamma    display gamma
+        \return numpy.array (ysize, xsize, z) of uint8
+        """
+        image = numpy.array(self.get_image(), dtype=numpy.float64)
+        color_count = min(self.__resolution[2], 3)
+        color = image[:, :, 0:color_count]
+        if _exposure != 1.0:
+            color *= _exposure
+        numpy.clip(image, 0.0, 1.0, image)
+        if _gamma != 1.0:
+            numpy.power(color, 1.0 / _gamma, color)
+
+        # (x, y, z) -> (y, x, z), y is flipped
+        image = image.transpose(1, 0, 2)[::-1]
+        return numpy.ascontiguousarray(255.0 * image, dtype=numpy.uint8)
 
 
     # save buffer as an image file
-    def save_file(self, _filename):
+    def save_file(self, _filename, _exposure=1.0, _gamma=1.0):
         """save the buffer contents to a file.
         \param[in] _filename output file name
+        \param[in] _exposure exposure scale of the color channels
+        \param[in] _gamma    display gamma
         """
-        imgsize  = (self.__resolution[0], self.__resolution[1])
-        print imgsize
+        image = self.get_uint8_image(_exposure, _gamma)
 
         if(self.__resolution[2] == 1):
-            # grayscale -> convert to RGB
-            bg_white = (255, 255, 255)
-            img = Image.new("RGB", imgsize, bg_white)
-
-            for x in xrange(0, self.__resolution[0], 1):
-                for y in xrange(0, self.__resolution[1], 1):
-                    col = self.get_color(_pos)
-                    # duplicate the channels
-                    ucharcol = (255 * col[0], 255 * col[0], 255 * col[0])
-                    img.putpixel((x, self.__resolution[1] - y - 1), ucharcol)
-
+            # grayscale -> convert to RGB (duplicate the channels)
+            img = Image.fromarray(numpy.repeat(image, 3, axis=2), 'RGB')
         elif(self.__resolution[2] == 3):
             # RGB
-            bg_white = (255, 255, 255)
-            img = Image.new("RGB", imgsize, bg_white)
-
-            for x in xrange(0, self.__resolution[0], 1):
-                for y in xrange(0, self.__resolution[1], 1):
-                    col = self.get_color(_pos)
-                    ucharcol = (255 * col[0], 255 * col[1], 255 * col[2])
-                    img.putpixel((x, self.__resolution[1] - y - 1), ucharcol)
-
+            img = Image.fromarray(image, 'RGB')
         elif(self.__resolution[2] == 4):
             # RGBA
-            bg_white = (255, 255, 255, 255)
-            img = Image.new("RGBA", imgsize, bg_white)
-
-            for x in xrange(0, self.__resolution[0], 1):
-                for y in xrange(0, self.__resolution[1], 1):
-                    col = 255 * self.get_color((x, y))
-                    ucharcol = (int(col[0]), int(col[1]), int(col[2]), int(col[3]))
-                    img.putpixel((x, self.__resolution[1] - y - 1), ucharcol)
+            img = Image.fromarray(image, 'RGBA')
         else:
             raise StandardError, ('supported number of channels are 1, 3, and 4, only.')
 
         img.save(_filename)
 
 
+    # allocate a buffer
+    def __allocate(self, _shape, _typecode):
+        """allocate a zero initialized buffer.
+        \param[in] _shape    buffer shape
+        \param[in] _typecode 'd' (float64) or 'i' (int32)
+        \return numpy.array, in shared memory if this film is shared.
+        """
+        dtype = {'d': numpy.float64, 'i': numpy.int32}[_typecode]
+        if not self.__is_shared:
+            return numpy.zeros(_shape, dtype=dtype)
+
+        # zero initialized shared memory
+        shm = sharedctypes.RawArray(_typecode, int(numpy.prod(_shape)))
+        return numpy.frombuffer(shm, dtype=dtype).reshape(_shape)
+
+
     # human readable string
     def __str__(self):
 
@@ -17,18 +17,101 @@ from ifgi.base import OrthonomalBasis
 # HitRecord
 class HitRecord(object):
     """hit record. members are public.
+
+    The hit basis (OrthonomalBasis, w is the normal) is built at the
+    first access of hit_basis from the edges given by
+    set_basis_from_edge() or the frame given by set_basis_frame().
+    Many hit records are dropped (shadow rays, not the closest hit),
+    they never build the basis.
     """
 
+    __slots__ = ('dist', 'intersect_pos', 'hit_primitive',
+                 'hit_face_index', 'hit_barycentric', 'hit_material_index',
+                 '_hit_basis', '_basis_e1', '_basis_e2', '_basis_frame')
+
     # default constructor
     def __init__(self):
         """default constructor.
         """
+        self.reset()
+
+
+    def reset(self):
+        """reset to the no hit state in place.
+        """
         self.dist = sys.float_info.max
         self.intersect_pos = None
         self.hit_primitive = None
-        # w component is normal direction of hit point
-        self.hit_basis     = None
+        # hit face index and barycentric coordinate (b1, b2) when
+        # the hit primitive is a TriMesh
+        self.hit_face_index  = -1
+        self.hit_barycentric = None
         self.hit_material_index = -1
+        # w component is normal direction of hit point
+        self._hit_basis = None
+        self._basis_e1  = None
+        self._basis_e2  = None
+        self._basis_frame = None
+
+
+    def set_basis_from_edge(self, _e1, _e2):
+        """set the hit basis source. The basis is
+        OrthonomalBasis.init_from_uv(_e1, _e2), built when hit_basis
+        is accessed.
+        \param[in] _e1 triangle edge 1 (u direction)
+        \param[in] _e2 triangle edge 2
+        """
+        self._hit_basis = None
+        self._basis_e1  = _e1
+        self._basis_e2  = _e2
+        self._basis_frame = None
+
+
+    def set_basis_frame(self, _u, _v, _w):
+        """set the hit basis source, a precomputed orthonormal frame
+        (e.g., TriMesh.face_frame_*). The basis is built when
+        hit_basis is accessed.
+        \param[in] _u unit u
+        \param[in] _v unit v
+        \param[in] _w unit w (normal)
+        """
+        self._hit_basis = None
+        self._basis_e1  = None
+        self._basis_e2  = None
+        self._basis_frame = (_u, _v, _w)
+
+
+    def is_hit_basis_built(self):
+        """has the hit basis been built?
+        \return True when built (or set)
+        """
+        return self._hit_basis is not None
+
+
+    def __get_hit_basis(self):
+        """get the hit basis. built at the first access.
+        \return OrthonomalBasis, None when no basis source
+        """
+        if self._hit_basis is None:
+            if self._basis_frame is not None:
+                self._hit_basis = OrthonomalBasis.OrthonomalBasis()
+                self._hit_basis.set(*self._basis_frame)
+            elif self._basis_e1 is not None:
+                self._hit_basis = OrthonomalBasis.OrthonomalBasis()
+                self._hit_basis.init_from_uv(self._basis_e1, self._basis_e2) # set normal
+        return self._hit_basis
+
+    def __set_hit_basis(self, _hit_basis):
+        """set the hit basis.
+        \param[in] _hit_basis OrthonomalBasis
+        """
+        self._hit_basis = _hit_basis
+        self._basis_e1  = None
+        self._basis_e2  = None
+        self._basis_frame = None
+
+    hit_basis = property(__get_hit_basis, __set_hit_basis)
+
 
     # class name
     def get_classname(self):
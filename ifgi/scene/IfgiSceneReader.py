@@ -7,9 +7,49 @@
 \brief ifgi scene reader (reader example)"""
 
 import math, numpy, string, exceptions, os.path
-import ConvReader2Primitive, ObjReader
+import multiprocessing, functools
+import ObjReader, MeshCache, Primitive
+from ifgi.base import numpy_util
 from ifgi.base.ILog import ILog
 
+
+def read_geometry_data(_geo_fpath, _is_use_mesh_cache):
+    """read an obj geometry file.
+    \param[in] _geo_fpath         obj file path
+    \param[in] _is_use_mesh_cache use the binary mesh cache when True
+    \return TriMesh.set_data() argument tuple (vertex list, face index
+    list, texcoord list, texcoord index list, normal list, normal
+    index list)
+    """
+    if _is_use_mesh_cache:
+        array_dict = MeshCache.load_obj_array_dict(_geo_fpath)
+        return tuple([array_dict[name] for (name, dtype, column)
+                      in MeshCache.ARRAY_DEF_LIST])
+
+    objreader = ObjReader.ObjReader()
+    objreader.read_bulk(_geo_fpath)
+    return (objreader.vertex_list,   objreader.face_idx_list,
+            objreader.texcoord_list, objreader.texcoord_idx_list,
+            objreader.normal_list,   objreader.normal_idx_list)
+
+
+def _read_geometry_task(_task_arg):
+    """geometry loader process task.
+
+    With the mesh cache, the worker only makes the cache valid and
+    returns None. The caller memory maps the cache, it is cheaper than
+    sending the arrays back.
+
+    \param[in] _task_arg (obj file path, use the mesh cache)
+    \return read_geometry_data() result, or None with the mesh cache.
+    """
+    (geo_fpath, is_use_mesh_cache) = _task_arg
+    if is_use_mesh_cache:
+        MeshCache.load_obj_array_dict(geo_fpath)
+        return None
+    return read_geometry_data(geo_fpath, False)
+
+
 class IfgiSceneReader(object):
     """IfgiSceneReader class.
 
@@ -37,6 +77,9 @@ class IfgiSceneReader(object):
       }
 
     The geometry should be read after ifgi scene file has been read.
+    The geometry files are read by worker processes in parallel (see
+    set_load_worker_count()), or loaded at the first access (see
+    set_lazy_geometry_load()).
     Geometry info also has 'TriMesh' entry. This is contents of geo_file_name.
 
     - geo_info['geo_name'] = name_of_geometry
@@ -45,6 +88,25 @@ class IfgiSceneReader(object):
     - geo_info['geo_file_name'] = filename
     - geo_info['TriMesh']  = Primitive.TriMesh object
 
+    - def instance {
+        inst_name = name_of_instance
+        geo_name = name_of_geometry
+        material = material_name
+        matrix = m00 m01 m02 m03 m10 ... m33
+      }
+
+    An instance places a geometry (defined before) again by the
+    object to world matrix (16 numbers, row major). The geometry file
+    is read once and shared. material is optional, the default is the
+    geometry's material. An instance name must differ from the
+    geometry names.
+
+    - inst_info['inst_name'] = name_of_instance
+    - inst_info['geo_name']  = name_of_geometry
+    - inst_info['material']  = material_name
+    - inst_info['matrix']    = 4x4 numpy.array
+    - inst_info['TriMeshInstance'] = Primitive.TriMeshInstance object
+
     - def camera {
         cam_name = name_of_camera
         eye_pos = eye_pos
@@ -66,6 +128,10 @@ class IfgiSceneReader(object):
     # supported geometry file format
     __supported_geometry_format = ['obj']
 
+    # geometry files are read in parallel when their total size is
+    # larger than this (bytes). The process pool costs ~0.1 s.
+    PARALLEL_LOAD_MIN_BYTES = 1 << 20
+
 
     # public: ------------------------------------------------------------
 
@@ -73,7 +139,7 @@ class IfgiSceneReader(object):
         """default constructor"""
         self.__curline     = -1
 
-        self.__defined_type_list = ['material', 'geometry', 'camera']
+        self.__defined_type_list = ['material', 'geometry', 'instance', 'camera']
 
         self.__ifgi_abspath = ''
         self.__ifgi_dirname = ''
@@ -87,12 +153,89 @@ class IfgiSceneReader(object):
         #    geometry name -> index of geometry_def_list
         self.geometry_name_idx_dict = {}
 
+        # instance
+        self.instance_dict_list = []
+        #    instance name -> index of instance_dict_list
+        self.instance_name_idx_dict = {}
+
         # camera. This is dict
         self.camera_dict_dict = {}
 
         # last read status
         self.__is_valid = False
 
+        # use the binary mesh cache (MeshCache) for geometry files
+        self.__is_use_mesh_cache = False
+
+        # number of geometry loader processes. 0: number of CPUs
+        self.__load_worker_count = 0
+
+        # cache of the built BVHs for SceneGeometryMaterialContainer
+        self.__bvh_cache = None
+
+        # load geometry files at the first access
+        self.__is_lazy_geometry_load = False
+
+
+    def set_use_mesh_cache(self, _is_use_mesh_cache):
+        """set use the binary mesh cache for the geometry files.
+
+        When True, an obj file is loaded from its binary cache file
+        (foo.obj.ifgimesh) if the cache is valid, otherwise the cache
+        is written. Default is False.
+
+        \param[in] _is_use_mesh_cache use the mesh cache when True
+        """
+        self.__is_use_mesh_cache = _is_use_mesh_cache
+
+
+    def set_bvh_cache(self, _bvh_cache):
+        """set the BVH cache of the scene.
+
+        SceneGeometryMaterialContainer.append_ifgi_data() takes it, its
+        build_accelerator() reads the cached BVHs of the meshes.
+        Default is None: the container's default cache,
+        BVHCache.get_default_cache(). It is the directory of the
+        environment variable IFGI_BVH_CACHE_DIR, and there is no BVH
+        cache when the variable is not set.
+
+        \param[in] _bvh_cache BVHCache
+        """
+        self.__bvh_cache = _bvh_cache
+
+
+    def get_bvh_cache(self):
+        """get the BVH cache of the scene.
+        \return BVHCache, None when not set
+        """
+        return self.__bvh_cache
+
+
+    def set_load_worker_count(self, _worker_count):
+        """set the number of geometry loader processes.
+
+        The geometry files are read in parallel, the results are in
+        the declaration order. 1 reads the files one by one in this
+        process. Small scenes (less than PARALLEL_LOAD_MIN_BYTES) are
+        always read in this process. Default is 0.
+
+        \param[in] _worker_count number of loader processes. 0: number
+        of CPUs.
+        """
+        self.__load_worker_count = _worker_count
+
+
+    def set_lazy_geometry_load(self, _is_lazy_geometry_load):
+        """set lazy geometry loading.
+
+        When True, geo_info['TriMesh'] is a Primitive.LazyTriMesh. Its
+        geometry file is read at the first access (bounding box, ray
+        intersection, draw, ...). Default is False.
+
+        \param[in] _is_lazy_geometry_load load at the first access when True
+        """
+        self.__is_lazy_geometry_load = _is_lazy_geometry_load
+
 
     def read(self, _ifgi_fname_path):
         """read a ifgi scene file.
@@ -136,6 +279,7 @@ class IfgiSceneReader(object):
 
         # now read geometry files
         self.__read_all_geometry_file()
+        self.__create_all_instance()
         self.__is_valid = True
         return True
 
@@ -170,6 +314,10 @@ class IfgiSceneReader(object):
         for g in self.geometry_dict_list:
             print 'def_geometry:', g
 
+        print '--- instance definition'
+        for i in self.instance_dict_list:
+            print 'def_instance:', i
+
         print '--- camera definition'
         for c in self.camera_dict_dict.keys():
             print 'def_camera:', self.camera_dict_dict[c]
@@ -284,6 +432,65 @@ class IfgiSceneReader(object):
         # somewhere else.
 
 
+    def __is_valid_instance(self, _inst_dict):
+        """check the instance information. The matrix string is
+        converted to a 4x4 numpy.array.
+        \param[in] _inst_dict
+        \return True when instance information is valid.
+        """
+        necessary_key = ['inst_name', 'geo_name', 'matrix']
+        for k in necessary_key:
+            if(not k in _inst_dict):
+                ILog.error('invalid instance: missing necessary key [' + k +\
+                               '], in the instance block of line ' + str(self.__curline))
+                return False
+
+        # geometry exists?
+        geo_name = _inst_dict['geo_name']
+        if (not (geo_name in self.geometry_name_idx_dict)):
+            ILog.error('geometry ['+ geo_name + '] of instance [' +\
+                           _inst_dict['inst_name'] + '] is not defined before the ' +\
+                           'instance block of line ' + str(self.__curline))
+            return False
+
+        # material exists? default is the geometry's
+        if (not ('material' in _inst_dict)):
+            geo_idx = self.geometry_name_idx_dict[geo_name]
+            _inst_dict['material'] = self.geometry_dict_list[geo_idx]['material']
+        if (not (_inst_dict['material'] in self.material_name_idx_dict)):
+            ILog.error('material ['+ _inst_dict['material'] + '] of instance [' +\
+                           _inst_dict['inst_name'] + '] is not defined in the instance ' +\
+                           'block of line ' + str(self.__curline))
+            return False
+
+        matrix = numpy_util.str2array(str(_inst_dict['matrix']))
+        if len(matrix) != 16:
+            ILog.error('matrix of instance [' + _inst_dict['inst_name'] +\
+                           '] must be 16 numbers, in the instance block of line ' +\
+                           str(self.__curline))
+            return False
+        _inst_dict['matrix'] = matrix.reshape((4, 4))
+
+        return True
+
+
+    def __append_instance(self, _new_inst_dict):
+        """append new instance.
+        \param[in] _new_inst_dict new instance info dict to append.
+        """
+        if (not self.__is_valid_instance(_new_inst_dict)):
+            raise StandardError, ('invalid instance.')
+
+        inst_name = _new_inst_dict['inst_name']
+        if((inst_name in self.instance_name_idx_dict) or
+           (inst_name in self.geometry_name_idx_dict)):
+            raise StandardError, ('duplicate instance [' + inst_name + '].')
+
+        new_inst_idx = len(self.instance_dict_list)
+        self.instance_dict_list.append(_new_inst_dict)
+        self.instance_name_idx_dict[inst_name] = new_inst_idx
+
+
     def __is_valid_camera(self, _cam_dict):
         """check the camera dictionary validity.
         """
@@ -402,6 +609,8 @@ class IfgiSceneReader(object):
             self.__append_material(def_dict)
         elif(_define_type == 'geometry'):
             self.__append_geometry(def_dict)
+        elif(_define_type == 'instance'):
+            self.__append_instance(def_dict)
         elif(_define_type == 'camera'):
             self.__append_camera(def_dict)
 
@@ -409,30 +618,71 @@ class IfgiSceneReader(object):
 
     def __read_all_geometry_file(self):
         """read all geometry files.
+
+        The files are read by a process pool, then the TriMeshes are
+        created in the declaration order.
         """
+        geo_fpath_list = []
         for geoinfo in self.geometry_dict_list:
-            self.__read_geometry_file(geoinfo)
-
-
-    def __read_geometry_file(self, _geoinfo):
-        """read single geometry file.
+            geo_ftype = geoinfo['geo_file_type']
+            if not (geo_ftype in self.__supported_geometry_format):
+                raise StandardError, ('non supported geometry file format ['+ geo_ftype + ']')
+            geo_fpath_list.append(os.path.join(self.__ifgi_dirname,
+                                               geoinfo['geo_file_name']))
+
+        if self.__is_lazy_geometry_load:
+            for (geoinfo, geo_fpath) in zip(self.geometry_dict_list, geo_fpath_list):
+                loader = functools.partial(read_geometry_data, geo_fpath,
+                                           self.__is_use_mesh_cache)
+                geoinfo['TriMesh'] = Primitive.LazyTriMesh(geoinfo['geo_name'],
+                                                           geoinfo['material'],
+                                                           loader)
+            return
+
+        worker_count = self.__load_worker_count
+        if worker_count <= 0:
+            worker_count = multiprocessing.cpu_count()
+        worker_count = min(worker_count, len(geo_fpath_list))
+        total_bytes  = sum([os.path.getsize(fpath) for fpath in geo_fpath_list])
+        if total_bytes < IfgiSceneReader.PARALLEL_LOAD_MIN_BYTES:
+            worker_count = 1
+
+        data_list = [None] * len(geo_fpath_list)
+        if worker_count > 1:
+            ILog.info('loading ' + str(len(geo_fpath_list)) + ' geometry files by ' +
+                      str(worker_count) + ' processes')
+            pool = multiprocessing.Pool(worker_count)
+            try:
+                data_list = pool.map(_read_geometry_task,
+                                     [(fpath, self.__is_use_mesh_cache)
+                                      for fpath in geo_fpath_list])
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
+
+        for (geoinfo, geo_fpath, data) in zip(self.geometry_dict_list, geo_fpath_list,
+                                              data_list):
+            if data == None:
+                ILog.info('loading [' + geo_fpath + ']')
+                data = read_geometry_data(geo_fpath, self.__is_use_mesh_cache)
+            tmesh = Primitive.TriMesh(geoinfo['geo_name'], geoinfo['material'])
+            tmesh.set_data(*data)
+            geoinfo['TriMesh'] = tmesh
+
+
+    def __create_all_instance(self):
+        """create the instances of the read geometries. An instance
+        shares the TriMesh of its geometry.
         """
-        geo_ftype = _geoinfo['geo_file_type']
-        if not (geo_ftype in self.__supported_geometry_format):
-            raise StandardError, ('non supported geometry file format ['+ geo_ftype + ']')
-
-        geo_fpath = os.path.join(self.__ifgi_dirname, _geoinfo['geo_file_name'])
-        ILog.info('loading [' + geo_fpath + ']')
-
-        if (geo_ftype == 'obj'):
-            objreader = ObjReader.ObjReader()
-            objreader.read(geo_fpath)
-            # objreader.dump()
-            tmesh = ConvReader2Primitive.\
-                conv_objreader_trimesh(objreader, _geoinfo['geo_name'],
-                                       _geoinfo['material'])
-            # print tmesh.info_summary()
-            _geoinfo['TriMesh'] = tmesh
+        for instinfo in self.instance_dict_list:
+            geo_idx = self.geometry_name_idx_dict[instinfo['geo_name']]
+            tmesh   = self.geometry_dict_list[geo_idx]['TriMesh']
+            instinfo['TriMeshInstance'] = \
+                Primitive.TriMeshInstance(instinfo['inst_name'], tmesh,
+                                          instinfo['matrix'], instinfo['material'])
 
 #
 # main test ... test_IfgiSceneReader
@@ -441,4 +691,3 @@ class IfgiSceneReader(object):
 #
 # if __name__ == '__main__':
 #     pass
-
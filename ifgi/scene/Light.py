@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI light
+\file
+\brief light registry for the explicit light sampling (next event
+estimation).
+"""
+
+import numpy
+
+from ifgi.base.ILog import ILog
+
+
+class LightRegistry(object):
+    """light registry: all the emitting triangles of a scene.
+
+    The registry is built from the geometries whose material is_emit()
+    is True. Each triangle of such a TriMesh is an area light. A light
+    is chosen proportional to its power (area x mean emit radiance),
+    then a point is chosen uniformly on the triangle.
+
+    An emitter emits to both sides, the same as a path that hits an
+    emitter.
+
+    The light index of face fi of geometry gi is
+    get_light_index(gi, fi).
+    """
+
+    def __init__(self, _scene_geo_mat):
+        """constructor.
+
+        \param[in] _scene_geo_mat SceneGeometryMaterialContainer. The
+        material index of the geometries should be set.
+        """
+        super(LightRegistry, self).__init__()
+
+        mat_list = _scene_geo_mat.material_list
+        geo_dict_list = _scene_geo_mat.geometry_dict_list
+
+        v0_list   = [numpy.zeros((0, 3))]
+        e1_list   = [numpy.zeros((0, 3))]
+        e2_list   = [numpy.zeros((0, 3))]
+        n_list    = [numpy.zeros((0, 3))]
+        area_list = [numpy.zeros(0)]
+        emit_list = []
+        # first light index of each geometry, -1: not an emitter
+        self.__geo_light_offset = numpy.empty(len(geo_dict_list), dtype=numpy.int32)
+        self.__geo_light_offset.fill(-1)
+        light_count = 0
+        for (gi, geo_dict) in enumerate(geo_dict_list):
+            tmesh = geo_dict['TriMesh']
+            mat   = mat_list[tmesh.material_index]
+            if not mat.is_emit():
+                continue
+            face_count = len(tmesh.face_idx_list)
+            self.__geo_light_offset[gi] = light_count
+            v0_list.append(tmesh.face_v0)
+            e1_list.append(tmesh.face_e1)
+            e2_list.append(tmesh.face_e2)
+            n_list.append(tmesh.face_frame_w)
+            area_list.append(tmesh.face_area)
+            emit = numpy.asarray(mat.emit_radiance(None, None, None, None),
+                                 dtype=numpy.float64)
+            emit_list.append(numpy.tile(emit, (face_count, 1)))
+            light_count += face_count
+
+        self.__v0 = numpy.vstack(v0_list)
+        self.__e1 = numpy.vstack(e1_list)
+        self.__e2 = numpy.vstack(e2_list)
+        self.__normal = numpy.vstack(n_list)
+        self.__area   = numpy.concatenate(area_list)
+        if light_count > 0:
+            self.__emit = numpy.vstack(emit_list)
+        else:
+            self.__emit = numpy.zeros((0, 1))
+
+        # power proportional selection. zero area triangles are never
+        # chosen.
+        power = self.__area * self.__emit.mean(axis=1)
+        self.__total_power = power.sum()
+        if self.__total_power > 0.0:
+            self.__select_prob = power / self.__total_power
+        else:
+            self.__select_prob = numpy.zeros(light_count)
+        self.__select_cdf = numpy.cumsum(self.__select_prob)
+
+        ILog.info('light registry: ' + str(light_count) + ' light triangles, ' +
+                  'total power ' + str(self.__total_power))
+
+
+    def get_light_count(self):
+        """get number of light triangles.
+        \return number of light triangles
+        """
+        return len(self.__area)
+
+
+    def can_sample(self):
+        """can sample a light? (some lights emit.)
+        \return True when a light can be sampled.
+        """
+        return self.__total_power > 0.0
+
+
+    def get_light_index(self, _geo_idx, _face_idx):
+        """get the light indices of faces (vectorized).
+
+        \param[in] _geo_idx  geometry indices numpy.array (N,)
+        \param[in] _face_idx face indices numpy.array (N,)
+        \return light indices numpy.array (N,), -1 when the face does
+        not emit.
+        """
+        offset = self.__geo_light_offset[_geo_idx]
+        return numpy.where(offset >= 0, offset + _face_idx, -1)
+
+
+    def get_pdf_area(self, _light_idx):
+        """get the sampling probability density with respect to area.
+
+        \param[in] _light_idx light indices numpy.array (N,)
+        \return probability density [1/area] numpy.array (N,)
+        """
+        area = self.__area[_light_idx]
+        return numpy.where(area > 0.0,
+                           self.__select_prob[_light_idx] / numpy.maximum(area, 1e-300),
+                           0.0)
+
+
+    def get_emit_radiance(self, _light_idx):
+        """get emit radiance of lights.
+        \param[in] _light_idx light indices numpy.array (N,)
+        \return emit radiance numpy.array (N, channels)
+        """
+        return self.__emit[_light_idx]
+
+
+    def sample_array(self, _sample_count, _rng):
+        """sample points on the lights.
+
+        \param[in] _sample_count number of samples
+        \param[in] _rng random number generator (numpy.random.RandomState)
+        \return (position (N,3), unit normal (N,3), emit radiance
+        (N,channels), pdf with respect to area (N,), light index
+        (N,)) numpy.arrays.
+        """
+        return self.warp_sample_array(_rng.random_sample((_sample_count, 3)))
+
+
+    def warp_sample_array(self, _u):
+        """map uniform samples to points on the lights.
+
+        \param[in] _u uniform samples in [0,1)^3 numpy.array (N,3).
+        _u[:,0] chooses a light, _u[:,1:3] chooses a point on it.
+        \return the same as sample_array()
+        """
+        if not self.can_sample():
+            raise StandardError, ('no light to sample.')
+
+        u = _u
+        light_idx = numpy.searchsorted(self.__select_cdf, u[:, 0] * self.__select_cdf[-1],
+                                       side='right')
+        light_idx = numpy.minimum(light_idx, len(self.__select_cdf) - 1)
+
+        # uniform on a triangle
+        su = numpy.sqrt(u[:, 1])
+        b1 = (1.0 - su)[:, numpy.newaxis]
+        b2 = (u[:, 2] * su)[:, numpy.newaxis]
+        pos = self.__v0[light_idx] + b1 * self.__e1[light_idx] + b2 * self.__e2[light_idx]
+
+        return (pos, self.__normal[light_idx], self.__emit[light_idx],
+                self.get_pdf_area(light_idx), light_idx)
+
+
+    def sample(self, _rng):
+        """sample one point on the lights.
+
+        \param[in] _rng random number generator (numpy.random.RandomState)
+        \return (position, unit normal, emit radiance, pdf with
+        respect to area, light index)
+        """
+        (pos, normal, emit, pdf_area, light_idx) = self.sample_array(1, _rng)
+        return (pos[0], normal[0], emit[0], pdf_area[0], light_idx[0])
+
+
+    def __str__(self):
+        """human readable string.
+        """
+        return 'LightRegistry: %d light triangles, total area %g, total power %g' % \
+            (self.get_light_count(), self.__area.sum(), self.__total_power)
@@ -91,13 +91,34 @@ class Material(object):
 
         \param[in] _hit_onb hit point orthonomal basis
         \param[in] _incident_dir incident direction
-        \param[in] _hemisphere_sampler   uniform sampler on a hemisphere
+        \param[in] _hemisphere_sampler   sampler on a hemisphere
 
         \return outgoing direction, None if not supported
         """
         return None
 
 
+    def sample_brdf(self, _hit_onb, _incident_dir, _tex_point, _tex_uv,
+                    _hemisphere_sampler):
+        """sample an outgoing direction with its pdf and brdf
+
+        The path throughput is multiplied by brdf * cos / pdf, cos is
+        the cosine between the outgoing direction and the normal
+        (_hit_onb.w()).
+
+        \param[in] _hit_onb hit point orthonomal basis
+        \param[in] _incident_dir incident direction
+        \param[in] _tex_point texture 3d point (if solid)
+        \param[in] _tex_uv    texture uv coordinate (if surface)
+        \param[in] _hemisphere_sampler sampler on a hemisphere (with
+        get_pdf()), e.g., Sampler.UnitHemisphereCosineSampler
+
+        \return (outgoing direction, pdf respect to solid angle, brdf),
+        None if not supported
+        """
+        return None
+
+
     def specular_direction(self, _hit_onb, _incident_dir, _tex_point, _tex_uv,\
                               _rnd_seed, _tex_color, _v_out):
         """explicit brdf
@@ -249,7 +270,7 @@ class DiffuseMaterial(Material):
         self.__emit_color = None
         zero4 = numpy.zeros(4)
         # None or all zeros => None
-        if (_emit_color == None) or all(_emit_color == zero4):
+        if (_emit_color is None) or all(_emit_color == zero4):
             return
 
         if not(all(_emit_color >= zero4)):
@@ -269,7 +290,7 @@ class DiffuseMaterial(Material):
         """is emit light?.
         \return true when emit light.
         """
-        return self.__emit_color != None
+        return self.__emit_color is not None
 
 
     def emit_radiance(self, _hit_onb, _light_out_dir, _tex_point, _tex_uv):
@@ -315,7 +336,7 @@ class DiffuseMaterial(Material):
 
         \param[in] _hit_onb hit point orthonomal basis
         \param[in] _incident_dir incident direction
-        \param[in] _hemisphere_sampler uniform sampler on a hemisphere
+        \param[in] _hemisphere_sampler sampler on a hemisphere
         \param[out] _v_out outgoing vector?
 
         \return outgoing direction, None if not supported
@@ -332,6 +353,32 @@ class DiffuseMaterial(Material):
         return v_out
 
 
+    def sample_brdf(self, _hit_onb, _incident_dir, _tex_point, _tex_uv,
+                    _hemisphere_sampler):
+        """sample an outgoing direction with its pdf and brdf
+
+        Lambert brdf is albedo/pi. With a cosine weighted sampler
+        (pdf = cos/pi), brdf * cos / pdf is the albedo.
+
+        \param[in] _hit_onb hit point orthonomal basis
+        \param[in] _incident_dir incident direction
+        \param[in] _tex_point texture 3d point (if solid)
+        \param[in] _tex_uv    texture uv coordinate (if surface)
+        \param[in] _hemisphere_sampler sampler on a hemisphere (with get_pdf())
+
+        \return (outgoing direction, pdf respect to solid angle, brdf)
+        """
+        v_on_hs = _hemisphere_sampler.get_sample()
+        v_out   = \
+            v_on_hs[0] * _hit_onb.u() +\
+            v_on_hs[1] * _hit_onb.v() +\
+            v_on_hs[2] * _hit_onb.w()
+        pdf  = _hemisphere_sampler.get_pdf(v_on_hs)
+        brdf = self.explicit_brdf(_hit_onb, _incident_dir, v_out, _tex_point, _tex_uv)
+
+        return (v_out, pdf, brdf)
+
+
     # def specular_direction(self, _hit_onb, _incident_dir, _tex_point, _tex_uv,\
     #                           _rnd_seed, _tex_color, _v_out):
 
@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+
+"""IFGI binary mesh cache
+\file
+\brief binary mesh cache of obj files. memory mapped loading.
+
+The cache file is next to the obj file (foo.obj -> foo.obj.ifgimesh).
+
+File format (all little endian):
+- magic 'IFGIMESH'
+- header length (uint32)
+- header: repr() of a dict
+  - 'version':      cache format version
+  - 'source_path':  absolute path of the obj file
+  - 'source_mtime': mtime of the obj file
+  - 'source_size':  size of the obj file
+  - 'array_list':   list of (name, dtype string, shape, offset)
+- arrays, each starts at ARRAY_ALIGN aligned offset.
+
+The cache is valid when the path, mtime and size of the obj file are
+the same as in the header. Otherwise, it is rebuilt.
+"""
+
+import os, struct, ast
+import numpy
+
+import ObjReader, Primitive
+from ifgi.base import ifgi_util
+from ifgi.base.ILog import ILog
+
+
+# cache file extension
+CACHE_EXT = '.ifgimesh'
+# magic
+MAGIC = 'IFGIMESH'
+# format version
+VERSION = 1
+# array alignment in the cache file
+ARRAY_ALIGN = 64
+
+# (name, dtype, columns) of the cached arrays. texcoord has 2 or 3
+# columns (None).
+ARRAY_DEF_LIST = [('vertex_list',       '<f8', 3),
+                  ('face_idx_list',     '<i4', 3),
+                  ('texcoord_list',     '<f8', None),
+                  ('texcoord_idx_list', '<i4', 3),
+                  ('normal_list',       '<f8', 3),
+                  ('normal_idx_list',   '<i4', 3)]
+
+
+def get_cache_filename(_objfname):
+    """get the cache file name of an obj file.
+    \param[in] _objfname obj file name
+    \return cache file name
+    """
+    return _objfname + CACHE_EXT
+
+
+def get_source_key(_objfname):
+    """get the cache key of an obj file.
+    \param[in] _objfname obj file name
+    \return (absolute path, mtime, size)
+    """
+    st = os.stat(_objfname)
+    return (os.path.abspath(_objfname), st.st_mtime, st.st_size)
+
+
+def write_cache(_objfname, _array_dict):
+    """write the cache file of an obj file.
+
+    The file is written atomically, see ifgi_util.atomic_write().
+
+    \param[in] _objfname   obj file name
+    \param[in] _array_dict name -> numpy.array of ARRAY_DEF_LIST
+    \return True when written.
+    """
+    (src_path, src_mtime, src_size) = get_source_key(_objfname)
+
+    array_list = []
+    data_list  = []
+    offset = 0
+    for (name, dtype, column) in ARRAY_DEF_LIST:
+        arr = numpy.ascontiguousarray(_array_dict[name], dtype=dtype)
+        offset = (offset + ARRAY_ALIGN - 1) / ARRAY_ALIGN * ARRAY_ALIGN
+        array_list.append((name, dtype, arr.shape, offset))
+        data_list.append((offset, arr))
+        offset += arr.nbytes
+
+    header = repr({'version':      VERSION,
+                   'source_path':  src_path,
+                   'source_mtime': src_mtime,
+                   'source_size':  src_size,
+                   'array_list':   array_list})
+    # array offset is relative to the data start
+    data_start = len(MAGIC) + 4 + len(header)
+    data_start = (data_start + ARRAY_ALIGN - 1) / ARRAY_ALIGN * ARRAY_ALIGN
+
+    def write_file(_outfile):
+        _outfile.write(MAGIC)
+        _outfile.write(struct.pack('<I', len(header)))
+        _outfile.write(header)
+        for (arr_offset, arr) in data_list:
+            _outfile.seek(data_start + arr_offset)
+            _outfile.write(arr.tostring())
+
+    cache_fname = get_cache_filename(_objfname)
+    try:
+        ifgi_util.atomic_write(cache_fname, write_file)
+    except (IOError, OSError), extrainfo:
+        ILog.warn('cannot write mesh cache [' + cache_fname + '] ' + str(extrainfo))
+        return False
+
+    return True
+
+
+def read_cache(_objfname):
+    """read the cache file of an obj file (memory mapped).
+
+    \param[in] _objfname obj file name
+    \return name -> numpy.array (read only memory map) dict. None when
+    there is no valid cache.
+    """
+    cache_fname = get_cache_filename(_objfname)
+    if not os.path.isfile(cache_fname):
+        return None
+
+    try:
+        with open(cache_fname, 'rb') as infile:
+            if infile.read(len(MAGIC)) != MAGIC:
+                raise StandardError, ('not a mesh cache file.')
+            buf = infile.read(4)
+            if len(buf) != 4:
+                raise StandardError, ('truncated mesh cache file.')
+            header_len = struct.unpack('<I', buf)[0]
+            buf = infile.read(header_len)
+            if len(buf) != header_len:
+                raise StandardError, ('truncated mesh cache file.')
+            header = ast.literal_eval(buf)
+
+        if header['version'] != VERSION:
+            return None
+        (src_path, src_mtime, src_size) = get_source_key(_objfname)
+        if ((header['source_path']  != src_path)  or
+            (header['source_mtime'] != src_mtime) or
+            (header['source_size']  != src_size)):
+            return None
+
+        data_start = len(MAGIC) + 4 + header_len
+        data_start = (data_start + ARRAY_ALIGN - 1) / ARRAY_ALIGN * ARRAY_ALIGN
+        file_size  = os.path.getsize(cache_fname)
+        array_dict = {}
+        for (name, dtype, shape, offset) in header['array_list']:
+            count = int(numpy.prod(shape))
+            if count == 0:
+                array_dict[name] = numpy.zeros(shape, dtype=dtype)
+                continue
+            nbytes = count * numpy.dtype(dtype).itemsize
+            if data_start + offset + nbytes > file_size:
+                raise StandardError, ('truncated mesh cache file.')
+            array_dict[name] = numpy.memmap(cache_fname, dtype=dtype, mode='r',
+                                            offset=data_start + offset, shape=shape)
+    except (StandardError, SyntaxError), extrainfo:
+        ILog.warn('ignore broken mesh cache [' + cache_fname + '] ' + str(extrainfo))
+        return None
+
+    return array_dict
+
+
+def objreader_to_array_dict(_objreader):
+    """convert an ObjReader result to the cache arrays.
+    \param[in] _objreader obj reader (has read a file)
+    \return name -> numpy.array dict
+    """
+    array_dict = {}
+    for (name, dtype, column) in ARRAY_DEF_LIST:
+        data = getattr(_objreader, name)
+        if len(data) == 0:
+            array_dict[name] = numpy.zeros((0, 3), dtype=dtype)
+        else:
+            array_dict[name] = numpy.array(data, dtype=dtype)
+        if (array_dict[name].ndim != 2) or \
+                ((column != None) and (array_dict[name].shape[1] != column)):
+            raise StandardError, ('unsupported ' + name + ' shape ' +
+                                  str(array_dict[name].shape))
+    return array_dict
+
+
+def load_obj_array_dict(_objfname):
+    """load the mesh arrays of an obj file via the binary mesh cache.
+
+    When a valid cache exists, the arrays are memory mapped from the
+    cache file. Otherwise, the obj file is read and the cache is
+    written.
+
+    \param[in] _objfname obj file name
+    \return name -> numpy.array dict of ARRAY_DEF_LIST
+    """
+    array_dict = read_cache(_objfname)
+    if array_dict == None:
+        objreader = ObjReader.ObjReader()
+        objreader.read_bulk(_objfname)
+        array_dict = objreader_to_array_dict(objreader)
+        if write_cache(_objfname, array_dict):
+            ILog.info('wrote mesh cache [' + get_cache_filename(_objfname) + ']')
+    return array_dict
+
+
+def load_obj_trimesh(_objfname, _mesh_name, _material_name):
+    """load a TriMesh from an obj file via the binary mesh cache.
+
+    See load_obj_array_dict().
+
+    \param[in] _objfname      obj file name
+    \param[in] _mesh_name     mesh name
+    \param[in] _material_name mesh's material name
+    \return a TriMesh
+    """
+    array_dict = load_obj_array_dict(_objfname)
+    tmesh = Primitive.TriMesh(_mesh_name, _material_name)
+    tmesh.set_data(array_dict['vertex_list'],
+                   array_dict['face_idx_list'],
+                   array_dict['texcoord_list'],
+                   array_dict['texcoord_idx_list'],
+                   array_dict['normal_list'],
+                   array_dict['normal_idx_list'])
+    return tmesh
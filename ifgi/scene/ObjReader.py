@@ -6,7 +6,7 @@
 \file
 \brief simple obj reader (reader example)"""
 
-import math, numpy, string, exceptions
+import math, numpy, string, exceptions, re
 
 
 class ObjReader(object):
@@ -65,6 +65,40 @@ class ObjReader(object):
             print 'fail to read [' + _objfname + ']', extrainfo
 
 
+    # read file by the bulk parser
+    def read_bulk(self, _objfname):
+        """read file by the bulk parser. (public)
+
+        The whole file is read at once, the records are collected by
+        tag and converted in bulk. The result members are numpy
+        arrays: vertex_list (V,3) float, face_idx_list (F,3) int32,
+        texcoord_list (T,2 or 3) float, normal_list (N,3) float,
+        texcoord_idx_list and normal_idx_list (F,3) int32 (or (0,3)
+        when the faces have no such indices).
+
+        When the file has something the bulk parser does not handle
+        (e.g., non triangle faces, mixed face formats, trailing
+        comments), this falls back to read(). Then the members are
+        lists as read().
+
+        \param[in] _objfname obj file name
+        """
+        try:
+            with open(_objfname, 'rb') as infile:
+                data = infile.read()
+            self.__check_filetype_data(data)
+        except StandardError, extrainfo:
+            print 'fail to read [' + _objfname + ']', extrainfo
+            return
+
+        try:
+            self.__parse_bulk(data)
+        except StandardError, extrainfo:
+            print 'bulk parse failed, fall back to the line parser: ', extrainfo
+            self.__init__()
+            self.read(_objfname)
+
+
     # get the process list
     def get_process_dict(self, _firstitem_list):
         """get the process list. (public)
@@ -145,6 +179,98 @@ class ObjReader(object):
 
             # maybe this is obj file
 
+    # check the file data is obj file or not
+    def __check_filetype_data(self, _data):
+        """check the file data is obj file or not. (private)
+        The same check as __check_filetype, but for the data string."""
+        match = re.search(r'^[ \t]*([^#\s][^\r\n]*)', _data, re.M)
+        if match == None:
+            raise StandardError, ('unexpected EOF')
+        _line = string.strip(match.group(1))
+        if (len(_line) < 2):
+            raise StandardError, ('first line is too short, maybe not obj file.')
+        if not (_line[0] == 'v' and _line[1] == ' '):
+            raise StandardError, ("line does not start with 'v '")
+
+
+    # bulk parse
+    def __parse_bulk(self, _data):
+        """parse the whole file data in bulk. (private)
+        \param[in] _data file contents
+        """
+        record_dict = {}
+        for (tag, body) in re.findall(r'^[ \t]*(\S+)[ \t]*([^\r\n]*)', _data, re.M):
+            if tag[0] == '#':
+                continue
+            if not (tag in record_dict):
+                record_dict[tag] = []
+            record_dict[tag].append(body)
+
+        for tag in record_dict.keys():
+            if not (tag in ['v', 'vn', 'vt', 'f']):
+                print 'Warning! unsupported entity [' + tag + '] ' +\
+                    str(len(record_dict[tag])) + ' lines'
+
+        self.vertex_list   = self.__bulk_float(record_dict.get('v',  []), [3], 'v')
+        self.normal_list   = self.__bulk_float(record_dict.get('vn', []), [3], 'vn')
+        self.texcoord_list = self.__bulk_float(record_dict.get('vt', []), [2, 3], 'vt')
+
+        empty_idx = numpy.zeros((0, 3), dtype=numpy.int32)
+        self.face_idx_list     = empty_idx
+        self.texcoord_idx_list = empty_idx
+        self.normal_idx_list   = empty_idx
+        face_list = record_dict.get('f', [])
+        if len(face_list) == 0:
+            return
+
+        # face format is given by the first item of the first face:
+        # v, v/t, v//n, v/t/n. All faces must have the same format.
+        face_count = len(face_list)
+        firstitem  = face_list[0].split()[0].split('/')
+        procdict   = self.get_process_dict(firstitem)
+        slash_count = len(firstitem) - 1
+        empty_count = firstitem.count('')
+        face_str = ' '.join(face_list)
+        if ((face_str.count('/')  != 3 * face_count * slash_count) or
+            (face_str.count('//') != 3 * face_count * empty_count)):
+            raise StandardError, ('mixed face formats')
+
+        item_count = len(firstitem) - empty_count
+        idx = numpy.fromstring(face_str.replace('/', ' '), dtype=numpy.int64, sep=' ')
+        if len(idx) != 3 * face_count * item_count:
+            raise StandardError, ('not triangle faces')
+        # objfile's index start with 1
+        idx = (idx.reshape((face_count, 3, item_count)) - 1).astype(numpy.int32)
+
+        col = 0
+        for (key, name) in [('face_idx',     'face_idx_list'),
+                            ('texcoord_idx', 'texcoord_idx_list'),
+                            ('normal_idx',   'normal_idx_list')]:
+            if procdict[key] == True:
+                setattr(self, name, numpy.ascontiguousarray(idx[:, :, col]))
+                col = col + 1
+
+
+    # bulk float conversion
+    def __bulk_float(self, _body_list, _column_list, _tag):
+        """convert records to a float array in bulk. (private)
+        \param[in] _body_list   record strings (without the tag)
+        \param[in] _column_list allowed number of columns
+        \param[in] _tag         record tag (for the error message)
+        \return numpy.array (len(_body_list), column)
+        """
+        row_count = len(_body_list)
+        if row_count == 0:
+            return numpy.zeros((0, _column_list[0]))
+
+        val = numpy.fromstring(' '.join(_body_list), dtype=numpy.float64, sep=' ')
+        for column in _column_list:
+            if len(val) == row_count * column:
+                return val.reshape((row_count, column))
+
+        raise StandardError, ('illigal ' + _tag + ' lines')
+
+
     # parse line
     def __parse_line(self, _line):
         """parse line.  (private)
@@ -13,7 +13,9 @@ import numpy
 
 import Ray
 import HitRecord
-from ifgi.base import OrthonomalBasis
+import BVH
+from ifgi.base import OrthonomalBasis, ifgimath
+from ifgi.base.ILog import ILog
 
 # ----------------------------------------------------------------------
 
@@ -110,6 +112,144 @@ class Primitive(object):
 
 # ----------------------------------------------------------------------
 
+class IntersectStat(object):
+    """ray intersection statistics of the meshes. members are public.
+
+    A (ray, mesh) pair is culled when the ray misses the mesh
+    bounding box or the box is beyond the ray's current max t (the
+    closest hit so far). Otherwise the faces are tested.
+    """
+
+    def __init__(self):
+        """default constructor.
+        """
+        self.reset()
+
+
+    def reset(self):
+        """reset statistics (e.g., per frame).
+        """
+        # closest hit queries
+        self.ray_count           = 0
+        # any hit (occlusion) queries, and how many are occluded
+        self.occlusion_ray_count = 0
+        self.occluded_count      = 0
+        # (ray, mesh) pairs
+        self.mesh_test_count     = 0
+        self.mesh_cull_count     = 0
+        # (ray, triangle) tests
+        self.triangle_test_count = 0
+
+
+    def add(self, _other):
+        """add other statistics to this.
+        \param[in] _other other IntersectStat
+        """
+        self.ray_count           += _other.ray_count
+        self.occlusion_ray_count += _other.occlusion_ray_count
+        self.occluded_count      += _other.occluded_count
+        self.mesh_test_count     += _other.mesh_test_count
+        self.mesh_cull_count     += _other.mesh_cull_count
+        self.triangle_test_count += _other.triangle_test_count
+
+
+    def __str__(self):
+        """human readable string.
+        """
+        query_count = self.ray_count + self.occlusion_ray_count
+        avg_tri = 0.0
+        if query_count > 0:
+            avg_tri = float(self.triangle_test_count) / query_count
+        return '%d rays, %d occlusion rays (%d occluded), ' \
+            '%d mesh tests, %d mesh culls, %g triangle tests/ray' % \
+            (self.ray_count, self.occlusion_ray_count, self.occluded_count,
+             self.mesh_test_count, self.mesh_cull_count, avg_tri)
+
+# ----------------------------------------------------------------------
+
+# conservative slab test: tfar is scaled by 1 + 2 gamma(3), gamma(n) =
+# n eps / (1 - n eps), to cover the rounding error of the slab
+# distances. (Ize 2013, "Robust BVH Ray Traversal")
+SLAB_TFAR_SCALE = 1.0 + 2.0 * (3.0 * sys.float_info.epsilon * 0.5) / \
+    (1.0 - 3.0 * sys.float_info.epsilon * 0.5)
+
+
+def ray_bbox_slab_test(_orig, _inv_dir, _min_t, _max_t, _bmin, _bmax):
+    """ray - axis aligned box slab test.
+
+    A zero direction component has an infinite inverse. When the
+    origin is on that slab, 0 * inf is NaN, comparisons with NaN are
+    False, then the slab does not limit the range.
+
+    Plain float sequences (lists) are the fastest for one ray.
+
+    \param[in] _orig    ray origin (3 floats)
+    \param[in] _inv_dir inverse ray direction (3 floats), 1/0 is signed inf.
+    See Ray.get_inv_dir().
+    \param[in] _min_t   ray minimal distance
+    \param[in] _max_t   ray maximal distance
+    \param[in] _bmin    box minimal point (3 floats)
+    \param[in] _bmax    box maximal point (3 floats)
+    \return (tnear, tfar) of the range in the box, None when not hit.
+    """
+    tnear = _min_t
+    tfar  = _max_t
+    for axis in (0, 1, 2):
+        inv = _inv_dir[axis]
+        t0  = (_bmin[axis] - _orig[axis]) * inv
+        t1  = (_bmax[axis] - _orig[axis]) * inv
+        if t0 > t1:
+            (t0, t1) = (t1, t0)
+        t1 *= SLAB_TFAR_SCALE
+        if t0 > tnear:
+            tnear = t0
+        if t1 < tfar:
+            tfar = t1
+        if tnear > tfar:
+            return None
+    return (tnear, tfar)
+
+
+def ray_bbox_slab_test_batch(_orig, _inv_dir, _min_t, _max_t, _bmin, _bmax):
+    """ray - axis aligned box slab test (vectorized).
+
+    The same as ray_bbox_slab_test(). The arguments are broadcast:
+    many rays against a box, a ray against many boxes, or many rays
+    against their own boxes.
+
+    \param[in] _orig    ray origins numpy.array (R,3) or (3,)
+    \param[in] _inv_dir inverse ray directions numpy.array (R,3) or (3,)
+    \param[in] _min_t   ray minimal distances numpy.array (R,) or a float
+    \param[in] _max_t   ray maximal distances numpy.array (R,) or a float
+    \param[in] _bmin    box minimal points numpy.array (B,3) or (3,)
+    \param[in] _bmax    box maximal points numpy.array (B,3) or (3,)
+    \return (tnear, tfar, is_hit) numpy.array each
+    """
+    with numpy.errstate(invalid='ignore'):
+        t0 = (_bmin - _orig) * _inv_dir
+        t1 = (_bmax - _orig) * _inv_dir
+        tlo = numpy.minimum(t0, t1)
+        thi = numpy.maximum(t0, t1)
+    # NaN: the origin is on the slab of a zero direction component
+    is_nan = numpy.isnan(tlo)
+    if is_nan.any():
+        tlo[is_nan] = -numpy.inf
+        thi[is_nan] =  numpy.inf
+    tnear = numpy.maximum(tlo.max(axis=-1), _min_t)
+    tfar  = numpy.minimum(thi.min(axis=-1) * SLAB_TFAR_SCALE, _max_t)
+    return (tnear, tfar, tnear <= tfar)
+
+
+def get_inv_dir_array(_dir):
+    """get inverse directions, 1/0 is signed infinity (vectorized).
+    \param[in] _dir directions numpy.array (R,3)
+    \return 1/_dir numpy.array (R,3)
+    """
+    with numpy.errstate(divide='ignore'):
+        return 1.0 / _dir
+
+# ----------------------------------------------------------------------
+
 class BBox(Primitive):
     """BBox: axis aligned 3D bounding box"""
 
@@ -142,11 +282,46 @@ class BBox(Primitive):
 
     def ray_intersect(self, _ray):
         """compute ray intersection. interface.
+
+        The hit is the entry point of the ray (the origin when the
+        origin is in the box). The hit basis is not set.
+
         \param[in] _ray a ray
-        \return None (A HitRecord)
+        \return a HitRecord. None when not hit.
         """
-        assert 0, "NIN."
-        return None
+        trange = self.ray_slab_test(_ray)
+        if trange == None:
+            return None
+        hr = HitRecord.HitRecord()
+        hr.dist = trange[0]
+        hr.intersect_pos = _ray.get_origin() + trange[0] * _ray.get_dir()
+        hr.hit_primitive = self
+        return hr
+
+
+    def ray_slab_test(self, _ray, _max_t=None):
+        """ray - bbox slab test (public).
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \return (tnear, tfar), None when not hit.
+        """
+        max_t = _ray.get_max_t()
+        if (_max_t != None) and (_max_t < max_t):
+            max_t = _max_t
+        return ray_bbox_slab_test(_ray.get_origin(), _ray.get_inv_dir(),
+                                  _ray.get_min_t(), max_t, self.__min, self.__max)
+
+
+    def ray_slab_test_batch(self, _orig, _inv_dir, _min_t, _max_t):
+        """rays - bbox slab test (vectorized, public).
+        \param[in] _orig    ray origins numpy.array (R,3)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3)
+        \param[in] _min_t   ray minimal distances numpy.array (R,)
+        \param[in] _max_t   ray maximal distances numpy.array (R,)
+        \return (tnear, tfar, is_hit) numpy.array (R,) each
+        """
+        return ray_bbox_slab_test_batch(_orig, _inv_dir, _min_t, _max_t,
+                                        self.__min, self.__max)
 
 
     def invalidate(self):
@@ -315,8 +490,7 @@ class Triangle(Primitive):
         hr.dist = t
         hr.intersect_pos = self.__vertex[0] + b1 * e1 + b2 * e2
         hr.hit_primitive = self
-        hr.hit_basis = OrthonomalBasis.OrthonomalBasis()
-        hr.hit_basis.init_from_uv(e1, e2) # set normal
+        hr.set_basis_from_edge(e1, e2) # set normal
         return hr
 
 
@@ -338,10 +512,157 @@ class Triangle(Primitive):
 
 # ----------------------------------------------------------------------
 
+def ray_triangle_intersect_soa(_orig, _dir, _min_t, _max_t, _v0, _e1, _e2, _n,
+                               _is_any_hit=False):
+    """ray - triangles intersection for structure of arrays (vectorized).
+
+    The same Cramer's rule based intersection as
+    Triangle.ray_intersect(), but one ray against all the given
+    triangles in one pass. The cross products with the ray direction
+    are a matrix product, the scalar triple products use the
+    precomputed _n = e1 x e2.
+
+    \param[in] _orig  ray origin numpy.array (3,)
+    \param[in] _dir   ray direction numpy.array (3,)
+    \param[in] _min_t ray minimal distance
+    \param[in] _max_t ray maximal distance
+    \param[in] _v0    triangle vertex 0, numpy.array (F,3)
+    \param[in] _e1    triangle edge v1 - v0, numpy.array (F,3)
+    \param[in] _e2    triangle edge v2 - v0, numpy.array (F,3)
+    \param[in] _n     e1 x e2 (not normalized), numpy.array (F,3)
+    \param[in] _is_any_hit when True, any hit is returned, not the nearest.
+    \return (t, face index in the arrays, b1, b2) of the nearest hit.
+    None when not hit.
+    """
+    (dx, dy, dz) = (_dir[0], _dir[1], _dir[2])
+    # cross(_dir, e) = numpy.dot(e, dir_cross_mat)
+    dir_cross_mat = numpy.array([[0.0,  dz, -dy],
+                                 [-dz, 0.0,  dx],
+                                 [ dy, -dx, 0.0]])
+    s1  = numpy.dot(_e2, dir_cross_mat)
+    div = numpy.einsum('ij,ij->i', s1, _e1)
+    d   = _orig - _v0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        inv_div = 1.0 / div
+        # barycentric coord b1, b2 and distance t
+        #   b2 = dir . (d x e1) = - d . (dir x e1)
+        #   t  = e2  . (d x e1) =   d . (e1 x e2)
+        b1 = numpy.einsum('ij,ij->i', d, s1) * inv_div
+        b2 = numpy.einsum('ij,ij->i', d, numpy.dot(_e1, dir_cross_mat)) * (-inv_div)
+        t  = numpy.einsum('ij,ij->i', d, _n) * inv_div
+
+        is_hit = ((div != 0.0) & (b1 >= 0.0) & (b1 <= 1.0) &
+                  (b2 >= 0.0) & ((b1 + b2) <= 1.0) &
+                  (t >= _min_t) & (t <= _max_t))
+    if not is_hit.any():
+        return None
+
+    if _is_any_hit:
+        fi = int(numpy.argmax(is_hit))
+    else:
+        fi = int(numpy.argmin(numpy.where(is_hit, t, numpy.inf)))
+    return (t[fi], fi, b1[fi], b2[fi])
+
+def ray_triangle_intersect_batch(_orig, _dir, _min_t, _max_t, _v0, _e1, _e2, _n):
+    """many rays - triangles intersection (vectorized).
+
+    The same intersection as ray_triangle_intersect_soa(), but all
+    the given rays against all the given triangles. Every term is
+    written as a (R,3) x (3,F) matrix product:
+      div = - dir . n
+      b1  = e2 . (orig x dir) - dir . (e2 x v0)
+      b2  = dir . (e1 x v0)   - e1 . (orig x dir)
+      t   = orig . n - v0 . n
+    The caller should keep R x F moderate (memory is O(R x F)).
+
+    \param[in] _orig  ray origins numpy.array (R,3)
+    \param[in] _dir   ray directions numpy.array (R,3)
+    \param[in] _min_t ray minimal distances numpy.array (R,)
+    \param[in] _max_t ray maximal distances numpy.array (R,)
+    \param[in] _v0    triangle vertex 0, numpy.array (F,3)
+    \param[in] _e1    triangle edge v1 - v0, numpy.array (F,3)
+    \param[in] _e2    triangle edge v2 - v0, numpy.array (F,3)
+    \param[in] _n     e1 x e2 (not normalized), numpy.array (F,3)
+    \return (t, face index) numpy.array (R,) each. t = inf and face
+    index = -1 when the ray does not hit.
+    """
+    ray_count = _orig.shape[0]
+    t_hit  = numpy.empty(ray_count)
+    t_hit.fill(numpy.inf)
+    fi_hit = numpy.empty(ray_count, dtype=numpy.int32)
+    fi_hit.fill(-1)
+    if (ray_count == 0) or (_v0.shape[0] == 0):
+        return (t_hit, fi_hit)
+
+    orig_x_dir = numpy.cross(_orig, _dir)
+    div = -numpy.dot(_dir, _n.T)
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        inv_div = 1.0 / div
+        b1 = (numpy.dot(orig_x_dir, _e2.T) -
+              numpy.dot(_dir, numpy.cross(_e2, _v0).T)) * inv_div
+        b2 = (numpy.dot(_dir, numpy.cross(_e1, _v0).T) -
+              numpy.dot(orig_x_dir, _e1.T)) * inv_div
+        t  = (numpy.dot(_orig, _n.T) -
+              numpy.einsum('ij,ij->i', _v0, _n)) * inv_div
+
+        is_hit = ((div != 0.0) & (b1 >= 0.0) & (b1 <= 1.0) &
+                  (b2 >= 0.0) & ((b1 + b2) <= 1.0) &
+                  (t >= _min_t[:, numpy.newaxis]) &
+                  (t <= _max_t[:, numpy.newaxis]))
+
+    t  = numpy.where(is_hit, t, numpy.inf)
+    fi = numpy.argmin(t, axis=1)
+    t_min = t[numpy.arange(ray_count), fi]
+    is_ray_hit = numpy.isfinite(t_min)
+    t_hit[is_ray_hit]  = t_min[is_ray_hit]
+    fi_hit[is_ray_hit] = fi[is_ray_hit]
+    return (t_hit, fi_hit)
+
+def get_face_frame_array(_e1, _e2):
+    """compute the per face normal, area, and tangent frame (vectorized).
+
+    The frame is the same as OrthonomalBasis.init_from_uv(e1, e2), w
+    is the unit geometric normal. A degenerate (zero area) face has a
+    zero frame.
+
+    \param[in] _e1 triangle edge v1 - v0, numpy.array (F,3)
+    \param[in] _e2 triangle edge v2 - v0, numpy.array (F,3)
+    \return (e1 x e2 (F,3), area (F,), frame u (F,3), frame v (F,3),
+    frame w (F,3))
+    """
+    n = numpy.cross(_e1, _e2)
+    n_len  = numpy.sqrt((n * n).sum(axis=1))
+    e1_len = numpy.sqrt((_e1 * _e1).sum(axis=1))
+    area = 0.5 * n_len
+    n_len[n_len == 0.0]   = numpy.inf
+    e1_len[e1_len == 0.0] = numpy.inf
+    frame_w = n   / n_len[:, numpy.newaxis]
+    frame_u = _e1 / e1_len[:, numpy.newaxis]
+    frame_v = numpy.cross(frame_w, frame_u)
+    return (n, area, frame_u, frame_v, frame_w)
+
+# ----------------------------------------------------------------------
+
 class TriMesh(Primitive):
     """TriMesh: simple triangle mesh primitive
+
+    vertex_list and face_idx_list are contiguous numpy arrays of
+    shape (V,3) and (F,3). The per face geometry is precomputed when
+    the vertices change (set_data(), set_vertex_list()), the
+    intersection and the shading read it:
+    - face_v0, face_e1, face_e2: vertex 0 and the edges (F,3)
+    - face_n:        e1 x e2, the geometric normal (F,3)
+    - face_area:     area (F,)
+    - face_frame_u, face_frame_v, face_frame_w: unit tangent frame
+      (F,3). The same as OrthonomalBasis.init_from_uv(e1, e2), w is
+      the unit geometric normal.
+    - face_bbox_min, face_bbox_max: face bounding boxes (F,3)
+    A degenerate (zero area) face has a zero frame.
     """
 
+    # max number of ray x face elements in one batch intersection
+    BATCH_ELEMENT_COUNT = 1 << 18
+
     def __init__(self, _mash_name, _mat_name):
         """default constructor (public)."""
         super(TriMesh, self).__init__()
@@ -349,18 +670,34 @@ class TriMesh(Primitive):
         super(TriMesh, self).set_material_name(_mat_name)
 
         # geometry information
-        self.vertex_list       = []
-        self.face_idx_list     = []
+        self.vertex_list       = numpy.zeros((0, 3))
+        self.face_idx_list     = numpy.zeros((0, 3), dtype=numpy.int32)
         self.texcoord_list     = []
         self.texcoord_idx_list = []
         self.normal_list       = []
         self.normal_idx_list   = []
         self.bbox              = BBox()
 
+        # per face vertex 0, edges, and e1 x e2
+        self.face_v0           = numpy.zeros((0, 3))
+        self.face_e1           = numpy.zeros((0, 3))
+        self.face_e2           = numpy.zeros((0, 3))
+        self.face_n            = numpy.zeros((0, 3))
+        # per face area, tangent frame, and bounding box
+        self.face_area         = numpy.zeros(0)
+        self.face_frame_u      = numpy.zeros((0, 3))
+        self.face_frame_v      = numpy.zeros((0, 3))
+        self.face_frame_w      = numpy.zeros((0, 3))
+        self.face_bbox_min     = numpy.zeros((0, 3))
+        self.face_bbox_max     = numpy.zeros((0, 3))
+
         # global material index of this geometry (valid after
         # preprocessing)
         self.material_index = -1
 
+        # bottom level BVH (None: not built, brute force intersection)
+        self.__bvh = None
+
 
     def get_classname(self):
         """get class name. interface method.
@@ -386,21 +723,44 @@ class TriMesh(Primitive):
     def set_data(self, _vlist, _fidxlist, _tclist, _tcidxlist, _nlist, _nidxlist):
         """set data (public).
 
-        \param[in]  _vlist     vertex list (len(_vlist) must be > 0)
-        \param[in]  _fidxlist  face index list
+        \param[in]  _vlist     vertex list (len(_vlist) must be > 0),
+        list of 3d points or numpy.array (V,3)
+        \param[in]  _fidxlist  face index list, list of triangle
+        vertex indices or numpy.array (F,3)
         \param[in]  _tclist    texture coordinate list
         \param[in]  _tcidxlist texture coordinate index list
         \param[in]  _nlist     normal list
         \param[in]  _nidxlist  normal index list
         """
         assert(len(_vlist) > 0) # at least, some points must be there.
-        self.vertex_list       = _vlist
-        self.face_idx_list     = _fidxlist
+        self.vertex_list       = numpy.ascontiguousarray(_vlist, dtype=numpy.float64)
+        self.face_idx_list     = numpy.ascontiguousarray(_fidxlist, dtype=numpy.int32)
+        if len(self.face_idx_list) == 0:
+            self.face_idx_list = numpy.zeros((0, 3), dtype=numpy.int32)
+        if ((self.vertex_list.ndim != 2) or (self.vertex_list.shape[1] != 3) or
+            (self.face_idx_list.ndim != 2) or (self.face_idx_list.shape[1] != 3)):
+            raise StandardError, ('TriMesh needs 3d vertices and triangle faces.')
         self.texcoord_list     = _tclist
         self.texcoord_idx_list = _tcidxlist
         self.normal_list       = _nlist
         self.normal_idx_list   = _nidxlist
-        self.update_bbox()
+        self.__update_geometry()
+
+
+    def set_vertex_list(self, _vlist):
+        """set new vertex positions, the faces are the same (public).
+        e.g., deformation. The per face geometry is recomputed and the
+        BVH is dropped.
+
+        \param[in] _vlist vertex list numpy.array (V,3), the same
+        number of vertices
+        """
+        vlist = numpy.ascontiguousarray(_vlist, dtype=numpy.float64)
+        if vlist.shape != self.vertex_list.shape:
+            raise StandardError, ('vertex list shape ' + str(vlist.shape) +
+                                  ' differs from ' + str(self.vertex_list.shape))
+        self.vertex_list = vlist
+        self.__update_geometry()
 
 
     def set_material_index(self, _mat_idx):
@@ -434,8 +794,9 @@ class TriMesh(Primitive):
         """update bounding box according to current vertex list (public).
         """
         self.bbox.invalidate()  # reset the bbox
-        for pos in self.vertex_list:
-            self.bbox.insert_point(pos)
+        if len(self.vertex_list) > 0:
+            self.bbox.insert_point(self.vertex_list.min(axis=0))
+            self.bbox.insert_point(self.vertex_list.max(axis=0))
 
 
     def is_valid(self):
@@ -447,38 +808,691 @@ class TriMesh(Primitive):
         return False
 
 
-    def ray_intersect(self, _ray):
+    def build_bvh(self, _max_leaf_size=8, _bin_count=16, _bvh_cache=None):
+        """build the bottom level BVH of this mesh (public).
+        After this, ray_intersect() uses the BVH.
+
+        \param[in] _max_leaf_size max number of faces in a leaf
+        \param[in] _bin_count     number of SAH bins per axis
+        \param[in] _bvh_cache     BVHCache to read/write the BVH. None:
+        always build
+        """
+        self.__bvh = None
+        if len(self.face_idx_list) > 0:
+            self.__bvh = BVH.TriMeshBVH(self, _max_leaf_size, _bin_count, _bvh_cache)
+
+
+    def get_bvh(self):
+        """get the bottom level BVH (public).
+        \return TriMeshBVH, None when not built.
+        """
+        return self.__bvh
+
+
+    def ray_intersect(self, _ray, _max_t=None, _stat=None):
         """compute ray intersection. (public).
-        \param[in] _ray a ray
+
+        The mesh is skipped when the ray misses the bounding box, or
+        the box is beyond _max_t (e.g., the closest hit so far). In
+        the mesh, the closest hit so far shrinks max t (BVH leaves).
+
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \param[in] _stat  IntersectStat to count the tests. None: no count
         \return a HitRecord. None if no hit.
         """
-        # NIN: bounding box test?
+        hit = self.__intersect_face(_ray, _max_t, _stat, False)
+        if hit == None:
+            return None
+        (t, fi, b1, b2) = hit
+        return self.get_hit_record(t, fi, b1, b2)
+
 
-        trimesh_hr = HitRecord.HitRecord()
+    def ray_intersect_face(self, _ray, _max_t=None, _stat=None):
+        """compute the closest face hit (public). The same as
+        ray_intersect() without creating a HitRecord.
 
-        # following init is make sure only (done in the HitRecord.__init__())
-        trimesh_hr.dist = sys.float_info.max
-        trimesh_hr.hit_primitive = None
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return (t, face index, b1, b2), None if no hit.
+        """
+        return self.__intersect_face(_ray, _max_t, _stat, False)
 
-        for fi in self.face_idx_list:
-            tri = Triangle()
-            tri.set_vertex(self.vertex_list[fi[0]],
-                           self.vertex_list[fi[1]],
-                           self.vertex_list[fi[2]])
 
-            hr = tri.ray_intersect(_ray)
-            if hr != None:
-                if trimesh_hr.dist > hr.dist:
-                    trimesh_hr.dist = hr.dist
-                    trimesh_hr.intersect_pos = hr.intersect_pos
-                    trimesh_hr.hit_primitive = tri
-                    trimesh_hr.hit_basis = hr.hit_basis
-                    trimesh_hr.hit_material_index = self.material_index
+    def occluded(self, _ray, _max_t=None, _stat=None):
+        """any hit query (public). It stops at the first found hit,
+        e.g., for a shadow ray.
 
-        if trimesh_hr.hit_primitive != None:
-            return trimesh_hr
+        \param[in] _ray   a ray
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return True when the ray hits a face in [min_t, max_t].
+        """
+        return self.__intersect_face(_ray, _max_t, _stat, True) != None
+
+
+    def ray_intersect_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir=None, _stat=None):
+        """compute many rays intersection (public).
+
+        Rays that miss the bounding box, or whose box entry is beyond
+        their _max_t, are culled first. The remaining rays traverse
+        the BVH when it has been built (see build_bvh()), otherwise
+        they are tested against all the faces in chunks to bound the
+        memory.
+
+        \param[in] _orig  ray origins numpy.array (R,3)
+        \param[in] _dir   ray directions numpy.array (R,3)
+        \param[in] _min_t ray minimal distances numpy.array (R,)
+        \param[in] _max_t ray maximal distances numpy.array (R,)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3).
+        None: computed here. See get_inv_dir_array().
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return (t, face index) numpy.array (R,) each. t = inf and
+        face index = -1 when the ray does not hit.
+        """
+        ray_count = _orig.shape[0]
+        t_hit  = numpy.empty(ray_count)
+        t_hit.fill(numpy.inf)
+        fi_hit = numpy.empty(ray_count, dtype=numpy.int32)
+        fi_hit.fill(-1)
+        face_count = len(self.face_idx_list)
+        if (ray_count == 0) or (face_count == 0):
+            return (t_hit, fi_hit)
+
+        # bounding box slab test of all rays
+        inv_dir = _inv_dir
+        if inv_dir is None:
+            inv_dir = get_inv_dir_array(_dir)
+        (tnear, tfar, is_hit) = self.bbox.ray_slab_test_batch(_orig, inv_dir, _min_t, _max_t)
+        ray_idx = numpy.nonzero(is_hit)[0]
+        if _stat != None:
+            _stat.mesh_test_count += len(ray_idx)
+            _stat.mesh_cull_count += ray_count - len(ray_idx)
+        if len(ray_idx) == 0:
+            return (t_hit, fi_hit)
+
+        orig  = _orig[ray_idx]
+        vdir  = _dir[ray_idx]
+        min_t = _min_t[ray_idx]
+        max_t = _max_t[ray_idx].copy()
+        if self.__bvh != None:
+            (t_cur, fi_cur) = self.__intersect_face_bvh_batch(orig, vdir, min_t, max_t,
+                                                              inv_dir[ray_idx], _stat, False)
+            t_hit[ray_idx]  = t_cur
+            fi_hit[ray_idx] = fi_cur
+            return (t_hit, fi_hit)
+
+        if _stat != None:
+            _stat.triangle_test_count += len(ray_idx) * face_count
+        t_cur  = t_hit[ray_idx]
+        fi_cur = fi_hit[ray_idx]
+        face_chunk = max(1, TriMesh.BATCH_ELEMENT_COUNT / len(ray_idx))
+        for fstart in xrange(0, face_count, face_chunk):
+            fend = min(fstart + face_chunk, face_count)
+            (t, fi) = ray_triangle_intersect_batch(
+                orig, vdir, min_t, max_t,
+                self.face_v0[fstart:fend], self.face_e1[fstart:fend],
+                self.face_e2[fstart:fend], self.face_n[fstart:fend])
+            is_closer = (t < t_cur)
+            t_cur[is_closer]  = t[is_closer]
+            fi_cur[is_closer] = fi[is_closer] + fstart
+            # later chunks only need closer hits
+            max_t = numpy.minimum(max_t, t_cur)
+
+        t_hit[ray_idx]  = t_cur
+        fi_hit[ray_idx] = fi_cur
+        return (t_hit, fi_hit)
+
+
+    def occluded_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir=None, _stat=None):
+        """many rays any hit query (public). e.g., shadow rays.
+
+        The same culling and BVH use as ray_intersect_batch(). A ray
+        found occluded by a face chunk is not tested by the later
+        chunks.
+
+        \param[in] _orig  ray origins numpy.array (R,3)
+        \param[in] _dir   ray directions numpy.array (R,3)
+        \param[in] _min_t ray minimal distances numpy.array (R,)
+        \param[in] _max_t ray maximal distances numpy.array (R,)
+        \param[in] _inv_dir inverse ray directions numpy.array (R,3).
+        None: computed here.
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return occluded bool numpy.array (R,)
+        """
+        ray_count = _orig.shape[0]
+        is_occluded = numpy.zeros(ray_count, dtype=bool)
+        face_count = len(self.face_idx_list)
+        if (ray_count == 0) or (face_count == 0):
+            return is_occluded
+
+        inv_dir = _inv_dir
+        if inv_dir is None:
+            inv_dir = get_inv_dir_array(_dir)
+        (tnear, tfar, is_hit) = self.bbox.ray_slab_test_batch(_orig, inv_dir, _min_t, _max_t)
+        ray_idx = numpy.nonzero(is_hit)[0]
+        if _stat != None:
+            _stat.mesh_test_count += len(ray_idx)
+            _stat.mesh_cull_count += ray_count - len(ray_idx)
+        if (self.__bvh != None) and (len(ray_idx) > 0):
+            (t, fi) = self.__intersect_face_bvh_batch(_orig[ray_idx], _dir[ray_idx],
+                                                      _min_t[ray_idx], _max_t[ray_idx],
+                                                      inv_dir[ray_idx], _stat, True)
+            is_occluded[ray_idx] = (fi >= 0)
+            return is_occluded
+
+        face_chunk = max(1, TriMesh.BATCH_ELEMENT_COUNT / max(1, len(ray_idx)))
+        for fstart in xrange(0, face_count, face_chunk):
+            if len(ray_idx) == 0:
+                break
+            fend = min(fstart + face_chunk, face_count)
+            if _stat != None:
+                _stat.triangle_test_count += len(ray_idx) * (fend - fstart)
+            (t, fi) = ray_triangle_intersect_batch(
+                _orig[ray_idx], _dir[ray_idx], _min_t[ray_idx], _max_t[ray_idx],
+                self.face_v0[fstart:fend], self.face_e1[fstart:fend],
+                self.face_e2[fstart:fend], self.face_n[fstart:fend])
+            is_hit = (fi >= 0)
+            is_occluded[ray_idx[is_hit]] = True
+            ray_idx = ray_idx[~is_hit]
+
+        return is_occluded
+
+
+    def get_face_basis(self, _face_idx):
+        """get the tangent frame of a face (public).
+        \param[in] _face_idx face index
+        \return OrthonomalBasis, w is the unit geometric normal
+        """
+        onb = OrthonomalBasis.OrthonomalBasis()
+        onb.set(self.face_frame_u[_face_idx], self.face_frame_v[_face_idx],
+                self.face_frame_w[_face_idx])
+        return onb
+
+
+    def get_hit_record(self, _t, _face_idx, _b1, _b2):
+        """create a hit record of a face hit (public).
+        \param[in] _t        hit distance
+        \param[in] _face_idx hit face index
+        \param[in] _b1       barycentric coordinate b1
+        \param[in] _b2       barycentric coordinate b2
+        \return a HitRecord.
+        """
+        e1 = self.face_e1[_face_idx]
+        e2 = self.face_e2[_face_idx]
 
-        return None
+        hr = HitRecord.HitRecord()
+        hr.dist = _t
+        hr.intersect_pos = self.face_v0[_face_idx] + _b1 * e1 + _b2 * e2
+        hr.hit_primitive = self
+        hr.hit_face_index = _face_idx
+        hr.hit_barycentric = (_b1, _b2)
+        hr.set_basis_frame(self.face_frame_u[_face_idx], self.face_frame_v[_face_idx],
+                           self.face_frame_w[_face_idx]) # set normal
+        hr.hit_material_index = self.material_index
+        return hr
+
+
+    def __intersect_face(self, _ray, _max_t, _stat, _is_any_hit):
+        """the closest or any face hit of a ray.
+        \return (t, face index, b1, b2), None when not hit.
+        """
+        trange = self.bbox.ray_slab_test(_ray, _max_t)
+        if trange == None:
+            if _stat != None:
+                _stat.mesh_cull_count += 1
+            return None
+        max_t = _ray.get_max_t()
+        if (_max_t != None) and (_max_t < max_t):
+            max_t = _max_t
+
+        if _stat != None:
+            _stat.mesh_test_count += 1
+        if self.__bvh != None:
+            bvh_stat = self.__bvh.stat
+            test_count = bvh_stat.primitive_test_count
+            if _is_any_hit:
+                hit = self.__bvh.intersect_any_face(_ray, max_t)
+            else:
+                hit = self.__bvh.intersect_closest_face(_ray, max_t)
+            if _stat != None:
+                _stat.triangle_test_count += bvh_stat.primitive_test_count - test_count
+            return hit
+
+        if _stat != None:
+            _stat.triangle_test_count += len(self.face_v0)
+        return ray_triangle_intersect_soa(_ray.get_origin(), _ray.get_dir(),
+                                          _ray.get_min_t(), max_t,
+                                          self.face_v0, self.face_e1, self.face_e2,
+                                          self.face_n, _is_any_hit)
+
+
+    def __intersect_face_bvh_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir, _stat,
+                                   _is_any_hit):
+        """the closest or any face hits of many rays by the BVH.
+        \return (t, face index) numpy.array (R,) each.
+        """
+        bvh_stat = self.__bvh.stat
+        test_count = bvh_stat.primitive_test_count
+        hit = self.__bvh.intersect_face_batch(_orig, _dir, _min_t, _max_t, _inv_dir,
+                                              _is_any_hit)
+        if _stat != None:
+            _stat.triangle_test_count += bvh_stat.primitive_test_count - test_count
+        return hit
+
+
+    def __update_geometry(self):
+        """update all the vertex dependent data: bbox, per face
+        arrays. The BVH is not valid anymore.
+        """
+        self.update_bbox()
+        self.__update_face_array()
+        self.__bvh = None
+
+
+    def __update_face_array(self):
+        """update per face arrays: vertex 0, edges, edge cross product,
+        area, tangent frame, and bounding box.
+        """
+        tri_pos = self.vertex_list[self.face_idx_list] # (F, 3 vertices, 3)
+        self.face_v0 = numpy.ascontiguousarray(tri_pos[:, 0])
+        self.face_e1 = tri_pos[:, 1] - tri_pos[:, 0]
+        self.face_e2 = tri_pos[:, 2] - tri_pos[:, 0]
+        (self.face_n, self.face_area, self.face_frame_u, self.face_frame_v,
+         self.face_frame_w) = get_face_frame_array(self.face_e1, self.face_e2)
+
+        self.face_bbox_min = tri_pos.min(axis=1)
+        self.face_bbox_max = tri_pos.max(axis=1)
+
+# ----------------------------------------------------------------------
+
+class LazyTriMesh(TriMesh):
+    """LazyTriMesh: TriMesh loaded on the first access of its geometry
+
+    The geometry members (vertex_list, bbox, face_v0, ...) do not
+    exist until the first access. Any access (get_bbox(),
+    ray_intersect(), drawing, ...) calls the loader once, then this
+    is the same as a TriMesh.
+    """
+
+    # members that are available after loading
+    GEOMETRY_ATTR_LIST = ['vertex_list', 'face_idx_list',
+                          'texcoord_list', 'texcoord_idx_list',
+                          'normal_list', 'normal_idx_list', 'bbox',
+                          'face_v0', 'face_e1', 'face_e2', 'face_n', 'face_area',
+                          'face_frame_u', 'face_frame_v', 'face_frame_w',
+                          'face_bbox_min', 'face_bbox_max']
+
+    def __init__(self, _mash_name, _mat_name, _loader):
+        """constructor (public).
+
+        \param[in] _mash_name mesh name
+        \param[in] _mat_name  material name
+        \param[in] _loader    callable with no argument. It returns
+        the TriMesh.set_data() argument tuple (vertex list, face index
+        list, texcoord list, texcoord index list, normal list, normal
+        index list).
+        """
+        super(LazyTriMesh, self).__init__(_mash_name, _mat_name)
+        for attr in LazyTriMesh.GEOMETRY_ATTR_LIST:
+            del self.__dict__[attr]
+        self.__loader = _loader
+
+
+    def __getattr__(self, _name):
+        """load the geometry when a geometry member is accessed first.
+        (called only when _name is not found.)
+        \param[in] _name attribute name
+        """
+        if ((_name in LazyTriMesh.GEOMETRY_ATTR_LIST) and
+            (self.__dict__.get('_LazyTriMesh__loader') != None)):
+            self.load()
+            return getattr(self, _name)
+        raise AttributeError, (_name)
+
+
+    def is_loaded(self):
+        """is the geometry loaded? (public).
+        \return True when loaded.
+        """
+        return (self.__loader == None)
+
+
+    def load(self):
+        """load the geometry now, if not yet loaded (public).
+        """
+        if self.__loader == None:
+            return
+        ILog.info('lazy loading mesh [' + self.get_name() + ']')
+        self.set_data(*self.__loader())
+
+
+    def set_data(self, _vlist, _fidxlist, _tclist, _tcidxlist, _nlist, _nidxlist):
+        """set data (public). The loader is not called anymore.
+        See TriMesh.set_data().
+        """
+        self.__loader = None
+        self.bbox     = BBox()
+        super(LazyTriMesh, self).set_data(_vlist, _fidxlist, _tclist, _tcidxlist,
+                                          _nlist, _nidxlist)
+
+# ----------------------------------------------------------------------
+
+class TriMeshInstance(Primitive):
+    """TriMeshInstance: a shared TriMesh placed by a 4x4 matrix
+
+    Many instances refer to one TriMesh. The vertices, the per face
+    arrays, and the bottom level BVH are not copied. The matrix maps
+    the object space (the TriMesh) to the world space (affine).
+
+    A ray is transformed to the object space without normalizing
+    its direction, then the hit distance t is the same in both
+    spaces.
+
+    The world space per face arrays (face_v0, ..., face_frame_w, see
+    TriMesh) are computed at the first access, e.g., by the wavefront
+    path tracer and the light registry. The ray intersection does not
+    need them.
+    """
+
+    # world space per face arrays, computed at the first access
+    WORLD_FACE_ATTR_LIST = ['face_v0', 'face_e1', 'face_e2', 'face_n', 'face_area',
+                            'face_frame_u', 'face_frame_v', 'face_frame_w']
+
+    def __init__(self, _inst_name, _trimesh, _matrix, _mat_name=None):
+        """constructor (public).
+
+        \param[in] _inst_name instance name
+        \param[in] _trimesh   shared TriMesh (object space)
+        \param[in] _matrix    object to world matrix, 4x4 (numpy.array
+        or nested list, row major, column vector convention. See
+        ifgimath.transformPoint())
+        \param[in] _mat_name  material name. None: the TriMesh's
+        material name
+        """
+        super(TriMeshInstance, self).__init__()
+        super(TriMeshInstance, self).set_name(_inst_name)
+        if _mat_name == None:
+            _mat_name = _trimesh.get_material_name()
+        super(TriMeshInstance, self).set_material_name(_mat_name)
+
+        self.__trimesh = _trimesh
+        # global material index of this instance (valid after
+        # preprocessing)
+        self.material_index = -1
+        self.set_matrix(_matrix)
+
+
+    def __getattr__(self, _name):
+        """compute the world space per face arrays when one of them is
+        accessed first. (called only when _name is not found.)
+        \param[in] _name attribute name
+        """
+        if ((_name in TriMeshInstance.WORLD_FACE_ATTR_LIST) and
+            ('_TriMeshInstance__trimesh' in self.__dict__)):
+            self.__update_world_face_array()
+            return self.__dict__[_name]
+        raise AttributeError, (_name)
+
+
+    def get_classname(self):
+        """get class name. interface method.
+        \return class name
+        """
+        return 'TriMeshInstance'
+
+
+    def get_bbox(self):
+        """get the world space bounding box. interface method.
+        \return bounding box of this primitive.
+        """
+        if self.__bbox == None:
+            self.__update_bbox()
+        return self.__bbox
+
+
+    def can_intersect(self):
+        """can TriMeshInstance primitive intersect with a ray? no.
+        The same as TriMesh.
+        """
+        return False
+
+
+    def get_trimesh(self):
+        """get the shared TriMesh (public).
+        \return TriMesh
+        """
+        return self.__trimesh
+
+
+    def set_matrix(self, _matrix):
+        """set the object to world matrix (public). The world space
+        bounding box and per face arrays are recomputed.
+
+        \param[in] _matrix object to world matrix, 4x4
+        """
+        matrix = numpy.array(_matrix, dtype=numpy.float64)
+        if matrix.shape != (4, 4):
+            raise StandardError, ('instance matrix must be 4x4, got ' + str(matrix.shape))
+        try:
+            inv_matrix = numpy.linalg.inv(matrix)
+        except numpy.linalg.LinAlgError:
+            raise StandardError, ('singular instance matrix of [' + str(self.get_name()) +
+                                  ']')
+        self.__matrix     = matrix
+        self.__inv_matrix = inv_matrix
+        self.__bbox       = None
+        for attr in TriMeshInstance.WORLD_FACE_ATTR_LIST:
+            self.__dict__.pop(attr, None)
+
+
+    def get_matrix(self):
+        """get the object to world matrix (public).
+        \return 4x4 numpy.array
+        """
+        return self.__matrix
+
+
+    def get_inverse_matrix(self):
+        """get the world to object matrix (public).
+        \return 4x4 numpy.array
+        """
+        return self.__inv_matrix
+
+
+    @property
+    def face_idx_list(self):
+        """face index list of the shared TriMesh.
+        """
+        return self.__trimesh.face_idx_list
+
+
+    def set_material_index(self, _mat_idx):
+        """set global material index.
+        \param[in] _mat_idx global material index.
+        """
+        self.material_index = _mat_idx
+
+
+    def is_valid(self):
+        """is this valid object? (public). The TriMesh is valid.
+        """
+        return self.__trimesh.is_valid()
+
+
+    def build_bvh(self, _max_leaf_size=8, _bin_count=16, _bvh_cache=None):
+        """build the bottom level BVH of the shared TriMesh, if not
+        yet built (public). The instances share it.
+
+        \param[in] _max_leaf_size max number of faces in a leaf
+        \param[in] _bin_count     number of SAH bins per axis
+        \param[in] _bvh_cache     BVHCache to read/write the BVH. None:
+        always build
+        """
+        if self.__trimesh.get_bvh() == None:
+            self.__trimesh.build_bvh(_max_leaf_size, _bin_count, _bvh_cache)
+
+
+    def get_bvh(self):
+        """get the bottom level BVH of the shared TriMesh (public).
+        \return TriMeshBVH, None when not built.
+        """
+        return self.__trimesh.get_bvh()
+
+
+    def ray_intersect(self, _ray, _max_t=None, _stat=None):
+        """compute ray intersection (public). See TriMesh.ray_intersect().
+
+        \param[in] _ray   a ray (world space)
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return a HitRecord (world space). None if no hit.
+        """
+        hit = self.ray_intersect_face(_ray, _max_t, _stat)
+        if hit == None:
+            return None
+        (t, fi, b1, b2) = hit
+        return self.get_hit_record(t, fi, b1, b2)
+
+
+    def ray_intersect_face(self, _ray, _max_t=None, _stat=None):
+        """compute the closest face hit (public).
+        See TriMesh.ray_intersect_face().
+
+        \param[in] _ray   a ray (world space)
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return (t, face index, b1, b2), None if no hit.
+        """
+        obj_ray = self.__get_object_ray(_ray, _max_t, _stat)
+        if obj_ray == None:
+            return None
+        return self.__trimesh.ray_intersect_face(obj_ray, _max_t, _stat)
+
+
+    def occluded(self, _ray, _max_t=None, _stat=None):
+        """any hit query (public). See TriMesh.occluded().
+
+        \param[in] _ray   a ray (world space)
+        \param[in] _max_t maximal distance. None: the ray's max_t
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return True when the ray hits a face in [min_t, max_t].
+        """
+        obj_ray = self.__get_object_ray(_ray, _max_t, _stat)
+        if obj_ray == None:
+            return False
+        return self.__trimesh.occluded(obj_ray, _max_t, _stat)
+
+
+    def ray_intersect_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir=None, _stat=None):
+        """compute many rays intersection (public).
+        See TriMesh.ray_intersect_batch().
+
+        \param[in] _orig  ray origins numpy.array (R,3) (world space)
+        \param[in] _dir   ray directions numpy.array (R,3) (world space)
+        \param[in] _min_t ray minimal distances numpy.array (R,)
+        \param[in] _max_t ray maximal distances numpy.array (R,)
+        \param[in] _inv_dir not used, the object space inverse
+        directions are computed here.
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return (t, face index) numpy.array (R,) each.
+        """
+        (orig, rdir) = self.__get_object_ray_array(_orig, _dir)
+        return self.__trimesh.ray_intersect_batch(orig, rdir, _min_t, _max_t, None, _stat)
+
+
+    def occluded_batch(self, _orig, _dir, _min_t, _max_t, _inv_dir=None, _stat=None):
+        """many rays any hit query (public). See TriMesh.occluded_batch().
+
+        \param[in] _orig  ray origins numpy.array (R,3) (world space)
+        \param[in] _dir   ray directions numpy.array (R,3) (world space)
+        \param[in] _min_t ray minimal distances numpy.array (R,)
+        \param[in] _max_t ray maximal distances numpy.array (R,)
+        \param[in] _inv_dir not used, see ray_intersect_batch()
+        \param[in] _stat  IntersectStat to count the tests. None: no count
+        \return occluded bool numpy.array (R,)
+        """
+        (orig, rdir) = self.__get_object_ray_array(_orig, _dir)
+        return self.__trimesh.occluded_batch(orig, rdir, _min_t, _max_t, None, _stat)
+
+
+    def get_hit_record(self, _t, _face_idx, _b1, _b2):
+        """create a world space hit record of a face hit (public).
+        \param[in] _t        hit distance
+        \param[in] _face_idx hit face index
+        \param[in] _b1       barycentric coordinate b1
+        \param[in] _b2       barycentric coordinate b2
+        \return a HitRecord.
+        """
+        tmesh = self.__trimesh
+        e1 = ifgimath.transformVector(self.__matrix, tmesh.face_e1[_face_idx])
+        e2 = ifgimath.transformVector(self.__matrix, tmesh.face_e2[_face_idx])
+        v0 = ifgimath.transformPoint(self.__matrix, tmesh.face_v0[_face_idx])
+
+        hr = HitRecord.HitRecord()
+        hr.dist = _t
+        hr.intersect_pos = v0 + _b1 * e1 + _b2 * e2
+        hr.hit_primitive = self
+        hr.hit_face_index = _face_idx
+        hr.hit_barycentric = (_b1, _b2)
+        hr.set_basis_from_edge(e1, e2) # set normal
+        hr.hit_material_index = self.material_index
+        return hr
+
+
+    def __get_object_ray(self, _ray, _max_t, _stat):
+        """transform a ray to the object space. The ray that misses
+        the world space bounding box is culled.
+        \return object space Ray, None when culled.
+        """
+        if self.get_bbox().ray_slab_test(_ray, _max_t) == None:
+            if _stat != None:
+                _stat.mesh_cull_count += 1
+            return None
+        return Ray.Ray(ifgimath.transformPoint(self.__inv_matrix, _ray.get_origin()),
+                       ifgimath.transformVector(self.__inv_matrix, _ray.get_dir()),
+                       _ray.get_min_t(), _ray.get_max_t())
+
+
+    def __get_object_ray_array(self, _orig, _dir):
+        """transform rays to the object space (vectorized).
+        \return (origin (R,3), direction (R,3)) numpy.arrays
+        """
+        m3 = self.__inv_matrix[0:3, 0:3]
+        return (_orig.dot(m3.T) + self.__inv_matrix[0:3, 3], _dir.dot(m3.T))
+
+
+    def __update_bbox(self):
+        """update the world space bounding box: the box of the
+        transformed TriMesh box corners.
+        """
+        self.__bbox = BBox()
+        obj_bbox = self.__trimesh.get_bbox()
+        bmin = obj_bbox.get_min()
+        bmax = obj_bbox.get_max()
+        if (bmin > bmax).any():
+            return              # invalid (empty) box
+        for corner in xrange(8):
+            pos = [bmin[0], bmin[1], bmin[2]]
+            for axis in xrange(3):
+                if corner & (1 << axis):
+                    pos[axis] = bmax[axis]
+            self.__bbox.insert_point(ifgimath.transformPoint(self.__matrix, pos))
+
+
+    def __update_world_face_array(self):
+        """update the world space per face arrays.
+        """
+        tmesh = self.__trimesh
+        m3 = self.__matrix[0:3, 0:3]
+        face_e1 = tmesh.face_e1.dot(m3.T)
+        face_e2 = tmesh.face_e2.dot(m3.T)
+        self.face_v0 = tmesh.face_v0.dot(m3.T) + self.__matrix[0:3, 3]
+        self.face_e1 = face_e1
+        self.face_e2 = face_e2
+        (self.face_n, self.face_area, self.face_frame_u, self.face_frame_v,
+         self.face_frame_w) = get_face_frame_array(face_e1, face_e2)
 
 
 
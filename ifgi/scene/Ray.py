@@ -9,14 +9,22 @@
 \brief a ray
 """
 
-#import math
+import math
 import numpy
 
 # Ray class
 class Ray(object):
     """a Ray
+
+    A ray is created per bounce and per shadow ray, then it is small
+    (__slots__). The path state (reflectance and intensity) is only
+    allocated when it is used, a shadow ray never allocates them. A
+    ray can be reused by reset() and reset_path().
     """
 
+    __slots__ = ('_origin', '_dir', '_inv_dir', '_min_t', '_max_t',
+                 'path_length', '_reflectance', '_intensity')
+
     def __init__(self, _origin, _dir, _min_t, _max_t):
         """default constructor.
         \param[in] _origin ray origin
@@ -26,14 +34,85 @@ class Ray(object):
         \param[in] _max_t ray maximal distance (more than this
         distance doesn't intersect)
         """
-        self.__origin = _origin
-        self.__dir    = _dir
-        self.__min_t  = _min_t
-        self.__max_t  = _max_t
+        self._origin = _origin
+        self._dir    = _dir
+        self._min_t  = _min_t
+        self._max_t  = _max_t
+        # inverse direction, computed when used
+        self._inv_dir = None
+
+        self.path_length  = 0
+        self._reflectance = None
+        self._intensity   = None
+
 
+    def reset(self, _origin, _dir, _min_t=None, _max_t=None):
+        """set the ray origin and direction in place. The path state
+        (path_length, reflectance, intensity) is kept, this is the
+        next bounce of the path.
+
+        The arrays are referred, not copied. Do not modify them later.
+
+        \param[in] _origin ray origin
+        \param[in] _dir    ray direction
+        \param[in] _min_t ray minimal distance. None: unchanged
+        \param[in] _max_t ray maximal distance. None: unchanged
+        """
+        assert(_origin is not None)
+        assert(_dir is not None)
+        self._origin = _origin
+        self._dir    = _dir
+        self._inv_dir = None
+        if _min_t != None:
+            self._min_t = _min_t
+        if _max_t != None:
+            self._max_t = _max_t
+
+
+    def reset_path(self):
+        """reset the path state for a new path. The reflectance and
+        intensity arrays are reused when allocated.
+        """
         self.path_length = 0
-        self.reflectance = numpy.array([1.0, 1.0, 1.0, 1.0])
-        self.intensity   = numpy.array([0.0, 0.0, 0.0, 1.0])
+        if self._reflectance is not None:
+            self._reflectance.fill(1.0)
+        if self._intensity is not None:
+            self._intensity[0:3] = 0.0
+            self._intensity[3]   = 1.0
+
+
+    def __get_reflectance(self):
+        """get the path reflectance (throughput). allocated at the first access.
+        \return reflectance numpy.array (4,)
+        """
+        if self._reflectance is None:
+            self._reflectance = numpy.array([1.0, 1.0, 1.0, 1.0])
+        return self._reflectance
+
+    def __set_reflectance(self, _reflectance):
+        """set the path reflectance.
+        \param[in] _reflectance reflectance
+        """
+        self._reflectance = _reflectance
+
+    reflectance = property(__get_reflectance, __set_reflectance)
+
+
+    def __get_intensity(self):
+        """get the path intensity. allocated at the first access.
+        \return intensity numpy.array (4,)
+        """
+        if self._intensity is None:
+            self._intensity = numpy.array([0.0, 0.0, 0.0, 1.0])
+        return self._intensity
+
+    def __set_intensity(self, _intensity):
+        """set the path intensity.
+        \param[in] _intensity intensity
+        """
+        self._intensity = _intensity
+
+    intensity = property(__get_intensity, __set_intensity)
 
 
     def get_classname(self):
@@ -47,49 +126,68 @@ class Ray(object):
         """set the ray origin.
         \param[in] _origin ray origin.
         """
-        assert(_origin != None)
-        self.__origin = _origin
+        assert(_origin is not None)
+        self._origin = _origin
 
 
     def get_origin(self):
         """get the ray origin.
         \return ray origin.
         """
-        return self.__origin
+        return self._origin
 
 
     def set_dir(self, _dir):
         """set the ray direction vector.
         \param[in] _dir ray direction
         """
-        assert(_dir != None)
-        self.__dir = _dir
+        assert(_dir is not None)
+        self._dir = _dir
+        self._inv_dir = None
 
 
     def get_dir(self):
         """get the ray direction vector.
         \return ray dir.
         """
-        return self.__dir
+        return self._dir
+
+
+    def get_inv_dir(self):
+        """get the inverse ray direction for the slab tests. 1/0 is
+        signed infinity. Computed at the first call after the
+        direction changed.
+        \return (1/dx, 1/dy, 1/dz) tuple of floats
+        """
+        if self._inv_dir is None:
+            inv_list = []
+            for x in self._dir[0:3]:
+                x = float(x)
+                if x == 0.0:
+                    inv_list.append(math.copysign(float('inf'), x))
+                else:
+                    inv_list.append(1.0 / x)
+            self._inv_dir = tuple(inv_list)
+        return self._inv_dir
 
 
     def get_min_t(self):
         """get minimal ray distance.
         \return ray min_t.
         """
-        return self.__min_t
+        return self._min_t
 
 
     def get_max_t(self):
         """get maximal ray distance.
         \return ray max_t.
         """
-        return self.__max_t
+        return self._max_t
 
 
     def __str__(self):
-        return 'orig: '+ str(self.__origin) + ' dir: ' + str(self.__dir) +\
-            ' range: [' + str(self.__min_t)  + ' ' + str(self.__max_t) + ']'
+        return 'orig: '+ str(self._origin) + ' dir: ' + str(self._dir) +\
+            ' range: [' + str(self._min_t)  + ' ' + str(self._max_t) + ']'
 
 
 
@@ -175,6 +175,58 @@ class SGTUpdateBBoxStrategy(SceneGraphTraverseStrategyIF):
                     _cur_node.get_bbox().insert_bbox(chnode.get_bbox())
 
 
+# SGTUpdateTransformStrategy ----------------------------------------
+
+class SGTUpdateTransformStrategy(SceneGraphTraverseStrategyIF):
+    """Update the object to world matrices of the instances.
+
+    The matrices of the TransformNodes on the path from the root are
+    multiplied (a matrix stack), then each InstanceNode's primitive
+    gets (the product x the node's local matrix).
+    """
+    # constructor
+    def __init__(self):
+        """constructor"""
+        self.__matrix_stack = [numpy.identity(4)]
+
+    # apply strategy to node before recurse. Implementation
+    def apply_before_recurse(self, _cur_node, _level):
+        """apply strategy to node before recurse. Implementation
+
+        push the transform, or set the instance matrix.
+
+        \param[in]  _cur_node current visting node
+        \param[in]  _level    current depth
+        """
+        if isinstance(_cur_node, TransformNode):
+            self.__matrix_stack.append(numpy.dot(self.__matrix_stack[-1],
+                                                 _cur_node.get_matrix()))
+        elif isinstance(_cur_node, InstanceNode):
+            _cur_node.get_primitive().set_matrix(numpy.dot(self.__matrix_stack[-1],
+                                                           _cur_node.get_matrix()))
+
+    # apply strategy while visiting __children. Implementation
+    def apply_middle(self, _cur_node, _level):
+        """apply strategy while visiting __children. Implementation
+        \param[in]  _cur_node current visting node
+        \param[in]  _level    current depth
+        """
+        pass
+
+    # apply strategy after visiting
+    def apply_after_recurse(self, _cur_node, _level):
+        """apply strategy after visiting (when returning from the
+        recurse). Implementation
+
+        pop the transform.
+
+        \param[in]  _cur_node current visting node
+        \param[in]  _level    current depth
+        """
+        if isinstance(_cur_node, TransformNode):
+            self.__matrix_stack.pop()
+
+
 # ----------------------------------------------------------------------
 
 class SceneGraph(object):
@@ -274,6 +326,19 @@ class SceneGraph(object):
         self.traverse_sgnode(self.__root_node, print_strategy)
 
 
+    def update_all_transform(self):
+        """update the object to world matrices of all the instances.
+        Call this after a TransformNode or InstanceNode matrix changed.
+        A built accelerator of the container that has the instances
+        needs build_accelerator() again (the shared bottom level BVHs
+        are not rebuilt).
+        \see SGTUpdateTransformStrategy
+        """
+        if self.__root_node == None:
+            return
+        self.traverse_sgnode(self.__root_node, SGTUpdateTransformStrategy())
+
+
     def update_all_bbox(self):
         """update all bounding box recursively.
         \see SGTUpdateBBoxStrategy
@@ -281,6 +346,8 @@ class SceneGraph(object):
         # recompute root bbox
         self.__root_node.get_bbox().invalidate()
 
+        # the instance boxes depend on the transforms
+        self.update_all_transform()
         update_bbox_strategy = SGTUpdateBBoxStrategy()
         self.traverse_sgnode(self.__root_node, update_bbox_strategy)
         # handle no children have valid bbox (e.g., empty scene)
@@ -568,6 +635,137 @@ class PrimitiveNode(SceneGraphNode):
 
 # ----------------------------------------------------------------------
 
+class TransformNode(SceneGraphNode):
+    """Transform node, a Scene Graph Node.
+
+    A group node with a 4x4 matrix (local to the parent). The
+    transform applies to the InstanceNodes under this node (see
+    SceneGraph.update_all_transform()). A PrimitiveNode's TriMesh is
+    already in the world space, it is not transformed.
+    """
+
+    def __init__(self, _nodename, _matrix=None):
+        """constructor
+        \param[in] _nodename node name
+        \param[in] _matrix   4x4 matrix. None: identity
+        """
+        super(TransformNode, self).__init__(_nodename)
+        self.set_matrix(_matrix)
+
+
+    def get_classname(self):
+        """get classname
+        \return: scnegraph node class name"""
+
+        return 'TransformNode'
+
+
+    def set_matrix(self, _matrix):
+        """set the local matrix.
+        \param[in] _matrix 4x4 matrix. None: identity
+        """
+        if _matrix is None:
+            _matrix = numpy.identity(4)
+        matrix = numpy.array(_matrix, dtype=numpy.float64)
+        if matrix.shape != (4, 4):
+            raise StandardError, ('transform matrix must be 4x4, got ' + str(matrix.shape))
+        self.__matrix = matrix
+
+
+    def get_matrix(self):
+        """get the local matrix.
+        \return 4x4 numpy.array
+        """
+        return self.__matrix
+
+# ----------------------------------------------------------------------
+
+class InstanceNode(SceneGraphNode):
+    """Instance node, a Scene Graph Node.
+
+    This refers to a Primitive.TriMeshInstance with a 4x4 matrix
+    (local to the parent). The instance is not copied: the node sets
+    the object to world matrix of the same object that a
+    SceneGeometryMaterialContainer traces, the product of the
+    TransformNode matrices from the root and the local matrix.
+    """
+
+    def __init__(self, _nodename, _instance, _matrix=None):
+        """constructor
+        \param[in] _nodename node name
+        \param[in] _instance Primitive.TriMeshInstance, e.g., the
+        reader's instance_dict['TriMeshInstance']
+        \param[in] _matrix   local 4x4 matrix. None: the instance's
+        current matrix
+        """
+        super(InstanceNode, self).__init__(_nodename)
+        if not isinstance(_instance, Primitive.TriMeshInstance):
+            raise StandardError, ('InstanceNode [' + _nodename +
+                                  '] needs a TriMeshInstance.')
+        if _matrix is None:
+            _matrix = _instance.get_matrix()
+        self.__instance = _instance
+        self.set_matrix(_matrix)
+
+
+    def get_classname(self):
+        """get classname
+        \return: scnegraph node class name"""
+
+        return 'InstanceNode'
+
+
+    def is_primitive_node(self):
+        """is this a primitive node?
+        \return True, the instance is the primitive.
+        """
+        return True
+
+
+    def get_primitive(self):
+        """get the primitive.
+        \return the Primitive.TriMeshInstance
+        """
+        return self.__instance
+
+
+    def set_matrix(self, _matrix):
+        """set the local matrix. The object to world matrix is updated
+        by SceneGraph.update_all_transform().
+        \param[in] _matrix 4x4 matrix
+        """
+        matrix = numpy.array(_matrix, dtype=numpy.float64)
+        if matrix.shape != (4, 4):
+            raise StandardError, ('instance matrix must be 4x4, got ' + str(matrix.shape))
+        self.__matrix = matrix
+
+
+    def get_matrix(self):
+        """get the local matrix.
+        \return 4x4 numpy.array
+        """
+        return self.__matrix
+
+
+    def get_bbox(self):
+        """get the world space bounding box of the instance.
+        \return bounding box
+        """
+        return self.__instance.get_bbox()
+
+
+    def print_nodeinfo(self, _level):
+        """print this object for debug.
+
+        \param[in] _depth node depth"""
+
+        indent = '  ' * _level
+        print indent + '+ InstanceNode:' + self.get_nodename() + ' of ' +\
+            str(self.__instance.get_trimesh().get_name()) +\
+            ' ' + str(self.__instance.get_bbox())
+
+# ----------------------------------------------------------------------
+
 class MaterialNode(SceneGraphNode):
     """Material node, a Scene Graph Node.
 
@@ -804,6 +1002,8 @@ def create_ifgi_scenegraph(_ifgi_reader):
                                                    +--+ TriMesh: 'trimesh0'
                                                    +--+ TriMesh: 'trimesh1'
                                                       ...
+                                                   +--+ InstanceNode: 'inst0'
+                                                      ...
 
     """
     if (not _ifgi_reader.is_valid()):
@@ -838,6 +1038,11 @@ def create_ifgi_scenegraph(_ifgi_reader):
     for geo_dict in _ifgi_reader.geometry_dict_list:
         ch_node = PrimitiveNode(geo_dict['geo_name'], geo_dict['TriMesh'])
         mesh_group.append_child(ch_node)
+    for inst_dict in _ifgi_reader.instance_dict_list:
+        # the reader's instance is the one the container traces
+        ch_node = InstanceNode(inst_dict['inst_name'], inst_dict['TriMeshInstance'],
+                               inst_dict['matrix'])
+        mesh_group.append_child(ch_node)
 
     sg.set_root_node(rootsg)
     sg.set_current_camera(cam_node.get_camera())
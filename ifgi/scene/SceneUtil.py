@@ -8,10 +8,10 @@
 \brief scene related utility.
 """
 
-import sys
+import numpy
 
 # import Camera, Primitive, Material, Texture
-import ObjReader, IfgiSceneReader, Material, HitRecord
+import ObjReader, IfgiSceneReader, Material, Primitive, BVH, BVHCache
 from ifgi.base.ILog import ILog
 
 
@@ -19,6 +19,15 @@ from ifgi.base.ILog import ILog
 
 class SceneGeometryMaterialContainer(object):
     """Scene geometry and material container
+
+    geo_dict['TriMesh'] of geometry_dict_list is a Primitive.TriMesh
+    or a Primitive.TriMeshInstance (see append_instance()). Both have
+    the same intersection and per face array interface.
+
+    build_accelerator() reads the bottom level BVHs from the BVH
+    cache. The cache is only on when the environment variable
+    IFGI_BVH_CACHE_DIR is set, or a cache is given by
+    set_bvh_cache() or by the scene reader.
     """
 
     def __init__(self):
@@ -33,6 +42,14 @@ class SceneGeometryMaterialContainer(object):
         # global geometry name -> index of geometry_def_list
         self.geometry_name_idx_dict = {}
 
+        # top level BVH (None: not built, brute force intersection)
+        self.__accelerator = None
+        # cache of the bottom level BVHs (None: always build)
+        self.__bvh_cache = BVHCache.get_default_cache()
+
+        # intersection statistics (the default of the queries)
+        self.intersect_stat = Primitive.IntersectStat()
+
 
     def append_ifgi_data(self, _ifgi_reader):
         """Append ifgi reader's data to this.
@@ -72,23 +89,240 @@ class SceneGeometryMaterialContainer(object):
 
         assert(len(self.geometry_dict_list) == len(self.geometry_name_idx_dict))
 
+        # append instance (shares the TriMesh of the reader's geometry)
+        for inst_dict in _ifgi_reader.instance_dict_list:
+            self.__append_instance_primitive(inst_dict['TriMeshInstance'])
+
+        # the reader's BVH cache, if set
+        if _ifgi_reader.get_bvh_cache() != None:
+            self.__bvh_cache = _ifgi_reader.get_bvh_cache()
+
+        # geometry changed, the accelerator is not valid anymore
+        self.__accelerator = None
+
+
+    def append_instance(self, _inst_name, _trimesh, _matrix, _mat_name=None):
+        """append an instance of a TriMesh.
+
+        The TriMesh (and its bottom level BVH) is shared, not copied.
+
+        \param[in] _inst_name instance name (a unique geometry name)
+        \param[in] _trimesh   shared TriMesh (object space)
+        \param[in] _matrix    object to world matrix, 4x4
+        \param[in] _mat_name  material name. None: the TriMesh's
+        material name
+        \return the Primitive.TriMeshInstance
+        """
+        inst = Primitive.TriMeshInstance(_inst_name, _trimesh, _matrix, _mat_name)
+        self.__append_instance_primitive(inst)
+
+        # geometry changed, the accelerator is not valid anymore
+        self.__accelerator = None
+        return inst
+
+
+    def build_accelerator(self, _max_leaf_size=8, _bin_count=16):
+        """build the two level BVH accelerator (opt-in).
+
+        Builds the bottom level BVH of each TriMesh and the top level
+        BVH over the TriMesh bounding boxes. After this,
+        ray_intersect(), occluded(), and their batch versions use the
+        accelerator. Appending data invalidates the accelerator.
+
+        The bottom level BVHs are read from the BVH cache when
+        cached (see set_bvh_cache()), both the single ray and the
+        batch queries traverse them.
+
+        \param[in] _max_leaf_size max number of primitives in a leaf
+        \param[in] _bin_count     number of SAH bins per axis
+        """
+        trimesh_list = []
+        for geo_dict in self.geometry_dict_list:
+            trimesh_list.append(geo_dict['TriMesh'])
+
+        self.__accelerator = BVH.SceneBVH(trimesh_list, _max_leaf_size, _bin_count,
+                                          self.__bvh_cache)
+        ILog.info('built the accelerator.')
+        self.__accelerator.print_stat()
+        if self.__bvh_cache != None:
+            ILog.info('BVH cache: ' + str(self.__bvh_cache.stat))
+
+
+    def set_bvh_cache(self, _bvh_cache):
+        """set the cache of the bottom level BVHs.
+        The default is BVHCache.get_default_cache() (the directory of
+        the environment variable IFGI_BVH_CACHE_DIR, None when it is
+        not set), or the scene reader's cache of append_ifgi_data().
+
+        \param[in] _bvh_cache BVHCache. None: always build
+        """
+        self.__bvh_cache = _bvh_cache
+
 
-    # should be aggregate
-    def ray_intersect(self, _ray):
+    def get_bvh_cache(self):
+        """get the cache of the bottom level BVHs.
+        \return BVHCache, None when no cache
+        """
+        return self.__bvh_cache
+
+
+    def get_accelerator(self):
+        """get the accelerator.
+        \return SceneBVH, None when not built.
+        """
+        return self.__accelerator
+
+
+    def reset_intersect_stat(self):
+        """reset the intersection statistics (e.g., per frame).
+        """
+        self.intersect_stat.reset()
+
+
+    def ray_intersect(self, _ray, _stat=None):
         """ray to whole geometry intersect
+
+        \param[in] _ray  a ray
+        \param[in] _stat IntersectStat to count the tests. None:
+        intersect_stat
+        \return the closest HitRecord. None if no hit.
         """
-        closest_hr = HitRecord.HitRecord()
+        stat = _stat
+        if stat == None:
+            stat = self.intersect_stat
+        stat.ray_count += 1
+
+        if self.__accelerator != None:
+            return self.__accelerator.ray_intersect(_ray, stat)
+
+        # a mesh whose box is missed or beyond the closest hit so far
+        # is skipped by the slab test.
+        closest_hr = None
+        max_t = _ray.get_max_t()
         for geo_dict in self.geometry_dict_list:
-            hr = geo_dict['TriMesh'].ray_intersect(_ray)
+            hr = geo_dict['TriMesh'].ray_intersect(_ray, max_t, stat)
             if(hr != None):
-                if closest_hr.dist > hr.dist:
+                if (closest_hr == None) or (closest_hr.dist > hr.dist):
                     closest_hr = hr
+                    max_t = hr.dist
 
-        if closest_hr.dist == sys.float_info.max:
-            return None
         return closest_hr
 
 
+    def occluded(self, _ray, _stat=None):
+        """ray to whole geometry any hit query (e.g., a shadow ray).
+        This stops at the first found hit.
+
+        \param[in] _ray  a ray. [min_t, max_t] is tested.
+        \param[in] _stat IntersectStat to count the tests. None:
+        intersect_stat
+        \return True when the ray hits any geometry.
+        """
+        stat = _stat
+        if stat == None:
+            stat = self.intersect_stat
+        stat.occlusion_ray_count += 1
+
+        if self.__accelerator != None:
+            is_occluded = self.__accelerator.occluded(_ray, stat)
+        else:
+            is_occluded = False
+            for geo_dict in self.geometry_dict_list:
+                if geo_dict['TriMesh'].occluded(_ray, None, stat):
+                    is_occluded = True
+                    break
+
+        if is_occluded:
+            stat.occluded_count += 1
+        return is_occluded
+
+
+    def ray_intersect_batch(self, _orig, _dir, _min_t, _max_t, _stat=None):
+        """many rays to whole geometry intersect. The rays traverse
+        the accelerator when it has been built (see
+        build_accelerator()), otherwise all the meshes are tested.
+
+        \param[in] _orig  ray origins numpy.array (R,3)
+        \param[in] _dir   ray directions numpy.array (R,3)
+        \param[in] _min_t ray minimal distances numpy.array (R,)
+        \param[in] _max_t ray maximal distances numpy.array (R,)
+        \param[in] _stat IntersectStat to count the tests. None:
+        intersect_stat
+        \return (t, geometry index, face index) numpy.array (R,)
+        each. t = inf, geometry index = face index = -1 when the ray
+        does not hit.
+        """
+        stat = _stat
+        if stat == None:
+            stat = self.intersect_stat
+        ray_count = _orig.shape[0]
+        stat.ray_count += ray_count
+        inv_dir = Primitive.get_inv_dir_array(_dir)
+        if self.__accelerator != None:
+            return self.__accelerator.ray_intersect_batch(_orig, _dir, _min_t, _max_t,
+                                                          inv_dir, stat)
+
+        t_hit  = numpy.empty(ray_count)
+        t_hit.fill(numpy.inf)
+        gi_hit = numpy.empty(ray_count, dtype=numpy.int32)
+        gi_hit.fill(-1)
+        fi_hit = numpy.empty(ray_count, dtype=numpy.int32)
+        fi_hit.fill(-1)
+
+        # the rays whose closest hit so far is before a mesh box skip
+        # the mesh. See TriMesh.ray_intersect_batch().
+        max_t = _max_t.copy()
+        for (gi, geo_dict) in enumerate(self.geometry_dict_list):
+            (t, fi) = geo_dict['TriMesh'].ray_intersect_batch(_orig, _dir, _min_t, max_t,
+                                                              inv_dir, stat)
+            is_closer = (t < t_hit)
+            t_hit[is_closer]  = t[is_closer]
+            gi_hit[is_closer] = gi
+            fi_hit[is_closer] = fi[is_closer]
+            max_t = numpy.minimum(max_t, t_hit)
+
+        return (t_hit, gi_hit, fi_hit)
+
+
+    def occluded_batch(self, _orig, _dir, _min_t, _max_t, _stat=None):
+        """many rays to whole geometry any hit query (e.g., shadow
+        rays). A ray found occluded by a mesh is not tested by the
+        later meshes. The accelerator is used as ray_intersect_batch().
+
+        \param[in] _orig  ray origins numpy.array (R,3)
+        \param[in] _dir   ray directions numpy.array (R,3)
+        \param[in] _min_t ray minimal distances numpy.array (R,)
+        \param[in] _max_t ray maximal distances numpy.array (R,)
+        \param[in] _stat IntersectStat to count the tests. None:
+        intersect_stat
+        \return occluded bool numpy.array (R,)
+        """
+        stat = _stat
+        if stat == None:
+            stat = self.intersect_stat
+        ray_count = _orig.shape[0]
+        stat.occlusion_ray_count += ray_count
+
+        inv_dir = Primitive.get_inv_dir_array(_dir)
+        if self.__accelerator != None:
+            is_occluded = self.__accelerator.occluded_batch(_orig, _dir, _min_t, _max_t,
+                                                            inv_dir, stat)
+        else:
+            is_occluded = numpy.zeros(ray_count, dtype=bool)
+            ray_idx = numpy.arange(ray_count)
+            for geo_dict in self.geometry_dict_list:
+                if len(ray_idx) == 0:
+                    break
+                is_hit = geo_dict['TriMesh'].occluded_batch(_orig[ray_idx], _dir[ray_idx],
+                                                            _min_t[ray_idx], _max_t[ray_idx],
+                                                            inv_dir[ray_idx], stat)
+                is_occluded[ray_idx[is_hit]] = True
+                ray_idx = ray_idx[~is_hit]
+
+        stat.occluded_count += int(is_occluded.sum())
+        return is_occluded
+
+
     def print_summary(self):
         """print summary"""
         ILog.info('# of materials  = ' + str(len(self.material_list)) +
@@ -118,6 +352,27 @@ class SceneGeometryMaterialContainer(object):
         # print 'geometry name index map is valid.'
 
 
+    # private: ------------------------------------------------------------
+
+    def __append_instance_primitive(self, _inst):
+        """append a TriMeshInstance as a geometry.
+        \param[in] _inst Primitive.TriMeshInstance
+        """
+        inst_name = _inst.get_name()
+        mat_name  = _inst.get_material_name()
+        if inst_name in self.geometry_name_idx_dict:
+            raise StandardError, ('duplicate geometry name [' + inst_name + '].')
+        if not (mat_name in self.material_name_idx_dict):
+            raise StandardError, ('no material [' + str(mat_name) + '] of instance [' +
+                                  inst_name + '].')
+
+        self.geometry_dict_list.append({'geo_name': inst_name,
+                                        'material': mat_name,
+                                        'TriMesh':  _inst})
+        self.geometry_name_idx_dict[inst_name] = len(self.geometry_dict_list) - 1
+        _inst.set_material_index(self.material_name_idx_dict[mat_name])
+
+
 
 
 # ----------------------------------------
@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for BVH
+#
+
+"""test IFGI BVH"""
+
+import unittest
+import random
+import numpy
+
+import ObjReader, ConvReader2Primitive, IfgiSceneReader, SceneUtil
+import Ray, BVH, Primitive
+
+
+def load_trimesh(_objfname):
+    """load a trimesh for the test"""
+    objreader = ObjReader.ObjReader()
+    objreader.read(_objfname)
+    return ConvReader2Primitive.conv_objreader_trimesh(objreader, 'mesh', 'mat')
+
+
+def random_ray_to_bbox(_bbox):
+    """create a random ray toward a point in the bbox"""
+    bmin = _bbox.get_min()
+    bmax = _bbox.get_max()
+    center = 0.5 * (bmin + bmax)
+    diag   = numpy.linalg.norm(bmax - bmin)
+    target = numpy.array([random.uniform(bmin[i], bmax[i]) for i in xrange(3)])
+    orig   = center + diag * numpy.array([random.uniform(-1, 1) for i in xrange(3)])
+    rdir   = target - orig
+    rdir  /= numpy.linalg.norm(rdir)
+    return Ray.Ray(orig, rdir, 0.0001, 1000000.0)
+
+
+class TestBVH(unittest.TestCase):
+    """test for BVH"""
+
+    def test_bvh_build(self):
+        """bvh build: all the primitives are in the leaves"""
+        tmesh = load_trimesh('../../sampledata/cylinder.obj')
+        tmesh.build_bvh(4, 8)
+        bvh = tmesh.get_bvh()
+
+        self.assertEquals(bvh.stat.primitive_count, 280)
+        self.assertEquals(sorted(bvh.prim_order), range(280))
+        leaf = bvh.node_child < 0
+        self.assertEquals(bvh.stat.leaf_count, leaf.sum())
+        self.assertEquals(bvh.node_count[leaf].sum(), 280)
+        assert(bvh.node_count[leaf].max() <= 4)
+        assert(bvh.stat.build_time_sec >= 0.0)
+
+
+    def test_bvh_trimesh_intersect(self):
+        """bvh: trimesh intersection is the same as brute force"""
+        random.seed(0)
+        tmesh = load_trimesh('../../sampledata/cylinder.obj')
+
+        ray_list = [random_ray_to_bbox(tmesh.get_bbox()) for i in xrange(50)]
+        brute_list = [tmesh.ray_intersect(r) for r in ray_list]
+
+        tmesh.build_bvh()
+        for (r, brute_hr) in zip(ray_list, brute_list):
+            hr = tmesh.ray_intersect(r)
+            if brute_hr == None:
+                assert(hr == None)
+            else:
+                assert(hr != None)
+                self.assertAlmostEqual(hr.dist, brute_hr.dist)
+
+        stat = tmesh.get_bvh().stat
+        self.assertEquals(stat.ray_count, 50)
+        assert(stat.primitive_test_count < 50 * 280)
+
+
+    def test_bvh_scene_intersect(self):
+        """bvh: scene intersection is the same as brute force"""
+        random.seed(1)
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        ifgireader.read('../../sampledata/cornel_box.ifgi')
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.append_ifgi_data(ifgireader)
+
+        scene_bbox = scene_geo_mat.geometry_dict_list[0]['TriMesh'].get_bbox()
+        ray_list = [random_ray_to_bbox(scene_bbox) for i in xrange(20)]
+        brute_list = [scene_geo_mat.ray_intersect(r) for r in ray_list]
+
+        scene_geo_mat.build_accelerator()
+        assert(scene_geo_mat.get_accelerator() != None)
+        for (r, brute_hr) in zip(ray_list, brute_list):
+            hr = scene_geo_mat.ray_intersect(r)
+            if brute_hr == None:
+                assert(hr == None)
+            else:
+                assert(hr != None)
+                self.assertAlmostEqual(hr.dist, brute_hr.dist)
+                self.assertEquals(hr.hit_material_index,
+                                  brute_hr.hit_material_index)
+
+
+    def test_scene_intersect_batch(self):
+        """batch intersection is the same as one by one intersection"""
+        random.seed(2)
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        ifgireader.read('../../sampledata/cornel_box.ifgi')
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.append_ifgi_data(ifgireader)
+
+        scene_bbox = scene_geo_mat.geometry_dict_list[0]['TriMesh'].get_bbox()
+        ray_list = [random_ray_to_bbox(scene_bbox) for i in xrange(50)]
+        orig  = numpy.array([r.get_origin() for r in ray_list])
+        vdir  = numpy.array([r.get_dir()    for r in ray_list])
+        min_t = numpy.array([r.get_min_t()  for r in ray_list])
+        max_t = numpy.array([r.get_max_t()  for r in ray_list])
+        (t, gi, fi) = scene_geo_mat.ray_intersect_batch(orig, vdir, min_t, max_t)
+
+        for (i, r) in enumerate(ray_list):
+            hr = scene_geo_mat.ray_intersect(r)
+            if hr == None:
+                self.assertEquals(gi[i], -1)
+                self.assertEquals(fi[i], -1)
+            else:
+                self.assertAlmostEqual(t[i], hr.dist)
+                tmesh = scene_geo_mat.geometry_dict_list[gi[i]]['TriMesh']
+                self.assertEquals(tmesh.material_index, hr.hit_material_index)
+
+
+    def test_scene_occluded(self):
+        """occluded (any hit) agrees with the closest hit, brute force,
+        batch, and bvh"""
+        random.seed(3)
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        ifgireader.read('../../sampledata/cornel_box.ifgi')
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.append_ifgi_data(ifgireader)
+
+        scene_bbox = scene_geo_mat.geometry_dict_list[0]['TriMesh'].get_bbox()
+        # short rays: some of them stop before the geometry
+        diag = numpy.linalg.norm(scene_bbox.get_max() - scene_bbox.get_min())
+        ray_list = []
+        for i in xrange(50):
+            r = random_ray_to_bbox(scene_bbox)
+            ray_list.append(Ray.Ray(r.get_origin(), r.get_dir(), r.get_min_t(),
+                                    random.uniform(0.0, 2.0 * diag)))
+        ref_list = [scene_geo_mat.ray_intersect(r) != None for r in ray_list]
+        assert(any(ref_list) and not all(ref_list))
+
+        scene_geo_mat.reset_intersect_stat()
+        occ_list = [scene_geo_mat.occluded(r) for r in ray_list]
+        self.assertEquals(occ_list, ref_list)
+        stat = scene_geo_mat.intersect_stat
+        self.assertEquals(stat.occlusion_ray_count, 50)
+        self.assertEquals(stat.occluded_count, sum(ref_list))
+        assert(stat.triangle_test_count > 0)
+
+        orig  = numpy.array([r.get_origin() for r in ray_list])
+        vdir  = numpy.array([r.get_dir()    for r in ray_list])
+        min_t = numpy.array([r.get_min_t()  for r in ray_list])
+        max_t = numpy.array([r.get_max_t()  for r in ray_list])
+        is_occluded = scene_geo_mat.occluded_batch(orig, vdir, min_t, max_t)
+        self.assertEquals(list(is_occluded), ref_list)
+
+        scene_geo_mat.build_accelerator()
+        self.assertEquals([scene_geo_mat.occluded(r) for r in ray_list], ref_list)
+
+
+    def test_bvh_intersect_batch(self):
+        """bvh batch intersection is the same as brute force batch
+        intersection (bunny, the mesh and a scene with instances)"""
+        random.seed(5)
+        tmesh = load_trimesh('../../sampledata/bunny1_8K.obj')
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.geometry_dict_list.append({'TriMesh': tmesh})
+        for (i, offset) in enumerate([0.05, -0.1]):
+            matrix = numpy.identity(4)
+            matrix[0:3, 3] = offset
+            inst = Primitive.TriMeshInstance('inst' + str(i), tmesh, matrix)
+            scene_geo_mat.geometry_dict_list.append({'TriMesh': inst})
+
+        ray_list = [random_ray_to_bbox(tmesh.get_bbox()) for i in xrange(200)]
+        # short rays: some of them stop before the mesh
+        diag = numpy.linalg.norm(tmesh.get_bbox().get_max() - tmesh.get_bbox().get_min())
+        ray_list += [Ray.Ray(r.get_origin(), r.get_dir(), r.get_min_t(),
+                             random.uniform(0.0, 2.0 * diag)) for r in ray_list[0:100]]
+        orig  = numpy.array([r.get_origin() for r in ray_list])
+        vdir  = numpy.array([r.get_dir()    for r in ray_list])
+        min_t = numpy.array([r.get_min_t()  for r in ray_list])
+        max_t = numpy.array([r.get_max_t()  for r in ray_list])
+
+        (brute_t, brute_fi) = tmesh.ray_intersect_batch(orig, vdir, min_t, max_t)
+        brute_occ = tmesh.occluded_batch(orig, vdir, min_t, max_t)
+        (brute_scene_t, brute_gi, brute_scene_fi) = \
+            scene_geo_mat.ray_intersect_batch(orig, vdir, min_t, max_t)
+        brute_scene_occ = scene_geo_mat.occluded_batch(orig, vdir, min_t, max_t)
+        assert((brute_fi >= 0).any() and (brute_fi < 0).any())
+        self.assertEquals(list(brute_occ), list(brute_fi >= 0))
+        self.assertEquals(set(brute_gi), set([-1, 0, 1, 2]))
+
+        scene_geo_mat.build_accelerator(4)
+        bvh_stat = tmesh.get_bvh().stat
+        bvh_stat.reset_traversal()
+        (t, fi) = tmesh.ray_intersect_batch(orig, vdir, min_t, max_t)
+        assert(numpy.allclose(t, brute_t))
+        self.assertEquals(list(fi), list(brute_fi))
+        assert(bvh_stat.ray_count > 0)
+        assert(bvh_stat.primitive_test_count < len(ray_list) * len(tmesh.face_idx_list) / 10)
+        self.assertEquals(list(tmesh.occluded_batch(orig, vdir, min_t, max_t)),
+                          list(brute_occ))
+
+        scene_geo_mat.reset_intersect_stat()
+        (t, gi, fi) = scene_geo_mat.ray_intersect_batch(orig, vdir, min_t, max_t)
+        assert(numpy.allclose(t, brute_scene_t))
+        self.assertEquals(list(gi), list(brute_gi))
+        self.assertEquals(list(fi), list(brute_scene_fi))
+        self.assertEquals(list(scene_geo_mat.occluded_batch(orig, vdir, min_t, max_t)),
+                          list(brute_scene_occ))
+        stat = scene_geo_mat.intersect_stat
+        self.assertEquals((stat.ray_count, stat.occlusion_ray_count), (300, 300))
+        self.assertEquals(stat.occluded_count, brute_scene_occ.sum())
+        assert(scene_geo_mat.get_accelerator().stat.ray_count == 600)
+
+
+    def test_closest_hit_shrink_max_t(self):
+        """the closest hit so far culls the farther meshes"""
+        random.seed(4)
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        ifgireader.read('../../sampledata/cornel_box.ifgi')
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.append_ifgi_data(ifgireader)
+
+        scene_bbox = scene_geo_mat.geometry_dict_list[0]['TriMesh'].get_bbox()
+        ray_list = [random_ray_to_bbox(scene_bbox) for i in xrange(50)]
+        scene_geo_mat.reset_intersect_stat()
+        for r in ray_list:
+            scene_geo_mat.ray_intersect(r)
+        stat = scene_geo_mat.intersect_stat
+        mesh_count = len(scene_geo_mat.geometry_dict_list)
+        self.assertEquals(stat.ray_count, 50)
+        self.assertEquals(stat.mesh_test_count + stat.mesh_cull_count, 50 * mesh_count)
+        assert(stat.mesh_cull_count > 0)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestBVH)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for BVHCache
+#
+
+"""test IFGI BVHCache"""
+
+import unittest
+import os, shutil, tempfile, random
+import numpy
+
+import BVHCache, IfgiSceneReader, SceneUtil
+from test_BVH import load_trimesh, random_ray_to_bbox
+
+
+class TestBVHCache(unittest.TestCase):
+    """test for BVHCache"""
+
+    def setUp(self):
+        """create a cache directory"""
+        self.__tmpdir    = tempfile.mkdtemp()
+        self.__cache_dir = os.path.join(self.__tmpdir, 'bvhcache')
+
+
+    def tearDown(self):
+        """remove the temporary directory"""
+        shutil.rmtree(self.__tmpdir)
+
+
+    def test_trimesh_key(self):
+        """key: the same for the same data and parameters"""
+        tmesh  = load_trimesh('../../sampledata/cylinder.obj')
+        tmesh2 = load_trimesh('../../sampledata/cylinder.obj')
+        key = BVHCache.compute_trimesh_key(tmesh, 8, 16)
+        self.assertEquals(key, BVHCache.compute_trimesh_key(tmesh2, 8, 16))
+        assert(key != BVHCache.compute_trimesh_key(tmesh, 4, 16))
+        assert(key != BVHCache.compute_trimesh_key(tmesh, 8, 8))
+
+        vertex = numpy.array(tmesh2.vertex_list, dtype=numpy.float64)
+        vertex[0, 0] += 1.0
+        tmesh2.set_data(vertex, tmesh2.face_idx_list, tmesh2.texcoord_list,
+                        tmesh2.texcoord_idx_list, tmesh2.normal_list, tmesh2.normal_idx_list)
+        assert(key != BVHCache.compute_trimesh_key(tmesh2, 8, 16))
+
+
+    def test_bvh_cache(self):
+        """cache: a cached BVH is the same as a built one"""
+        random.seed(0)
+        cache = BVHCache.BVHCache(self.__cache_dir)
+        tmesh = load_trimesh('../../sampledata/cylinder.obj')
+        tmesh.build_bvh(4, 8, cache)
+        self.assertEquals((cache.stat.miss_count, cache.stat.write_count), (1, 1))
+        ref_bvh  = tmesh.get_bvh()
+        ray_list = [random_ray_to_bbox(tmesh.get_bbox()) for i in xrange(30)]
+        ref_list = [tmesh.ray_intersect(r) for r in ray_list]
+
+        tmesh = load_trimesh('../../sampledata/cylinder.obj')
+        tmesh.build_bvh(4, 8, cache)
+        self.assertEquals(cache.stat.hit_count, 1)
+        bvh = tmesh.get_bvh()
+        for name in BVHCache.ARRAY_NAME_LIST:
+            assert((getattr(bvh, name) == getattr(ref_bvh, name)).all())
+        for name in BVHCache.STAT_NAME_LIST:
+            self.assertEquals(getattr(bvh.stat, name), getattr(ref_bvh.stat, name))
+        for (r, ref_hr) in zip(ray_list, ref_list):
+            hr = tmesh.ray_intersect(r)
+            if ref_hr == None:
+                assert(hr == None)
+            else:
+                self.assertAlmostEqual(hr.dist, ref_hr.dist)
+
+        # a broken file is rebuilt and rewritten
+        key = BVHCache.compute_trimesh_key(tmesh, 4, 8)
+        with open(cache.get_cache_filename(key), 'wb') as f:
+            f.write('broken')
+        self.assertEquals(cache.read(key), None)
+        tmesh.build_bvh(4, 8, cache)
+        assert(cache.read(key) != None)
+
+
+    def test_lru_evict(self):
+        """cache: the least recently used files are evicted over the
+        max total size"""
+        cache = BVHCache.BVHCache(self.__cache_dir)
+        tmesh = load_trimesh('../../sampledata/cylinder.obj')
+        key_list = []
+        for (i, leaf_size) in enumerate([8, 8, 8]):
+            tmesh.build_bvh(leaf_size, 16 - i, cache)
+            key_list.append(BVHCache.compute_trimesh_key(tmesh, leaf_size, 16 - i))
+            # distinct mtimes, the first one is the oldest
+            os.utime(cache.get_cache_filename(key_list[-1]), (1000 + i, 1000 + i))
+        file_size = max([os.path.getsize(cache.get_cache_filename(k)) for k in key_list])
+
+        # room for two files. use the first one, then the second one
+        # is the oldest.
+        cache = BVHCache.BVHCache(self.__cache_dir, 2 * file_size + file_size / 2)
+        assert(cache.read(key_list[0]) != None)
+        self.assertEquals(cache.evict(), 1)
+        assert(cache.get_total_size() <= cache.get_max_total_size())
+        assert(os.path.isfile(cache.get_cache_filename(key_list[0])))
+        assert(not os.path.isfile(cache.get_cache_filename(key_list[1])))
+        assert(os.path.isfile(cache.get_cache_filename(key_list[2])))
+
+        cache.clear()
+        self.assertEquals(cache.get_total_size(), 0)
+
+
+    def test_scene_bvh_cache(self):
+        """scene: the reader's cache is used by build_accelerator, the
+        batch queries traverse the cached BVHs"""
+        random.seed(2)
+        batch_hit_list = []
+        for i in xrange(2):
+            ifgireader = IfgiSceneReader.IfgiSceneReader()
+            cache = BVHCache.BVHCache(self.__cache_dir)
+            ifgireader.set_bvh_cache(cache)
+            ifgireader.read('../../sampledata/cornel_box.ifgi')
+            scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+            scene_geo_mat.append_ifgi_data(ifgireader)
+            assert(scene_geo_mat.get_bvh_cache() is cache)
+            scene_geo_mat.build_accelerator()
+            mesh_count = len(scene_geo_mat.geometry_dict_list)
+            if i == 0:
+                self.assertEquals(cache.stat.write_count, mesh_count)
+            else:
+                self.assertEquals((cache.stat.hit_count, cache.stat.write_count),
+                                  (mesh_count, 0))
+
+            if i == 0:
+                scene_bbox = scene_geo_mat.geometry_dict_list[0]['TriMesh'].get_bbox()
+                ray_list = [random_ray_to_bbox(scene_bbox) for j in xrange(50)]
+            accel = scene_geo_mat.get_accelerator()
+            accel.reset_traversal_stat()
+            (t, gi, fi) = scene_geo_mat.ray_intersect_batch(
+                numpy.array([r.get_origin() for r in ray_list]),
+                numpy.array([r.get_dir()    for r in ray_list]),
+                numpy.array([r.get_min_t()  for r in ray_list]),
+                numpy.array([r.get_max_t()  for r in ray_list]))
+            assert(accel.get_blas_stat().ray_count > 0)
+            batch_hit_list.append((list(gi), list(fi)))
+        self.assertEquals(batch_hit_list[0], batch_hit_list[1])
+
+
+    def test_default_cache(self):
+        """default cache: only when IFGI_BVH_CACHE_DIR is set"""
+        env_dir = os.environ.get(BVHCache.CACHE_DIR_ENV)
+        try:
+            os.environ[BVHCache.CACHE_DIR_ENV] = ''
+            assert(BVHCache.get_default_cache() == None)
+            assert(SceneUtil.SceneGeometryMaterialContainer().get_bvh_cache() == None)
+
+            os.environ[BVHCache.CACHE_DIR_ENV] = self.__cache_dir
+            cache = BVHCache.get_default_cache()
+            assert(cache != None)
+            assert(SceneUtil.SceneGeometryMaterialContainer().get_bvh_cache() is cache)
+        finally:
+            if env_dir == None:
+                del os.environ[BVHCache.CACHE_DIR_ENV]
+            else:
+                os.environ[BVHCache.CACHE_DIR_ENV] = env_dir
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestBVHCache)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
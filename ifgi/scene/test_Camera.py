@@ -8,6 +8,7 @@
 """test IFGI Camera"""
 
 import unittest
+import numpy
 from ifgi.base  import enum
 from ifgi.scene import Camera
 
@@ -23,6 +24,53 @@ class TestCamera(unittest.TestCase):
         print glcam.get_param_key()
         print glcam.get_config_dict()
 
+
+    def test_generate_rays(self):
+        """test generate rays: the same as get_ray"""
+        cam = Camera.IFGICamera()
+        cam.set_eye_pos(numpy.array([1.0, 2.0, 3.0]))
+        cam.set_resolution_x(4)
+        cam.set_resolution_y(3)
+        (orig, vdir) = cam.generate_tile_rays(0, 3, 0, 2)
+        self.assertEquals(orig.shape, (12, 3))
+        i = 0
+        for x in xrange(4):
+            for y in xrange(3):
+                r = cam.get_ray((x + 0.5) / 4.0, (y + 0.5) / 3.0)
+                assert(numpy.allclose(orig[i], r.get_origin()))
+                assert(numpy.allclose(vdir[i], r.get_dir()))
+                i += 1
+
+
+    def test_generate_rays_lens(self):
+        """test generate rays: thin lens rays converge on the focal plane"""
+        cam = Camera.IFGICamera()
+        cam.set_focal_length(1.0)
+        cam.set_lens_to_film_distance(1.25)
+        focal_dist = cam.get_focal_plane_distance()
+        self.assertAlmostEqual(focal_dist, 5.0)
+
+        dx = numpy.array([0.3, 0.3, 0.3])
+        dy = numpy.array([0.6, 0.6, 0.6])
+        lens_uv = numpy.array([[0.0, 0.0], [1.0, 0.0], [-0.5, 0.5]])
+        (orig, vdir) = cam.generate_rays(dx, dy, lens_uv, 0.1)
+        (porig, pdir) = cam.generate_rays(dx, dy)
+        assert(numpy.allclose(orig[0], porig[0]))
+        assert(numpy.allclose(vdir[0], pdir[0]))
+
+        view_dir = cam.get_view_dir()
+        for i in xrange(3):
+            t = (focal_dist - numpy.dot(orig[i] - cam.get_eye_pos(), view_dir)) /\
+                numpy.dot(vdir[i], view_dir)
+            p = orig[i] + t * vdir[i]
+            pt = porig[0] + (focal_dist / numpy.dot(pdir[0], view_dir)) * pdir[0]
+            assert(numpy.allclose(p, pt))
+
+        # focal plane at infinity: parallel rays
+        cam.set_lens_to_film_distance(1.0)
+        (orig, vdir) = cam.generate_rays(dx, dy, lens_uv, 0.1)
+        assert(numpy.allclose(vdir, pdir))
+
 #
 # main test
 #
@@ -10,6 +10,7 @@
 
 import unittest
 import numpy
+from PIL import Image
 import Film
 
 # test Film
@@ -35,6 +36,106 @@ class TestFilm(unittest.TestCase):
         # save a file
         f.save_file('test_film_result.png')
 
+
+    def test_imagefilm_save(self):
+        """test for ImageFilm save: orientation, clamp, and channels"""
+        f = Film.ImageFilm((4, 3, 4), 'RGBA')
+        f.fill_color(numpy.array([0.0, 0.0, 0.0, 1.0]))
+        # (0, 0) is the left bottom pixel
+        f.put_color((0, 0), numpy.array([1.0, 2.0, -1.0, 1.0]))
+        f.put_color((3, 2), numpy.array([0.5, 0.5, 0.5, 1.0]))
+
+        image = f.get_uint8_image()
+        assert(image.shape == (3, 4, 4))
+        assert((image[2, 0] == [255, 255, 0, 255]).all())
+        assert((image[0, 3] == [127, 127, 127, 255]).all())
+        assert((f.get_uint8_image(1.0, 2.0)[0, 3, 0:3] == 180).all())
+
+        fname = 'test_film_result.png'
+        f.save_file(fname)
+        img = Image.open(fname)
+        assert(img.size == (4, 3))
+        assert(img.getpixel((0, 2)) == (255, 255, 0, 255))
+
+        for depth in [1, 3]:
+            f = Film.ImageFilm((4, 3, depth), 'RGB')
+            f.fill_color(numpy.ones(depth))
+            f.save_file(fname)
+            img = Image.open(fname)
+            assert(img.getpixel((1, 1)) == (255, 255, 255))
+
+
+    def test_imagefilm_shared(self):
+        """test for ImageFilm in shared memory"""
+        f = Film.ImageFilm((16, 8, 4), 'RGBA', True)
+        assert(f.is_shared())
+        fb = f.get_framebuffer()
+        assert(fb.shape == (16, 8, 4))
+        assert((fb == 0.0).all())
+
+        red = numpy.array([1, 0, 0, 1])
+        f.put_color((3, 5), red)
+        assert((fb[3, 5] == red).all())
+
+    def test_imagefilm_accumulation(self):
+        """test for ImageFilm accumulation mode"""
+        f = Film.ImageFilm((4, 3, 2), 'RGBA', False, True)
+        assert(f.is_accumulation())
+
+        frame = numpy.ones((4, 3, 2))
+        f.accumulate(frame)
+        f.accumulate(3.0 * frame)
+        assert((f.get_sample_count_buffer() == 2).all())
+        assert(numpy.allclose(f.get_image(), 2.0))
+        assert(numpy.allclose(f.get_color((1, 2)), [2.0, 2.0]))
+
+        # a tile
+        f.accumulate(numpy.zeros((2, 1, 2)), (2, 1))
+        self.assertEquals(f.get_sample_count_buffer()[3, 1], 3)
+        assert(numpy.allclose(f.get_color((3, 1)), 4.0 / 3.0))
+        assert(numpy.allclose(f.get_color((3, 2)), 2.0))
+
+        f.put_color((0, 0), numpy.array([0.5, 0.5]))
+        assert(numpy.allclose(f.get_color((0, 0)), 0.5))
+
+        f.clear()
+        assert((f.get_sample_count_buffer() == 0).all())
+        assert((f.get_image() == 0.0).all())
+
+        # not accumulation mode
+        self.assertRaises(StandardError, Film.ImageFilm((4, 3, 2), 'RGBA').accumulate, frame)
+
+    def test_imagefilm_variance(self):
+        """test for ImageFilm second moment mode"""
+        f = Film.ImageFilm((4, 3, 2), 'RGBA', False, True, True)
+        self.assertEquals(f.get_second_moment_buffer().shape, (4, 3, 2))
+        frame = numpy.ones((4, 3, 2))
+        f.accumulate(frame)
+        assert(numpy.isinf(f.get_variance()).all())
+
+        rng = numpy.random.RandomState(0)
+        sample_list = [frame]
+        for i in xrange(4):
+            sample = rng.random_sample((4, 3, 2))
+            f.accumulate(sample)
+            sample_list.append(sample)
+        ref = numpy.var(numpy.array(sample_list), axis=0, ddof=1) / len(sample_list)
+        assert(numpy.allclose(f.get_variance(), ref))
+
+        # the variance of a tile
+        f.accumulate(numpy.ones((1, 1, 2)), (0, 0))
+        ref = numpy.var(numpy.array([s[0, 0] for s in sample_list] + [[1.0, 1.0]]),
+                        axis=0, ddof=1) / (len(sample_list) + 1)
+        assert(numpy.allclose(f.get_variance()[0, 0], ref))
+
+        f.clear()
+        assert((f.get_second_moment_buffer() == 0.0).all())
+
+        # second moment needs the accumulation mode, variance needs
+        # the second moment mode
+        self.assertRaises(StandardError, Film.ImageFilm, (4, 3, 2), 'RGBA', False, False, True)
+        self.assertRaises(StandardError, Film.ImageFilm((4, 3, 2), 'RGBA', False, True).get_variance)
+
 #
 # main test
 #
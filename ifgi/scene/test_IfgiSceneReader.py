@@ -8,7 +8,55 @@
 """test IFGI IfgiSceneReader"""
 
 import unittest
-import IfgiSceneReader
+import os, shutil, tempfile
+import numpy
+import IfgiSceneReader, Primitive, SceneUtil, SceneGraph, Ray
+
+
+# two instances of a cylinder. %s is the obj file path.
+INSTANCE_SCENE = """# ifgi_scene 0
+def material {
+    mat_name = mat0
+    mat_type = lambert
+    diffuse_color = 0.5 0.5 0.5 1.0
+}
+def material {
+    mat_name = mat1
+    mat_type = lambert
+    diffuse_color = 0.9 0.1 0.1 1.0
+}
+def geometry {
+    geo_name = cylinder
+    material = mat0
+    geo_file_type = obj
+    geo_file_name = %s
+}
+def instance {
+    inst_name = inst0
+    geo_name = cylinder
+    matrix = 1 0 0 100  0 1 0 0  0 0 1 0  0 0 0 1
+}
+def instance {
+    inst_name = inst1
+    geo_name = cylinder
+    material = mat1
+    matrix = 2 0 0 0  0 2 0 0  0 0 2 -100  0 0 0 1
+}
+"""
+
+
+def read_cornel_box(_worker_count, _is_lazy):
+    """read the cornel box scene
+    \param[in] _worker_count number of geometry loader processes
+    \param[in] _is_lazy      lazy geometry loading
+    \return ifgi scene reader
+    """
+    ifgireader = IfgiSceneReader.IfgiSceneReader()
+    ifgireader.set_load_worker_count(_worker_count)
+    ifgireader.set_lazy_geometry_load(_is_lazy)
+    assert(ifgireader.read('../../sampledata/cornel_box.ifgi'))
+    return ifgireader
+
 
 class TestIfgiSceneReader(unittest.TestCase):
     """test for ifgi scene reader"""
@@ -24,6 +72,135 @@ class TestIfgiSceneReader(unittest.TestCase):
         self.assertEquals(len(ifgireader.camera_dict_dict), 1)
 
 
+    def test_ifgiscenereader_parallel_load(self):
+        """ifgi scene reader: parallel and lazy geometry loading"""
+        seq_reader  = read_cornel_box(1, False)
+        # force the process pool for the small scene
+        min_bytes = IfgiSceneReader.IfgiSceneReader.PARALLEL_LOAD_MIN_BYTES
+        IfgiSceneReader.IfgiSceneReader.PARALLEL_LOAD_MIN_BYTES = 0
+        try:
+            par_reader = read_cornel_box(2, False)
+        finally:
+            IfgiSceneReader.IfgiSceneReader.PARALLEL_LOAD_MIN_BYTES = min_bytes
+        lazy_reader = read_cornel_box(1, True)
+
+        for reader in [par_reader, lazy_reader]:
+            self.assertEquals(len(reader.geometry_dict_list), 8)
+            for (seq_geo, geo) in zip(seq_reader.geometry_dict_list,
+                                      reader.geometry_dict_list):
+                seq_mesh = seq_geo['TriMesh']
+                tmesh    = geo['TriMesh']
+                self.assertEquals(tmesh.get_name(), seq_geo['geo_name'])
+                self.assertEquals(tmesh.get_name(), seq_mesh.get_name())
+                assert((tmesh.vertex_list   == seq_mesh.vertex_list).all())
+                assert((tmesh.face_idx_list == seq_mesh.face_idx_list).all())
+
+        # lazy mesh is loaded at the first access
+        tmesh = read_cornel_box(1, True).geometry_dict_list[0]['TriMesh']
+        assert(isinstance(tmesh, Primitive.LazyTriMesh))
+        assert(not tmesh.is_loaded())
+        assert(tmesh.get_bbox().has_volume() or tmesh.get_bbox().get_rank() > 0)
+        assert(tmesh.is_loaded())
+        self.assertRaises(AttributeError, getattr, tmesh, 'no_such_member')
+
+
+    def test_ifgiscenereader_instance(self):
+        """ifgi scene reader: instances share the geometry"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            ifgi_fname = os.path.join(tmpdir, 'instance.ifgi')
+            with open(ifgi_fname, 'w') as outfile:
+                outfile.write(INSTANCE_SCENE %
+                              os.path.abspath('../../sampledata/cylinder.obj'))
+            ifgireader = IfgiSceneReader.IfgiSceneReader()
+            assert(ifgireader.read(ifgi_fname))
+        finally:
+            shutil.rmtree(tmpdir)
+
+        self.assertEquals(len(ifgireader.geometry_dict_list), 1)
+        self.assertEquals(len(ifgireader.instance_dict_list), 2)
+        tmesh = ifgireader.geometry_dict_list[0]['TriMesh']
+        (inst0, inst1) = [d['TriMeshInstance'] for d in ifgireader.instance_dict_list]
+        assert(inst0.get_trimesh() is tmesh)
+        assert(inst1.get_trimesh() is tmesh)
+        self.assertEquals(inst0.get_material_name(), 'mat0')
+        self.assertEquals(inst1.get_material_name(), 'mat1')
+        assert(numpy.allclose(inst0.get_bbox().get_min(),
+                              tmesh.get_bbox().get_min() + [100.0, 0.0, 0.0]))
+
+        # the container has the instances as geometries
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.append_ifgi_data(ifgireader)
+        self.assertEquals(len(scene_geo_mat.geometry_dict_list), 3)
+        inst_geo = scene_geo_mat.geometry_dict_list[2]
+        self.assertEquals(inst_geo['geo_name'], 'inst1')
+        self.assertEquals(inst_geo['TriMesh'].material_index,
+                          scene_geo_mat.material_name_idx_dict['mat1'])
+
+        # a ray toward the translated instance hits it
+        center = 0.5 * (inst0.get_bbox().get_min() + inst0.get_bbox().get_max())
+        ray = Ray.Ray(center + [0.0, 0.0, -1000.0], numpy.array([0.0, 0.0, 1.0]),
+                      0.0001, 10000.0)
+        hr = scene_geo_mat.ray_intersect(ray)
+        assert(hr != None)
+        assert(hr.hit_primitive is inst0)
+        scene_geo_mat.build_accelerator()
+        self.assertAlmostEqual(scene_geo_mat.ray_intersect(ray).dist, hr.dist)
+
+
+    def test_ifgiscenereader_instance_transform(self):
+        """ifgi scene reader: a scenegraph transform moves the traced
+        instance"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            ifgi_fname = os.path.join(tmpdir, 'instance.ifgi')
+            with open(ifgi_fname, 'w') as outfile:
+                outfile.write(INSTANCE_SCENE %
+                              os.path.abspath('../../sampledata/cylinder.obj'))
+            ifgireader = IfgiSceneReader.IfgiSceneReader()
+            assert(ifgireader.read(ifgi_fname))
+        finally:
+            shutil.rmtree(tmpdir)
+
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.append_ifgi_data(ifgireader)
+        inst0 = ifgireader.instance_dict_list[0]['TriMeshInstance']
+
+        # the ifgi scenegraph refers to the traced instances
+        sg = SceneGraph.create_ifgi_scenegraph(ifgireader)
+        inst_node_list = [node for node in sg.get_root_node().get_children()[2].get_children()
+                          if isinstance(node, SceneGraph.InstanceNode)]
+        self.assertEquals(len(inst_node_list), 2)
+        assert(inst_node_list[0].get_primitive() is inst0)
+
+        # put inst0 under a transform
+        sg = SceneGraph.create_empty_scenegraph()
+        xform = SceneGraph.TransformNode('xform')
+        sg.get_root_node().append_child(xform)
+        xform.append_child(SceneGraph.InstanceNode('inst0', inst0))
+        sg.update_all_transform()
+
+        center = 0.5 * (inst0.get_bbox().get_min() + inst0.get_bbox().get_max())
+        ray = Ray.Ray(center + [0.0, 0.0, -1000.0], numpy.array([0.0, 0.0, 1.0]),
+                      0.0001, 10000.0)
+        assert(scene_geo_mat.ray_intersect(ray).hit_primitive is inst0)
+
+        # move the parent transform: the ray misses, a moved ray hits
+        trans = numpy.identity(4)
+        trans[0:3, 3] = [0.0, 500.0, 0.0]
+        xform.set_matrix(trans)
+        sg.update_all_transform()
+        assert(scene_geo_mat.ray_intersect(ray) == None)
+        moved_ray = Ray.Ray(center + [0.0, 500.0, -1000.0], numpy.array([0.0, 0.0, 1.0]),
+                            0.0001, 10000.0)
+        assert(scene_geo_mat.ray_intersect(moved_ray).hit_primitive is inst0)
+
+        # the accelerator is rebuilt for the moved instance
+        scene_geo_mat.build_accelerator()
+        assert(scene_geo_mat.ray_intersect(ray) == None)
+        assert(scene_geo_mat.ray_intersect(moved_ray).hit_primitive is inst0)
+
+
 #
 # main test
 #
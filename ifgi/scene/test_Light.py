@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for Light
+#
+
+"""test IFGI Light"""
+
+import unittest
+import numpy
+
+import IfgiSceneReader, SceneUtil, Light
+
+
+class TestLight(unittest.TestCase):
+    """test for Light"""
+
+    def test_light_registry(self):
+        """LightRegistry: the cornel box light, uniform area sampling"""
+        ifgireader = IfgiSceneReader.IfgiSceneReader()
+        assert(ifgireader.read('../../sampledata/cornel_box.ifgi'))
+        scene_geo_mat = SceneUtil.SceneGeometryMaterialContainer()
+        scene_geo_mat.append_ifgi_data(ifgireader)
+
+        light_reg = Light.LightRegistry(scene_geo_mat)
+        self.assertEquals(light_reg.get_light_count(), 2)
+        assert(light_reg.can_sample())
+
+        rng = numpy.random.RandomState(0)
+        (pos, normal, emit, pdf_area, light_idx) = light_reg.sample_array(1000, rng)
+        # light: x [213, 343], y = 545, z [227, 332]
+        assert(numpy.allclose(pos[:, 1], 545.0))
+        assert((pos[:, 0] >= 213.0).all() and (pos[:, 0] <= 343.0).all())
+        assert((pos[:, 2] >= 227.0).all() and (pos[:, 2] <= 332.0).all())
+        assert(numpy.allclose(numpy.abs(normal[:, 1]), 1.0))
+        assert(numpy.allclose(pdf_area, 1.0 / (130.0 * 105.0)))
+        assert(numpy.allclose(emit[:, 0], 10.0))
+
+        light_gi = scene_geo_mat.geometry_name_idx_dict['light']
+        floor_gi = scene_geo_mat.geometry_name_idx_dict['floor']
+        assert((light_reg.get_light_index(numpy.array([light_gi, light_gi, floor_gi]),
+                                          numpy.array([0, 1, 0])) == [0, 1, -1]).all())
+
+
+    def test_light_registry_no_light(self):
+        """LightRegistry: no emitter, can not sample"""
+        light_reg = Light.LightRegistry(SceneUtil.SceneGeometryMaterialContainer())
+        self.assertEquals(light_reg.get_light_count(), 0)
+        assert(not light_reg.can_sample())
+        self.assertRaises(StandardError, light_reg.sample_array, 1,
+                          numpy.random.RandomState(0))
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestLight)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# Copyright 2011 (C) Yamauchi, Hitoshi
+#
+# test for MeshCache
+#
+
+"""test IFGI MeshCache"""
+
+import unittest
+import os, shutil, tempfile
+import numpy
+
+import MeshCache, ObjReader, ConvReader2Primitive
+
+
+class TestMeshCache(unittest.TestCase):
+    """test for MeshCache"""
+
+    def setUp(self):
+        """copy a sample obj file to a temporary directory"""
+        self.__tmpdir  = tempfile.mkdtemp()
+        self.__objfname = os.path.join(self.__tmpdir, 'cylinder.obj')
+        shutil.copy('../../sampledata/cylinder.obj', self.__objfname)
+
+
+    def tearDown(self):
+        """remove the temporary directory"""
+        shutil.rmtree(self.__tmpdir)
+
+
+    def test_mesh_cache(self):
+        """mesh cache: write, memory mapped read, and the same mesh"""
+        objreader = ObjReader.ObjReader()
+        objreader.read(self.__objfname)
+        ref_mesh = ConvReader2Primitive.conv_objreader_trimesh(objreader, 'mesh', 'mat')
+
+        cache_fname = MeshCache.get_cache_filename(self.__objfname)
+        assert(MeshCache.read_cache(self.__objfname) == None)
+
+        # first load writes the cache
+        tmesh = MeshCache.load_obj_trimesh(self.__objfname, 'mesh', 'mat')
+        assert(os.path.isfile(cache_fname))
+
+        array_dict = MeshCache.read_cache(self.__objfname)
+        assert(array_dict != None)
+        assert(isinstance(array_dict['vertex_list'], numpy.memmap))
+
+        # second load is from the cache
+        tmesh = MeshCache.load_obj_trimesh(self.__objfname, 'mesh', 'mat')
+        self.assertEquals(tmesh.get_name(), 'mesh')
+        self.assertEquals(tmesh.get_material_name(), 'mat')
+        assert((tmesh.vertex_list   == ref_mesh.vertex_list).all())
+        assert((tmesh.face_idx_list == ref_mesh.face_idx_list).all())
+        self.assertEquals(len(tmesh.normal_list), len(ref_mesh.normal_list))
+        assert(tmesh.get_bbox().equal(ref_mesh.get_bbox()))
+
+
+    def test_mesh_cache_invalidate(self):
+        """mesh cache: source change and broken cache invalidate the cache"""
+        MeshCache.load_obj_trimesh(self.__objfname, 'mesh', 'mat')
+        assert(MeshCache.read_cache(self.__objfname) != None)
+
+        # source changed
+        with open(self.__objfname, 'a') as outfile:
+            outfile.write('v 0.0 100.0 0.0\n')
+        assert(MeshCache.read_cache(self.__objfname) == None)
+        tmesh = MeshCache.load_obj_trimesh(self.__objfname, 'mesh', 'mat')
+        self.assertEquals(len(tmesh.vertex_list), 143)
+        self.assertEquals(len(MeshCache.read_cache(self.__objfname)['vertex_list']), 143)
+
+        # broken cache
+        with open(MeshCache.get_cache_filename(self.__objfname), 'wb') as outfile:
+            outfile.write('broken')
+        assert(MeshCache.read_cache(self.__objfname) == None)
+        tmesh = MeshCache.load_obj_trimesh(self.__objfname, 'mesh', 'mat')
+        self.assertEquals(len(tmesh.vertex_list), 143)
+
+        # truncated cache: in the header length, in the header
+        cache_fname = MeshCache.get_cache_filename(self.__objfname)
+        with open(cache_fname, 'rb') as infile:
+            cache_data = infile.read()
+        for trunc_len in [len(MeshCache.MAGIC) + 1, len(MeshCache.MAGIC) + 10]:
+            with open(cache_fname, 'wb') as outfile:
+                outfile.write(cache_data[0:trunc_len])
+            assert(MeshCache.read_cache(self.__objfname) == None)
+        tmesh = MeshCache.load_obj_trimesh(self.__objfname, 'mesh', 'mat')
+        self.assertEquals(len(tmesh.vertex_list), 143)
+        assert(MeshCache.read_cache(self.__objfname) != None)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestMeshCache)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -8,6 +8,8 @@
 """test IFGI ObjReader"""
 
 import unittest
+import os, tempfile
+import numpy
 import ObjReader
 
 class TestObjReader(unittest.TestCase):
@@ -62,6 +64,63 @@ class TestObjReader(unittest.TestCase):
         self.assertEquals(len(objreader.face_idx_list), 280) # nface
 
 
+    def test_objreader_bulk(self):
+        """objreader bulk parser: the same result as the line parser"""
+        for objfname in ['one_tri.obj', 'cylinder.obj', 'cornel_box.obj',
+                         'cornel_box.tallblock.obj', 'bunny1_8K.obj']:
+            objreader = ObjReader.ObjReader()
+            objreader.read('../../sampledata/' + objfname)
+            bulkreader = ObjReader.ObjReader()
+            bulkreader.read_bulk('../../sampledata/' + objfname)
+
+            assert(isinstance(bulkreader.vertex_list,   numpy.ndarray))
+            assert(isinstance(bulkreader.face_idx_list, numpy.ndarray))
+            self.assertEquals(bulkreader.face_idx_list.dtype, numpy.int32)
+            for name in ['vertex_list', 'face_idx_list', 'texcoord_list',
+                         'texcoord_idx_list', 'normal_list', 'normal_idx_list']:
+                ref = getattr(objreader, name)
+                res = getattr(bulkreader, name)
+                self.assertEquals(len(ref), len(res))
+                if len(ref) > 0:
+                    assert((numpy.array(ref) == res).all())
+
+
+    def test_objreader_bulk_face_format(self):
+        """objreader bulk parser: face formats and the fall back"""
+        (fd, objfname) = tempfile.mkstemp('.obj')
+        os.close(fd)
+        vstr = 'v 0 0 0\nv 1 0 0\nv 0 1 0\nv 1 1 0\n' +\
+            'vt 0 0\nvt 1 0\nvt 0 1\nvn 0 0 1\nvn 0 0 -1\n'
+        face_case_list = [
+            ('f 1/1/1 2/2/1 3/3/1\nf 2/2/2 4/3/2 3/1/2\n', True),
+            ('f 1//1 2//1 3//1\nf 2//2 4//2 3//2\n',       True),
+            # quad: fall back to the line parser
+            ('f 1 2 4 3\n',                                 False),
+            # mixed: fall back to the line parser
+            ('f 1/1 2/2 3/3\nf 2//1 4//1 3//1\n',          False),
+            ]
+        try:
+            for (fstr, is_bulk) in face_case_list:
+                with open(objfname, 'w') as outfile:
+                    outfile.write(vstr + fstr)
+                objreader = ObjReader.ObjReader()
+                objreader.read(objfname)
+                bulkreader = ObjReader.ObjReader()
+                bulkreader.read_bulk(objfname)
+
+                self.assertEquals(isinstance(bulkreader.face_idx_list, numpy.ndarray),
+                                  is_bulk)
+                for name in ['face_idx_list', 'texcoord_idx_list', 'normal_idx_list']:
+                    ref = getattr(objreader, name)
+                    res = getattr(bulkreader, name)
+                    self.assertEquals(len(ref), len(res))
+                    if len(ref) > 0:
+                        assert((numpy.array(ref) == numpy.array(res)).all())
+        finally:
+            os.remove(objfname)
+
+
+
 #     def test_objreader_sample2(self):
 #         objreader = ObjReader.ObjReader()
 #         objreader.read('../sampledata/cylinder.obj')
@@ -15,6 +15,7 @@ import numpy
 import random
 import Primitive
 import Ray
+from ifgi.base import OrthonomalBasis, ifgimath
 import cProfile
 import pstats
 
@@ -109,7 +110,247 @@ class TestPrimitive(unittest.TestCase):
     #     assert(tmesh.get_bbox().equal(bbox))
 
 
+    # bbox: ray slab test
+    def test_bbox_slab_test(self):
+        """bbox: ray slab test, scalar and vectorized"""
+        bbox = Primitive.BBox()
+        bbox.insert_point(numpy.array([-1.0, -1.0, -1.0]))
+        bbox.insert_point(numpy.array([ 1.0,  1.0,  1.0]))
+
+        # through the box
+        r = Ray.Ray(numpy.array([-5.0, 0.0, 0.0]), numpy.array([1.0, 0.0, 0.0]), 0.0, 100.0)
+        (tnear, tfar) = bbox.ray_slab_test(r)
+        assert(abs(tnear - 4.0) < 1e-12)
+        assert(abs(tfar  - 6.0) < 1e-12)
+        hr = bbox.ray_intersect(r)
+        assert(numpy.allclose(hr.intersect_pos, [-1.0, 0.0, 0.0]))
+        # the box is beyond max_t
+        assert(bbox.ray_slab_test(r, 3.9) == None)
+        # the origin is in the box
+        r = Ray.Ray(numpy.array([0.0, 0.0, 0.0]), numpy.array([0.0, 0.0, -1.0]), 0.0, 100.0)
+        assert(bbox.ray_slab_test(r)[0] == 0.0)
+        # on the face plane, parallel to the face (0 * inf)
+        r = Ray.Ray(numpy.array([-5.0, 1.0, 0.0]), numpy.array([1.0, 0.0, 0.0]), 0.0, 100.0)
+        assert(bbox.ray_slab_test(r) != None)
+        # miss
+        r = Ray.Ray(numpy.array([-5.0, 1.5, 0.0]), numpy.array([1.0, 0.0, 0.0]), 0.0, 100.0)
+        assert(bbox.ray_slab_test(r) == None)
+        assert(bbox.ray_intersect(r) == None)
+
+        # vectorized version is the same as the scalar version
+        rng = numpy.random.RandomState(0)
+        ray_count = 500
+        orig = rng.uniform(-3.0, 3.0, (ray_count, 3))
+        vdir = rng.normal(size=(ray_count, 3))
+        vdir[0:50, 0] = 0.0
+        orig[0:10, 0] = 1.0
+        min_t = numpy.zeros(ray_count)
+        max_t = rng.uniform(0.0, 5.0, ray_count)
+        (tnear, tfar, is_hit) = bbox.ray_slab_test_batch(
+            orig, Primitive.get_inv_dir_array(vdir), min_t, max_t)
+        assert(0 < is_hit.sum() < ray_count)
+        for i in xrange(ray_count):
+            r = Ray.Ray(orig[i], vdir[i], min_t[i], max_t[i])
+            trange = bbox.ray_slab_test(r)
+            self.assertEquals(trange != None, is_hit[i])
+            if trange != None:
+                assert(abs(trange[0] - tnear[i]) < 1e-9)
+                assert(abs(trange[1] - tfar[i])  < 1e-9)
+
+
+    # trimesh: per face geometry cache
+    def test_trimesh_face_array(self):
+        """trimesh: per face frame, area, bbox, and vertex update"""
+        tmesh = Primitive.TriMesh('mesh', 'mat')
+        vlist = numpy.array([[0.0, 0.0, 0.0], [2.0, 0.0, 0.0], [0.0, 2.0, 0.0],
+                             [0.0, 0.0, 1.0], [0.0, 0.0, 1.0]])
+        # second face is degenerate
+        tmesh.set_data(vlist, numpy.array([[0, 1, 2], [0, 3, 4]]), [], [], [], [])
+
+        assert(numpy.allclose(tmesh.face_area, [2.0, 0.0]))
+        assert(numpy.allclose(tmesh.face_bbox_min[0], [0.0, 0.0, 0.0]))
+        assert(numpy.allclose(tmesh.face_bbox_max[0], [2.0, 2.0, 0.0]))
+        assert(numpy.all(tmesh.face_frame_w[1] == 0.0))
+
+        # the same as OrthonomalBasis.init_from_uv(e1, e2)
+        ref_onb = OrthonomalBasis.OrthonomalBasis()
+        ref_onb.init_from_uv(tmesh.face_e1[0], tmesh.face_e2[0])
+        onb = tmesh.get_face_basis(0)
+        assert(numpy.allclose(onb.u(), ref_onb.u()))
+        assert(numpy.allclose(onb.v(), ref_onb.v()))
+        assert(numpy.allclose(onb.w(), ref_onb.w()))
+
+        # vertex update recomputes the face arrays and drops the BVH
+        tmesh.build_bvh()
+        assert(tmesh.get_bvh() != None)
+        vlist = vlist.copy()
+        vlist[2] = [0.0, 0.0, 2.0]
+        tmesh.set_vertex_list(vlist)
+        assert(tmesh.get_bvh() == None)
+        assert(numpy.allclose(tmesh.face_frame_w[0], [0.0, -1.0, 0.0]))
+        assert(numpy.allclose(tmesh.face_bbox_max[0], [2.0, 0.0, 2.0]))
+        assert(numpy.allclose(tmesh.get_bbox().get_max()[0:3], [2.0, 0.0, 2.0]))
+        self.assertRaises(StandardError, tmesh.set_vertex_list, vlist[0:3])
+
+
+    # trimesh instance: the same as a transformed copy
+    def test_trimesh_instance(self):
+        """trimesh instance: the same hits as a transformed copy"""
+        random.seed(0)
+        vlist = numpy.array([[random.uniform(-1, 1) for j in xrange(3)]
+                             for i in xrange(60)])
+        flist = numpy.arange(60).reshape((20, 3))
+        tmesh = Primitive.TriMesh('mesh', 'mat')
+        tmesh.set_data(vlist, flist, [], [], [], [])
+
+        # rotation, non uniform scale, and translation
+        matrix = ifgimath.getRotationMat([1.0, 2.0, 3.0], 0.7)
+        matrix = numpy.dot(matrix, numpy.diag([2.0, 1.0, 0.5, 1.0]))
+        matrix[0:3, 3] = [3.0, -1.0, 2.0]
+        inst = Primitive.TriMeshInstance('inst', tmesh, matrix)
+        self.assertEquals(inst.get_material_name(), 'mat')
+        self.assertRaises(StandardError, inst.set_matrix, numpy.zeros((4, 4)))
+
+        ref_mesh = Primitive.TriMesh('ref', 'mat')
+        ref_mesh.set_data([ifgimath.transformPoint(matrix, v) for v in vlist], flist,
+                          [], [], [], [])
+        # the world box contains the transformed mesh
+        assert(numpy.all(inst.get_bbox().get_min() <= ref_mesh.get_bbox().get_min() + 1e-9))
+        assert(numpy.all(inst.get_bbox().get_max() >= ref_mesh.get_bbox().get_max() - 1e-9))
+        # world space per face arrays
+        assert(numpy.allclose(inst.face_area,    ref_mesh.face_area))
+        assert(numpy.allclose(inst.face_frame_w, ref_mesh.face_frame_w))
+        assert(numpy.allclose(inst.face_v0,      ref_mesh.face_v0))
+
+        ray_list = []
+        center = 0.5 * (ref_mesh.get_bbox().get_min() + ref_mesh.get_bbox().get_max())
+        for i in xrange(100):
+            orig = center + numpy.array([random.uniform(-6, 6) for j in xrange(3)])
+            rdir = center + numpy.array([random.uniform(-1, 1) for j in xrange(3)]) - orig
+            rdir /= numpy.linalg.norm(rdir)
+            ray_list.append(Ray.Ray(orig, rdir, 0.0001, 1000.0))
+
+        for is_bvh in [False, True]:
+            if is_bvh:
+                inst.build_bvh()
+                assert(tmesh.get_bvh() != None)
+                assert(inst.get_bvh() is tmesh.get_bvh())
+            hit_count = 0
+            for r in ray_list:
+                ref_hr = ref_mesh.ray_intersect(r)
+                hr = inst.ray_intersect(r)
+                self.assertEquals(inst.occluded(r), ref_hr != None)
+                if ref_hr == None:
+                    assert(hr == None)
+                    continue
+                hit_count += 1
+                self.assertAlmostEqual(hr.dist, ref_hr.dist)
+                self.assertEquals(hr.hit_face_index, ref_hr.hit_face_index)
+                assert(numpy.allclose(hr.intersect_pos, ref_hr.intersect_pos))
+                assert(numpy.allclose(hr.hit_basis.w(), ref_hr.hit_basis.w()))
+            assert(hit_count > 0)
+
+        orig  = numpy.array([r.get_origin() for r in ray_list])
+        vdir  = numpy.array([r.get_dir()    for r in ray_list])
+        min_t = numpy.array([r.get_min_t()  for r in ray_list])
+        max_t = numpy.array([r.get_max_t()  for r in ray_list])
+        (t, fi) = inst.ray_intersect_batch(orig, vdir, min_t, max_t)
+        (ref_t, ref_fi) = ref_mesh.ray_intersect_batch(orig, vdir, min_t, max_t)
+        assert(numpy.all(fi == ref_fi))
+        assert(numpy.allclose(t[fi >= 0], ref_t[ref_fi >= 0]))
+        assert(numpy.all(inst.occluded_batch(orig, vdir, min_t, max_t) == (ref_fi >= 0)))
+
+
     # primitive: ray-triangle intesection
+    # structure of arrays ray-triangle intersection
+    def test_ray_triangle_intersect_soa(self):
+        """ray_triangle_intersect_soa: the same hits as
+        Triangle.ray_intersect, with the backfacing and the edge-on
+        triangles"""
+        random.seed(1)
+        vertex_list = []
+        for i in xrange(20):
+            vertex_list.append([numpy.array([random.uniform(-1, 1) for j in xrange(3)])
+                                for k in xrange(3)])
+        # the same triangle, front and back facing the rays
+        vertex_list.append([numpy.array([-1.0, -1.0, 0.5]), numpy.array([1.0, -1.0, 0.5]),
+                            numpy.array([0.0, 1.0, 0.5])])
+        vertex_list.append([numpy.array([-1.0, -1.0, -0.5]), numpy.array([0.0, 1.0, -0.5]),
+                            numpy.array([1.0, -1.0, -0.5])])
+        # edge-on: the z = 0 plane, for the rays of zero dir z
+        vertex_list.append([numpy.array([-2.0, -2.0, 0.0]), numpy.array([2.0, -2.0, 0.0]),
+                            numpy.array([0.0, 2.0, 0.0])])
+
+        tri_list = []
+        for (p0, p1, p2) in vertex_list:
+            tri = Primitive.Triangle()
+            tri.set_vertex(p0, p1, p2)
+            tri_list.append(tri)
+        v0 = numpy.array([v[0] for v in vertex_list])
+        e1 = numpy.array([v[1] - v[0] for v in vertex_list])
+        e2 = numpy.array([v[2] - v[0] for v in vertex_list])
+        n  = numpy.cross(e1, e2)
+
+        ray_list = []
+        for i in xrange(300):
+            orig = numpy.array([random.uniform(-2, 2) for j in xrange(3)])
+            rdir = numpy.array([random.uniform(-1, 1) for j in xrange(3)])
+            if i % 3 == 0:
+                # along z, both facings of the front/back pair
+                rdir = numpy.array([0.0, 0.0, random.choice([-1.0, 1.0])])
+            elif i % 3 == 1:
+                # in the plane of the edge-on triangle
+                orig[2] = 0.0
+                rdir[2] = 0.0
+            ray_list.append(Ray.Ray(orig, rdir / numpy.linalg.norm(rdir), 0.0,
+                                    random.uniform(0.5, 5.0)))
+
+        hit_count = 0
+        backfacing_count = 0
+        for r in ray_list:
+            ref = None
+            for (fi, tri) in enumerate(tri_list):
+                hr = tri.ray_intersect(r)
+                if (hr != None) and ((ref == None) or (hr.dist < ref[1].dist)):
+                    ref = (fi, hr)
+            hit = Primitive.ray_triangle_intersect_soa(r.get_origin(), r.get_dir(),
+                                                       r.get_min_t(), r.get_max_t(),
+                                                       v0, e1, e2, n)
+            any_hit = Primitive.ray_triangle_intersect_soa(r.get_origin(), r.get_dir(),
+                                                           r.get_min_t(), r.get_max_t(),
+                                                           v0, e1, e2, n, True)
+            if ref == None:
+                assert(hit == None)
+                assert(any_hit == None)
+                continue
+
+            (t, fi, b1, b2) = hit
+            self.assertEquals(fi, ref[0])
+            self.assertAlmostEqual(t, ref[1].dist)
+            assert((b1 >= 0.0) and (b2 >= 0.0) and (b1 + b2 <= 1.0))
+            assert(numpy.allclose(v0[fi] + b1 * e1[fi] + b2 * e2[fi],
+                                  ref[1].intersect_pos))
+            # any hit is a hit of its triangle
+            any_hr = tri_list[any_hit[1]].ray_intersect(r)
+            assert(any_hr != None)
+            self.assertAlmostEqual(any_hit[0], any_hr.dist)
+
+            hit_count += 1
+            if numpy.dot(r.get_dir(), n[fi]) > 0.0:
+                backfacing_count += 1
+
+        # the edge-on triangle is never hit, the others are hit from
+        # both sides
+        assert(hit_count > 50)
+        assert(0 < backfacing_count < hit_count)
+        for r in ray_list[1::3]:
+            assert(tri_list[-1].ray_intersect(r) == None)
+            assert(Primitive.ray_triangle_intersect_soa(r.get_origin(), r.get_dir(),
+                                                        r.get_min_t(), r.get_max_t(),
+                                                        v0[-1:], e1[-1:], e2[-1:],
+                                                        n[-1:]) == None)
+
+
     def test_primitive_tri_ray_intersection_sub(self):
         """primitive: ray-triangle intesection"""
 
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+#
+# Copyright (C) 2011 Yamauchi, Hitoshi
+#
+# test for Ray and HitRecord
+#
+
+"""test IFGI Ray and HitRecord"""
+
+import unittest
+import numpy
+
+import Ray, HitRecord, Primitive
+
+
+class TestRay(unittest.TestCase):
+    """test for Ray and HitRecord"""
+
+    def test_ray_reset(self):
+        """ray: lazy path state, reset, and reset_path"""
+        r = Ray.Ray(numpy.array([0.0, 0.0, 0.0]), numpy.array([0.0, 0.0, 1.0]), 0.1, 10.0)
+        # slots: no instance dict
+        self.assertRaises(AttributeError, setattr, r, 'no_such_member', 0)
+        assert(r._reflectance is None)
+        assert((r.reflectance == [1.0, 1.0, 1.0, 1.0]).all())
+        assert((r.intensity   == [0.0, 0.0, 0.0, 1.0]).all())
+
+        r.path_length = 3
+        r.reflectance = r.reflectance * 0.5
+        r.intensity   = r.intensity + numpy.array([1.0, 2.0, 3.0, 0.0])
+
+        # next bounce keeps the path state
+        r.reset(numpy.array([1.0, 2.0, 3.0]), numpy.array([1.0, 0.0, 0.0]))
+        assert((r.get_origin() == [1.0, 2.0, 3.0]).all())
+        assert((r.get_dir()    == [1.0, 0.0, 0.0]).all())
+        self.assertEquals(r.get_min_t(), 0.1)
+        self.assertEquals(r.get_max_t(), 10.0)
+        self.assertEquals(r.path_length, 3)
+        assert((r.reflectance == 0.5).all())
+
+        # new path reuses the arrays
+        refl = r.reflectance
+        r.reset(numpy.array([0.0, 0.0, 0.0]), numpy.array([0.0, 1.0, 0.0]), 0.5, 5.0)
+        r.reset_path()
+        self.assertEquals(r.get_min_t(), 0.5)
+        self.assertEquals(r.get_max_t(), 5.0)
+        self.assertEquals(r.path_length, 0)
+        assert(r.reflectance is refl)
+        assert((r.reflectance == [1.0, 1.0, 1.0, 1.0]).all())
+        assert((r.intensity   == [0.0, 0.0, 0.0, 1.0]).all())
+
+
+    def test_hit_record_lazy_basis(self):
+        """hit record: the hit basis is built at the first access"""
+        tmesh = Primitive.TriMesh('tri', 'mat')
+        tmesh.set_data(numpy.array([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 0.0]]),
+                       numpy.array([[0, 1, 2]]), [], [], [], [])
+        r = Ray.Ray(numpy.array([0.2, 0.2, 1.0]), numpy.array([0.0, 0.0, -1.0]), 0.1, 10.0)
+        hr = tmesh.ray_intersect(r)
+        assert(hr != None)
+        assert(not hr.is_hit_basis_built())
+        assert(numpy.allclose(hr.hit_basis.w(), [0.0, 0.0, 1.0]))
+        assert(hr.is_hit_basis_built())
+
+        hr.reset()
+        self.assertEquals(hr.hit_face_index, -1)
+        assert(hr.hit_basis is None)
+
+
+#
+# main test
+#
+if __name__ == '__main__':
+    suit0   = unittest.TestLoader().loadTestsFromTestCase(TestRay)
+    alltest = unittest.TestSuite([suit0])
+    unittest.TextTestRunner(verbosity=2).run(alltest)
@@ -66,6 +66,45 @@ class TestSceneGraph(unittest.TestCase):
         grp1.append_child(mat0)
 
 
+    def test_instance_node(self):
+        """instance node: transform stack and world bbox"""
+        tmesh = Primitive.TriMesh('mesh', 'mat')
+        tmesh.set_data([[0.0, 0.0, 0.0], [1.0, 0.0, 0.0], [0.0, 1.0, 1.0]],
+                       [[0, 1, 2]], [], [], [], [])
+
+        sg = SceneGraph.create_empty_scenegraph()
+        sg_root = sg.get_root_node()
+        trans = numpy.identity(4)
+        trans[0:3, 3] = [10.0, 0.0, 0.0]
+        xform0 = SceneGraph.TransformNode('xform0', trans)
+        sg_root.append_child(xform0)
+
+        scale = numpy.diag([2.0, 2.0, 2.0, 1.0])
+        inst0 = SceneGraph.InstanceNode(
+            'inst0', Primitive.TriMeshInstance('inst0', tmesh, numpy.identity(4)), scale)
+        inst1 = SceneGraph.InstanceNode(
+            'inst1', Primitive.TriMeshInstance('inst1', tmesh, numpy.identity(4)))
+        xform0.append_child(inst0)
+        sg_root.append_child(inst1)
+
+        sg.update_all_bbox()
+        assert(numpy.allclose(inst0.get_primitive().get_matrix(), numpy.dot(trans, scale)))
+        assert(inst0.get_primitive().get_trimesh() is tmesh)
+        self.assertRaises(StandardError, SceneGraph.InstanceNode, 'inst2', tmesh)
+        assert(numpy.allclose(inst0.get_bbox().get_min(), [10.0, 0.0, 0.0]))
+        assert(numpy.allclose(inst0.get_bbox().get_max(), [12.0, 2.0, 2.0]))
+        assert(numpy.allclose(xform0.get_bbox().get_max(), [12.0, 2.0, 2.0]))
+        assert(numpy.allclose(inst1.get_bbox().get_max(), [1.0, 1.0, 1.0]))
+        assert(numpy.allclose(sg_root.get_bbox().get_min(), [0.0, 0.0, 0.0]))
+
+        # moving the transform moves the instance
+        trans[0:3, 3] = [0.0, -5.0, 0.0]
+        xform0.set_matrix(trans)
+        sg.update_all_bbox()
+        assert(numpy.allclose(inst0.get_bbox().get_min(), [0.0, -5.0, 0.0]))
+        assert(numpy.allclose(sg_root.get_bbox().get_min(), [0.0, -5.0, 0.0]))
+
+
 #
 # main test
 #
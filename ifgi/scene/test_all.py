@@ -7,12 +7,17 @@
 
 import unittest
 
+import test_BVH
+import test_BVHCache
 import test_Camera
 import test_ConvReader2Primitive
 import test_Film
 import test_IfgiSceneReader
+import test_Light
+import test_MeshCache
 import test_ObjReader
 import test_Primitive
+import test_Ray
 import test_SceneGraph
 
 
@@ -21,12 +26,17 @@ import test_SceneGraph
 #
 if __name__ == '__main__':
     suits = []
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_BVH.TestBVH))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_BVHCache.TestBVHCache))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Camera.TestCamera))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ConvReader2Primitive.TestConvReader2Primitive))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Film.TestFilm))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_IfgiSceneReader.TestIfgiSceneReader))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Light.TestLight))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_MeshCache.TestMeshCache))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_ObjReader.TestObjReader))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Primitive.TestPrimitive))
+    suits.append(unittest.TestLoader().loadTestsFromTestCase(test_Ray.TestRay))
     suits.append(unittest.TestLoader().loadTestsFromTestCase(test_SceneGraph.TestSceneGraph))
 
     alltest = unittest.TestSuite(suits)